@@ -0,0 +1,127 @@
+"""
+Curated bloatware rules
+
+Each rule is (kind, pattern, category, safety, description). kind is
+'package' (exact name), 'prefix' (every package under a namespace
+ending in '.'), 'segment' (one dot-separated part of the name equals
+pattern) or 'regex' (searched in the name). safety says how risky removal is, from
+'recommended' (no visible effect) through 'advanced' and 'expert' to
+'unsafe' (breaks the system; listed so it is never offered).
+
+Rule sets are keyed like BRAND_TOOLS; 'generic' and 'carrier' apply to
+every device. Later sets override earlier ones for the same pattern.
+"""
+
+BLOAT_RULES = {
+    'generic': [
+        ('package', 'android', 'system', 'unsafe', "Android framework"),
+        ('package', 'com.android.systemui', 'system', 'unsafe', "System UI"),
+        ('package', 'com.android.settings', 'system', 'unsafe', "Settings"),
+        ('package', 'com.android.phone', 'system', 'unsafe', "Telephony"),
+        ('package', 'com.android.shell', 'system', 'unsafe', "ADB shell"),
+        ('package', 'com.android.packageinstaller', 'system', 'unsafe', "Package installer"),
+        ('package', 'com.android.permissioncontroller', 'system', 'unsafe', "Permission controller"),
+        ('package', 'com.android.webview', 'system', 'expert', "System WebView"),
+        ('package', 'com.android.vending', 'google', 'expert', "Play Store"),
+        ('package', 'com.android.chrome', 'google', 'advanced', "Chrome"),
+        ('prefix', 'com.android.providers.', 'system', 'unsafe', "Content provider"),
+        ('prefix', 'com.android.inputmethod.', 'system', 'expert', "Keyboard"),
+        ('package', 'com.google.android.gms', 'google', 'unsafe', "Play Services"),
+        ('package', 'com.google.android.gsf', 'google', 'unsafe', "Google Services Framework"),
+        ('package', 'com.google.android.youtube', 'google', 'advanced', "YouTube"),
+        ('package', 'com.google.android.music', 'google', 'recommended', "Play Music (discontinued)"),
+        ('package', 'com.google.android.videos', 'google', 'recommended', "Play Movies"),
+        ('package', 'com.google.android.apps.tachyon', 'google', 'recommended', "Duo / Meet"),
+        ('package', 'com.google.android.apps.magazines', 'google', 'recommended', "Google News"),
+        ('package', 'com.google.android.apps.subscriptions.red', 'google', 'recommended', "Google One"),
+        ('package', 'com.google.android.apps.wellbeing', 'google', 'advanced', "Digital Wellbeing"),
+        ('package', 'com.google.android.feedback', 'telemetry', 'recommended', "Market feedback agent"),
+        ('prefix', 'com.facebook.', 'social', 'recommended', "Facebook"),
+        ('package', 'com.instagram.android', 'social', 'recommended', "Instagram"),
+        ('package', 'com.netflix.partner.activation', 'partner', 'recommended', "Netflix preload activation"),
+        ('package', 'com.netflix.mediaclient', 'partner', 'recommended', "Netflix"),
+        ('package', 'com.spotify.music', 'partner', 'recommended', "Spotify"),
+        ('package', 'com.amazon.mShop.android.shopping', 'partner', 'recommended', "Amazon Shopping"),
+        ('package', 'com.amazon.appmanager', 'partner', 'recommended', "Amazon app manager"),
+        ('package', 'com.booking', 'partner', 'recommended', "Booking.com"),
+        ('package', 'com.linkedin.android', 'partner', 'recommended', "LinkedIn"),
+        ('package', 'com.microsoft.skydrive', 'partner', 'advanced', "OneDrive"),
+        ('package', 'com.topjohnwu.magisk', 'root', 'unsafe', "Magisk app"),
+        # Whole name segments only, so "attestation" is not a test package
+        ('segment', 'test', 'test', 'advanced', "Test package"),
+        ('segment', 'tests', 'test', 'advanced', "Test package"),
+        ('segment', 'demo', 'demo', 'recommended', "Retail demo"),
+        ('segment', 'demomode', 'demo', 'recommended', "Retail demo"),
+    ],
+    'carrier': [
+        ('prefix', 'com.vzw.', 'carrier', 'recommended', "Verizon"),
+        ('prefix', 'com.verizon.', 'carrier', 'recommended', "Verizon"),
+        ('prefix', 'com.motricity.verizon.', 'carrier', 'recommended', "Verizon"),
+        ('prefix', 'com.att.', 'carrier', 'recommended', "AT&T"),
+        ('prefix', 'com.tmobile.', 'carrier', 'recommended', "T-Mobile"),
+        ('prefix', 'com.tmo.', 'carrier', 'recommended', "T-Mobile"),
+        ('prefix', 'com.sprint.', 'carrier', 'recommended', "Sprint"),
+        ('prefix', 'com.dti.', 'carrier', 'recommended', "Carrier app installer (Digital Turbine)"),
+        ('package', 'com.ironsrc.aura.tmo', 'carrier', 'recommended', "Carrier app installer (ironSource)"),
+    ],
+    'samsung': [
+        ('prefix', 'com.samsung.android.bixby.', 'assistant', 'advanced', "Bixby"),
+        ('package', 'com.samsung.android.visionintelligence', 'assistant', 'recommended', "Bixby Vision"),
+        ('package', 'com.samsung.android.app.spage', 'assistant', 'recommended', "Samsung Free"),
+        ('prefix', 'com.samsung.android.game.', 'games', 'recommended', "Game Launcher"),
+        ('package', 'com.samsung.android.arzone', 'oem', 'recommended', "AR Zone"),
+        ('package', 'com.samsung.android.aremoji', 'oem', 'recommended', "AR Emoji"),
+        ('package', 'com.samsung.android.app.tips', 'oem', 'recommended', "Tips"),
+        ('package', 'com.samsung.android.kidsinstaller', 'oem', 'recommended', "Kids installer"),
+        ('package', 'com.samsung.android.dqagent', 'telemetry', 'recommended', "Device quality agent"),
+        ('package', 'com.samsung.android.mateagent', 'telemetry', 'recommended', "Galaxy Friends agent"),
+        ('package', 'com.sec.android.app.samsungapps', 'oem', 'advanced', "Galaxy Store"),
+        ('package', 'com.samsung.android.samsungpass', 'oem', 'advanced', "Samsung Pass"),
+        ('prefix', 'com.samsung.android.knox.', 'security', 'expert', "Knox"),
+        ('package', 'com.samsung.android.honeyboard', 'system', 'expert', "Samsung Keyboard"),
+        ('package', 'com.sec.android.app.launcher', 'system', 'unsafe', "One UI Home"),
+    ],
+    'xiaomi': [
+        ('package', 'com.miui.analytics', 'telemetry', 'recommended', "MIUI analytics"),
+        ('package', 'com.miui.msa.global', 'ads', 'recommended', "MIUI system ads"),
+        ('package', 'com.miui.daemon', 'telemetry', 'recommended', "MIUI daemon"),
+        ('package', 'com.miui.bugreport', 'telemetry', 'recommended', "Bug report"),
+        ('package', 'com.miui.hybrid', 'ads', 'recommended', "Quick apps"),
+        ('package', 'com.miui.yellowpage', 'oem', 'recommended', "Yellow pages"),
+        ('package', 'com.mi.globalbrowser', 'oem', 'recommended', "Mi Browser"),
+        ('package', 'com.miui.cleanmaster', 'oem', 'recommended', "Cleaner"),
+        ('package', 'com.xiaomi.glgm', 'games', 'recommended', "Games"),
+        ('package', 'com.miui.videoplayer', 'oem', 'advanced', "Mi Video"),
+        ('package', 'com.miui.player', 'oem', 'advanced', "Mi Music"),
+        ('package', 'com.xiaomi.mipicks', 'oem', 'advanced', "GetApps"),
+        ('package', 'com.xiaomi.midrop', 'oem', 'advanced', "ShareMe"),
+        ('package', 'com.miui.cloudservice', 'oem', 'advanced', "Mi Cloud"),
+        ('package', 'com.xiaomi.joyose', 'telemetry', 'advanced', "Joyose"),
+        ('package', 'com.miui.securitycenter', 'system', 'unsafe', "Security"),
+        ('package', 'com.miui.home', 'system', 'unsafe', "MIUI launcher"),
+    ],
+    'qualcomm': [
+        ('package', 'com.qualcomm.qti.autoregistration', 'telemetry', 'recommended', "Auto registration"),
+        ('package', 'com.qualcomm.qti.qdma', 'telemetry', 'recommended', "Device management agent"),
+        ('package', 'com.qualcomm.qti.perfdump', 'telemetry', 'recommended', "Performance dump"),
+        ('package', 'com.qti.qualcomm.datastatusnotification', 'oem', 'advanced', "Data status notification"),
+        ('package', 'com.qualcomm.qti.poweroffalarm', 'oem', 'advanced', "Power-off alarm"),
+        ('package', 'com.qualcomm.embms', 'carrier', 'advanced', "LTE broadcast"),
+        ('package', 'com.qualcomm.location', 'system', 'expert', "Location"),
+        ('package', 'com.qualcomm.qti.callfeaturessetting', 'system', 'expert', "Call features"),
+        ('package', 'com.qualcomm.qti.ims', 'system', 'unsafe', "IMS (VoLTE)"),
+        ('package', 'com.qualcomm.qti.telephonyservice', 'system', 'unsafe', "Telephony service"),
+    ],
+    'mediatek': [
+        ('package', 'com.debug.loggerui', 'telemetry', 'recommended', "MTK logger"),
+        ('package', 'com.mediatek.mdmlsample', 'test', 'recommended', "Modem log sample"),
+        ('package', 'com.mediatek.atmwifimeta', 'test', 'recommended', "Wi-Fi meta tool"),
+        ('package', 'com.mediatek.ygps', 'test', 'advanced', "GPS test"),
+        ('package', 'com.mediatek.omacp', 'carrier', 'advanced', "OMA client provisioning"),
+        ('package', 'com.mediatek.duraspeed', 'oem', 'advanced', "DuraSpeed"),
+        ('package', 'com.mediatek.callrecorder', 'oem', 'advanced', "Call recorder"),
+        ('package', 'com.mediatek.engineermode', 'system', 'expert', "Engineer mode"),
+        ('package', 'com.mediatek.location.lppe.main', 'system', 'expert', "LPPe location"),
+        ('package', 'com.mediatek.ims', 'system', 'unsafe', "IMS (VoLTE)"),
+    ],
+}
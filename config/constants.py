@@ -22,6 +22,7 @@ DEVICE_PROPERTIES_ADVANCED = [
     'ro.build.user',
     'ro.build.id',
     'ro.product.name',
+    'ro.board.platform',
 ]
 
 # Boot partition paths
@@ -33,6 +34,10 @@ BOOT_PARTITION_PATHS = [
     "/dev/block/bootdevice/by-name/bootimg",
 ]
 
+# First bytes of a valid boot image and of a PNG (screencap -p)
+BOOT_IMAGE_MAGIC = b'ANDROID!'
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
 # Backup folder names
 BACKUP_FOLDERS = [
     ("DCIM", "/sdcard/DCIM"),
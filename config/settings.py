@@ -27,7 +27,73 @@ class AppConfig:
         'qualcomm': r"qualcomm",
         'mtk': r"mtk",
         'scrcpy': r"scrcpy",
+        'cache': r"cache",
     })
+
+    # ADB server socket (native host protocol client)
+    ADB_SERVER_HOST: str = "127.0.0.1"
+    ADB_SERVER_PORT: int = 5037
+    USE_NATIVE_ADB: bool = True
+    
+    # Persistent per-device shell sessions
+    USE_SHELL_SESSIONS: bool = True
+    SHELL_SESSION_IDLE_TIMEOUT: float = 60.0
+    
+    # Default limit for a single ADB/fastboot command in seconds (0 = none)
+    COMMAND_TIMEOUT: float = 600.0
+    # Default for pull/push, adb backup/restore/install/sideload and
+    # fastboot flash, which take as long as the data (or the confirmation
+    # on the phone) does; cancel them instead
+    TRANSFER_TIMEOUT: float = 0.0
+    
+    # Async engine concurrency limits (whole app / per device, see core/async_adb.py)
+    ADB_MAX_CONCURRENCY: int = 32
+    ADB_PER_DEVICE_CONCURRENCY: int = 4
+    
+    # Device info snapshots cached across runs (see core/device_store.py)
+    USE_DEVICE_CACHE: bool = True
+    DEVICE_CACHE_FILE: str = "device_info.sqlite3"
+    
+    # Limit for each root detector probe in seconds (see core/root_detection.py)
+    ROOT_PROBE_TIMEOUT: float = 3.0
+    
+    # Package actions sent per script, and the time allowed for each one
+    # (see core/package_batch.py)
+    PACKAGE_BATCH_SIZE: int = 50
+    PACKAGE_ACTION_TIMEOUT: float = 10.0
+    
+    # Parallel directory pulls: sync connections per tree and attempts
+    # after the first for each failed file (see core/pull_engine.py)
+    PULL_WORKERS: int = 4
+    PULL_RETRIES: int = 2
+    
+    # Trees of at least this many files averaging at most this many bytes
+    # are streamed with tar over exec-out instead of pulled file by file
+    PULL_TAR_MIN_FILES: int = 64
+    PULL_TAR_MAX_AVERAGE_SIZE: int = 256 * 1024
+    
+    # Fleet export: devices queried at once and the time allowed for each
+    # (see core/fleet_export.py)
+    FLEET_MAX_WORKERS: int = 8
+    FLEET_DEVICE_TIMEOUT: float = 60.0
+    
+    # Retries of idempotent commands after transient device errors
+    # (device offline, protocol fault), with exponential backoff and jitter
+    RETRY_ATTEMPTS: int = 3
+    RETRY_BASE_DELAY: float = 0.25
+    RETRY_MAX_DELAY: float = 4.0
+    
+    # Per-device circuit breaker: fail fast after this many unavailable
+    # errors in a row, then let a trial command through after the timeout
+    BREAKER_FAILURE_THRESHOLD: int = 5
+    BREAKER_RESET_TIMEOUT: float = 15.0
+    
+    # Metrics written on exit: .json for a snapshot, anything else for the
+    # Prometheus text format (e.g. a node_exporter textfile directory)
+    METRICS_FILE: str = ""
+    
+    # Record a Chrome trace from startup and write it here on exit
+    TRACE_FILE: str = ""
     
     def __post_init__(self):
         """Initialize paths after dataclass creation"""
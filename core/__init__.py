@@ -3,8 +3,15 @@ Core functionality modules
 """
 
 from .adb_manager import ADBManager
+from .adb_client import ADBClient
+from .async_adb import AsyncADBEngine, ADBEventLoop
+from .cancellation import CancelToken
+from .command_stream import CommandStream
+from .device_handle import DeviceHandle
+from .device_tracker import DeviceTracker
 from .device_manager import DeviceManager
 from .backup_manager import BackupManager
 from .file_manager import FileManager
+from .metrics import MetricsRegistry
 
-__all__ = ['ADBManager', 'DeviceManager', 'BackupManager', 'FileManager']
+__all__ = ['ADBManager', 'ADBClient', 'AsyncADBEngine', 'ADBEventLoop', 'CancelToken', 'CommandStream', 'DeviceHandle', 'DeviceTracker', 'DeviceManager', 'BackupManager', 'FileManager', 'MetricsRegistry']
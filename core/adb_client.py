@@ -0,0 +1,578 @@
+"""
+Native ADB host protocol client
+
+Talks to the local ADB server over its TCP socket instead of spawning an
+``adb`` client process for every command.
+"""
+
+import mmap
+import os
+import socket
+import stat
+import struct
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+SYNC_DATA_MAX = 64 * 1024
+
+# Longest service request the 4-hex-digit length prefix can frame
+MAX_SERVICE_LENGTH = 0xFFFF
+
+# shell,v2 packet ids
+SHELL_ID_STDOUT = 1
+SHELL_ID_STDERR = 2
+SHELL_ID_EXIT = 3
+
+
+class ADBProtocolError(Exception):
+    """Raised when the ADB server answers with FAIL or an unexpected reply"""
+
+
+class ADBConnectionError(ADBProtocolError):
+    """Raised when the ADB server socket cannot be reached"""
+
+
+class ADBClient:
+    """Client for the ADB server socket protocol"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 5037,
+                 connect_timeout: float = 2.0):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self._features: Dict[str, Set[str]] = {}
+        self._local = threading.local()
+
+    # ==================== Wire Helpers ====================
+
+    def _connect(self) -> socket.socket:
+        """Open a connection to the ADB server"""
+        try:
+            sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        except OSError as e:
+            raise ADBConnectionError(f"cannot connect to ADB server at {self.host}:{self.port}: {e}")
+        sock.settimeout(None)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        scope = getattr(self._local, 'scope', None)
+        if scope is not None:
+            scope.add(sock)
+        return sock
+
+    @contextmanager
+    def abortable(self) -> Iterator['AbortScope']:
+        """Track the sockets this thread opens so another thread can abort them"""
+        scope = AbortScope()
+        previous = getattr(self._local, 'scope', None)
+        self._local.scope = scope
+        try:
+            yield scope
+        finally:
+            self._local.scope = previous
+
+    @staticmethod
+    def _read_exact(sock: socket.socket, size: int) -> bytes:
+        """Read exactly size bytes from the socket"""
+        buf = bytearray(size)
+        view = memoryview(buf)
+        pos = 0
+        while pos < size:
+            n = sock.recv_into(view[pos:], size - pos)
+            if n == 0:
+                raise ADBProtocolError("connection closed by ADB server")
+            pos += n
+        return bytes(buf)
+
+    @staticmethod
+    def _read_all(sock: socket.socket) -> bytes:
+        """Read until the server closes the connection"""
+        chunks = []
+        while True:
+            chunk = sock.recv(SYNC_DATA_MAX)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _send_request(sock: socket.socket, service: str):
+        """Send a length-prefixed service request"""
+        payload = service.encode('utf-8')
+        if len(payload) > MAX_SERVICE_LENGTH:
+            # A longer prefix would desync the server, which reads exactly 4 digits
+            raise ADBProtocolError(f"service request too long ({len(payload)} bytes)")
+        sock.sendall(b'%04x' % len(payload) + payload)
+
+    def _read_hex_block(self, sock: socket.socket) -> bytes:
+        """Read a 4-hex-digit length prefixed block"""
+        length = int(self._read_exact(sock, 4), 16)
+        return self._read_exact(sock, length)
+
+    def _read_status(self, sock: socket.socket):
+        """Read OKAY/FAIL status, raising on FAIL"""
+        status = self._read_exact(sock, 4)
+        if status == b'OKAY':
+            return
+        if status == b'FAIL':
+            message = self._read_hex_block(sock).decode('utf-8', errors='replace')
+            raise ADBProtocolError(message)
+        raise ADBProtocolError(f"unexpected status from ADB server: {status!r}")
+
+    def _request(self, sock: socket.socket, service: str):
+        """Send a service request and check the status reply"""
+        self._send_request(sock, service)
+        self._read_status(sock)
+
+    # ==================== Host Services ====================
+
+    def host_command(self, service: str) -> str:
+        """Run a host: service that answers with a length-prefixed string"""
+        sock = self._connect()
+        try:
+            self._request(sock, service)
+            return self._read_hex_block(sock).decode('utf-8', errors='replace')
+        finally:
+            sock.close()
+
+    def is_available(self) -> bool:
+        """Check if the ADB server is up and answering requests"""
+        try:
+            sock = self._connect()
+        except ADBConnectionError:
+            return False
+        try:
+            # A wedged server accepts connections but never replies
+            sock.settimeout(self.connect_timeout)
+            self._request(sock, 'host:version')
+            self._read_hex_block(sock)
+            return True
+        except (ADBProtocolError, OSError):
+            return False
+        finally:
+            sock.close()
+
+    def version(self) -> int:
+        """Get the ADB server protocol version"""
+        return int(self.host_command('host:version'), 16)
+
+    def devices(self) -> List[Dict[str, str]]:
+        """List devices via host:devices-l"""
+        return parse_devices_l(self.host_command('host:devices-l'))
+
+    def features(self, serial: Optional[str] = None) -> Set[str]:
+        """Get the feature set shared by the server and device"""
+        key = serial or ''
+        if key not in self._features:
+            service = f'host-serial:{serial}:features' if serial else 'host:features'
+            try:
+                reply = self.host_command(service)
+                self._features[key] = set(filter(None, reply.strip().split(',')))
+            except ADBProtocolError:
+                return set()
+        return self._features[key]
+
+    def open_device_tracker(self) -> socket.socket:
+        """Subscribe to host:track-devices-l
+
+        The server sends the full device list right away and again on every
+        change; read each one with read_device_list().
+        """
+        sock = self._connect()
+        try:
+            self._request(sock, 'host:track-devices-l')
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
+    def read_device_list(self, sock: socket.socket) -> List[Dict[str, str]]:
+        """Read the next device list from a tracker socket"""
+        return parse_devices_l(self._read_hex_block(sock).decode('utf-8', errors='replace'))
+
+    def forget_device(self, serial: Optional[str] = None):
+        """Drop cached per-device state"""
+        self._features.pop(serial or '', None)
+
+    # ==================== Device Services ====================
+
+    def open_transport(self, serial: Optional[str] = None) -> socket.socket:
+        """Open a socket switched to the given device's transport"""
+        sock = self._connect()
+        try:
+            if serial:
+                self._request(sock, f'host:transport:{serial}')
+            else:
+                self._request(sock, 'host:transport-any')
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def open_service(self, serial: Optional[str], service: str) -> socket.socket:
+        """Open a device service stream (shell:, exec:, sync:, ...)"""
+        sock = self.open_transport(serial)
+        try:
+            self._request(sock, service)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def shell(self, serial: Optional[str], command: str) -> Tuple[int, bytes, bytes]:
+        """Run a shell command, returning (exit code, stdout, stderr)"""
+        if 'shell_v2' in self.features(serial):
+            return self._shell_v2(serial, command)
+        return self._shell_legacy(serial, command)
+
+    def _shell_v2(self, serial: Optional[str], command: str) -> Tuple[int, bytes, bytes]:
+        """Run a command over shell,v2 which reports the exit code"""
+        sock = self.open_service(serial, f'shell,v2,raw:{command}')
+        stdout, stderr = [], []
+        exit_code = 255
+        try:
+            while True:
+                try:
+                    header = self._read_exact(sock, 5)
+                except ADBProtocolError:
+                    break
+                packet_id, length = header[0], struct.unpack('<I', header[1:])[0]
+                data = self._read_exact(sock, length) if length else b''
+                if packet_id == SHELL_ID_STDOUT:
+                    stdout.append(data)
+                elif packet_id == SHELL_ID_STDERR:
+                    stderr.append(data)
+                elif packet_id == SHELL_ID_EXIT:
+                    exit_code = data[0] if data else 0
+                    break
+        finally:
+            sock.close()
+        return exit_code, b''.join(stdout), b''.join(stderr)
+
+    def _shell_legacy(self, serial: Optional[str], command: str) -> Tuple[int, bytes, bytes]:
+        """Run a command over shell: and recover the exit code from a marker"""
+        marker = f'__ARS_RC_{uuid.uuid4().hex}__'
+        sock = self.open_service(serial, f'shell:{command}; echo "{marker}$?"')
+        try:
+            output = self._read_all(sock).replace(b'\r\n', b'\n')
+        finally:
+            sock.close()
+        exit_code = 0
+        idx = output.rfind(marker.encode())
+        if idx != -1:
+            tail = output[idx + len(marker):].strip()
+            output = output[:idx]
+            if tail.isdigit():
+                exit_code = int(tail)
+        return exit_code, output, b''
+
+    def exec_out(self, serial: Optional[str], command: str) -> bytes:
+        """Run a command over exec: returning raw, unmangled stdout"""
+        sock = self.open_service(serial, f'exec:{command}')
+        try:
+            return self._read_all(sock)
+        finally:
+            sock.close()
+
+    def exec_out_into(self, serial: Optional[str], command: str,
+                      sink: Any = None) -> Tuple[int, Optional[memoryview]]:
+        """Run a command over exec: writing stdout straight into sink
+
+        See read_into() for the accepted sinks. Returns (bytes read, data).
+        """
+        sock = self.open_service(serial, f'exec:{command}')
+        try:
+            return read_into(sock.recv_into, sink)
+        finally:
+            sock.close()
+
+    def reboot(self, serial: Optional[str], mode: str = ''):
+        """Reboot the device into the given mode"""
+        sock = self.open_service(serial, f'reboot:{mode}')
+        try:
+            self._read_all(sock)
+        finally:
+            sock.close()
+
+    def get_state(self, serial: Optional[str] = None) -> str:
+        """Get the connection state of a device"""
+        if serial:
+            return self.host_command(f'host-serial:{serial}:get-state')
+        return self.host_command('host:get-state')
+
+    # ==================== Sync Service ====================
+
+    def open_sync(self, serial: Optional[str]) -> 'SyncConnection':
+        """Open a sync: session for file transfer"""
+        return SyncConnection(self, self.open_service(serial, 'sync:'))
+
+    def pull(self, serial: Optional[str], remote_path: str, local_path: str) -> Tuple[int, int]:
+        """Pull a file or directory, returning (files pulled, bytes transferred)"""
+        with self.open_sync(serial) as sync:
+            mode, _, _ = sync.stat(remote_path)
+            if mode == 0:
+                raise ADBProtocolError(f"remote object '{remote_path}' does not exist")
+
+            if os.path.isdir(local_path):
+                local_path = os.path.join(local_path, posix_basename(remote_path))
+
+            if stat.S_ISDIR(mode):
+                return sync.pull_tree(remote_path, local_path)
+            return 1, sync.pull_file(remote_path, local_path)
+
+    def push(self, serial: Optional[str], local_path: str, remote_path: str) -> Tuple[int, int]:
+        """Push a file or directory, returning (files pushed, bytes transferred)"""
+        if not os.path.exists(local_path):
+            raise ADBProtocolError(f"cannot stat '{local_path}': No such file or directory")
+
+        with self.open_sync(serial) as sync:
+            mode, _, _ = sync.stat(remote_path)
+            if stat.S_ISDIR(mode) or remote_path.endswith('/'):
+                remote_path = remote_path.rstrip('/') + '/' + os.path.basename(local_path.rstrip(os.sep))
+
+            if os.path.isdir(local_path):
+                return sync.push_tree(local_path, remote_path)
+            return 1, sync.push_file(local_path, remote_path)
+
+
+class AbortScope:
+    """Sockets opened by one operation, shut down together on abort()"""
+
+    def __init__(self):
+        self.aborted = False
+        self._lock = threading.Lock()
+        self._sockets: List[socket.socket] = []
+
+    def add(self, sock: socket.socket):
+        with self._lock:
+            if not self.aborted:
+                self._sockets.append(sock)
+                return
+        _shutdown(sock)
+
+    def abort(self):
+        """Unblock every read/write on the operation's sockets"""
+        with self._lock:
+            self.aborted = True
+            sockets, self._sockets = self._sockets, []
+        for sock in sockets:
+            _shutdown(sock)
+
+
+class SyncConnection:
+    """A single sync: session multiplexing STAT/LIST/RECV/SEND requests"""
+
+    def __init__(self, client: ADBClient, sock: socket.socket):
+        self.client = client
+        self.sock = sock
+
+    def __enter__(self) -> 'SyncConnection':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """End the sync session"""
+        try:
+            self.sock.sendall(b'QUIT' + struct.pack('<I', 0))
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _send(self, cmd: bytes, payload: bytes):
+        self.sock.sendall(cmd + struct.pack('<I', len(payload)) + payload)
+
+    def _read(self, size: int) -> bytes:
+        return self.client._read_exact(self.sock, size)
+
+    def _raise_fail(self, length: int):
+        message = self._read(length).decode('utf-8', errors='replace')
+        raise ADBProtocolError(message)
+
+    def stat(self, remote_path: str) -> Tuple[int, int, int]:
+        """Return (mode, size, mtime) of a remote path, mode 0 if missing"""
+        self._send(b'STAT', remote_path.encode('utf-8'))
+        reply = self._read(16)
+        if reply[:4] != b'STAT':
+            raise ADBProtocolError(f"unexpected sync reply: {reply[:4]!r}")
+        return struct.unpack('<III', reply[4:])
+
+    def list(self, remote_path: str) -> List[Tuple[str, int, int, int]]:
+        """List a remote directory as (name, mode, size, mtime) entries"""
+        self._send(b'LIST', remote_path.encode('utf-8'))
+        entries = []
+        while True:
+            header = self._read(20)
+            cmd = header[:4]
+            if cmd == b'DONE':
+                break
+            if cmd == b'FAIL':
+                self._raise_fail(struct.unpack('<I', header[4:8])[0])
+            if cmd != b'DENT':
+                raise ADBProtocolError(f"unexpected sync reply: {cmd!r}")
+            mode, size, mtime, namelen = struct.unpack('<IIII', header[4:])
+            name = self._read(namelen).decode('utf-8', errors='surrogateescape')
+            if name not in ('.', '..'):
+                entries.append((name, mode, size, mtime))
+        return entries
+
+    def pull_file(self, remote_path: str, local_path: str, mtime: Optional[int] = None) -> int:
+        """Receive a single remote file into local_path"""
+        parent = os.path.dirname(local_path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+        self._send(b'RECV', remote_path.encode('utf-8'))
+        total = 0
+        with open(local_path, 'wb') as f:
+            while True:
+                header = self._read(8)
+                cmd, length = header[:4], struct.unpack('<I', header[4:])[0]
+                if cmd == b'DATA':
+                    f.write(self._read(length))
+                    total += length
+                elif cmd == b'DONE':
+                    break
+                elif cmd == b'FAIL':
+                    self._raise_fail(length)
+                else:
+                    raise ADBProtocolError(f"unexpected sync reply: {cmd!r}")
+
+        if mtime:
+            os.utime(local_path, (mtime, mtime))
+        return total
+
+    def pull_tree(self, remote_dir: str, local_dir: str) -> Tuple[int, int]:
+        """Recursively receive a remote directory"""
+        os.makedirs(local_dir, exist_ok=True)
+        files, total = 0, 0
+        for name, mode, _, mtime in self.list(remote_dir):
+            remote_child = remote_dir.rstrip('/') + '/' + name
+            local_child = os.path.join(local_dir, name)
+            if stat.S_ISDIR(mode):
+                sub_files, sub_total = self.pull_tree(remote_child, local_child)
+                files += sub_files
+                total += sub_total
+            elif stat.S_ISREG(mode) or stat.S_ISLNK(mode):
+                total += self.pull_file(remote_child, local_child, mtime)
+                files += 1
+        return files, total
+
+    def push_file(self, local_path: str, remote_path: str) -> int:
+        """Send a single local file to remote_path"""
+        st = os.stat(local_path)
+        spec = f'{remote_path},{stat.S_IMODE(st.st_mode) | stat.S_IFREG}'
+        self._send(b'SEND', spec.encode('utf-8'))
+
+        total = 0
+        with open(local_path, 'rb') as f:
+            while True:
+                chunk = f.read(SYNC_DATA_MAX)
+                if not chunk:
+                    break
+                self._send(b'DATA', chunk)
+                total += len(chunk)
+
+        self.sock.sendall(b'DONE' + struct.pack('<I', int(st.st_mtime)))
+        header = self._read(8)
+        cmd, length = header[:4], struct.unpack('<I', header[4:])[0]
+        if cmd == b'FAIL':
+            self._raise_fail(length)
+        if cmd != b'OKAY':
+            raise ADBProtocolError(f"unexpected sync reply: {cmd!r}")
+        return total
+
+    def push_tree(self, local_dir: str, remote_dir: str) -> Tuple[int, int]:
+        """Recursively send a local directory"""
+        files, total = 0, 0
+        for root, _, filenames in os.walk(local_dir):
+            rel = os.path.relpath(root, local_dir)
+            remote_root = remote_dir if rel == '.' else remote_dir + '/' + rel.replace(os.sep, '/')
+            for filename in filenames:
+                total += self.push_file(os.path.join(root, filename), remote_root + '/' + filename)
+                files += 1
+        return files, total
+
+
+def read_into(readinto: Callable[[memoryview], int], sink: Any = None,
+              chunk_size: int = SYNC_DATA_MAX) -> Tuple[int, Optional[memoryview]]:
+    """Drain a readinto() source into sink without intermediate copies
+
+    sink may be None (collect into a new buffer), a writable buffer such as
+    a preallocated bytearray or mmap (filled in place, raising if the
+    output does not fit) or a file-like object with write(). Returns
+    (bytes read, memoryview of the data), the view being None for files.
+    """
+    if sink is not None and not isinstance(sink, (bytearray, memoryview, mmap.mmap)):
+        buf = bytearray(chunk_size)
+        total = 0
+        with memoryview(buf) as view:
+            while True:
+                n = readinto(view)
+                if not n:
+                    return total, None
+                sink.write(view[:n])
+                total += n
+
+    grow = sink is None
+    buf = bytearray(chunk_size) if grow else sink
+    pos = 0
+    while True:
+        if pos == len(buf):
+            if not grow:
+                # Full: anything more is an overflow
+                with memoryview(bytearray(1)) as probe:
+                    if readinto(probe):
+                        raise ADBProtocolError(f"output larger than the {len(buf)} byte buffer")
+                break
+            buf.extend(bytes(len(buf)))
+        with memoryview(buf) as view, view[pos:] as tail:
+            n = readinto(tail)
+        if not n:
+            break
+        pos += n
+
+    if grow:
+        del buf[pos:]
+        return pos, memoryview(buf)
+    return pos, memoryview(buf)[:pos]
+
+
+def _shutdown(sock: socket.socket):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+def posix_basename(path: str) -> str:
+    """Basename of a device-side path"""
+    return path.rstrip('/').rsplit('/', 1)[-1]
+
+
+def parse_devices_l(output: str) -> List[Dict[str, str]]:
+    """Parse host:devices-l / `adb devices -l` output"""
+    devices = []
+    for line in output.splitlines():
+        line = line.strip()
+        if not line or line.startswith('List of devices') or line.startswith('*'):
+            continue
+        parts = line.split()
+        if len(parts) < 2:
+            continue
+        device = {'serial': parts[0], 'status': parts[1]}
+        for field in parts[2:]:
+            key, sep, value = field.partition(':')
+            if sep:
+                device[key] = value
+        devices.append(device)
+    return devices
+
+
+def format_transfer_summary(remote_path: str, files: int, total: int, elapsed: float, verb: str) -> str:
+    """Format a transfer summary like the adb client prints"""
+    rate = (total / elapsed / (1024 * 1024)) if elapsed > 0 else 0.0
+    plural = 'file' if files == 1 else 'files'
+    return (f"{remote_path}: {files} {plural} {verb}, 0 skipped. "
+            f"{rate:.1f} MB/s ({total} bytes in {elapsed:.3f}s)\n")
@@ -1,9 +1,50 @@
+import mmap
 import os
+import re
+import sqlite3
 import subprocess
+import tempfile
+import threading
 import time
-from typing import Tuple, List, Dict, Optional
+from contextlib import contextmanager
+from typing import Any, Callable, Tuple, List, Dict, Optional, Union
 from dataclasses import dataclass
 
+from .adb_client import (
+    ADBClient, ADBConnectionError, ADBProtocolError,
+    format_transfer_summary, parse_devices_l, read_into
+)
+from .cancellation import CancelToken, PROCESS_GROUP_KWARGS, Watchdog, kill_process_group
+from .command_stream import CommandStream, LegacyShellSource, ProcessSource, ShellV2Source, SocketSource
+from .device_store import DeviceInfoStore
+from .metrics import command_retries, record_command
+from .retry import CircuitBreaker, RetryPolicy, is_device_unavailable, is_idempotent, is_read_only_shell
+from .shell_session import ProcessChannel, ShellSession, SocketChannel
+
+# adb subcommands served by the native socket client
+NATIVE_SUBCOMMANDS = ('devices', 'shell', 'exec-out', 'pull', 'push', 'reboot', 'get-state')
+
+# `getprop` dump lines: [key]: [value], values may span lines; legacy
+# (pty) shells end them with CRLF
+PROP_LINE_RE = re.compile(r'^\[([^\]]*)\]: \[(.*?)\]\r?$', re.MULTILINE | re.DOTALL)
+
+BOOT_ID_PATH = '/proc/sys/kernel/random/boot_id'
+
+# Return codes reported for runs that were stopped (as with timeout(1) and SIGINT)
+TIMEOUT_RETURNCODE = 124
+CANCELLED_RETURNCODE = 130
+
+# Argument lists starting with one of these are adb invocations without the adb path
+ADB_SUBCOMMANDS = NATIVE_SUBCOMMANDS + (
+    '-s', 'backup', 'restore', 'install', 'uninstall', 'logcat', 'root',
+    'sideload', 'wait-for-device', 'start-server', 'kill-server',
+)
+
+# Transfers, app backups and flashing run as long as the data and the user
+# take: they default to TRANSFER_TIMEOUT instead of COMMAND_TIMEOUT
+TRANSFER_SUBCOMMANDS = ('pull', 'push', 'backup', 'restore', 'install', 'install-multiple', 'sideload')
+FASTBOOT_TRANSFER_SUBCOMMANDS = ('flash', 'flashall', 'update', 'boot', 'stage', 'fetch')
+
 @dataclass
 class CommandResult:
     """Container for command execution results"""
@@ -11,9 +52,48 @@ class CommandResult:
     stdout: str
     stderr: str
     success: bool = False
+    timed_out: bool = False
+    cancelled: bool = False
     
     def __post_init__(self):
-        self.success = self.returncode == 0
+        self.success = self.returncode == 0 and not (self.timed_out or self.cancelled)
+    
+    @property
+    def state(self) -> str:
+        """One of 'ok', 'failed', 'timed_out' or 'cancelled'"""
+        if self.cancelled:
+            return 'cancelled'
+        if self.timed_out:
+            return 'timed_out'
+        return 'ok' if self.success else 'failed'
+
+class BinaryResult(CommandResult):
+    """CommandResult carrying raw stdout; text is decoded on first access
+    
+    data is the output as bytes or a memoryview (over a caller's buffer when
+    one was supplied), or None when it was written to a file. size is the
+    number of bytes produced either way.
+    """
+    
+    def __init__(self, returncode: int, data: Optional[Union[bytes, memoryview]] = b'',
+                 stderr: str = '', size: Optional[int] = None):
+        self.data = data
+        self.size = size if size is not None else (len(data) if data is not None else 0)
+        self._text: Optional[str] = None
+        super().__init__(returncode, None, stderr)
+    
+    @property
+    def stdout(self) -> str:
+        if self._text is None:
+            self._text = _decode(self.data) if self.data is not None else ''
+        return self._text
+    
+    @stdout.setter
+    def stdout(self, value: Optional[str]):
+        self._text = value
+    
+    def __repr__(self) -> str:
+        return f"BinaryResult(returncode={self.returncode}, size={self.size}, stderr={self.stderr!r})"
 
 class ADBManager:
     """Manages ADB and Fastboot operations"""
@@ -23,29 +103,470 @@ class ADBManager:
         self.adb_path = os.path.join(config.PATHS['platform_tools'], 'adb.exe')
         self.fastboot_path = os.path.join(config.PATHS['platform_tools'], 'fastboot.exe')
         self.current_device: Optional[str] = None
+        self.client: Optional[ADBClient] = None
+        if config.USE_NATIVE_ADB:
+            self.client = ADBClient(config.ADB_SERVER_HOST, config.ADB_SERVER_PORT)
+        self._handles: Dict[str, 'DeviceHandle'] = {}
+        self._handles_lock = threading.Lock()
+        self._shell_sessions: Dict[Tuple[str, bool], ShellSession] = {}
+        self._sessions_lock = threading.Lock()
+        self._children: List[subprocess.Popen] = []
+        self._children_lock = threading.Lock()
+        self._local = threading.local()
+        self.retry_policy = RetryPolicy.from_config(config)
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._breakers_lock = threading.Lock()
+        self.breaker_listeners: List[Callable[[str, str], None]] = []
+        self._device_store: Optional[DeviceInfoStore] = None
+        self._store_lock = threading.Lock()
     
-    def run_command(self, cmd: List[str], wait: bool = True, shell: bool = False) -> CommandResult:
-        """Run a command and return structured result"""
-        try:
-            if wait:
-                result = subprocess.run(
-                    cmd,
-                    shell=shell,
-                    capture_output=True,
-                    text=True,
-                    encoding='utf-8',
-                    errors='ignore'
-                )
+    def run_command(self, cmd: List[str], wait: bool = True, shell: bool = False,
+                    timeout: Optional[float] = None, cancel: Optional[CancelToken] = None,
+                    idempotent: Optional[bool] = None) -> CommandResult:
+        """Run a command and return structured result
+        
+        timeout defaults to config.COMMAND_TIMEOUT, or TRANSFER_TIMEOUT for
+        transfers, app backups and flashing (0 disables either), and cancel
+        to the token of the enclosing cancellation() block. A timed-out or
+        cancelled run is killed with its whole process group and reported
+        with timed_out / cancelled set. Waited-for runs are recorded in the
+        metrics registry.
+        
+        adb commands that fail because the device dropped off are retried
+        with backoff when idempotent (by default: read-only shell commands,
+        pull/push and host queries), and go through the device's circuit
+        breaker.
+        """
+        if timeout is None and self.is_transfer(cmd):
+            timeout = self.config.TRANSFER_TIMEOUT
+        if not wait:
+            return self._execute(cmd, wait, shell, timeout, cancel)
+        start = time.perf_counter()
+        command, serial = self.command_labels(cmd)
+        adb_args = None if shell else self._adb_args(cmd)
+        if adb_args is None:
+            result = self._execute(cmd, wait, shell, timeout, cancel)
+        else:
+            if idempotent is None:
+                idempotent = is_idempotent(split_serial(adb_args)[1])
+            result = self._with_retries(
+                command, serial, idempotent, cancel,
+                lambda: self._execute(cmd, wait, shell, timeout, cancel)
+            )
+        record_command(command, serial, start, result)
+        return result
+    
+    def _with_retries(self, command: str, serial: Optional[str], idempotent: bool,
+                      cancel: Optional[CancelToken], attempt: Callable[[], CommandResult],
+                      before_retry: Optional[Callable[[], None]] = None) -> CommandResult:
+        """Run attempt under the device's circuit breaker and the retry policy"""
+        breaker = self.breaker(serial) if serial else None
+        cancel = cancel or self.current_token()
+        retries = self.retry_policy.attempts - 1 if idempotent else 0
+        for retry in range(retries + 1):
+            if breaker and not breaker.allow():
                 return CommandResult(
-                    returncode=result.returncode,
-                    stdout=result.stdout,
-                    stderr=result.stderr
-                )
+                    1, '', f"error: device '{serial}' unavailable "
+                           f"(circuit open, next try in {breaker.retry_after():.0f}s)\n")
+            result = attempt()
+            if result.timed_out or result.cancelled:
+                return result
+            if not is_device_unavailable(result):
+                if breaker:
+                    breaker.record_success()
+                return result
+            if breaker:
+                breaker.record_failure()
+            if retry == retries:
+                break
+            command_retries.inc(command=command, serial=serial or '')
+            delay = self.retry_policy.delay(retry)
+            if cancel:
+                if cancel.wait(delay):
+                    return interrupted_result(cancelled=True)
             else:
-                subprocess.Popen(cmd, shell=shell)
-                return CommandResult(0, "", "")
+                time.sleep(delay)
+            if before_retry:
+                before_retry()
+        return result
+    
+    def breaker(self, serial: str) -> CircuitBreaker:
+        """Get the circuit breaker for a serial"""
+        with self._breakers_lock:
+            breaker = self._breakers.get(serial)
+            if breaker is None:
+                breaker = CircuitBreaker(
+                    serial,
+                    self.config.BREAKER_FAILURE_THRESHOLD,
+                    self.config.BREAKER_RESET_TIMEOUT,
+                    self._breaker_changed
+                )
+                self._breakers[serial] = breaker
+            return breaker
+    
+    def breaker_state(self, serial: str) -> str:
+        """'closed', 'open' or 'half-open' for a serial"""
+        breaker = self._breakers.get(serial)
+        return breaker.state if breaker else CircuitBreaker.CLOSED
+    
+    def _breaker_changed(self, serial: str, state: str):
+        for listener in list(self.breaker_listeners):
+            listener(serial, state)
+    
+    def _execute(self, cmd: List[str], wait: bool, shell: bool,
+                 timeout: Optional[float], cancel: Optional[CancelToken]) -> CommandResult:
+        """run_command without the bookkeeping"""
+        timeout = self.resolve_timeout(timeout)
+        cancel = cancel or self.current_token()
+        if cancel and cancel.cancelled:
+            return interrupted_result(cancelled=True)
+        
+        adb_args = None if shell else self._adb_args(cmd)
+        if adb_args is not None:
+            if wait and self.client:
+                result = self._run_native(adb_args, timeout, cancel)
+                if result is not None:
+                    return result
+            cmd = [self.adb_path] + adb_args
+        
+        if not wait:
+            return self._spawn(cmd, shell)
+        
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                shell=shell,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                **PROCESS_GROUP_KWARGS
+            )
+        except Exception as e:
+            return CommandResult(-1, "", str(e))
+        
+        with Watchdog(lambda: kill_process_group(proc), timeout, cancel) as watchdog:
+            out, err = proc.communicate()
+        if watchdog.interrupted:
+            return interrupted_result(watchdog.cancelled, timeout, _decode_text(out), _decode_text(err))
+        
+        if adb_args is not None and split_serial(adb_args)[1][:1] == ['exec-out']:
+            # exec-out output is binary; keep the bytes and decode lazily
+            return BinaryResult(proc.returncode, out, _decode(err))
+        return CommandResult(
+            returncode=proc.returncode,
+            stdout=_decode_text(out),
+            stderr=_decode_text(err)
+        )
+    
+    def _spawn(self, cmd: List[str], shell: bool) -> CommandResult:
+        """Start a command without waiting; it is reaped later"""
+        self.reap_children()
+        try:
+            proc = subprocess.Popen(cmd, shell=shell, **PROCESS_GROUP_KWARGS)
         except Exception as e:
             return CommandResult(-1, "", str(e))
+        with self._children_lock:
+            self._children.append(proc)
+        return CommandResult(0, "", "")
+    
+    def reap_children(self):
+        """Collect wait=False children that have exited"""
+        with self._children_lock:
+            self._children = [proc for proc in self._children if proc.poll() is None]
+    
+    def shutdown(self):
+        """Kill leftover children and close shell sessions"""
+        with self._children_lock:
+            children, self._children = self._children, []
+        for proc in children:
+            kill_process_group(proc)
+            proc.wait()
+        self.close_shell_sessions()
+        with self._store_lock:
+            store, self._device_store = self._device_store, None
+        if store:
+            store.close()
+    
+    def device_store(self) -> Optional[DeviceInfoStore]:
+        """The shared device info cache, None when disabled"""
+        if not self.config.USE_DEVICE_CACHE:
+            return None
+        with self._store_lock:
+            if self._device_store is None:
+                path = os.path.join(self.config.PATHS['cache'], self.config.DEVICE_CACHE_FILE)
+                try:
+                    self._device_store = DeviceInfoStore(path)
+                except sqlite3.Error as e:
+                    print(f"Error opening device cache: {e}")
+                    return None
+            return self._device_store
+    
+    def resolve_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        """Apply the configured default; None means no limit"""
+        if timeout is None:
+            timeout = self.config.COMMAND_TIMEOUT
+        return timeout or None
+    
+    @contextmanager
+    def cancellation(self, token: CancelToken):
+        """Make token the default for commands run by this thread"""
+        previous = getattr(self._local, 'token', None)
+        self._local.token = token
+        try:
+            yield token
+        finally:
+            self._local.token = previous
+    
+    def current_token(self) -> Optional[CancelToken]:
+        """The token set by an enclosing cancellation() block"""
+        return getattr(self._local, 'token', None)
+    
+    def exec_out(self, serial: Optional[str], command: str, sink: Any = None,
+                 timeout: Optional[float] = None, cancel: Optional[CancelToken] = None,
+                 idempotent: Optional[bool] = None) -> CommandResult:
+        """Run a command with exec-out and keep its stdout binary-safe
+        
+        Output lands in sink without passing through text decoding: None
+        collects it into a buffer, a preallocated bytearray/mmap is filled in
+        place and a file object is written to chunk by chunk. Returns a
+        BinaryResult, or an interrupted CommandResult on timeout/cancel.
+        Read-only commands are retried like run_command's as long as the
+        sink can be rewound.
+        """
+        start = time.perf_counter()
+        if idempotent is None:
+            idempotent = is_read_only_shell(command)
+        rewind = _sink_rewinder(sink)
+        result = self._with_retries(
+            'exec-out', serial, idempotent and rewind is not None, cancel,
+            lambda: self._exec_out(serial, command, sink, timeout, cancel), rewind
+        )
+        record_command('exec-out', serial, start, result)
+        return result
+    
+    def _exec_out(self, serial: Optional[str], command: str, sink: Any,
+                  timeout: Optional[float], cancel: Optional[CancelToken]) -> CommandResult:
+        """exec_out without the bookkeeping"""
+        timeout = self.resolve_timeout(timeout)
+        cancel = cancel or self.current_token()
+        if cancel and cancel.cancelled:
+            return interrupted_result(cancelled=True)
+        
+        if self.client:
+            with self.client.abortable() as scope:
+                with Watchdog(scope.abort, timeout, cancel) as watchdog:
+                    try:
+                        size, data = self.client.exec_out_into(serial, command, sink)
+                        if not watchdog.interrupted:
+                            return BinaryResult(0, data, '', size)
+                    except ADBConnectionError:
+                        pass
+                    except (ADBProtocolError, OSError) as e:
+                        if not watchdog.interrupted:
+                            return BinaryResult(1, None, f"adb: error: {e}\n")
+            if watchdog.interrupted:
+                return interrupted_result(watchdog.cancelled, timeout)
+        
+        cmd = [self.adb_path]
+        if serial:
+            cmd += ['-s', serial]
+        try:
+            with tempfile.TemporaryFile() as stderr:
+                proc = subprocess.Popen(cmd + ['exec-out', command], stdout=subprocess.PIPE,
+                                        stderr=stderr, bufsize=0, **PROCESS_GROUP_KWARGS)
+                with Watchdog(lambda: kill_process_group(proc), timeout, cancel) as watchdog:
+                    try:
+                        size, data = read_into(proc.stdout.readinto, sink)
+                    finally:
+                        proc.stdout.close()
+                        returncode = proc.wait()
+                if watchdog.interrupted:
+                    return interrupted_result(watchdog.cancelled, timeout)
+                stderr.seek(0)
+                return BinaryResult(returncode, data, _decode(stderr.read()), size)
+        except (ADBProtocolError, OSError) as e:
+            return BinaryResult(-1, None, str(e))
+    
+    def stream_command(self, cmd: List[str], chunk_size: int = 65536,
+                       cancel: Optional[CancelToken] = None) -> CommandStream:
+        """Run a command and stream its stdout instead of collecting it
+        
+        adb shell/exec-out go straight over the server socket when possible;
+        everything else is read incrementally from a child process. Streams
+        have no timeout (logcat never ends); cancel the token or the stream.
+        """
+        cancel = cancel or self.current_token()
+        adb_args = self._adb_args(cmd)
+        if adb_args is not None:
+            serial, args = split_serial(adb_args)
+            if self.client and len(args) >= 2 and args[0] in ('shell', 'exec-out'):
+                command = ' '.join(args[1:])
+                try:
+                    if args[0] == 'exec-out':
+                        source = SocketSource(self.client.open_service(serial, f'exec:{command}'))
+                    elif 'shell_v2' in self.client.features(serial):
+                        source = ShellV2Source(self.client.open_service(serial, f'shell,v2,raw:{command}'))
+                    else:
+                        source = LegacyShellSource(self.client, serial, command)
+                    return CommandStream(source, chunk_size, cancel)
+                except ADBConnectionError:
+                    pass
+                except ADBProtocolError as e:
+                    return CommandStream(_FailedSource(f"adb: error: {e}\n"), chunk_size)
+            cmd = [self.adb_path] + adb_args
+        
+        try:
+            return CommandStream(ProcessSource(cmd), chunk_size, cancel)
+        except OSError as e:
+            return CommandStream(_FailedSource(str(e), -1), chunk_size)
+    
+    def command_labels(self, cmd: Union[List[str], str]) -> Tuple[str, str]:
+        """(command, serial) metric labels: the adb subcommand or the program name"""
+        adb_args = self._adb_args(cmd)
+        if adb_args is not None:
+            serial, args = split_serial(adb_args)
+            return (args[0] if args else 'adb'), serial or ''
+        if isinstance(cmd, str):
+            cmd = cmd.split()
+        if not cmd:
+            return '', ''
+        program = os.path.splitext(os.path.basename(str(cmd[0])))[0]
+        serial, _ = split_serial(list(cmd[1:]))
+        return program, serial or ''
+    
+    def is_transfer(self, cmd: List[str]) -> bool:
+        """Whether cmd moves data or waits on the user rather than answering right away"""
+        adb_args = self._adb_args(cmd)
+        if adb_args is not None:
+            args = split_serial(adb_args)[1]
+            return bool(args) and args[0] in TRANSFER_SUBCOMMANDS
+        if isinstance(cmd, (list, tuple)) and cmd and cmd[0] == self.fastboot_path:
+            args = split_serial(list(cmd[1:]))[1]
+            return bool(args) and args[0] in FASTBOOT_TRANSFER_SUBCOMMANDS
+        return False
+    
+    def _adb_args(self, cmd: List[str]) -> Optional[List[str]]:
+        """Return the adb arguments if cmd is an adb invocation"""
+        if not isinstance(cmd, (list, tuple)) or not cmd:
+            return None
+        if cmd[0] == self.adb_path:
+            return list(cmd[1:])
+        if cmd[0] in ADB_SUBCOMMANDS:
+            return list(cmd)
+        return None
+    
+    def _run_native(self, args: List[str], timeout: Optional[float] = None,
+                    cancel: Optional[CancelToken] = None) -> Optional[CommandResult]:
+        """Serve an adb invocation over the server socket, None to fall back"""
+        with self.client.abortable() as scope:
+            with Watchdog(scope.abort, timeout, cancel) as watchdog:
+                result = self._native_call(args)
+        if watchdog.interrupted:
+            return interrupted_result(watchdog.cancelled, timeout)
+        return result
+    
+    def _native_call(self, args: List[str]) -> Optional[CommandResult]:
+        serial, args = split_serial(args)
+        
+        if not args or args[0] not in NATIVE_SUBCOMMANDS:
+            return None
+        command, rest = args[0], args[1:]
+        
+        try:
+            if command == 'devices' and rest in ([], ['-l']):
+                lines = ['List of devices attached']
+                for device in self.client.devices():
+                    line = f"{device['serial']}\t{device['status']}"
+                    if rest:
+                        extras = [f"{k}:{v}" for k, v in device.items() if k not in ('serial', 'status')]
+                        line = ' '.join([line] + extras)
+                    lines.append(line)
+                return CommandResult(0, '\n'.join(lines) + '\n\n', '')
+            
+            if command == 'shell' and rest:
+                code, out, err = self.client.shell(serial, ' '.join(rest))
+                return CommandResult(code, _decode_text(out), _decode_text(err))
+            
+            if command == 'exec-out' and rest:
+                out = self.client.exec_out(serial, ' '.join(rest))
+                return BinaryResult(0, out)
+            
+            if command == 'pull' and len(rest) == 2 and not rest[0].startswith('-'):
+                start = time.monotonic()
+                files, total = self.client.pull(serial, rest[0], rest[1])
+                summary = format_transfer_summary(rest[0], files, total, time.monotonic() - start, 'pulled')
+                return CommandResult(0, summary, '')
+            
+            if command == 'push' and len(rest) == 2 and not rest[0].startswith('-'):
+                start = time.monotonic()
+                files, total = self.client.push(serial, rest[0], rest[1])
+                summary = format_transfer_summary(rest[0], files, total, time.monotonic() - start, 'pushed')
+                return CommandResult(0, summary, '')
+            
+            if command == 'reboot' and len(rest) <= 1:
+                self.client.reboot(serial, rest[0] if rest else '')
+                return CommandResult(0, '', '')
+            
+            if command == 'get-state' and not rest:
+                return CommandResult(0, self.client.get_state(serial) + '\n', '')
+        except ADBConnectionError:
+            return None
+        except (ADBProtocolError, OSError) as e:
+            return CommandResult(1, '', f"adb: error: {e}\n")
+        
+        return None
+    
+    def run_shell(self, command: str, root: bool = False) -> CommandResult:
+        """Run a shell command on the current device (see DeviceHandle.run_shell)"""
+        return self.device().run_shell(command, root)
+    
+    def device(self, serial: Optional[str] = None) -> 'DeviceHandle':
+        """Get the handle for a serial, defaulting to the current device"""
+        from .device_handle import DeviceHandle
+        serial = serial or self.current_device
+        key = serial or ''
+        with self._handles_lock:
+            handle = self._handles.get(key)
+            if handle is None:
+                handle = DeviceHandle(self, serial)
+                self._handles[key] = handle
+        return handle
+    
+    def get_shell_session(self, root: bool = False, serial: Optional[str] = None) -> ShellSession:
+        """Get (or create) the pooled shell session for a device"""
+        serial = serial or self.current_device
+        key = (serial or '', root)
+        with self._sessions_lock:
+            session = self._shell_sessions.get(key)
+            if session is None:
+                session = ShellSession(
+                    lambda: self._open_shell_channel(serial, root),
+                    root=root,
+                    idle_timeout=self.config.SHELL_SESSION_IDLE_TIMEOUT
+                )
+                self._shell_sessions[key] = session
+        return session
+    
+    def close_shell_sessions(self, serial: Optional[str] = None):
+        """Close pooled shell sessions, for one device or all of them"""
+        with self._sessions_lock:
+            keys = [k for k in self._shell_sessions if serial is None or k[0] == serial]
+            sessions = [self._shell_sessions.pop(k) for k in keys]
+        for session in sessions:
+            session.close()
+    
+    def _open_shell_channel(self, serial: Optional[str], root: bool):
+        """Open the raw channel backing a shell session"""
+        program = 'su' if root else 'sh'
+        if self.client:
+            try:
+                return SocketChannel(self.client.open_service(serial, f'exec:{program}'))
+            except ADBConnectionError:
+                pass
+        
+        cmd = [self.adb_path]
+        if serial:
+            cmd += ['-s', serial]
+        return ProcessChannel(cmd + ['shell', program])
     
     def check_adb(self) -> Tuple[bool, str]:
         """Check if ADB is available"""
@@ -61,49 +582,137 @@ class ADBManager:
         return False, "ADB not found"
     
     def start_adb_server(self) -> CommandResult:
-        """Start ADB server"""
+        """Make sure the ADB server is running
+        
+        A healthy server is left alone so other tools keep their
+        connections; it is only restarted when it does not answer.
+        """
+        if self.client and self.client.is_available():
+            return CommandResult(0, "", "")
+        
+        result = self.run_command([self.adb_path, 'start-server'])
+        if self.client and not self.client.is_available():
+            # Something holds the port without answering
+            return self.restart_adb_server()
+        return result
+    
+    def restart_adb_server(self) -> CommandResult:
+        """Kill and restart the ADB server"""
         self.run_command([self.adb_path, 'kill-server'])
         time.sleep(1)
         return self.run_command([self.adb_path, 'start-server'])
     
     def get_devices(self) -> List[Dict[str, str]]:
-        """Get list of connected devices"""
-        result = self.run_command([self.adb_path, 'devices'])
-        
-        devices = []
-        for line in result.stdout.strip().split('\n')[1:]:
-            if line.strip():
-                parts = line.split('\t')
-                if len(parts) == 2:
-                    devices.append({'serial': parts[0], 'status': parts[1]})
-        
-        if devices:
-            self.current_device = devices[0]['serial']
-        else:
-            self.current_device = None
-            
+        """Get list of connected devices
+        
+        Handles are refreshed with each device's listing. current_device is
+        kept while it stays connected and only falls back to the first
+        serial when it goes away.
+        """
+        result = self.run_command([self.adb_path, 'devices', '-l'])
+        devices = parse_devices_l(result.stdout) if result.success else []
+        
+        self.apply_device_list(devices)
         return devices
     
+    def apply_device_list(self, devices: List[Dict[str, str]]):
+        """Refresh device handles from a device listing"""
+        connected = {d['serial'] for d in devices}
+        for device in devices:
+            self.device(device['serial']).info = device
+            if device['status'] == 'device' and self.breaker_state(device['serial']) != CircuitBreaker.CLOSED:
+                # Back online: let commands through again right away
+                self.breaker(device['serial']).reset()
+        with self._handles_lock:
+            gone = [h for key, h in self._handles.items() if key and key not in connected]
+            for handle in gone:
+                del self._handles[handle.serial]
+        for handle in gone:
+            handle.forget()
+        
+        if self.current_device not in connected:
+            self.current_device = devices[0]['serial'] if devices else None
+    
     def get_device_props(self, prop_names: List[str]) -> Dict[str, str]:
         """Get device properties"""
-        props = {}
-        for prop in prop_names:
-            result = self.run_command([self.adb_path, 'shell', 'getprop', prop])
-            if result.success and result.stdout.strip():
-                props[prop] = result.stdout.strip()
-        return props
+        return self.device().get_device_props(prop_names)
+    
+    def get_prop_snapshot(self) -> Dict[str, str]:
+        """Get every device property from a single getprop dump"""
+        return self.device().get_prop_snapshot()
     
     def reboot_device(self, mode: str = "") -> CommandResult:
         """Reboot device to specified mode"""
-        cmd = [self.adb_path, 'reboot']
-        if mode:
-            cmd.append(mode)
-        return self.run_command(cmd)
+        return self.device().reboot(mode)
     
     def pull_file(self, remote_path: str, local_path: str) -> CommandResult:
         """Pull file from device"""
-        return self.run_command([self.adb_path, 'pull', remote_path, local_path])
+        return self.device().pull_file(remote_path, local_path)
     
     def push_file(self, local_path: str, remote_path: str) -> CommandResult:
         """Push file to device"""
-        return self.run_command([self.adb_path, 'push', local_path, remote_path])
+        return self.device().push_file(local_path, remote_path)
+
+
+def parse_getprop(output: str) -> Dict[str, str]:
+    """Parse a `getprop` dump into a property dict"""
+    return dict(PROP_LINE_RE.findall(output))
+
+def select_props(snapshot: Dict[str, str], prop_names: List[str]) -> Dict[str, str]:
+    """Pick the non-empty properties in prop_names from a snapshot"""
+    props = {}
+    for prop in prop_names:
+        value = snapshot.get(prop, '').strip()
+        if value:
+            props[prop] = value
+    return props
+
+def interrupted_result(cancelled: bool, timeout: Optional[float] = None,
+                       stdout: str = '', stderr: str = '') -> CommandResult:
+    """Result for a run stopped by cancellation or a timeout"""
+    if cancelled:
+        return CommandResult(CANCELLED_RETURNCODE, stdout, stderr + "operation cancelled\n", cancelled=True)
+    return CommandResult(TIMEOUT_RETURNCODE, stdout, stderr + f"timed out after {timeout:g}s\n", timed_out=True)
+
+class _FailedSource:
+    """Stream source for a command that could not be started"""
+    
+    def __init__(self, message: str, returncode: int = 1):
+        self.message = message
+        self.returncode = returncode
+    
+    def read(self, size: int) -> bytes:
+        return b''
+    
+    def cancel(self):
+        pass
+    
+    def finish(self):
+        return self.returncode, self.message.encode()
+
+def split_serial(args: List[str]) -> Tuple[Optional[str], List[str]]:
+    """Split a leading `-s <serial>` off adb arguments"""
+    if len(args) >= 2 and args[0] == '-s':
+        return args[1], list(args[2:])
+    return None, list(args)
+
+def _sink_rewinder(sink: Any) -> Optional[Callable[[], None]]:
+    """How to reset an exec_out sink before a retry, None if it cannot be"""
+    if sink is None or isinstance(sink, (bytearray, memoryview, mmap.mmap)):
+        # Buffers are refilled from the start anyway
+        return lambda: None
+    seekable = getattr(sink, 'seekable', None)
+    if seekable and seekable() and hasattr(sink, 'truncate'):
+        def rewind():
+            sink.seek(0)
+            sink.truncate()
+        return rewind
+    return None
+
+def _decode(data: Union[bytes, memoryview]) -> str:
+    """Decode device output the same way the subprocess path does"""
+    return str(data, 'utf-8', errors='ignore')
+
+def _decode_text(data: bytes) -> str:
+    """Decode captured output like text-mode pipes do, newlines included"""
+    return _decode(data).replace('\r\n', '\n').replace('\r', '\n')
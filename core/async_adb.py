@@ -0,0 +1,169 @@
+"""
+asyncio front end for ADBManager
+
+AsyncADBEngine lets an event loop drive many devices at once under a
+global and a per-device concurrency limit. Every call goes through
+ADBManager's own execution path (native socket client, retries, circuit
+breakers, timeouts, CancelToken), run on a worker pool no larger than the
+global limit, so the thread count stays bounded however many operations
+are queued. ADBEventLoop is the sync facade for Tk handlers and workers.
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .adb_manager import ADBManager, CommandResult, split_serial
+from .cancellation import CancelToken
+
+class AsyncADBEngine:
+    """Async run_command/get_devices/pull_file/push_file with concurrency limits"""
+    
+    def __init__(self, adb_manager: ADBManager, max_concurrency: Optional[int] = None,
+                 per_device_concurrency: Optional[int] = None):
+        self.adb = adb_manager
+        config = adb_manager.config
+        self.max_concurrency = max_concurrency or config.ADB_MAX_CONCURRENCY
+        self.per_device_concurrency = per_device_concurrency or config.ADB_PER_DEVICE_CONCURRENCY
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.max_concurrency,
+                                                               thread_name_prefix='adb-async')
+        
+        # Semaphores are created lazily so they bind to the running loop
+        self._global: Optional[asyncio.Semaphore] = None
+        self._devices: Dict[str, asyncio.Semaphore] = {}
+    
+    def _limits(self, serial: Optional[str]) -> Tuple[asyncio.Semaphore, asyncio.Semaphore]:
+        """Get the (device, global) semaphores for a serial"""
+        if self._global is None:
+            self._global = asyncio.Semaphore(self.max_concurrency)
+        key = serial or ''
+        if key not in self._devices:
+            self._devices[key] = asyncio.Semaphore(self.per_device_concurrency)
+        return self._devices[key], self._global
+    
+    async def _call(self, serial: Optional[str], func: Callable[..., Any], *args,
+                    cancel: Optional[CancelToken] = None) -> Any:
+        """Run a blocking ADBManager call under the limits
+        
+        Cancelling the awaiting task cancels the call's token, and the slots
+        are held until the call has actually stopped.
+        """
+        token = CancelToken()
+        if cancel:
+            cancel.add_callback(token.cancel)
+        
+        def run():
+            with self.adb.cancellation(token):
+                return func(*args)
+        
+        device_slot, global_slot = self._limits(serial)
+        try:
+            # Take the device slot first so a busy device never parks a global slot
+            async with device_slot:
+                async with global_slot:
+                    future = asyncio.get_running_loop().run_in_executor(self._executor, run)
+                    try:
+                        return await asyncio.shield(future)
+                    except asyncio.CancelledError:
+                        token.cancel()
+                        await asyncio.wait([future])
+                        raise
+        finally:
+            if cancel:
+                cancel.remove_callback(token.cancel)
+    
+    # ==================== Public API ====================
+    
+    async def run_command(self, cmd: List[str], timeout: Optional[float] = None,
+                          cancel: Optional[CancelToken] = None) -> CommandResult:
+        """Run a command like ADBManager.run_command"""
+        adb_args = self.adb._adb_args(cmd)
+        serial = split_serial(adb_args)[0] if adb_args is not None else None
+        return await self._call(serial, lambda: self.adb.run_command(cmd, timeout=timeout), cancel=cancel)
+    
+    async def shell(self, command: str, serial: Optional[str] = None,
+                    cancel: Optional[CancelToken] = None) -> CommandResult:
+        """Run a shell command on a device"""
+        return await self._call(serial, self.adb.device(serial).run_command, ['shell', command],
+                                cancel=cancel)
+    
+    async def get_devices(self) -> List[Dict[str, str]]:
+        """Get list of connected devices"""
+        return await self._call(None, self.adb.get_devices)
+    
+    async def pull_file(self, remote_path: str, local_path: str, serial: Optional[str] = None,
+                        cancel: Optional[CancelToken] = None) -> CommandResult:
+        """Pull file from device"""
+        return await self._call(serial, self.adb.device(serial).pull_file, remote_path, local_path,
+                                cancel=cancel)
+    
+    async def push_file(self, local_path: str, remote_path: str, serial: Optional[str] = None,
+                        cancel: Optional[CancelToken] = None) -> CommandResult:
+        """Push file to device"""
+        return await self._call(serial, self.adb.device(serial).push_file, local_path, remote_path,
+                                cancel=cancel)
+    
+    async def gather(self, *coros: Awaitable) -> List[Any]:
+        """Run several operations concurrently, limits still apply"""
+        return list(await asyncio.gather(*coros))
+    
+    def close(self):
+        """Wait for running calls and release the worker pool"""
+        self._executor.shutdown(wait=True)
+
+class ADBEventLoop:
+    """Sync facade running an AsyncADBEngine on one background loop thread
+    
+    Tk handlers call submit() and hook a callback on the returned future;
+    worker code can call the blocking helpers directly.
+    """
+    
+    def __init__(self, engine: AsyncADBEngine):
+        self.engine = engine
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever,
+                                                name='adb-event-loop', daemon=True)
+                self._thread.start()
+            return self._loop
+    
+    def submit(self, coro: Awaitable) -> 'concurrent.futures.Future':
+        """Schedule a coroutine on the loop thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+    
+    def call(self, coro: Awaitable) -> Any:
+        """Run a coroutine on the loop thread and wait for its result"""
+        return self.submit(coro).result()
+    
+    def run_command(self, cmd: List[str], timeout: Optional[float] = None,
+                    cancel: Optional[CancelToken] = None) -> CommandResult:
+        return self.call(self.engine.run_command(cmd, timeout, cancel))
+    
+    def get_devices(self) -> List[Dict[str, str]]:
+        return self.call(self.engine.get_devices())
+    
+    def pull_file(self, remote_path: str, local_path: str, serial: Optional[str] = None,
+                  cancel: Optional[CancelToken] = None) -> CommandResult:
+        return self.call(self.engine.pull_file(remote_path, local_path, serial, cancel))
+    
+    def push_file(self, local_path: str, remote_path: str, serial: Optional[str] = None,
+                  cancel: Optional[CancelToken] = None) -> CommandResult:
+        return self.call(self.engine.push_file(local_path, remote_path, serial, cancel))
+    
+    def close(self):
+        """Stop the loop thread and the engine's workers"""
+        with self._lock:
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop.close()
+                self._loop = None
+                self._thread = None
+        self.engine.close()
@@ -6,18 +6,22 @@ import os
 import json
 import shutil
 from datetime import datetime
-from typing import Dict, List, Tuple, Optional
+from typing import Callable, Dict, List, Tuple, Optional
 from pathlib import Path
 
-from .adb_manager import ADBManager
+from .backup_manifest import BackupManifest
+from .device_handle import DeviceHandle
+from .metrics import timed_operation
+from .pull_engine import list_remote_files, local_path_for, pull_files
+from .tracing import tracer
 from config.settings import config
-from utils.file_utils import get_directory_size, format_file_size
+from utils.file_utils import get_directory_size, format_file_size, link_or_copy
 
 class BackupManager:
     """Manages backup operations"""
     
-    def __init__(self, adb_manager: ADBManager):
-        self.adb = adb_manager
+    def __init__(self, device: DeviceHandle):
+        self.device = device
         self.config = config
     
     def create_backup_folder(self) -> str:
@@ -26,18 +30,18 @@ class BackupManager:
         os.makedirs(backup_folder, exist_ok=True)
         return backup_folder
     
+    @timed_operation()
     def backup_device_info(self, backup_folder: str) -> bool:
         """Backup device information"""
         try:
-            # Get device properties
-            from config.constants import DEVICE_PROPERTIES_BASIC
-            props = self.adb.get_device_props(DEVICE_PROPERTIES_BASIC)
+            # Get all device properties in one getprop dump
+            props = self.device.get_prop_snapshot()
             
             # Save to file
             props_file = os.path.join(backup_folder, "device_properties.txt")
             with open(props_file, 'w', encoding='utf-8') as f:
-                for prop, value in props.items():
-                    f.write(f"{prop}={value}\n")
+                for prop in sorted(props):
+                    f.write(f"{prop}={props[prop]}\n")
             
             # Create backup summary
             summary_file = os.path.join(backup_folder, "backup_summary.txt")
@@ -54,10 +58,11 @@ class BackupManager:
             print(f"Error backing up device info: {e}")
             return False
     
+    @timed_operation()
     def backup_boot_image(self, backup_folder: str) -> Tuple[bool, str]:
         """Backup boot image"""
         from core.device_manager import DeviceManager
-        device_manager = DeviceManager(self.adb)
+        device_manager = DeviceManager(self.device)
         
         boot_file = os.path.join(backup_folder, "ogboot.img")
         
@@ -66,10 +71,19 @@ class BackupManager:
                 size = os.path.getsize(boot_file)
                 return True, f"Boot image backed up ({format_file_size(size)})"
         
+        if device_manager.last_error:
+            return False, f"Failed to backup boot image: {device_manager.last_error}"
         return False, "Failed to backup boot image"
     
+    @timed_operation()
     def backup_app(self, package_name: str, backup_folder: str, include_apk: bool = True) -> bool:
         """Backup a single app"""
+        from core.device_manager import DeviceManager
+        inventory = DeviceManager(self.device).get_package_inventory()
+        if inventory and package_name not in inventory:
+            print(f"Error backing up app {package_name}: not installed")
+            return False
+        
         try:
             backup_file = os.path.join(backup_folder, f"{package_name}.ab")
             
@@ -77,7 +91,7 @@ class BackupManager:
             if include_apk:
                 cmd.append('-apk')
             
-            result = self.adb.run_command(cmd)
+            result = self.device.run_command(cmd)
             
             if result.success and os.path.exists(backup_file):
                 return True
@@ -87,30 +101,101 @@ class BackupManager:
             print(f"Error backing up app {package_name}: {e}")
             return False
     
-    def backup_user_data(self, backup_folder: str, folders: List[Tuple[str, str]]) -> Dict[str, int]:
-        """Backup user data folders"""
+    @timed_operation()
+    def backup_user_data(self, backup_folder: str, folders: List[Tuple[str, str]],
+                         status_callback: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+        """Backup user data folders incrementally
+        
+        Every folder is listed in one round trip and compared, by path, size
+        and mtime, with the manifest of this device's previous backup:
+        unchanged files are hard-linked from it and only new or changed files
+        are pulled. Files are added to this backup's manifest as they land,
+        so running again into the same folder resumes where it stopped.
+        """
         results = {}
         user_data_folder = os.path.join(backup_folder, "User_Data")
-        os.makedirs(user_data_folder, exist_ok=True)
+        serial = self.device.serial or ''
+        previous = self.previous_manifest(backup_folder)
+        manifest = BackupManifest.open(user_data_folder, serial)
         
-        for name, remote_path in folders:
-            self.adb.update_status(f"Backing up {name}...")
-            dest_folder = os.path.join(user_data_folder, name)
-            os.makedirs(dest_folder, exist_ok=True)
-            
-            # Check if folder exists on device
-            result = self.adb.run_command(['shell', f'ls {remote_path}'])
-            if result.success:
-                pull_result = self.adb.pull_file(remote_path, dest_folder)
-                if pull_result.success:
-                    # Count files
-                    file_count = 0
-                    for root, dirs, files in os.walk(dest_folder):
-                        file_count += len(files)
-                    results[name] = file_count
+        if status_callback:
+            status_callback("Listing user data...")
+        listing = list_remote_files(self.device, *[remote_path for _, remote_path in folders])
+        
+        # A folder that exists but could not be listed must not pass as empty
+        failed = bool(listing.unlisted)
+        for remote_path in listing.unlisted:
+            print(f"Error backing up {remote_path}: could not be listed")
+        try:
+            for name, remote_path in folders:
+                files = listing.under(remote_path)
+                if not files:
+                    continue
+                if status_callback:
+                    status_callback(f"Backing up {name}...")
+                dest_folder = os.path.join(user_data_folder, name)
+                
+                def report(progress, name=name):
+                    if status_callback:
+                        status_callback(f"Backing up {name}... {progress.files_done}/{progress.total_files} "
+                                        f"changed files ({progress.fraction:.0%})")
+                
+                with tracer.span(name, 'folder', self.device.serial, remote_path=remote_path) as span:
+                    to_pull, kept, linked = [], 0, 0
+                    for f in files:
+                        if manifest.match(f):
+                            kept += 1
+                            continue
+                        unchanged = previous.match(f) if previous else None
+                        if unchanged is None:
+                            to_pull.append(f)
+                            continue
+                        local_path = local_path_for(remote_path, f.path, dest_folder)
+                        link_or_copy(unchanged, local_path)
+                        manifest.record(f, local_path)
+                        linked += 1
+                    
+                    pull_result = pull_files(self.device, to_pull, remote_path, dest_folder,
+                                             progress=report, on_file=manifest.record)
+                    span.set(kept=kept, linked=linked, pulled=pull_result.files, failed=len(pull_result.failed))
+                    results[name] = kept + linked + pull_result.files
+                    for path, error in pull_result.failed:
+                        print(f"Error backing up {path}: {error}")
+                    failed = failed or not pull_result.success
+        finally:
+            manifest.close(complete=not failed)
         
         return results
     
+    def user_data_manifests(self) -> List[BackupManifest]:
+        """User-data manifests of this device, newest backup first"""
+        backup_root = self.config.PATHS['backup_root']
+        if not os.path.isdir(backup_root):
+            return []
+        manifests = []
+        # newbackup_<YYYYmmdd_HHMMSS> sorts by time
+        for item in sorted(os.listdir(backup_root), reverse=True):
+            if item.startswith('newbackup_'):
+                manifest = BackupManifest.load(os.path.join(backup_root, item, "User_Data"))
+                if manifest and manifest.serial == (self.device.serial or ''):
+                    manifests.append(manifest)
+        return manifests
+    
+    def previous_manifest(self, backup_folder: str) -> Optional[BackupManifest]:
+        """Manifest of this device's newest user-data backup other than backup_folder"""
+        current = os.path.abspath(os.path.join(backup_folder, "User_Data"))
+        for manifest in self.user_data_manifests():
+            if os.path.abspath(manifest.folder) != current:
+                return manifest
+        return None
+    
+    def interrupted_backup(self) -> Optional[str]:
+        """Backup folder of this device's newest user-data backup if it never finished"""
+        manifests = self.user_data_manifests()
+        if manifests and not manifests[0].complete:
+            return os.path.dirname(manifests[0].folder)
+        return None
+    
     def get_backup_info(self, backup_path: str) -> Dict[str, str]:
         """Get information about a backup"""
         info = {
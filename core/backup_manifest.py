@@ -0,0 +1,109 @@
+"""
+Per-backup manifest of pulled user-data files
+
+One JSON line per file (remote path, size, mtime, local path relative to
+the manifest's folder), appended as soon as the file is on disk, so an
+interrupted backup knows exactly what it already has. The first line
+names the device and a last {"complete": ...} line closes the manifest.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from .pull_engine import RemoteFile
+
+MANIFEST_FILE = 'manifest.jsonl'
+
+class BackupManifest:
+    """Files of one user-data backup folder, keyed by remote path"""
+    
+    def __init__(self, folder: str, serial: str = '', entries: Optional[Dict[str, Tuple[int, int, str]]] = None,
+                 complete: bool = False):
+        self.folder = folder
+        self.serial = serial
+        # remote path -> (size, mtime, local path relative to folder, '/'-separated)
+        self.entries: Dict[str, Tuple[int, int, str]] = entries or {}
+        self.complete = complete
+        self._file = None
+        self._lock = threading.Lock()
+    
+    @property
+    def path(self) -> str:
+        return os.path.join(self.folder, MANIFEST_FILE)
+    
+    @classmethod
+    def load(cls, folder: str) -> Optional['BackupManifest']:
+        """Manifest of a folder, None if it has none; a torn last line is ignored"""
+        path = os.path.join(folder, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        manifest = cls(folder)
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if 'serial' in record:
+                    manifest.serial = record['serial']
+                elif 'complete' in record:
+                    manifest.complete = True
+                elif 'path' in record:
+                    manifest.entries[record['path']] = (record['size'], record['mtime'], record['local'])
+        return manifest
+    
+    @classmethod
+    def open(cls, folder: str, serial: str) -> 'BackupManifest':
+        """Manifest to append to: the folder's own when resuming, else a new one"""
+        manifest = cls.load(folder)
+        if manifest is None or manifest.serial != serial:
+            os.makedirs(folder, exist_ok=True)
+            manifest = cls(folder, serial)
+            with open(manifest.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'serial': serial, 'started': time.time()}) + '\n')
+        manifest.complete = False
+        manifest._file = open(manifest.path, 'a+', encoding='utf-8')
+        # An interrupted run may have torn its last line; start on a fresh one
+        if manifest._file.tell():
+            manifest._file.seek(manifest._file.tell() - 1)
+            if manifest._file.read(1) != '\n':
+                manifest._file.write('\n')
+        return manifest
+    
+    def local_path(self, remote_path: str) -> Optional[str]:
+        entry = self.entries.get(remote_path)
+        return os.path.join(self.folder, *entry[2].split('/')) if entry else None
+    
+    def match(self, f: RemoteFile) -> Optional[str]:
+        """Local copy of a remote file if this manifest has it unchanged and it is still on disk"""
+        entry = self.entries.get(f.path)
+        if entry is None or entry[0] != f.size or entry[1] != f.mtime:
+            return None
+        local = self.local_path(f.path)
+        try:
+            return local if os.path.getsize(local) == f.size else None
+        except OSError:
+            return None
+    
+    def record(self, f: RemoteFile, local_path: str):
+        """Add a file that is now complete on disk (thread-safe)"""
+        local = os.path.relpath(local_path, self.folder).replace(os.sep, '/')
+        line = json.dumps({'path': f.path, 'size': f.size, 'mtime': f.mtime, 'local': local}) + '\n'
+        with self._lock:
+            self.entries[f.path] = (f.size, f.mtime, local)
+            self._file.write(line)
+            self._file.flush()
+    
+    def close(self, complete: bool = False):
+        """Stop appending; complete=True marks the backup as finished"""
+        with self._lock:
+            if self._file is None:
+                return
+            if complete:
+                self._file.write(json.dumps({'complete': time.time(), 'files': len(self.entries)}) + '\n')
+                self.complete = True
+            self._file.close()
+            self._file = None
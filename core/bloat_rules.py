@@ -0,0 +1,138 @@
+"""
+Bloatware classification compiled from the curated rule sets
+"""
+
+import functools
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.bloatware import BLOAT_RULES
+from config.constants import BRAND_TOOLS
+
+# Removal risk, least to most
+SAFETY_LEVELS = ('recommended', 'advanced', 'expert', 'unsafe')
+
+# Rule sets applied to every device, ahead of the brand ones
+COMMON_RULE_SETS = ('generic', 'carrier')
+
+# SoC platforms (ro.board.platform / ro.hardware) by chip vendor
+_QUALCOMM_PLATFORM_RE = re.compile(r'^(?:qcom|msm|sdm|sm\d|apq|kalama|lahaina|taro|bengal|holi|kona|lito|pineapple)')
+_MEDIATEK_PLATFORM_RE = re.compile(r'^mt\d')
+
+# Brands sold under another manufacturer's rule set
+_BRAND_ALIASES = {'redmi': 'xiaomi', 'poco': 'xiaomi'}
+
+# Trie node key holding the rule of a namespace ending there
+_RULE = ''
+
+@dataclass(frozen=True)
+class BloatRule:
+    """One curated rule and where it came from"""
+    kind: str
+    pattern: str
+    category: str
+    safety: str
+    description: str
+    rule_set: str
+
+class BloatClassifier:
+    """Compiled matcher over a list of rules
+    
+    Exact names go in a dict, namespace prefixes in a trie keyed by name
+    segments (longest prefix wins), segment rules in a set and any
+    regexes in one alternation. A name is split once and costs a handful
+    of dict lookups; results are memoised per name.
+    """
+    
+    def __init__(self, rules: Iterable[BloatRule]):
+        self.rules: List[BloatRule] = list(rules)
+        self._exact: Dict[str, BloatRule] = {}
+        self._trie: dict = {}
+        self._segments: Dict[str, BloatRule] = {}
+        self._regex_rules: List[BloatRule] = []
+        self._cache: Dict[str, Optional[BloatRule]] = {}
+        
+        for rule in self.rules:
+            if rule.kind == 'package':
+                self._exact[rule.pattern] = rule
+            elif rule.kind == 'prefix':
+                if not rule.pattern.endswith('.'):
+                    raise ValueError(f"Prefix bloat rule {rule.pattern!r} must end with '.'")
+                node = self._trie
+                for segment in rule.pattern[:-1].split('.'):
+                    node = node.setdefault(segment, {})
+                node[_RULE] = rule
+            elif rule.kind == 'segment':
+                self._segments[rule.pattern] = rule
+            elif rule.kind == 'regex':
+                self._regex_rules.append(rule)
+            else:
+                raise ValueError(f"Unknown bloat rule kind {rule.kind!r} for {rule.pattern!r}")
+        
+        # lastgroup names the outermost group that matched, i.e. the rule
+        self._regex = re.compile('|'.join(
+            f"(?P<r{i}>{rule.pattern})" for i, rule in enumerate(self._regex_rules)
+        )) if self._regex_rules else None
+    
+    def classify(self, name: str) -> Optional[BloatRule]:
+        """Rule matching a package name, or None"""
+        try:
+            return self._cache[name]
+        except KeyError:
+            pass
+        
+        rule = self._exact.get(name)
+        if rule is None:
+            segments = name.split('.')
+            node = self._trie
+            # The last segment is the package itself, not a namespace
+            for segment in segments[:-1]:
+                node = node.get(segment)
+                if node is None:
+                    break
+                rule = node.get(_RULE, rule)
+            if rule is None and self._segments:
+                rule = next((self._segments[s] for s in segments if s in self._segments), None)
+        if rule is None and self._regex is not None:
+            match = self._regex.search(name)
+            if match:
+                rule = self._regex_rules[int(match.lastgroup[1:])]
+        
+        self._cache[name] = rule
+        return rule
+    
+    def classify_all(self, names: Iterable[str]) -> Dict[str, BloatRule]:
+        """{name: rule} for every name a rule matches"""
+        classify = self.classify
+        matches = {}
+        for name in names:
+            rule = classify(name)
+            if rule is not None:
+                matches[name] = rule
+        return matches
+
+def device_rule_sets(props: Dict[str, str]) -> Tuple[str, ...]:
+    """Rule sets that apply to a device, from its manufacturer and SoC properties"""
+    brand_keys = {key for _, key, _ in BRAND_TOOLS}
+    sets = list(COMMON_RULE_SETS)
+    for prop in ('ro.product.manufacturer', 'ro.product.brand'):
+        value = props.get(prop, '').strip().lower()
+        key = _BRAND_ALIASES.get(value, value)
+        if key in brand_keys and key not in sets:
+            sets.append(key)
+    platform = f"{props.get('ro.board.platform', '')} {props.get('ro.hardware', '')}".lower().split()
+    if any(_QUALCOMM_PLATFORM_RE.match(value) for value in platform) and 'qualcomm' not in sets:
+        sets.append('qualcomm')
+    if any(_MEDIATEK_PLATFORM_RE.match(value) for value in platform) and 'mediatek' not in sets:
+        sets.append('mediatek')
+    return tuple(sets)
+
+@functools.lru_cache(maxsize=32)
+def classifier_for(rule_sets: Tuple[str, ...]) -> BloatClassifier:
+    """Compiled classifier for a combination of rule sets, built once"""
+    rules = []
+    for rule_set in rule_sets:
+        for kind, pattern, category, safety, description in BLOAT_RULES.get(rule_set, []):
+            rules.append(BloatRule(kind, pattern, category, safety, description, rule_set))
+    return BloatClassifier(rules)
@@ -0,0 +1,175 @@
+"""
+Cancellation tokens, timeouts and process-group cleanup
+"""
+
+import heapq
+import itertools
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional
+
+# Popen arguments that put a child in its own process group, so a timeout
+# or cancel can take down everything it spawned (adb forks its server)
+if os.name == 'nt':
+    PROCESS_GROUP_KWARGS = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+else:
+    PROCESS_GROUP_KWARGS = {'start_new_session': True}
+
+class CancelToken:
+    """Cooperative cancellation flag shared between the GUI and workers"""
+    
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+    
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+    
+    def cancel(self):
+        """Cancel and notify everything currently registered"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+    
+    def add_callback(self, callback: Callable[[], None]):
+        """Call callback on cancel, right away if already cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+    
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until cancelled or the timeout passes"""
+        return self._event.wait(timeout)
+
+class _Deadlines:
+    """One shared thread firing timeout callbacks, instead of a Timer per call"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap: List[list] = []
+        self._dead = 0
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+    
+    def schedule(self, delay: float, callback: Callable[[], None]) -> list:
+        entry = [time.monotonic() + delay, next(self._seq), callback]
+        with self._cond:
+            heapq.heappush(self._heap, entry)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='adb-deadlines', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return entry
+    
+    def cancel(self, entry: list):
+        with self._cond:
+            if entry[2] is None:
+                return
+            entry[2] = None
+            self._dead += 1
+            # Drop cancelled entries once they are the majority
+            if self._dead * 2 > len(self._heap):
+                self._heap = [e for e in self._heap if e[2] is not None]
+                heapq.heapify(self._heap)
+                self._dead = 0
+    
+    def _run(self):
+        with self._cond:
+            while True:
+                while self._heap and self._heap[0][2] is None:
+                    heapq.heappop(self._heap)
+                    self._dead -= 1
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                delay = self._heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                entry = heapq.heappop(self._heap)
+                callback, entry[2] = entry[2], None
+                self._cond.release()
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"Error in timeout callback: {e}")
+                finally:
+                    self._cond.acquire()
+
+_deadlines = _Deadlines()
+
+class Watchdog:
+    """Runs abort() when an operation times out or its token is cancelled
+    
+    Use as a context manager around the blocking call, then check
+    timed_out / cancelled to tell an abort from a normal failure.
+    """
+    
+    def __init__(self, abort: Callable[[], None], timeout: Optional[float] = None,
+                 token: Optional[CancelToken] = None):
+        self._abort = abort
+        self.timeout = timeout
+        self.token = token
+        self.timed_out = False
+        self.cancelled = False
+        self._deadline: Optional[list] = None
+    
+    @property
+    def interrupted(self) -> bool:
+        return self.timed_out or self.cancelled
+    
+    def __enter__(self) -> 'Watchdog':
+        if self.timeout:
+            self._deadline = _deadlines.schedule(self.timeout, self._expire)
+        if self.token:
+            self.token.add_callback(self._cancel)
+        return self
+    
+    def __exit__(self, *exc):
+        if self._deadline:
+            _deadlines.cancel(self._deadline)
+        if self.token:
+            self.token.remove_callback(self._cancel)
+    
+    def _expire(self):
+        if not self.interrupted:
+            self.timed_out = True
+            self._abort()
+    
+    def _cancel(self):
+        if not self.interrupted:
+            self.cancelled = True
+            self._abort()
+
+def kill_process_group(proc):
+    """Kill a Popen child started with PROCESS_GROUP_KWARGS and all its descendants"""
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(proc.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    try:
+        proc.kill()
+    except OSError:
+        pass
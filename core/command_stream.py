@@ -0,0 +1,226 @@
+"""
+Streaming command output
+
+A CommandStream hands out a command's stdout as it arrives, either as raw
+byte chunks or as decoded lines, without ever holding more than one chunk
+plus a partial line in memory.
+"""
+
+import codecs
+import os
+import socket
+import struct
+import subprocess
+import tempfile
+import uuid
+from typing import Iterator, List, Optional
+
+from .adb_client import ADBClient, ADBProtocolError, SHELL_ID_EXIT, SHELL_ID_STDERR, SHELL_ID_STDOUT
+from .cancellation import CancelToken, PROCESS_GROUP_KWARGS, kill_process_group
+
+# Lines longer than this are handed out in pieces
+MAX_LINE_LENGTH = 1024 * 1024
+
+# stderr is kept for the error message only, so cap it
+MAX_STDERR = 64 * 1024
+
+class CommandStream:
+    """Incremental stdout of a running command
+    
+    Iterate over it (or over lines()/chunks()) to consume output as it is
+    produced. Reading is pull-based: nothing is read ahead of the consumer,
+    so a slow consumer throttles the device instead of growing a buffer.
+    Breaking out early, cancel() or leaving the `with` block stops the
+    command. returncode and stderr are set once the stream is exhausted.
+    """
+    
+    def __init__(self, source, chunk_size: int = 65536, token: Optional[CancelToken] = None):
+        self._source = source
+        self.chunk_size = chunk_size
+        self.returncode: Optional[int] = None
+        self.stderr = ''
+        self.cancelled = False
+        self._consumed = False
+        self._token = token
+        if token:
+            token.add_callback(self.cancel)
+    
+    def __enter__(self) -> 'CommandStream':
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def __iter__(self) -> Iterator[str]:
+        return self.lines()
+    
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0
+    
+    def chunks(self) -> Iterator[bytes]:
+        """Yield raw stdout chunks as they arrive"""
+        if self._consumed:
+            raise RuntimeError("command stream already consumed")
+        self._consumed = True
+        finished = False
+        try:
+            while not self.cancelled:
+                chunk = self._source.read(self.chunk_size)
+                if not chunk:
+                    finished = True
+                    break
+                yield chunk
+        except (ADBProtocolError, OSError):
+            if not self.cancelled:
+                raise
+        finally:
+            if not finished:
+                # The consumer stopped early; don't wait for the command to end
+                self.cancel()
+            self.close()
+    
+    def lines(self, encoding: str = 'utf-8', keepends: bool = False) -> Iterator[str]:
+        """Yield decoded stdout lines as they complete"""
+        decoder = codecs.getincrementaldecoder(encoding)(errors='ignore')
+        pending = ''
+        for chunk in self.chunks():
+            *lines, pending = (pending + decoder.decode(chunk)).split('\n')
+            for line in lines:
+                yield line + '\n' if keepends else line.rstrip('\r')
+            while len(pending) > MAX_LINE_LENGTH:
+                yield pending[:MAX_LINE_LENGTH]
+                pending = pending[MAX_LINE_LENGTH:]
+        pending += decoder.decode(b'', final=True)
+        if pending:
+            yield pending if keepends else pending.rstrip('\r')
+    
+    def cancel(self):
+        """Stop the command; safe to call from another thread"""
+        self.cancelled = True
+        self._source.cancel()
+    
+    def close(self):
+        """Release the command and collect its exit status"""
+        if self.returncode is not None:
+            return
+        if self._token:
+            self._token.remove_callback(self.cancel)
+        if not self._consumed:
+            self.cancel()
+        self.returncode, stderr = self._source.finish()
+        self.stderr = stderr.decode('utf-8', errors='ignore')
+
+class ProcessSource:
+    """Stream the stdout of a child process"""
+    
+    def __init__(self, cmd: List[str]):
+        # stderr goes to a file so a chatty command cannot block on a full pipe
+        self._stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=self._stderr,
+                                     **PROCESS_GROUP_KWARGS)
+    
+    def read(self, size: int) -> bytes:
+        return os.read(self.proc.stdout.fileno(), size)
+    
+    def cancel(self):
+        kill_process_group(self.proc)
+    
+    def finish(self):
+        self.proc.stdout.close()
+        code = self.proc.wait()
+        self._stderr.seek(0)
+        stderr = self._stderr.read(MAX_STDERR)
+        self._stderr.close()
+        return code, stderr
+
+class SocketSource:
+    """Stream a raw device service (exec:) from the server socket"""
+    
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._exit_code = 0
+    
+    def read(self, size: int) -> bytes:
+        return self.sock.recv(size)
+    
+    def cancel(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    
+    def finish(self):
+        self.sock.close()
+        return self._exit_code, b''
+
+class ShellV2Source(SocketSource):
+    """Stream shell,v2 stdout packets, keeping stderr and the exit code"""
+    
+    def __init__(self, sock: socket.socket):
+        super().__init__(sock)
+        self._exit_code = 255
+        self._stderr = bytearray()
+        self._remaining = 0
+    
+    def read(self, size: int) -> bytes:
+        while True:
+            if self._remaining:
+                chunk = self.sock.recv(min(size, self._remaining))
+                if not chunk:
+                    return b''
+                self._remaining -= len(chunk)
+                return chunk
+            
+            try:
+                header = ADBClient._read_exact(self.sock, 5)
+            except ADBProtocolError:
+                return b''
+            packet_id, length = header[0], struct.unpack('<I', header[1:])[0]
+            if packet_id == SHELL_ID_STDOUT:
+                self._remaining = length
+                continue
+            data = ADBClient._read_exact(self.sock, length) if length else b''
+            if packet_id == SHELL_ID_STDERR:
+                self._stderr += data[:MAX_STDERR - len(self._stderr)]
+            elif packet_id == SHELL_ID_EXIT:
+                self._exit_code = data[0] if data else 0
+                return b''
+    
+    def finish(self):
+        self.sock.close()
+        return self._exit_code, bytes(self._stderr)
+
+class LegacyShellSource(SocketSource):
+    """Stream shell: output, recovering the exit code from a trailing marker"""
+    
+    def __init__(self, client: ADBClient, serial: Optional[str], command: str):
+        self.marker = f'__ARS_RC_{uuid.uuid4().hex}__'.encode()
+        super().__init__(client.open_service(serial, f'shell:{command}; echo "{self.marker.decode()}$?"'))
+        self._tail = b''
+        self._eof = False
+    
+    def read(self, size: int) -> bytes:
+        # The last bytes might be the marker, so they are held back until EOF
+        hold = len(self.marker) + 8
+        while not self._eof:
+            chunk = self.sock.recv(size)
+            if not chunk:
+                self._eof = True
+                break
+            self._tail += chunk
+            if len(self._tail) > hold:
+                cut = len(self._tail) - hold
+                if self._tail[cut - 1:cut] == b'\r':
+                    cut -= 1
+                out, self._tail = self._tail[:cut], self._tail[cut:]
+                if out:
+                    return out.replace(b'\r\n', b'\n')
+        
+        idx = self._tail.rfind(self.marker)
+        if idx != -1:
+            code = self._tail[idx + len(self.marker):].strip()
+            self._exit_code = int(code) if code.isdigit() else 0
+            self._tail = self._tail[:idx]
+        out, self._tail = self._tail, b''
+        return out.replace(b'\r\n', b'\n')
@@ -0,0 +1,217 @@
+"""
+Serial-bound device handles
+"""
+
+import shlex
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .adb_manager import BOOT_ID_PATH, CommandResult, interrupted_result, parse_getprop, select_props
+from .cancellation import CancelToken
+from .command_stream import CommandStream
+from .device_probe import PROBE_SECTIONS, build_probe_script, new_probe_token, parse_identity, split_probe_output
+from .metrics import record_command
+from .package_inventory import PackageInventory
+from .pull_engine import PullProgress, PullResult, archive_tree, pull_tree
+from .shell_session import ShellSession, ShellSessionCancelled, ShellSessionError, ShellSessionTimeout
+
+if TYPE_CHECKING:
+    from .adb_manager import ADBManager
+
+class DeviceHandle:
+    """One connected device: command routing, caches and a lock of its own
+    
+    Every command goes out with `-s <serial>`, so handles for different
+    devices can be driven from different threads at the same time. Hold
+    `lock` around multi-step operations that must not interleave on the
+    same device (staging files, flashing, backups).
+    """
+    
+    def __init__(self, adb_manager: 'ADBManager', serial: Optional[str]):
+        self.adb = adb_manager
+        self.serial = serial
+        self.lock = threading.RLock()
+        self.info: Dict[str, str] = {}
+        self._ro_props: Optional[Tuple[str, Dict[str, str]]] = None
+        # Root detection result for the current boot (see DeviceManager.check_root_status)
+        self.root_status: Optional[Tuple[bool, str, Optional[str]]] = None
+        # Package inventory shared by app lists, debloating and backups
+        self.packages: Optional[PackageInventory] = None
+        # (taken, inventory) stored by the previous visit, loaded on first use
+        self.package_baseline: Optional[Tuple[float, Optional[PackageInventory]]] = None
+    
+    def __repr__(self) -> str:
+        return f"DeviceHandle({self.serial!r})"
+    
+    @property
+    def model(self) -> str:
+        """Model name reported by `adb devices -l`"""
+        return self.info.get('model', '').replace('_', ' ')
+    
+    @property
+    def status(self) -> str:
+        """Connection state from the last device listing"""
+        return self.info.get('status', 'unknown')
+    
+    # ==================== Command Routing ====================
+    
+    def adb_command(self, args: List[str]) -> List[str]:
+        """Build an adb command line bound to this device"""
+        cmd = [self.adb.adb_path]
+        if self.serial:
+            cmd += ['-s', self.serial]
+        return cmd + list(args)
+    
+    def fastboot_command(self, args: List[str]) -> List[str]:
+        """Build a fastboot command line bound to this device
+        
+        Assumes the device keeps its adb serial in the bootloader, as USB
+        devices do.
+        """
+        cmd = [self.adb.fastboot_path]
+        if self.serial:
+            cmd += ['-s', self.serial]
+        return cmd + list(args)
+    
+    def run_command(self, args: List[str], timeout: Optional[float] = None,
+                    cancel: Optional[CancelToken] = None, idempotent: Optional[bool] = None) -> CommandResult:
+        """Run adb arguments against this device"""
+        return self.adb.run_command(self.adb_command(args), timeout=timeout, cancel=cancel, idempotent=idempotent)
+    
+    def run_shell(self, command: str, root: bool = False, timeout: Optional[float] = None,
+                  cancel: Optional[CancelToken] = None) -> CommandResult:
+        """Run a shell command over the device's persistent shell session
+        
+        stderr is folded into stdout. With root=True the command runs in a
+        kept-open su shell instead of paying for `su -c` on every call.
+        """
+        if self.adb.config.USE_SHELL_SESSIONS:
+            timeout = self.adb.resolve_timeout(timeout)
+            cancel = cancel or self.adb.current_token()
+            start = time.perf_counter()
+            try:
+                code, output = self.shell_session(root).run(command, timeout, cancel)
+                result = CommandResult(code, output, '')
+            except ShellSessionCancelled:
+                result = interrupted_result(cancelled=True)
+            except ShellSessionTimeout:
+                result = interrupted_result(False, timeout)
+            except ShellSessionError:
+                result = None
+            if result is not None:
+                record_command('shell-session', self.serial, start, result)
+                return result
+        
+        if root:
+            command = f"su -c {shlex.quote(command)}"
+        return self.run_command(['shell', command], timeout, cancel)
+    
+    def exec_out(self, command: str, sink: Any = None, timeout: Optional[float] = None,
+                 cancel: Optional[CancelToken] = None, idempotent: Optional[bool] = None) -> CommandResult:
+        """Run a command with binary-safe stdout (see ADBManager.exec_out)"""
+        return self.adb.exec_out(self.serial, command, sink, timeout, cancel, idempotent)
+    
+    def stream_command(self, args: List[str], cancel: Optional[CancelToken] = None) -> CommandStream:
+        """Stream the stdout of adb arguments run against this device"""
+        return self.adb.stream_command(self.adb_command(args), cancel=cancel)
+    
+    def stream_shell(self, command: str) -> CommandStream:
+        """Stream the stdout of a shell command line by line"""
+        return self.stream_command(['shell', command])
+    
+    def shell_session(self, root: bool = False) -> ShellSession:
+        """Get the pooled shell session for this device"""
+        return self.adb.get_shell_session(root, self.serial)
+    
+    def pull_file(self, remote_path: str, local_path: str, timeout: Optional[float] = None) -> CommandResult:
+        """Pull file from device"""
+        return self.run_command(['pull', remote_path, local_path], timeout)
+    
+    def pull_tree(self, remote_path: str, local_dir: str, workers: Optional[int] = None,
+                  progress: Optional[Callable[[PullProgress], None]] = None,
+                  transport: Optional[str] = None) -> PullResult:
+        """Pull a file or directory tree over several sync connections at once
+        
+        Lands in local_dir/<basename of remote_path> like pull_file into a
+        folder; trees of many small files are tar-streamed instead. See
+        core.pull_engine.
+        """
+        return pull_tree(self, remote_path, local_dir, workers, progress=progress, transport=transport)
+    
+    def archive_tree(self, remote_path: str, archive_path: str,
+                     progress: Optional[Callable[[PullProgress], None]] = None) -> PullResult:
+        """Stream a file or directory tree into a local .tar or .tar.gz archive"""
+        return archive_tree(self, remote_path, archive_path, progress)
+    
+    def push_file(self, local_path: str, remote_path: str, timeout: Optional[float] = None) -> CommandResult:
+        """Push file to device"""
+        return self.run_command(['push', local_path, remote_path], timeout)
+    
+    def reboot(self, mode: str = "") -> CommandResult:
+        """Reboot device to specified mode"""
+        self.root_status = None
+        return self.run_command(['reboot', mode] if mode else ['reboot'])
+    
+    # ==================== Properties ====================
+    
+    def get_device_props(self, prop_names: List[str]) -> Dict[str, str]:
+        """Get device properties"""
+        return select_props(self.get_prop_snapshot(), prop_names)
+    
+    def get_prop_snapshot(self, _retried: bool = False) -> Dict[str, str]:
+        """Get every device property from a single getprop dump
+        
+        Immutable ro.* properties are cached per boot id, so once the cache
+        is warm only the mutable properties cross the wire. If the device
+        cannot be read the cached ro.* values are all that is returned.
+        """
+        cached = self._ro_props
+        
+        dump_cmd = "getprop | grep -v '^\\[ro\\.'" if cached else "getprop"
+        result = self.run_shell(f"cat {BOOT_ID_PATH} 2>/dev/null || echo; {dump_cmd}")
+        if not result.success:
+            return dict(cached[1]) if cached else {}
+        boot_id, _, dump = result.stdout.partition('\n')
+        boot_id = boot_id.strip()
+        props = parse_getprop(dump)
+        
+        if cached:
+            if cached[0] != boot_id and boot_id and not _retried:
+                # Rebooted since the cache was filled (possibly into a new build)
+                self._ro_props = None
+                return self.get_prop_snapshot(_retried=True)
+            props.update(cached[1])
+            return props
+        
+        if boot_id and props:
+            self._ro_props = (boot_id, {k: v for k, v in props.items() if k.startswith('ro.')})
+        return props
+    
+    def get_identity(self) -> Tuple[str, str, bool]:
+        """(boot id, build fingerprint, boot completed) in one round trip"""
+        result = self.run_shell(PROBE_SECTIONS['identity'])
+        return parse_identity(result.stdout if result.success else '')
+    
+    def probe(self, sections: Iterable[str], commands: Optional[Dict[str, str]] = None,
+              timeout: Optional[float] = None) -> Dict[str, str]:
+        """Run several probe sections in one shell round trip
+        
+        Returns the raw text of each section (see core.device_probe for the
+        parsers). The exit status of the script is that of its last section,
+        so a section is judged by its output; a device that could not be
+        reached gives an empty dict. commands overrides the section table.
+        """
+        token = new_probe_token()
+        result = self.run_shell(build_probe_script(sections, token, commands), timeout=timeout)
+        if result.cancelled or result.timed_out:
+            return {}
+        return split_probe_output(result.stdout, token)
+    
+    def forget(self):
+        """Drop cached state and shell sessions, e.g. after a disconnect"""
+        self._ro_props = None
+        self.root_status = None
+        self.packages = None
+        self.package_baseline = None
+        self.adb.close_shell_sessions(self.serial or '')
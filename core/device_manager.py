@@ -2,156 +2,376 @@
 Device management operations
 """
 
-import re
-from typing import Dict, List, Optional, Tuple
-from .adb_manager import ADBManager
-from config.constants import DEVICE_PROPERTIES_BASIC, DEVICE_PROPERTIES_ADVANCED
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from .adb_manager import parse_getprop, select_props
+from .bloat_rules import BloatRule, classifier_for, device_rule_sets
+from .device_handle import DeviceHandle
+from .device_probe import (
+    BATTERY_SECTIONS, NETWORK_SECTIONS, PROBE_SECTIONS, STORAGE_SECTIONS, VOLATILE_PROBE_SECTIONS,
+    parse_battery, parse_identity, parse_network, parse_storage
+)
+from .device_store import DeviceSnapshot
+from .metrics import timed_operation
+from .package_batch import (
+    PackageBatch, PackageOutcome, action_changes, batch_sections, parse_outcomes, validate_actions
+)
+from .package_inventory import INVENTORY_SECTIONS, PackageDiff, PackageInventory, diff_inventories, parse_inventory
+from .retry import is_device_unavailable
+from .root_detection import ROOT_UNKNOWN, RootStatus, detect_root, probe_sections
+from config.constants import (
+    BOOT_IMAGE_MAGIC, BOOT_PARTITION_PATHS, DEVICE_PROPERTIES_BASIC, DEVICE_PROPERTIES_ADVANCED, PNG_SIGNATURE
+)
+from config.settings import config
 
 class DeviceManager:
     """Manages device-specific operations"""
     
-    def __init__(self, adb_manager: ADBManager):
-        self.adb = adb_manager
-    
-    def get_detailed_device_info(self) -> Dict[str, Dict[str, str]]:
-        """Get comprehensive device information"""
-        info = {
-            'basic': {},
-            'advanced': {},
-            'storage': {},
-            'network': {},
-            'battery': {},
-        }
+    def __init__(self, device: DeviceHandle):
+        self.device = device
+        self.last_error: Optional[str] = None
+    
+    @timed_operation()
+    def get_detailed_device_info(self, refresh: bool = False) -> Dict[str, Dict[str, str]]:
+        """Get comprehensive device information
         
-        # Get basic properties
-        info['basic'] = self.adb.get_device_props(DEVICE_PROPERTIES_BASIC)
+        One probe script reads the identity and every volatile section
+        (storage, battery, network), plus the full getprop dump when no
+        cached build properties exist. Build properties are served from the
+        device cache while the build fingerprint matches. refresh=True
+        re-reads everything.
+        """
+        store = self.device.adb.device_store() if self.device.serial else None
+        cached = store.load(self.device.serial) if store and not refresh else None
         
-        # Get advanced properties
-        info['advanced'] = self.adb.get_device_props(DEVICE_PROPERTIES_ADVANCED)
+        sections = ('identity',) + VOLATILE_PROBE_SECTIONS
+        if cached is None:
+            sections += ('props',)
+        output = self.device.probe(sections)
+        snapshot, cacheable = self.match_snapshot(parse_identity(output.get('identity', '')), cached)
         
-        # Get storage info
-        info['storage'] = self.get_storage_info()
+        if not snapshot.build:
+            # Basic and advanced properties come from one getprop dump; after
+            # an OTA the cached build missed, so it takes a second round trip
+            props = parse_getprop(output['props']) if 'props' in output else self.device.get_prop_snapshot()
+            snapshot.build = {
+                'basic': select_props(props, DEVICE_PROPERTIES_BASIC),
+                'advanced': select_props(props, DEVICE_PROPERTIES_ADVANCED),
+            }
         
-        # Get battery info
-        info['battery'] = self.get_battery_info()
+        snapshot.volatile = {
+            'storage': parse_storage(output),
+            'network': parse_network(output),
+            'battery': parse_battery(output),
+        }
+        snapshot.volatile_updated = time.time()
         
-        return info
+        if cacheable:
+            self.save_snapshot(snapshot)
+        return snapshot.sections()
+    
+    def cached_device_info(self) -> Optional[Dict[str, Dict[str, str]]]:
+        """Last stored info for this device, without touching the device"""
+        store = self.device.adb.device_store()
+        if store is None or not self.device.serial:
+            return None
+        snapshot = store.load(self.device.serial)
+        return snapshot.sections() if snapshot else None
+    
+    def current_snapshot(self, use_cache: bool = True) -> Tuple[DeviceSnapshot, bool]:
+        """The cached snapshot if it still matches the device, else an empty one
+        
+        The flag says whether the result may be stored (not while the device
+        is still booting).
+        """
+        identity = self.device.get_identity()
+        store = self.device.adb.device_store() if self.device.serial else None
+        cached = store.load(self.device.serial, identity[1]) if store and use_cache else None
+        return self.match_snapshot(identity, cached)
+    
+    def match_snapshot(self, identity: Tuple[str, str, bool],
+                       cached: Optional[DeviceSnapshot]) -> Tuple[DeviceSnapshot, bool]:
+        """Check a cached snapshot against the device's current identity
+        
+        A changed fingerprint misses the cache; a changed boot id keeps the
+        build data but drops everything boot-scoped.
+        """
+        boot_id, fingerprint, booted = identity
+        cacheable = bool(booted and fingerprint and self.device.serial)
+        if cached is None or not cacheable or cached.fingerprint != fingerprint:
+            return DeviceSnapshot(self.device.serial or '', fingerprint, boot_id), cacheable
+        if cached.boot_id != boot_id:
+            cached.rebooted(boot_id)
+        return cached, cacheable
+    
+    def save_snapshot(self, snapshot: DeviceSnapshot):
+        """Write a snapshot back to the device cache"""
+        store = self.device.adb.device_store()
+        if store is not None:
+            store.save(snapshot)
     
     def get_storage_info(self) -> Dict[str, str]:
         """Get storage information"""
-        storage_info = {}
-        
-        # Get internal storage
-        cmd = "df -h /data | tail -1"
-        result = self.adb.run_command(['shell', cmd])
-        if result.success:
-            parts = result.stdout.strip().split()
-            if len(parts) >= 5:
-                storage_info['internal_total'] = parts[1]
-                storage_info['internal_used'] = parts[2]
-                storage_info['internal_available'] = parts[3]
-                storage_info['internal_use_percent'] = parts[4]
-        
-        # Get RAM info
-        cmd = "cat /proc/meminfo | grep MemTotal"
-        result = self.adb.run_command(['shell', cmd])
-        if result.success:
-            match = re.search(r'MemTotal:\s+(\d+)\s+kB', result.stdout)
-            if match:
-                ram_kb = int(match.group(1))
-                storage_info['ram_total_mb'] = str(ram_kb // 1024)
-        
-        return storage_info
+        return parse_storage(self.device.probe(STORAGE_SECTIONS))
     
     def get_battery_info(self) -> Dict[str, str]:
         """Get battery information"""
-        battery_info = {}
-        
-        # Try different methods to get battery info
-        cmds = [
-            "dumpsys battery",
-            "cat /sys/class/power_supply/battery/capacity",
-        ]
-        
-        for cmd in cmds:
-            result = self.adb.run_command(['shell', cmd])
-            if result.success:
-                output = result.stdout
-                
-                # Parse dumpsys battery output
-                if "dumpsys" in cmd:
-                    level_match = re.search(r'level:\s+(\d+)', output)
-                    if level_match:
-                        battery_info['level'] = level_match.group(1)
-                    
-                    status_match = re.search(r'status:\s+(\d+)', output)
-                    if status_match:
-                        status_map = {1: "Unknown", 2: "Charging", 3: "Discharging", 4: "Not charging", 5: "Full"}
-                        status_code = int(status_match.group(1))
-                        battery_info['status'] = status_map.get(status_code, "Unknown")
-                
-                # Parse capacity file
-                elif "capacity" in cmd:
-                    battery_info['level'] = output.strip()
-        
-        return battery_info
-    
-    def check_root_status(self) -> Tuple[bool, str, Optional[str]]:
-        """Check if device is rooted and determine root method"""
-        # Check for su binary
-        result = self.adb.run_command(['shell', 'which su'])
-        if not result.success or not result.stdout.strip():
-            return False, "Not rooted", None
-        
-        # Check for Magisk
-        magisk_result = self.adb.run_command(['shell', 'su -c "magisk -v"'])
-        if magisk_result.success:
-            version = magisk_result.stdout.strip()
-            return True, "Rooted", f"Magisk {version}"
-        
-        # Check for KernelSU
-        kernelsu_result = self.adb.run_command(['shell', 'su -c "ksud"'])
-        if kernelsu_result.success:
-            return True, "Rooted", "KernelSU"
-        
-        # Check for SuperSU
-        supersu_result = self.adb.run_command(['shell', 'su -c "su --version"'])
-        if supersu_result.success:
-            return True, "Rooted", "SuperSU"
-        
-        return True, "Rooted", "Unknown"
+        return parse_battery(self.device.probe(BATTERY_SECTIONS))
     
+    def get_network_info(self) -> Dict[str, str]:
+        """Get IPv4 addresses and mobile operator"""
+        return parse_network(self.device.probe(NETWORK_SECTIONS))
+    
+    @timed_operation()
+    def check_root_status(self, refresh: bool = False) -> RootStatus:
+        """Check if device is rooted and determine root method
+        
+        Every registered root detector is probed in one unprivileged script
+        (see core/root_detection.py). The result holds for the current boot:
+        it is kept on the device handle, so later calls return at once, and
+        in the device cache under the boot id. refresh=True probes again.
+        A device that does not answer gives ROOT_UNKNOWN, which is not kept.
+        """
+        if not refresh and self.device.root_status is not None:
+            return self.device.root_status
+        
+        store = self.device.adb.device_store() if self.device.serial else None
+        cached = store.load(self.device.serial) if store else None
+        if not refresh and cached is not None and 'root' in cached.boot:
+            # Stored by an earlier run; only valid if the device has not rebooted since
+            snapshot, _ = self.match_snapshot(self.device.get_identity(), cached)
+            if 'root' in snapshot.boot:
+                self.device.root_status = tuple(snapshot.boot['root'])
+                return self.device.root_status
+        
+        timeout = self.device.adb.config.ROOT_PROBE_TIMEOUT
+        sections = probe_sections(timeout)
+        output = self.device.probe(['identity', *sections], {**PROBE_SECTIONS, **sections},
+                                   timeout=timeout * len(sections) + 5)
+        if not all(name in output for name in sections):
+            return ROOT_UNKNOWN
+        status = detect_root(output)
+        self.device.root_status = status
+        
+        snapshot, cacheable = self.match_snapshot(parse_identity(output.get('identity', '')), cached)
+        if cacheable and snapshot.build:
+            snapshot.boot['root'] = list(status)
+            self.save_snapshot(snapshot)
+        return status
+    
+    def cached_root_status(self) -> Optional[RootStatus]:
+        """Root status already detected this boot, without touching the device"""
+        return self.device.root_status
+    
+    @timed_operation()
     def get_installed_apps(self, system_only: bool = False) -> List[str]:
         """Get list of installed apps"""
-        cmd = "pm list packages"
+        inventory = self.get_package_inventory()
         if system_only:
-            cmd += " -s"
+            inventory = inventory.filter(system=True)
+        return list(inventory.names)
+    
+    @timed_operation()
+    def get_package_inventory(self, refresh: bool = False) -> PackageInventory:
+        """Every installed package with path, uid, installer and version code
         
-        result = self.adb.run_command(['shell', cmd])
-        if not result.success:
-            return []
+        Loaded with one probe round trip and kept on the device handle, so
+        app lists, debloating and backups all pick from the same index.
+        refresh=True reloads it; an unreachable device gives an empty one.
+        """
+        if not refresh and self.device.packages is not None:
+            return self.device.packages
+        output = self.device.probe(INVENTORY_SECTIONS, INVENTORY_SECTIONS)
+        inventory = parse_inventory(output)
+        if inventory:
+            self.device.packages = inventory
+            self.record_inventory(inventory)
+        return inventory
+    
+    def record_inventory(self, inventory: PackageInventory):
+        """Store an inventory, keeping the previous visit's one as the baseline
         
-        apps = []
-        for line in result.stdout.strip().split('\n'):
-            if line.startswith('package:'):
-                apps.append(line.replace('package:', '').strip())
+        A visit lasts as long as the device handle, so reloads during one
+        visit are all compared with what the last visit left behind.
+        """
+        store = self.device.adb.device_store() if self.device.serial else None
+        if store is None:
+            return
+        if self.device.package_baseline is None:
+            saved = store.load_packages(self.device.serial)
+            try:
+                self.device.package_baseline = saved[0], PackageInventory.from_dict(saved[1])
+            except (TypeError, KeyError, ValueError):
+                # First visit, or a damaged row: nothing to compare with
+                self.device.package_baseline = time.time(), None
+        store.save_packages(self.device.serial, inventory.to_dict())
+    
+    def package_changes(self) -> Optional[Tuple[float, PackageDiff]]:
+        """(time of the last visit, what changed since) or None on a first visit
         
-        return apps
+        Works on the loaded inventories only, so it costs no device round trip.
+        """
+        baseline = self.device.package_baseline
+        if baseline is None or baseline[1] is None or self.device.packages is None:
+            return None
+        return baseline[0], diff_inventories(baseline[1], self.device.packages)
+    
+    def bloat_rule_sets(self) -> Tuple[str, ...]:
+        """Curated bloatware rule sets for this device's brand and SoC"""
+        info = self.cached_device_info() or self.get_detailed_device_info()
+        return device_rule_sets({**info.get('basic', {}), **info.get('advanced', {})})
+    
+    @timed_operation()
+    def classify_packages(self, inventory: Optional[PackageInventory] = None) -> Dict[str, BloatRule]:
+        """{package: matching bloatware rule} for every installed package a rule covers
+        
+        The classifier for a set of rules is compiled once per process and
+        remembers every name it has seen, so re-listing is dict lookups.
+        """
+        if inventory is None:
+            inventory = self.get_package_inventory()
+        return classifier_for(self.bloat_rule_sets()).classify_all(inventory.names)
+    
+    def disable_package(self, package_name: str) -> bool:
+        """Disable a package for user 0 (journaled, so it can be rolled back)"""
+        return bool(self.apply_package_actions([('disable', package_name)]).succeeded)
+    
+    @timed_operation()
+    def apply_package_actions(self, actions: Sequence[Tuple[str, str]], journal: bool = True) -> PackageBatch:
+        """Run (action, package) pairs as one script per PACKAGE_BATCH_SIZE packages
+        
+        Each package reports its own status, so one failure does not stop the
+        rest. Successful steps update the package inventory in place and,
+        with journal=True, are journaled for rollback_package_batch along
+        with whether each one changed its package, so that rolling back
+        leaves packages that were already in the target state alone.
+        """
+        validate_actions(actions)
+        adb_config = self.device.adb.config
+        batch = PackageBatch(self.device.serial or '')
+        # State before the batch; an empty inventory (device unreachable) tells nothing
+        inventory = self.get_package_inventory() if journal else None
+        prior = {package: inventory.get(package) for _, package in actions} if inventory else None
+        for start in range(0, len(actions), adb_config.PACKAGE_BATCH_SIZE):
+            chunk = actions[start:start + adb_config.PACKAGE_BATCH_SIZE]
+            sections = batch_sections(chunk)
+            output = self.device.probe(sections, sections,
+                                       timeout=adb_config.PACKAGE_ACTION_TIMEOUT * len(chunk))
+            batch.outcomes += parse_outcomes(chunk, output)
+        
+        if prior is not None:
+            for outcome in batch.outcomes:
+                outcome.changed = action_changes(outcome.action, prior[outcome.package])
+        self.update_inventory(batch.succeeded)
+        store = self.device.adb.device_store() if self.device.serial else None
+        if journal and store is not None and batch.succeeded:
+            batch.id = store.save_batch(batch.serial, batch.started, batch.to_entries())
+        return batch
+    
+    def update_inventory(self, outcomes: Sequence[PackageOutcome]):
+        """Apply successful package actions to the loaded inventory"""
+        inventory = self.device.packages
+        if inventory is None or not outcomes:
+            return
+        if any(outcome.action == 'restore' for outcome in outcomes):
+            # A restored package has no row yet; reload on next use
+            self.device.packages = None
+            return
+        removed = set()
+        for outcome in outcomes:
+            if outcome.action == 'uninstall':
+                removed.add(outcome.package)
+            else:
+                inventory.set_enabled(outcome.package, outcome.action == 'enable')
+        if removed:
+            self.device.packages = inventory.take(i for i, name in enumerate(inventory.names)
+                                                  if name not in removed)
     
+    def last_package_batch(self) -> Optional[PackageBatch]:
+        """Newest journaled batch of this device not rolled back yet"""
+        store = self.device.adb.device_store() if self.device.serial else None
+        saved = store.load_batch(self.device.serial) if store else None
+        if saved is None:
+            return None
+        batch_id, started, entries, rolled_back = saved
+        try:
+            outcomes = [PackageOutcome(**entry) for entry in entries]
+        except TypeError:
+            return None
+        return PackageBatch(self.device.serial, outcomes, started, batch_id, rolled_back)
+    
+    def rollback_package_batch(self, batch: Optional[PackageBatch] = None) -> Optional[PackageBatch]:
+        """Undo a journaled batch (the last one by default) in one pass
+        
+        Returns the batch of undo steps, or None when there is nothing to
+        undo. The journal entry is closed only if every step was undone, so
+        a partial rollback can be retried.
+        """
+        batch = batch or self.last_package_batch()
+        if batch is None or batch.rolled_back:
+            return None
+        undo = self.apply_package_actions(batch.undo_plan(), journal=False)
+        if not undo.failed:
+            batch.rolled_back = True
+            store = self.device.adb.device_store()
+            if store is not None and batch.id is not None:
+                store.mark_rolled_back(batch.id)
+        return undo
+    
+    @timed_operation()
     def get_boot_image(self, backup_path: str) -> bool:
-        """Extract boot image from device"""
+        """Extract boot image from device
+        
+        Only a partition path that is missing moves on to the next one. If
+        the device dropped off (after retries) or the run was cancelled the
+        extraction stops, with the reason in last_error.
+        """
+        self.last_error = None
+        boot_file = os.path.join(backup_path, 'ogboot.img')
         for partition in BOOT_PARTITION_PATHS:
-            cmd = f'su -c "dd if={partition} of=/sdcard/boot_backup.img bs=4096 count=32768"'
-            result = self.adb.run_command(['shell', cmd])
+            # Stream the partition straight into the local file, no /sdcard staging
+            cmd = f'su -c "dd if={partition} bs=4096 count=32768 2>/dev/null"'
+            with open(boot_file, 'wb') as f:
+                result = self.device.exec_out(cmd, sink=f)
             
-            if result.success:
-                # Pull the file
-                pull_result = self.adb.pull_file('/sdcard/boot_backup.img', 
-                                                f'{backup_path}/ogboot.img')
-                
-                # Clean up
-                self.adb.run_command(['shell', 'rm', '/sdcard/boot_backup.img'])
-                
-                return pull_result.success
+            if result.cancelled or result.timed_out or is_device_unavailable(result):
+                self.last_error = result.stderr.strip() or result.state
+                print(f"Error reading {partition}: {self.last_error}")
+                break
+            if result.success and result.size > 0:
+                # exec: has no exit status and su's own errors land on stdout,
+                # so only a boot image header proves the dump worked
+                head = _file_head(boot_file, len(BOOT_IMAGE_MAGIC))
+                if head == BOOT_IMAGE_MAGIC:
+                    return True
+                message = _file_head(boot_file, 200).decode('utf-8', errors='replace').strip()
+                self.last_error = message or "not a boot image"
+                print(f"Error reading {partition}: {self.last_error}")
+                break
         
+        if os.path.exists(boot_file):
+            os.remove(boot_file)
         return False
+    
+    @timed_operation()
+    def take_screenshot(self, output_dir: Optional[str] = None) -> Optional[str]:
+        """Capture the screen as PNG, returning the saved file path"""
+        output_dir = output_dir or os.path.join(config.PATHS['backup_root'], 'screenshots')
+        os.makedirs(output_dir, exist_ok=True)
+        file_path = os.path.join(output_dir, f"screenshot_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
+        
+        with open(file_path, 'wb') as f:
+            result = self.device.exec_out('screencap -p', sink=f)
+        
+        # exec: has no exit status; an error message is not a PNG
+        if result.success and _file_head(file_path, len(PNG_SIGNATURE)) == PNG_SIGNATURE:
+            return file_path
+        os.remove(file_path)
+        return None
+
+def _file_head(path: str, size: int) -> bytes:
+    """First size bytes of a local file"""
+    with open(path, 'rb') as f:
+        return f.read(size)
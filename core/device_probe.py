@@ -0,0 +1,136 @@
+"""
+One-round-trip device probe script and its host-side parsers
+"""
+
+import re
+import secrets
+from typing import Dict, Iterable, Optional, Tuple
+
+from .adb_manager import BOOT_ID_PATH
+
+# Device-side commands of each probe section; stderr is dropped so a
+# missing tool leaves its section empty instead of polluting the output
+PROBE_SECTIONS: Dict[str, str] = {
+    'identity': f"cat {BOOT_ID_PATH} 2>/dev/null || echo; getprop ro.build.fingerprint; getprop sys.boot_completed",
+    'props': "getprop",
+    'df': "df -h /data 2>/dev/null | tail -1",
+    'meminfo': "grep Mem /proc/meminfo 2>/dev/null",
+    'battery': "dumpsys battery 2>/dev/null",
+    'capacity': "cat /sys/class/power_supply/battery/capacity 2>/dev/null",
+    'ip': "ip -o -4 addr show 2>/dev/null || ifconfig 2>/dev/null",
+    'telephony': "getprop gsm.operator.alpha; getprop gsm.sim.state; getprop gsm.network.type",
+}
+
+# Sections behind each volatile part of get_detailed_device_info
+STORAGE_SECTIONS = ('df', 'meminfo')
+BATTERY_SECTIONS = ('battery', 'capacity')
+NETWORK_SECTIONS = ('ip', 'telephony')
+VOLATILE_PROBE_SECTIONS = STORAGE_SECTIONS + BATTERY_SECTIONS + NETWORK_SECTIONS
+
+MARKER_PREFIX = '@@ARS:'
+
+BATTERY_STATUS = {1: "Unknown", 2: "Charging", 3: "Discharging", 4: "Not charging", 5: "Full"}
+
+# `ip -o addr` lines: "30: wlan0    inet 192.168.1.100/24 brd ... scope global wlan0"
+_IP_ADDR_RE = re.compile(r'^\d+:\s+(\S+?)(?:@\S+)?\s+inet\s+([\d.]+)', re.MULTILINE)
+# ifconfig blocks: "wlan0     Link encap:..." followed by "inet addr:192.168.1.100"
+_IFCONFIG_RE = re.compile(r'^(\S+)\s.*?\n\s+inet (?:addr:)?([\d.]+)', re.MULTILINE)
+
+def build_probe_script(sections: Iterable[str], token: str, commands: Optional[Dict[str, str]] = None) -> str:
+    """Shell script printing every section after its own marker line
+    
+    Section names are looked up in commands, PROBE_SECTIONS by default.
+    """
+    commands = PROBE_SECTIONS if commands is None else commands
+    parts = []
+    for name in sections:
+        parts.append(f"echo {MARKER_PREFIX}{token}:{name}")
+        parts.append(commands[name])
+    return '; '.join(parts)
+
+def new_probe_token() -> str:
+    """Random marker token, so section output cannot fake a marker"""
+    return secrets.token_hex(4)
+
+def split_probe_output(output: str, token: str) -> Dict[str, str]:
+    """Cut probe output into {section: text}; sections that never started are absent"""
+    marker = f"{MARKER_PREFIX}{token}:"
+    sections: Dict[str, str] = {}
+    name: Optional[str] = None
+    lines = []
+    for line in output.split('\n'):
+        if line.startswith(marker):
+            if name is not None:
+                sections[name] = '\n'.join(lines)
+            name, lines = line[len(marker):].strip(), []
+        elif name is not None:
+            lines.append(line)
+    if name is not None:
+        sections[name] = '\n'.join(lines)
+    return sections
+
+def parse_identity(text: str) -> Tuple[str, str, bool]:
+    """(boot id, build fingerprint, boot completed) from the identity section"""
+    lines = text.split('\n')
+    boot_id, fingerprint, completed = (line.strip() for line in (lines + ['', '', ''])[:3])
+    return boot_id, fingerprint, completed == '1'
+
+def parse_storage(sections: Dict[str, str]) -> Dict[str, str]:
+    """Internal storage and RAM from the df and meminfo sections"""
+    storage_info = {}
+    
+    parts = sections.get('df', '').strip().split()
+    if len(parts) >= 5:
+        storage_info['internal_total'] = parts[1]
+        storage_info['internal_used'] = parts[2]
+        storage_info['internal_available'] = parts[3]
+        storage_info['internal_use_percent'] = parts[4]
+    
+    meminfo = sections.get('meminfo', '')
+    match = re.search(r'MemTotal:\s+(\d+)\s+kB', meminfo)
+    if match:
+        storage_info['ram_total_mb'] = str(int(match.group(1)) // 1024)
+    match = re.search(r'MemAvailable:\s+(\d+)\s+kB', meminfo)
+    if match:
+        storage_info['ram_available_mb'] = str(int(match.group(1)) // 1024)
+    
+    return storage_info
+
+def parse_battery(sections: Dict[str, str]) -> Dict[str, str]:
+    """Battery level and status from dumpsys, the capacity file winning on level"""
+    battery_info = {}
+    
+    dumpsys = sections.get('battery', '')
+    level_match = re.search(r'level:\s+(\d+)', dumpsys)
+    if level_match:
+        battery_info['level'] = level_match.group(1)
+    status_match = re.search(r'status:\s+(\d+)', dumpsys)
+    if status_match:
+        battery_info['status'] = BATTERY_STATUS.get(int(status_match.group(1)), "Unknown")
+    
+    capacity = sections.get('capacity', '').strip()
+    if capacity.isdigit():
+        battery_info['level'] = capacity
+    
+    return battery_info
+
+def parse_network(sections: Dict[str, str]) -> Dict[str, str]:
+    """IPv4 addresses per interface plus the mobile operator from telephony props"""
+    network_info = {}
+    
+    addresses = sections.get('ip', '')
+    matches = _IP_ADDR_RE.findall(addresses) or _IFCONFIG_RE.findall(addresses)
+    for iface, address in matches:
+        if iface != 'lo' and not address.startswith('127.'):
+            network_info[f"ip_{iface}"] = address
+    
+    lines = sections.get('telephony', '').split('\n')
+    operator, sim_state, network_type = (line.strip() for line in (lines + ['', '', ''])[:3])
+    if operator:
+        network_info['operator'] = operator
+    if sim_state:
+        network_info['sim_state'] = sim_state
+    if network_type:
+        network_info['network_type'] = network_type
+    
+    return network_info
@@ -0,0 +1,192 @@
+"""
+On-disk cache of device info snapshots
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# Sections that change while the device runs and are refreshed on every visit
+VOLATILE_SECTIONS = ('storage', 'battery', 'network')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS device_snapshots (
+    serial TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    boot_id TEXT NOT NULL,
+    build_info TEXT NOT NULL,
+    boot_info TEXT NOT NULL,
+    volatile_info TEXT NOT NULL,
+    updated REAL NOT NULL,
+    volatile_updated REAL NOT NULL,
+    PRIMARY KEY (serial, fingerprint)
+);
+CREATE TABLE IF NOT EXISTS package_snapshots (
+    serial TEXT PRIMARY KEY,
+    taken REAL NOT NULL,
+    inventory TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS package_journal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    serial TEXT NOT NULL,
+    started REAL NOT NULL,
+    entries TEXT NOT NULL,
+    rolled_back INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+@dataclass
+class DeviceSnapshot:
+    """What is known about one device build
+    
+    build holds sections fixed for a build fingerprint (basic/advanced
+    properties), boot holds data valid until the next reboot (root status)
+    and volatile the sections refreshed on every visit.
+    """
+    serial: str
+    fingerprint: str
+    boot_id: str
+    build: Dict[str, Any] = field(default_factory=dict)
+    boot: Dict[str, Any] = field(default_factory=dict)
+    volatile: Dict[str, Any] = field(default_factory=dict)
+    updated: float = 0.0
+    volatile_updated: float = 0.0
+    
+    def sections(self) -> Dict[str, Dict[str, str]]:
+        """The get_detailed_device_info dict this snapshot describes"""
+        info = {'basic': {}, 'advanced': {}}
+        info.update({name: {} for name in VOLATILE_SECTIONS})
+        info.update({name: dict(values) for name, values in self.build.items()})
+        info.update({name: dict(values) for name, values in self.volatile.items()})
+        return info
+    
+    def rebooted(self, boot_id: str):
+        """Drop everything that does not survive a reboot"""
+        self.boot_id = boot_id
+        self.boot = {}
+        self.volatile = {}
+        self.volatile_updated = 0.0
+
+class DeviceInfoStore:
+    """SQLite store of DeviceSnapshots keyed by serial and build fingerprint
+    
+    Safe to share between threads. Only the newest fingerprint of a serial
+    is kept; saving a snapshot for a new build drops the old one. The last
+    package inventory of each serial and a journal of package batches are
+    kept alongside.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+    
+    def load(self, serial: str, fingerprint: Optional[str] = None) -> Optional[DeviceSnapshot]:
+        """Snapshot for a serial and build, or the newest one for the serial"""
+        query = "SELECT * FROM device_snapshots WHERE serial = ?"
+        params = [serial]
+        if fingerprint is not None:
+            query += " AND fingerprint = ?"
+            params.append(fingerprint)
+        query += " ORDER BY updated DESC LIMIT 1"
+        
+        with self._lock:
+            row = self._db.execute(query, params).fetchone()
+        if row is None:
+            return None
+        try:
+            return DeviceSnapshot(
+                serial=row[0],
+                fingerprint=row[1],
+                boot_id=row[2],
+                build=json.loads(row[3]),
+                boot=json.loads(row[4]),
+                volatile=json.loads(row[5]),
+                updated=row[6],
+                volatile_updated=row[7],
+            )
+        except ValueError:
+            # A damaged row is just a cache miss
+            self.forget(serial)
+            return None
+    
+    def save(self, snapshot: DeviceSnapshot):
+        """Store a snapshot, replacing any other build of the same serial"""
+        snapshot.updated = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM device_snapshots WHERE serial = ? AND fingerprint != ?",
+                (snapshot.serial, snapshot.fingerprint)
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO device_snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (snapshot.serial, snapshot.fingerprint, snapshot.boot_id,
+                 json.dumps(snapshot.build), json.dumps(snapshot.boot), json.dumps(snapshot.volatile),
+                 snapshot.updated, snapshot.volatile_updated)
+            )
+    
+    def forget(self, serial: str):
+        """Drop every snapshot of a serial"""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM device_snapshots WHERE serial = ?", (serial,))
+    
+    def load_packages(self, serial: str) -> Optional[Tuple[float, Dict[str, list]]]:
+        """(time taken, PackageInventory.to_dict()) last saved for a serial"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT taken, inventory FROM package_snapshots WHERE serial = ?", (serial,)
+            ).fetchone()
+        if row is None:
+            return None
+        try:
+            return row[0], json.loads(row[1])
+        except ValueError:
+            return None
+    
+    def save_packages(self, serial: str, inventory: Dict[str, list], taken: Optional[float] = None):
+        """Replace the package inventory stored for a serial"""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO package_snapshots VALUES (?, ?, ?)",
+                (serial, time.time() if taken is None else taken, json.dumps(inventory))
+            )
+    
+    def save_batch(self, serial: str, started: float, entries: List[Dict[str, Any]]) -> int:
+        """Journal a package batch; returns its id"""
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT INTO package_journal (serial, started, entries) VALUES (?, ?, ?)",
+                (serial, started, json.dumps(entries))
+            )
+        return cursor.lastrowid
+    
+    def load_batch(self, serial: str, include_rolled_back: bool = False
+                   ) -> Optional[Tuple[int, float, List[Dict[str, Any]], bool]]:
+        """(id, started, entries, rolled back) of the newest journaled batch of a serial"""
+        query = "SELECT id, started, entries, rolled_back FROM package_journal WHERE serial = ?"
+        if not include_rolled_back:
+            query += " AND rolled_back = 0"
+        with self._lock:
+            row = self._db.execute(query + " ORDER BY id DESC LIMIT 1", (serial,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return row[0], row[1], json.loads(row[2]), bool(row[3])
+        except ValueError:
+            return None
+    
+    def mark_rolled_back(self, batch_id: int):
+        with self._lock, self._db:
+            self._db.execute("UPDATE package_journal SET rolled_back = 1 WHERE id = ?", (batch_id,))
+    
+    def close(self):
+        with self._lock:
+            self._db.close()
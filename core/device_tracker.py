@@ -0,0 +1,190 @@
+"""
+Event-driven device tracking
+"""
+
+import socket
+import subprocess
+import threading
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, List, Optional
+
+from .adb_client import ADBProtocolError, parse_devices_l
+
+if TYPE_CHECKING:
+    from .adb_manager import ADBManager
+
+# Event kinds
+CONNECTED = 'connected'
+DISCONNECTED = 'disconnected'
+STATE_CHANGED = 'state'
+
+@dataclass
+class DeviceEvent:
+    """A device appeared, went away or changed state"""
+    kind: str
+    serial: str
+    status: str
+    previous_status: Optional[str] = None
+    devices: List[Dict[str, str]] = field(default_factory=list)
+
+class DeviceTracker:
+    """Follows host:track-devices-l on a background thread
+    
+    Subscribers are called from the tracker thread with a DeviceEvent for
+    every connect, disconnect and state change (device, unauthorized,
+    recovery, sideload, ...). GUI subscribers must hop back onto the Tk
+    thread themselves. When the stream drops, the server is checked and
+    restarted only if it does not answer.
+    """
+    
+    def __init__(self, adb_manager: 'ADBManager', retry_delay: float = 1.0,
+                 max_retry_delay: float = 10.0):
+        self.adb = adb_manager
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.devices: List[Dict[str, str]] = []
+        
+        self._subscribers: List[Callable[[DeviceEvent], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closer: Optional[Callable[[], None]] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def subscribe(self, callback: Callable[[DeviceEvent], None]) -> Callable[[DeviceEvent], None]:
+        """Register a callback for device events"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+    
+    def unsubscribe(self, callback: Callable[[DeviceEvent], None]):
+        """Remove a previously registered callback"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+    
+    def start(self):
+        """Start tracking in the background"""
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='adb-device-tracker', daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        """Stop tracking and close the tracker stream"""
+        with self._lock:
+            self._stop.set()
+            closer = self._closer
+        if closer:
+            closer()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+    
+    # ==================== Worker ====================
+    
+    def _run(self):
+        delay = self.retry_delay
+        while not self._stop.is_set():
+            try:
+                for devices in self._stream():
+                    delay = self.retry_delay
+                    self._publish(devices)
+            except (ADBProtocolError, OSError):
+                pass
+            finally:
+                with self._lock:
+                    self._closer = None
+            
+            if self._stop.is_set():
+                break
+            # The stream only ends when the server went away or was restarted
+            self.adb.start_adb_server()
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+    
+    def _set_closer(self, closer: Callable[[], None]) -> bool:
+        """Register how stop() interrupts the stream; False if stop() already ran"""
+        with self._lock:
+            if self._stop.is_set():
+                return False
+            self._closer = closer
+            return True
+    
+    def _stream(self) -> Iterator[List[Dict[str, str]]]:
+        """Yield device lists from the server socket or `adb track-devices`"""
+        client = self.adb.client
+        if client:
+            try:
+                sock = client.open_device_tracker()
+            except ADBProtocolError:
+                sock = None
+            if sock is not None:
+                def close():
+                    # shutdown() is what wakes a recv() blocked in another thread
+                    try:
+                        sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+                    sock.close()
+                if not self._set_closer(close):
+                    close()
+                    return
+                try:
+                    while True:
+                        yield client.read_device_list(sock)
+                finally:
+                    sock.close()
+                return
+        
+        proc = subprocess.Popen(
+            [self.adb.adb_path, 'track-devices', '-l'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        if not self._set_closer(proc.kill):
+            proc.kill()
+        try:
+            while True:
+                header = proc.stdout.read(4)
+                if len(header) < 4:
+                    return
+                length = int(header, 16)
+                payload = proc.stdout.read(length)
+                if len(payload) < length:
+                    return
+                yield parse_devices_l(payload.decode('utf-8', errors='replace'))
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+            proc.wait()
+    
+    def _publish(self, devices: List[Dict[str, str]]):
+        """Diff against the last list and notify subscribers"""
+        before = {d['serial']: d['status'] for d in self.devices}
+        after = {d['serial']: d['status'] for d in devices}
+        self.devices = devices
+        self.adb.apply_device_list(devices)
+        
+        events = []
+        for serial, status in after.items():
+            if serial not in before:
+                events.append(DeviceEvent(CONNECTED, serial, status, None, devices))
+            elif before[serial] != status:
+                events.append(DeviceEvent(STATE_CHANGED, serial, status, before[serial], devices))
+        for serial, status in before.items():
+            if serial not in after:
+                events.append(DeviceEvent(DISCONNECTED, serial, 'disconnected', status, devices))
+        
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for event in events:
+            for callback in subscribers:
+                try:
+                    callback(event)
+                except Exception as e:
+                    print(f"Error in device event subscriber: {e}")
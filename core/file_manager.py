@@ -4,7 +4,7 @@ File management operations
 
 import os
 import shutil
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
 from utils.file_utils import find_files_by_extension
@@ -0,0 +1,157 @@
+"""
+Fleet-wide device inventory export
+
+Collects the get_detailed_device_info snapshot of every connected device
+on a bounded thread pool and streams one record per device to NDJSON
+and/or CSV as soon as that device finishes. Each device runs under its
+own deadline, so a slow or unauthorized phone costs one error row
+instead of holding up the rest of the rack. Run headless with:
+
+    python -m core.fleet_export --ndjson fleet.ndjson --csv fleet.csv
+"""
+
+import argparse
+import csv
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, TextIO
+
+from .adb_manager import ADBManager
+from .cancellation import CancelToken, Watchdog
+from .device_manager import DeviceManager
+from config.constants import DEVICE_PROPERTIES_ADVANCED, DEVICE_PROPERTIES_BASIC
+from config.settings import config
+
+# Fixed CSV columns: record fields, then the flattened info sections
+RECORD_FIELDS = ['serial', 'status', 'model', 'ok', 'error', 'started', 'elapsed_ms']
+INFO_FIELDS = (
+    [f"basic.{prop}" for prop in DEVICE_PROPERTIES_BASIC]
+    + [f"advanced.{prop}" for prop in DEVICE_PROPERTIES_ADVANCED]
+    + [f"storage.{key}" for key in ('internal_total', 'internal_used', 'internal_available',
+                                     'internal_use_percent', 'ram_total_mb', 'ram_available_mb')]
+    + ['battery.level', 'battery.status']
+    + ['network.ip', 'network.operator', 'network.sim_state', 'network.network_type']
+)
+CSV_FIELDS = RECORD_FIELDS + INFO_FIELDS
+
+def collect_device(adb: ADBManager, device: Dict[str, str], timeout: Optional[float] = None) -> Dict[str, Any]:
+    """One export record for a device listing entry; never raises"""
+    start = time.perf_counter()
+    record: Dict[str, Any] = {
+        'serial': device['serial'],
+        'status': device.get('status', 'unknown'),
+        'model': device.get('model', '').replace('_', ' '),
+        'ok': False,
+        'error': '',
+        'started': datetime.now().isoformat(timespec='seconds'),
+        'elapsed_ms': 0.0,
+        'info': {},
+    }
+    
+    if record['status'] != 'device':
+        # unauthorized / offline / recovery: nothing to ask the device
+        record['error'] = f"Device is {record['status']}"
+    else:
+        token = CancelToken()
+        watchdog = Watchdog(token.cancel, timeout)
+        try:
+            with watchdog, adb.cancellation(token):
+                info = DeviceManager(adb.device(device['serial'])).get_detailed_device_info()
+            record['info'] = info
+            if watchdog.timed_out:
+                record['error'] = f"Timed out after {timeout:g}s"
+            elif not info.get('basic'):
+                record['error'] = "No response from device"
+            else:
+                record['ok'] = True
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+    
+    record['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+def flatten_record(record: Dict[str, Any]) -> Dict[str, str]:
+    """CSV row of a record; interface addresses share one network.ip cell"""
+    row = {name: record.get(name, '') for name in RECORD_FIELDS}
+    for section, values in record.get('info', {}).items():
+        for key, value in values.items():
+            if section == 'network' and key.startswith('ip_'):
+                continue
+            row[f"{section}.{key}"] = value
+    network = record.get('info', {}).get('network', {})
+    row['network.ip'] = ' '.join(f"{key[3:]}={value}" for key, value in sorted(network.items())
+                                 if key.startswith('ip_'))
+    return row
+
+def export_fleet(adb: ADBManager, ndjson: Optional[TextIO] = None, csv_file: Optional[TextIO] = None,
+                 max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 on_record: Optional[Callable[[Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+    """Export every device from get_devices, writing each record as it completes
+    
+    Records come out in completion order; outputs are flushed after every
+    line so a tail -f on them follows the run. Defaults for max_workers and
+    the per-device timeout come from FLEET_MAX_WORKERS / FLEET_DEVICE_TIMEOUT.
+    """
+    max_workers = max_workers or adb.config.FLEET_MAX_WORKERS
+    timeout = adb.config.FLEET_DEVICE_TIMEOUT if timeout is None else timeout
+    writer = None
+    if csv_file is not None:
+        writer = csv.DictWriter(csv_file, CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+    
+    records = []
+    devices = adb.get_devices()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='fleet') as pool:
+        futures = [pool.submit(collect_device, adb, device, timeout) for device in devices]
+        for future in as_completed(futures):
+            record = future.result()
+            records.append(record)
+            if ndjson is not None:
+                ndjson.write(json.dumps(record) + '\n')
+                ndjson.flush()
+            if writer is not None:
+                writer.writerow(flatten_record(record))
+                csv_file.flush()
+            if on_record:
+                on_record(record)
+    return records
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Export the connected fleet; exit status 1 if any device failed"""
+    parser = argparse.ArgumentParser(description="Export device info of every connected device")
+    parser.add_argument('--ndjson', help="NDJSON output file ('-' for stdout)")
+    parser.add_argument('--csv', help="CSV output file ('-' for stdout)")
+    parser.add_argument('--workers', type=int, default=None, help="devices queried at once")
+    parser.add_argument('--timeout', type=float, default=None, help="seconds allowed per device")
+    args = parser.parse_args(argv)
+    if not args.ndjson and not args.csv:
+        args.ndjson = '-'
+    
+    def open_output(path):
+        if not path:
+            return None
+        return sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
+    
+    adb = ADBManager(config)
+    ndjson, csv_file = open_output(args.ndjson), open_output(args.csv)
+    
+    def report(record):
+        state = "ok" if record['ok'] else f"FAILED: {record['error']}"
+        print(f"{record['serial']:<24} {record['elapsed_ms']:>8.0f} ms  {state}", file=sys.stderr)
+    try:
+        records = export_fleet(adb, ndjson, csv_file, args.workers, args.timeout, report)
+    finally:
+        for output in (ndjson, csv_file):
+            if output not in (None, sys.stdout):
+                output.close()
+        adb.shutdown()
+    
+    failed = sum(not record['ok'] for record in records)
+    print(f"{len(records) - failed} of {len(records)} devices exported", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
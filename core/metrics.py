@@ -0,0 +1,400 @@
+"""
+In-process metrics: command latency histograms and counters
+"""
+
+import abc
+import bisect
+import functools
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from .tracing import tracer
+
+# Latency buckets in seconds, from a pooled-shell getprop up to a partition dump
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# "... (12345 bytes in 0.123s)" summary printed by adb pull/push
+TRANSFER_BYTES_RE = re.compile(r'\((\d+) bytes in ')
+
+LabelKey = Tuple[str, ...]
+
+class _Metric(abc.ABC):
+    """Named metric with a fixed set of label names"""
+    
+    kind = ''
+    
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+    
+    def labels_of(self, key: LabelKey) -> Dict[str, str]:
+        return dict(zip(self.label_names, key))
+    
+    @abc.abstractmethod
+    def samples(self) -> List[tuple]:
+        """Recorded values per label set, sorted by labels"""
+    
+    @abc.abstractmethod
+    def reset(self):
+        """Drop every recorded value"""
+
+class Counter(_Metric):
+    """Monotonic per-label-set total"""
+    
+    kind = 'counter'
+    
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self._values: Dict[LabelKey, float] = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+    
+    def samples(self) -> List[Tuple[LabelKey, float]]:
+        with self._lock:
+            return sorted(self._values.items())
+    
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class _Series:
+    """Bucket counts of one histogram label set; the last slot is +Inf"""
+    
+    __slots__ = ('counts', 'total', 'count')
+    
+    def __init__(self, bucket_count: int):
+        self.counts = [0] * (bucket_count + 1)
+        self.total = 0.0
+        self.count = 0
+
+class Histogram(_Metric):
+    """Fixed-bucket distribution, cumulative on export like Prometheus"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, _Series] = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series(len(self.buckets))
+            series.counts[index] += 1
+            series.total += value
+            series.count += 1
+    
+    def samples(self) -> List[Tuple[LabelKey, List[int], float, int]]:
+        """(labels, cumulative bucket counts, sum, count) per label set"""
+        with self._lock:
+            items = [(key, list(s.counts), s.total, s.count) for key, s in self._series.items()]
+        samples = []
+        for key, counts, total, count in sorted(items):
+            running = 0
+            cumulative = []
+            for bucket_count in counts:
+                running += bucket_count
+                cumulative.append(running)
+            samples.append((key, cumulative, total, count))
+        return samples
+    
+    def quantile(self, q: float, cumulative: List[int]) -> float:
+        """Estimate a quantile from cumulative counts (linear within a bucket)"""
+        count = cumulative[-1] if cumulative else 0
+        if not count:
+            return 0.0
+        rank = q * count
+        for index, running in enumerate(cumulative):
+            if running >= rank:
+                if index >= len(self.buckets):
+                    # Past the last bound; the best we can say is "above it"
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                below = cumulative[index - 1] if index else 0
+                in_bucket = running - below
+                fraction = (rank - below) / in_bucket if in_bucket else 1.0
+                return lower + (self.buckets[index] - lower) * fraction
+        return self.buckets[-1]
+    
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+class MetricsRegistry:
+    """Collection of metrics exportable as Prometheus text or JSON"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.kind != metric.kind or existing.label_names != metric.label_names:
+                    raise ValueError(f"metric {metric.name} already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+    
+    def counter(self, name: str, help_text: str, label_names: Sequence[str] = ()) -> Counter:
+        """Get or create a counter"""
+        return self._register(Counter(name, help_text, label_names))
+    
+    def histogram(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        return self._register(Histogram(name, help_text, label_names, buckets))
+    
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+    
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return [self._metrics[name] for name in sorted(self._metrics)]
+    
+    def reset(self):
+        """Zero every metric, keeping the definitions"""
+        for metric in self.metrics():
+            metric.reset()
+    
+    # ==================== Export ====================
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serialisable view of every metric"""
+        metrics = {}
+        for metric in self.metrics():
+            entry = {'type': metric.kind, 'help': metric.help, 'samples': []}
+            if isinstance(metric, Histogram):
+                for key, cumulative, total, count in metric.samples():
+                    entry['samples'].append({
+                        'labels': metric.labels_of(key),
+                        'count': count,
+                        'sum': total,
+                        'buckets': {_format_bound(bound): cumulative[i] for i, bound in enumerate(metric.buckets)},
+                        'p50': metric.quantile(0.5, cumulative),
+                        'p95': metric.quantile(0.95, cumulative),
+                    })
+            else:
+                for key, value in metric.samples():
+                    entry['samples'].append({'labels': metric.labels_of(key), 'value': value})
+            metrics[metric.name] = entry
+        return {'timestamp': time.time(), 'metrics': metrics}
+    
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2, sort_keys=True)
+    
+    def to_prometheus(self) -> str:
+        """Render the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            if isinstance(metric, Histogram):
+                for key, cumulative, total, count in metric.samples():
+                    labels = metric.labels_of(key)
+                    for i, bound in enumerate(metric.buckets):
+                        lines.append(f"{metric.name}_bucket{_format_labels(labels, le=_format_bound(bound))} {cumulative[i]}")
+                    lines.append(f"{metric.name}_bucket{_format_labels(labels, le='+Inf')} {count}")
+                    lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                    lines.append(f"{metric.name}_count{_format_labels(labels)} {count}")
+            else:
+                for key, value in metric.samples():
+                    lines.append(f"{metric.name}{_format_labels(metric.labels_of(key))} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+    
+    def write(self, path: str) -> str:
+        """Write a .json snapshot or a Prometheus text file, atomically"""
+        content = self.to_json() if path.lower().endswith('.json') else self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        # node_exporter's textfile collector must never see a half-written file
+        os.replace(temp_path, path)
+        return path
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str], **extra: str) -> str:
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+# ==================== Application Metrics ====================
+
+# Global registry instance
+registry = MetricsRegistry()
+
+command_duration = registry.histogram(
+    'adb_command_duration_seconds', 'Wall time of adb/fastboot commands', ('command', 'serial'))
+commands_total = registry.counter(
+    'adb_commands_total', 'Commands run, by exit code', ('command', 'serial', 'code'))
+command_bytes = registry.counter(
+    'adb_command_bytes_total', 'Bytes produced or transferred by commands', ('command', 'serial'))
+command_retries = registry.counter(
+    'adb_command_retries_total', 'Retries after transient device errors', ('command', 'serial'))
+operation_duration = registry.histogram(
+    'operation_duration_seconds', 'Wall time of device and backup operations', ('operation', 'serial'))
+operations_total = registry.counter(
+    'operations_total', 'Operations run, by outcome', ('operation', 'serial', 'outcome'))
+operation_bytes = registry.counter(
+    'operation_bytes_total', 'Bytes moved by the commands of an operation', ('operation', 'serial'))
+
+# Byte tallies of the operations open on each thread, innermost last
+_open_operations = threading.local()
+# Worker threads may credit the same tally at once
+_tally_lock = threading.Lock()
+
+def result_bytes(command: str, result: Any) -> int:
+    """Bytes a command moved: the file transfer for pull/push, else its output"""
+    size = getattr(result, 'size', None)
+    if size is not None:
+        # BinaryResult: counted without decoding the payload
+        return size + len(result.stderr or '')
+    stdout = result.stdout or ''
+    if command in ('pull', 'push'):
+        match = TRANSFER_BYTES_RE.search(stdout)
+        if match:
+            return int(match.group(1))
+    return len(stdout) + len(result.stderr or '')
+
+def record_command(command: str, serial: Optional[str], start: float, result: Any):
+    """Record a command that began at perf_counter() start and just finished
+    
+    result is any CommandResult. The command also becomes an 'adb' span
+    when tracing is on.
+    """
+    end = time.perf_counter()
+    serial = serial or ''
+    size = result_bytes(command, result)
+    if tracer.enabled:
+        tracer.complete(command, 'adb', start, end, {
+            'serial': serial, 'returncode': result.returncode, 'bytes': size})
+    command_duration.observe(end - start, command=command, serial=serial)
+    commands_total.inc(command=command, serial=serial, code=result.returncode)
+    command_bytes.inc(size, command=command, serial=serial)
+    with _tally_lock:
+        for tally in getattr(_open_operations, 'stack', ()):
+            tally[0] += size
+
+def open_operations() -> List[List[int]]:
+    """Byte tallies of the operations open on this thread, for crediting()"""
+    return list(getattr(_open_operations, 'stack', ()))
+
+@contextmanager
+def crediting(tallies: List[List[int]]):
+    """Count commands this thread records towards another thread's operations
+    
+    For worker threads running part of an operation: pass them
+    open_operations() from the thread that started it.
+    """
+    previous = getattr(_open_operations, 'stack', None)
+    _open_operations.stack = list(tallies) + list(previous or ())
+    try:
+        yield
+    finally:
+        _open_operations.stack = previous if previous is not None else []
+
+def operation_outcome(result: Any) -> str:
+    """'failed' for False/None results, else 'ok'"""
+    return 'failed' if result is None or result is False else 'ok'
+
+def timed_operation(name: Optional[str] = None) -> Callable:
+    """Decorate a DeviceManager/BackupManager method to record it as an operation
+    
+    The serial comes from self.device; bytes are those of the commands the
+    operation ran on the calling thread. Calls are also traced as 'step'
+    spans.
+    """
+    def decorate(func: Callable) -> Callable:
+        operation = name or func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            serial = getattr(getattr(self, 'device', None), 'serial', None) or ''
+            stack = getattr(_open_operations, 'stack', None)
+            if stack is None:
+                stack = _open_operations.stack = []
+            tally = [0]
+            stack.append(tally)
+            outcome = 'error'
+            start = time.perf_counter()
+            try:
+                result = func(self, *args, **kwargs)
+                outcome = operation_outcome(result)
+                return result
+            finally:
+                end = time.perf_counter()
+                duration = end - start
+                stack.pop()
+                if tracer.enabled:
+                    tracer.complete(operation, 'step', start, end, {
+                        'serial': serial, 'outcome': outcome, 'bytes': tally[0]})
+                operation_duration.observe(duration, operation=operation, serial=serial)
+                operations_total.inc(operation=operation, serial=serial, outcome=outcome)
+                operation_bytes.inc(tally[0], operation=operation, serial=serial)
+        return wrapper
+    return decorate
+
+def summary_rows() -> List[Dict[str, Any]]:
+    """One row per command/operation and serial for the stats window"""
+    rows = []
+    sources = (
+        ('command', command_duration, commands_total, command_bytes,
+         lambda labels: labels.get('code') != '0'),
+        ('operation', operation_duration, operations_total, operation_bytes,
+         lambda labels: labels.get('outcome') != 'ok'),
+    )
+    for kind, histogram, totals, byte_counter, is_failure in sources:
+        failures: Dict[LabelKey, float] = {}
+        for key, value in totals.samples():
+            labels = totals.labels_of(key)
+            if is_failure(labels):
+                target = key[:2]
+                failures[target] = failures.get(target, 0) + value
+        bytes_moved = dict(byte_counter.samples())
+        for key, cumulative, total, count in histogram.samples():
+            rows.append({
+                'kind': kind,
+                'name': key[0],
+                'serial': key[1],
+                'count': count,
+                'failures': int(failures.get(key, 0)),
+                'mean': total / count if count else 0.0,
+                'p50': histogram.quantile(0.5, cumulative),
+                'p95': histogram.quantile(0.95, cumulative),
+                'total': total,
+                'bytes': int(bytes_moved.get(key, 0)),
+            })
+    return rows
@@ -0,0 +1,113 @@
+"""
+Batched package state changes with an undo journal
+"""
+
+import re
+import shlex
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .package_inventory import PackageInfo
+
+# Device-side command of each action, for user 0
+PACKAGE_ACTIONS: Dict[str, str] = {
+    'disable': "pm disable-user --user 0 {package}",
+    'enable': "pm enable --user 0 {package}",
+    'uninstall': "pm uninstall -k --user 0 {package}",
+    'restore': "pm install-existing --user 0 {package}",
+}
+
+# Action that reverses each action
+UNDO_ACTIONS = {'disable': 'enable', 'enable': 'disable', 'uninstall': 'restore', 'restore': 'uninstall'}
+
+# Trailer appended to each section so its exit status survives the script
+_EXIT_RE = re.compile(r'^exit:(\d+)\s*$', re.MULTILINE)
+
+@dataclass
+class PackageOutcome:
+    """Result of one action on one package"""
+    action: str
+    package: str
+    success: bool
+    message: str = ''
+    # False when the package was already in the target state; not undone
+    changed: bool = True
+
+@dataclass
+class PackageBatch:
+    """One run of package actions on a device, as kept in the journal"""
+    serial: str
+    outcomes: List[PackageOutcome] = field(default_factory=list)
+    started: float = field(default_factory=time.time)
+    id: Optional[int] = None
+    rolled_back: bool = False
+    
+    @property
+    def succeeded(self) -> List[PackageOutcome]:
+        return [outcome for outcome in self.outcomes if outcome.success]
+    
+    @property
+    def failed(self) -> List[PackageOutcome]:
+        return [outcome for outcome in self.outcomes if not outcome.success]
+    
+    def undo_plan(self) -> List[Tuple[str, str]]:
+        """(action, package) pairs reversing every successful step that changed a package, last first"""
+        return [(UNDO_ACTIONS[outcome.action], outcome.package)
+                for outcome in reversed(self.succeeded) if outcome.changed]
+    
+    def summary(self) -> str:
+        text = f"{len(self.succeeded)} of {len(self.outcomes)} succeeded"
+        if self.failed:
+            text += "\n\nFailed:\n" + "\n".join(
+                f"{outcome.package}: {outcome.message or 'no response'}" for outcome in self.failed
+            )
+        return text
+    
+    def to_entries(self) -> List[Dict[str, Any]]:
+        """Outcomes as plain dicts for JSON storage"""
+        return [asdict(outcome) for outcome in self.outcomes]
+
+def validate_actions(actions: Sequence[Tuple[str, str]]):
+    """Reject unknown actions before anything reaches the device"""
+    for action, package in actions:
+        if action not in PACKAGE_ACTIONS:
+            raise ValueError(f"Unknown package action {action!r} for {package}")
+
+def action_changes(action: str, prior: Optional[PackageInfo]) -> bool:
+    """Whether action alters a package whose state before it was prior
+    
+    prior is None for a package not installed for the user.
+    """
+    if action == 'disable':
+        return prior is not None and prior.enabled
+    if action == 'enable':
+        return prior is not None and not prior.enabled
+    if action == 'uninstall':
+        return prior is not None
+    return prior is None
+
+def batch_sections(actions: Sequence[Tuple[str, str]]) -> Dict[str, str]:
+    """Probe sections running each (action, package) and reporting its exit status"""
+    return {
+        f"pkg{i}": f"{PACKAGE_ACTIONS[action].format(package=shlex.quote(package))} 2>&1; echo exit:$?"
+        for i, (action, package) in enumerate(actions)
+    }
+
+def parse_outcomes(actions: Sequence[Tuple[str, str]], sections: Dict[str, str]) -> List[PackageOutcome]:
+    """Outcome of each action from the output of its batch_sections section
+    
+    Old pm builds print Failure with exit status 0, so both are checked. A
+    section that never started (the script was cut off) is a failure.
+    """
+    outcomes = []
+    for i, (action, package) in enumerate(actions):
+        text = sections.get(f"pkg{i}")
+        if text is None:
+            outcomes.append(PackageOutcome(action, package, False, "Not run"))
+            continue
+        codes = _EXIT_RE.findall(text)
+        message = _EXIT_RE.sub('', text).strip()
+        success = bool(codes) and codes[-1] == '0' and not message.startswith(('Failure', 'Error'))
+        outcomes.append(PackageOutcome(action, package, success, message))
+    return outcomes
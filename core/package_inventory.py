@@ -0,0 +1,273 @@
+"""
+Compact columnar package inventory built from one pm round trip
+"""
+
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Probe sections that make up an inventory: the full listing, then the
+# names of system and of disabled packages, all in one shell round trip
+INVENTORY_SECTIONS: Dict[str, str] = {
+    'packages': "pm list packages -f -U -i --show-versioncode 2>/dev/null",
+    'system': "pm list packages -s 2>/dev/null",
+    'disabled': "pm list packages -d 2>/dev/null",
+}
+
+# package:<apk path>=<name> versionCode:<n>  installer=<pkg> uid:<n>[,<n>...]
+# The path may itself hold '=' (/data/app/~~abc==/...), the name never does
+_PACKAGE_LINE_RE = re.compile(
+    r'^package:(?:(?P<path>\S*)=)?(?P<name>[\w.]+)'
+    r'(?:\s+versionCode:(?P<version>\d+))?'
+    r'(?:\s+installer=(?P<installer>\S+))?'
+    r'(?:\s+uid:(?P<uid>\d+))?',
+    re.MULTILINE
+)
+
+# Named PackageInventory.filter criteria offered by app lists
+INVENTORY_SCOPES: Dict[str, Dict[str, bool]] = {
+    'All': {},
+    'User': {'system': False},
+    'System': {'system': True},
+    'Disabled': {'enabled': False},
+}
+# App list view of the PackageDiff since the last visit
+CHANGES_SCOPE = 'Changes'
+
+FLAG_SYSTEM = 1
+FLAG_DISABLED = 2
+
+class PackageInfo:
+    """One row of a PackageInventory"""
+    __slots__ = ('name', 'path', 'uid', 'installer', 'version_code', 'system', 'enabled')
+    
+    def __init__(self, name: str, path: str, uid: int, installer: str, version_code: int,
+                 system: bool, enabled: bool):
+        self.name = name
+        self.path = path
+        self.uid = uid
+        self.installer = installer
+        self.version_code = version_code
+        self.system = system
+        self.enabled = enabled
+    
+    def __repr__(self) -> str:
+        return f"PackageInfo({self.name!r}, version_code={self.version_code}, system={self.system})"
+
+class PackageInventory:
+    """Installed packages held column by column
+    
+    Numbers live in typed arrays, installers are interned into a small
+    table and the system/disabled bits share one bytearray, so a 500+
+    package ROM costs a few strings per package instead of a dict each.
+    Filtering and sorting work on row numbers and return new inventories.
+    """
+    
+    SORT_KEYS = ('name', 'path', 'uid', 'installer', 'version_code')
+    
+    def __init__(self):
+        self.names: List[str] = []
+        self.paths: List[str] = []
+        self.uids = array('l')
+        self.version_codes = array('q')
+        self.installer_ids = array('H')
+        self.installers: List[str] = []
+        self.flags = bytearray()
+        self.index: Dict[str, int] = {}
+        self._installer_index: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+    
+    def __iter__(self) -> Iterator[PackageInfo]:
+        return (self.row(i) for i in range(len(self.names)))
+    
+    def add(self, name: str, path: str = '', uid: int = -1, installer: str = '',
+            version_code: int = 0, system: bool = False, enabled: bool = True):
+        """Append a package; a name already present is overwritten in place"""
+        installer_id = self._installer_index.get(installer)
+        if installer_id is None:
+            installer_id = self._installer_index[installer] = len(self.installers)
+            self.installers.append(installer)
+        flags = (FLAG_SYSTEM if system else 0) | (0 if enabled else FLAG_DISABLED)
+        
+        i = self.index.get(name)
+        if i is not None:
+            self.paths[i] = path
+            self.uids[i] = uid
+            self.version_codes[i] = version_code
+            self.installer_ids[i] = installer_id
+            self.flags[i] = flags
+            return
+        self.index[name] = len(self.names)
+        self.names.append(name)
+        self.paths.append(path)
+        self.uids.append(uid)
+        self.version_codes.append(version_code)
+        self.installer_ids.append(installer_id)
+        self.flags.append(flags)
+    
+    def row(self, i: int) -> PackageInfo:
+        flags = self.flags[i]
+        return PackageInfo(self.names[i], self.paths[i], self.uids[i],
+                           self.installers[self.installer_ids[i]], self.version_codes[i],
+                           bool(flags & FLAG_SYSTEM), not flags & FLAG_DISABLED)
+    
+    def get(self, name: str) -> Optional[PackageInfo]:
+        i = self.index.get(name)
+        return None if i is None else self.row(i)
+    
+    def set_enabled(self, name: str, enabled: bool):
+        """Record a pm enable/disable without reloading"""
+        i = self.index.get(name)
+        if i is not None:
+            self.flags[i] = self.flags[i] & ~FLAG_DISABLED | (0 if enabled else FLAG_DISABLED)
+    
+    def discard(self, name: str) -> 'PackageInventory':
+        """Inventory without one package, e.g. after an uninstall"""
+        return self.take(i for i in range(len(self.names)) if self.names[i] != name)
+    
+    def rows(self, system: Optional[bool] = None, enabled: Optional[bool] = None,
+             installer: Optional[str] = None, contains: str = '') -> List[int]:
+        """Row numbers matching every given criterion"""
+        contains = contains.lower()
+        installer_id = None if installer is None else self._installer_index.get(installer, -1)
+        rows = []
+        for i, flags in enumerate(self.flags):
+            if system is not None and bool(flags & FLAG_SYSTEM) != system:
+                continue
+            if enabled is not None and (not flags & FLAG_DISABLED) != enabled:
+                continue
+            if installer_id is not None and self.installer_ids[i] != installer_id:
+                continue
+            if contains and contains not in self.names[i].lower():
+                continue
+            rows.append(i)
+        return rows
+    
+    def filter(self, system: Optional[bool] = None, enabled: Optional[bool] = None,
+               installer: Optional[str] = None, contains: str = '') -> 'PackageInventory':
+        """Packages matching every given criterion"""
+        return self.take(self.rows(system, enabled, installer, contains))
+    
+    def sort(self, key: str = 'name', reverse: bool = False) -> 'PackageInventory':
+        """Packages ordered by one of SORT_KEYS"""
+        if key not in self.SORT_KEYS:
+            raise ValueError(f"Cannot sort packages by {key!r}")
+        if key == 'installer':
+            column = [self.installers[i] for i in self.installer_ids]
+        else:
+            column = getattr(self, key + 's')
+        order = sorted(range(len(self.names)), key=lambda i: (column[i], self.names[i]), reverse=reverse)
+        return self.take(order)
+    
+    def enabled_names(self) -> Set[str]:
+        return {name for name, flags in zip(self.names, self.flags) if not flags & FLAG_DISABLED}
+    
+    def to_dict(self) -> Dict[str, list]:
+        """Plain columns for JSON storage"""
+        return {
+            'names': self.names,
+            'paths': self.paths,
+            'uids': self.uids.tolist(),
+            'version_codes': self.version_codes.tolist(),
+            'installers': self.installers,
+            'installer_ids': self.installer_ids.tolist(),
+            'flags': list(self.flags),
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, list]) -> 'PackageInventory':
+        """Inverse of to_dict"""
+        inventory = cls()
+        inventory.names = list(data['names'])
+        inventory.paths = list(data['paths'])
+        inventory.uids = array('l', data['uids'])
+        inventory.version_codes = array('q', data['version_codes'])
+        inventory.installers = list(data['installers'])
+        inventory.installer_ids = array('H', data['installer_ids'])
+        inventory.flags = bytearray(data['flags'])
+        inventory.index = {name: i for i, name in enumerate(inventory.names)}
+        inventory._installer_index = {name: i for i, name in enumerate(inventory.installers)}
+        return inventory
+    
+    def take(self, rows) -> 'PackageInventory':
+        """New inventory holding the given rows in the given order"""
+        inventory = PackageInventory()
+        inventory.installers = list(self.installers)
+        inventory._installer_index = dict(self._installer_index)
+        for i in rows:
+            inventory.index[self.names[i]] = len(inventory.names)
+            inventory.names.append(self.names[i])
+            inventory.paths.append(self.paths[i])
+            inventory.uids.append(self.uids[i])
+            inventory.version_codes.append(self.version_codes[i])
+            inventory.installer_ids.append(self.installer_ids[i])
+            inventory.flags.append(self.flags[i])
+        return inventory
+
+@dataclass
+class PackageDiff:
+    """What changed between two inventories of the same device"""
+    installed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    # (name, old version code, new version code)
+    updated: List[Tuple[str, int, int]] = field(default_factory=list)
+    disabled: List[str] = field(default_factory=list)
+    enabled: List[str] = field(default_factory=list)
+    
+    def __bool__(self) -> bool:
+        return bool(self.installed or self.removed or self.updated or self.disabled or self.enabled)
+    
+    def summary(self) -> str:
+        counts = [(len(self.installed), "installed"), (len(self.removed), "removed"),
+                  (len(self.updated), "updated"), (len(self.disabled), "disabled"),
+                  (len(self.enabled), "enabled")]
+        return ", ".join(f"{count} {label}" for count, label in counts if count) or "no changes"
+
+def diff_inventories(old: PackageInventory, new: PackageInventory) -> PackageDiff:
+    """Compare two inventories column-wise, without touching package text"""
+    old_names = old.index.keys()
+    new_names = new.index.keys()
+    common = old_names & new_names
+    
+    old_codes = dict(zip(old.names, old.version_codes))
+    new_codes = dict(zip(new.names, new.version_codes))
+    old_enabled = old.enabled_names()
+    new_enabled = new.enabled_names()
+    
+    return PackageDiff(
+        installed=sorted(new_names - old_names),
+        removed=sorted(old_names - new_names),
+        updated=sorted((name, old_codes[name], new_codes[name])
+                       for name in common if old_codes[name] != new_codes[name]),
+        disabled=sorted((old_enabled - new_enabled) & common),
+        enabled=sorted((new_enabled - old_enabled) & common),
+    )
+
+def _package_names(output: str) -> set:
+    return {match.group('name') for match in _PACKAGE_LINE_RE.finditer(output)}
+
+def parse_inventory(sections: Dict[str, str]) -> PackageInventory:
+    """Build an inventory from the output of the INVENTORY_SECTIONS probe"""
+    system = _package_names(sections.get('system', ''))
+    disabled = _package_names(sections.get('disabled', ''))
+    
+    inventory = PackageInventory()
+    for match in _PACKAGE_LINE_RE.finditer(sections.get('packages', '')):
+        name = match.group('name')
+        installer = match.group('installer') or ''
+        inventory.add(
+            name,
+            path=match.group('path') or '',
+            uid=int(match.group('uid') or -1),
+            installer='' if installer == 'null' else installer,
+            version_code=int(match.group('version') or 0),
+            system=name in system,
+            enabled=name not in disabled,
+        )
+    return inventory
@@ -0,0 +1,532 @@
+"""
+Parallel pull of large remote directory trees
+
+The tree is listed with one shell call, split into work units of about
+the same byte count and pulled by several workers at once, each over its
+own sync connection. Directory layout and mtimes are kept, a failed file
+is retried on its own and progress is aggregated across the workers.
+
+Folders of many small files (thumbnails, chat media) are instead streamed
+as `tar -c` over exec-out and unpacked on the fly, paying one round trip
+per batch rather than per file; the transport is chosen from the
+listing's average file size.
+"""
+
+import contextlib
+import heapq
+import os
+import posixpath
+import re
+import shlex
+import shutil
+import stat
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Callable, List, NamedTuple, Optional, Tuple
+
+from .adb_client import ADBConnectionError, ADBProtocolError
+from .adb_manager import BinaryResult
+from .cancellation import CancelToken, Watchdog
+from .metrics import crediting, open_operations, record_command
+from .tracing import tracer
+
+if TYPE_CHECKING:
+    from .device_handle import DeviceHandle
+
+# Every entry below the given paths with its mode, size and mtime. -H
+# follows a symlinked starting point (/sdcard is one on real devices);
+# links further down are reported, not followed
+LIST_COMMAND = "find -H {path} -exec stat -c '%f %s %Y %n' {{}} + 2>/dev/null"
+
+# Appended per path so a missing one is told apart from an unreadable one
+EXISTS_COMMAND = "[ -e {path} ] || echo missing:{path}"
+
+# "<hex mode> <size> <mtime> <path>"; anything else (shell noise) is skipped
+_LISTING_RE = re.compile(r'^([0-9a-f]+) (\d+) (\d+) (/.*)$', re.MULTILINE)
+_MISSING_RE = re.compile(r'^missing:(/.*)$', re.MULTILINE)
+
+# Selected files of the tree below {parent} as one tar stream on stdout;
+# errors stay off stdout so they cannot corrupt the stream
+TAR_COMMAND = "tar -cf - -C {parent} {names} 2>/dev/null"
+
+# Longest tar command line (in bytes) sent at once; bigger selections are
+# split. Well below the adb service request limit (MAX_SERVICE_LENGTH) and
+# the device shell's own argument limits
+TAR_COMMAND_LIMIT = 32 * 1024
+
+# Seconds between progress callbacks; the last file always reports
+PROGRESS_INTERVAL = 0.1
+
+class RemoteFile(NamedTuple):
+    path: str
+    size: int
+    mtime: int
+
+@dataclass
+class PullResult:
+    """Outcome of pulling one tree"""
+    files: int = 0
+    bytes: int = 0
+    # (remote path, last error) of files that failed every attempt
+    failed: List[Tuple[str, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+    cancelled: bool = False
+    error: str = ''
+    
+    @property
+    def success(self) -> bool:
+        return not (self.failed or self.cancelled or self.error)
+    
+    def summary(self) -> str:
+        if self.error:
+            return self.error
+        rate = self.bytes / self.elapsed / (1024 * 1024) if self.elapsed > 0 else 0.0
+        text = f"{self.files} files pulled, {len(self.failed)} failed. {rate:.1f} MB/s"
+        if self.cancelled:
+            text += " (cancelled)"
+        return text
+
+class PullProgress:
+    """Files and bytes done so far, shared by every worker of a pull"""
+    
+    def __init__(self, files: List[RemoteFile], callback: Optional[Callable[['PullProgress'], None]] = None):
+        self.total_files = len(files)
+        self.total_bytes = sum(f.size for f in files)
+        self.files_done = 0
+        self.bytes_done = 0
+        self.failed: List[Tuple[str, str]] = []
+        self._callback = callback
+        self._lock = threading.Lock()
+        self._reported = 0.0
+    
+    @property
+    def fraction(self) -> float:
+        if self.total_bytes:
+            return self.bytes_done / self.total_bytes
+        return self.files_done / self.total_files if self.total_files else 1.0
+    
+    def file_done(self, size: int):
+        with self._lock:
+            self.files_done += 1
+            self.bytes_done += size
+        self._report()
+    
+    def file_failed(self, remote_path: str, error: str):
+        with self._lock:
+            self.failed.append((remote_path, error))
+        self._report()
+    
+    def _report(self):
+        if self._callback is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            last = self.files_done + len(self.failed) == self.total_files
+            if not last and now - self._reported < PROGRESS_INTERVAL:
+                return
+            self._reported = now
+        self._callback(self)
+
+class RemoteListing(NamedTuple):
+    """Result of listing one or more remote paths"""
+    files: List[RemoteFile]
+    # Requested paths that do not exist on the device
+    missing: List[str]
+    # Requested paths that exist but could not be listed (unreadable, or
+    # a symlink that was not followed): an error, not an empty folder
+    unlisted: List[str]
+    
+    def under(self, remote_path: str) -> List[RemoteFile]:
+        """Files of one of the listed paths"""
+        root = remote_path.rstrip('/') or '/'
+        return [f for f in self.files if f.path == root or f.path.startswith(root.rstrip('/') + '/')]
+
+def parse_listing(output: str) -> Tuple[List[RemoteFile], List[str]]:
+    """(regular files, directories) from LIST_COMMAND output"""
+    files, dirs = [], []
+    for mode, size, mtime, path in _LISTING_RE.findall(output):
+        mode = int(mode, 16)
+        if stat.S_ISREG(mode):
+            files.append(RemoteFile(path, int(size), int(mtime)))
+        elif stat.S_ISDIR(mode):
+            dirs.append(path)
+    return files, dirs
+
+def list_remote_files(device: 'DeviceHandle', *remote_paths: str) -> RemoteListing:
+    """Every file below the given paths (or the paths themselves) in one round trip"""
+    script = '; '.join([LIST_COMMAND.format(path=' '.join(shlex.quote(path) for path in remote_paths))]
+                       + [EXISTS_COMMAND.format(path=shlex.quote(path)) for path in remote_paths])
+    result = device.run_shell(script)
+    files, dirs = parse_listing(result.stdout)
+    missing = set(_MISSING_RE.findall(result.stdout))
+    
+    listing = RemoteListing(files, [], [])
+    reached = set(dirs) | {f.path for f in files}
+    for path in remote_paths:
+        if path in missing:
+            listing.missing.append(path)
+        elif (path.rstrip('/') or '/') not in reached and not listing.under(path):
+            listing.unlisted.append(path)
+    return listing
+
+def partition_files(files: List[RemoteFile], units: int) -> List[List[RemoteFile]]:
+    """Split files into at most `units` groups of about the same byte count
+    
+    Largest file first into the lightest group, so one huge video does not
+    end up queued behind a worker's share of thumbnails.
+    """
+    heap = [(0, i, []) for i in range(max(1, units))]
+    for f in sorted(files, key=lambda f: f.size, reverse=True):
+        total, i, unit = heapq.heappop(heap)
+        unit.append(f)
+        heapq.heappush(heap, (total + f.size, i, unit))
+    return [unit for _, _, unit in sorted(heap, key=lambda entry: entry[1]) if unit]
+
+def choose_transport(files: List[RemoteFile], adb_config) -> str:
+    """'tar' for many files that are small on average, else 'sync'
+    
+    Sync pays a round trip per file, which dominates below a few hundred
+    KB; tar pays one per stream but moves every byte through the shell.
+    """
+    if len(files) < adb_config.PULL_TAR_MIN_FILES:
+        return 'sync'
+    average = sum(f.size for f in files) / len(files)
+    return 'tar' if average <= adb_config.PULL_TAR_MAX_AVERAGE_SIZE else 'sync'
+
+def local_path_for(remote_root: str, remote_path: str, local_dir: str) -> str:
+    """Where a remote file lands: local_dir/<basename of root>/<relative path>"""
+    parent = posixpath.dirname(remote_root.rstrip('/'))
+    relative = posixpath.relpath(remote_path, parent or '/')
+    return os.path.join(local_dir, *relative.split('/'))
+
+def pull_tree(device: 'DeviceHandle', remote_path: str, local_dir: str, workers: Optional[int] = None,
+              retries: Optional[int] = None, progress: Optional[Callable[[PullProgress], None]] = None,
+              cancel: Optional[CancelToken] = None, transport: Optional[str] = None) -> PullResult:
+    """Pull a remote file or directory into local_dir like `adb pull`, in parallel
+    
+    Files land under local_dir/<basename of remote_path>. workers and
+    retries default to PULL_WORKERS / PULL_RETRIES; progress is called
+    from worker threads. transport is 'sync', 'tar' or None to choose
+    from the listing (see choose_transport).
+    """
+    start = time.monotonic()
+    listing = list_remote_files(device, remote_path)
+    if listing.missing:
+        return PullResult(error=f"remote object '{remote_path}' does not exist")
+    if listing.unlisted:
+        return PullResult(error=f"remote object '{remote_path}' could not be listed")
+    files = listing.files
+    # An empty directory is still created, like adb pull does
+    os.makedirs(local_dir if files else local_path_for(remote_path, remote_path, local_dir), exist_ok=True)
+    
+    result = pull_files(device, files, remote_path, local_dir, workers, retries, progress, cancel,
+                        transport=transport)
+    result.elapsed = time.monotonic() - start
+    return result
+
+def pull_files(device: 'DeviceHandle', files: List[RemoteFile], remote_root: str, local_dir: str,
+               workers: Optional[int] = None, retries: Optional[int] = None,
+               progress: Optional[Callable[[PullProgress], None]] = None,
+               cancel: Optional[CancelToken] = None,
+               on_file: Optional[Callable[[RemoteFile, str], None]] = None,
+               transport: Optional[str] = None) -> PullResult:
+    """Pull already listed files of the tree at remote_root (see pull_tree)
+    
+    on_file(remote file, local path) is called from the worker thread as
+    soon as each file is complete on disk. With the tar transport, files
+    missing from the streams are pulled over sync afterwards.
+    """
+    adb_config = device.adb.config
+    workers = workers or adb_config.PULL_WORKERS
+    retries = adb_config.PULL_RETRIES if retries is None else retries
+    cancel = cancel or device.adb.current_token()
+    transport = transport or choose_transport(files, adb_config)
+    start = time.monotonic()
+    
+    tracker = PullProgress(files, progress)
+    # Workers record their transfers against the caller's operations
+    tallies = open_operations()
+    if transport == 'tar' and files:
+        files = _pull_tar(device, files, remote_root, local_dir, workers, tracker, cancel, on_file, tallies)
+        if cancel and cancel.cancelled:
+            files = []
+    units = partition_files(files, workers)
+    with ThreadPoolExecutor(max_workers=max(1, len(units)), thread_name_prefix='pull') as pool:
+        futures = [pool.submit(_pull_unit, device, i, unit, remote_root, local_dir, retries, tracker,
+                               cancel, on_file, tallies)
+                   for i, unit in enumerate(units)]
+        for future in futures:
+            future.result()
+    
+    return PullResult(
+        files=tracker.files_done,
+        bytes=tracker.bytes_done,
+        failed=tracker.failed,
+        elapsed=time.monotonic() - start,
+        cancelled=bool(cancel and cancel.cancelled),
+    )
+
+def _pull_unit(device: 'DeviceHandle', index: int, unit: List[RemoteFile], remote_root: str,
+               local_dir: str, retries: int, progress: PullProgress, cancel: Optional[CancelToken],
+               on_file: Optional[Callable[[RemoteFile, str], None]] = None,
+               tallies: Optional[List[List[int]]] = None):
+    """Pull one work unit over a single sync connection, retrying file by file
+    
+    tallies are the caller's open operations (see metrics.crediting), so
+    the bytes pulled here count towards them.
+    """
+    client = device.adb.client
+    delay = device.adb.config.RETRY_BASE_DELAY
+    sync = None
+    
+    def pull_one(f: RemoteFile, local_path: str) -> int:
+        nonlocal client, sync
+        if client is None:
+            return _pull_with_process(device, f, local_path, cancel)
+        start = time.perf_counter()
+        try:
+            if sync is None:
+                sync = client.open_sync(device.serial)
+            size = sync.pull_file(f.path, local_path, f.mtime)
+        except ADBConnectionError:
+            # No server socket: adb pull for the rest of the unit
+            client = None
+            raise
+        except (ADBProtocolError, OSError) as e:
+            record_command('sync-pull', device.serial, start, BinaryResult(1, None, str(e), 0))
+            # The session may be left mid-transfer; start a fresh one
+            if sync is not None:
+                sync.sock.close()
+                sync = None
+            raise
+        record_command('sync-pull', device.serial, start, BinaryResult(0, None, '', size))
+        return size
+    
+    with crediting(tallies or []), \
+            tracer.span(f"pull unit {index}", 'pull', device.serial,
+                        files=len(unit), bytes=sum(f.size for f in unit)), \
+            (client.abortable() if client else contextlib.nullcontext()) as scope, \
+            Watchdog(scope.abort if scope else lambda: None, None, cancel):
+        for f in unit:
+            if cancel and cancel.cancelled:
+                break
+            local_path = local_path_for(remote_root, f.path, local_dir)
+            error = ''
+            for attempt in range(retries + 1):
+                if attempt and _backoff(delay * 2 ** (attempt - 1), cancel):
+                    break
+                try:
+                    size = pull_one(f, local_path)
+                    if on_file:
+                        on_file(f, local_path)
+                    progress.file_done(size)
+                    error = ''
+                    break
+                except (ADBProtocolError, OSError) as e:
+                    error = str(e) or type(e).__name__
+            if error and not (cancel and cancel.cancelled):
+                if os.path.exists(local_path):
+                    os.remove(local_path)
+                progress.file_failed(f.path, error)
+        if sync is not None:
+            sync.close()
+
+def _backoff(seconds: float, cancel: Optional[CancelToken]) -> bool:
+    """Wait before a retry; True if cancelled meanwhile"""
+    if cancel is not None:
+        return cancel.wait(seconds)
+    time.sleep(seconds)
+    return False
+
+def _pull_with_process(device: 'DeviceHandle', f: RemoteFile, local_path: str,
+                       cancel: Optional[CancelToken]) -> int:
+    """Pull one file with the adb client process when the server socket is unavailable"""
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    result = device.run_command(['pull', f.path, local_path], cancel=cancel)
+    if not result.success:
+        raise OSError(result.stderr.strip() or f"adb pull {f.path} failed")
+    os.utime(local_path, (f.mtime, f.mtime))
+    return os.path.getsize(local_path)
+
+# ==================== Tar Streams ====================
+
+def tar_parent(remote_root: str) -> str:
+    """Directory tar runs in (-C) so member names match local_path_for"""
+    return posixpath.dirname(remote_root.rstrip('/')) or '/'
+
+def tar_batches(files: List[RemoteFile], remote_root: str, units: int = 1,
+                limit: int = TAR_COMMAND_LIMIT) -> List[str]:
+    """TAR_COMMAND lines covering every file, split into at least `units` streams
+    
+    Files are kept in path order so each stream walks whole directories;
+    a batch also ends before its command line would pass limit bytes
+    (encoded, as it goes on the wire).
+    """
+    root_dir = tar_parent(remote_root)
+    parent = shlex.quote(root_dir)
+    per_batch = -(-len(files) // max(1, units))
+    base = len(TAR_COMMAND.format(parent=parent, names='').encode('utf-8'))
+    commands, names, length = [], [], base
+    for f in sorted(files, key=lambda f: f.path):
+        name = shlex.quote(posixpath.relpath(f.path, root_dir))
+        size = len(name.encode('utf-8')) + 1
+        if names and (len(names) == per_batch or length + size > limit):
+            commands.append(TAR_COMMAND.format(parent=parent, names=' '.join(names)))
+            names, length = [], base
+        names.append(name)
+        length += size
+    if names:
+        commands.append(TAR_COMMAND.format(parent=parent, names=' '.join(names)))
+    return commands
+
+def stream_tar(device: 'DeviceHandle', command: str, on_member: Callable[[tarfile.TarFile, tarfile.TarInfo], None],
+               cancel: Optional[CancelToken] = None) -> str:
+    """Run a tar command with exec-out, handing each member to on_member as it arrives
+    
+    The stream goes through a pipe into a reader thread, so nothing is
+    staged on the device or buffered whole on the host. Returns '' or the
+    error that cut the stream short.
+    """
+    read_fd, write_fd = os.pipe()
+    errors = []
+    
+    with os.fdopen(read_fd, 'rb') as reader:
+        def extract():
+            try:
+                with tarfile.open(fileobj=reader, mode='r|') as tar:
+                    for member in tar:
+                        on_member(tar, member)
+            except (tarfile.TarError, OSError) as e:
+                errors.append(str(e) or type(e).__name__)
+            finally:
+                # Drain what is left so the writing side never blocks
+                while reader.read(65536):
+                    pass
+        
+        thread = threading.Thread(target=extract, name='tar-extract', daemon=True)
+        thread.start()
+        with os.fdopen(write_fd, 'wb') as writer:
+            # No deadline: like a sync pull, a long stream is not a hung one
+            result = device.exec_out(command, sink=writer, timeout=0, cancel=cancel, idempotent=False)
+        thread.join()
+    
+    if not result.success:
+        return result.stderr.strip() or result.state
+    return errors[0] if errors else ''
+
+def _member_name(member: tarfile.TarInfo) -> str:
+    return member.name[2:] if member.name.startswith('./') else member.name
+
+def _pull_tar(device: 'DeviceHandle', files: List[RemoteFile], remote_root: str, local_dir: str,
+              workers: int, progress: PullProgress, cancel: Optional[CancelToken],
+              on_file: Optional[Callable[[RemoteFile, str], None]],
+              tallies: Optional[List[List[int]]] = None) -> List[RemoteFile]:
+    """Pull files as parallel tar streams, returning the ones that did not arrive"""
+    parent = tar_parent(remote_root)
+    # Only listed files are written, which also keeps member names from
+    # escaping local_dir
+    wanted = {posixpath.relpath(f.path, parent): f for f in files}
+    arrived = set()
+    lock = threading.Lock()
+    
+    def extract(tar: tarfile.TarFile, member: tarfile.TarInfo):
+        name = _member_name(member)
+        f = wanted.get(name)
+        if f is None or not member.isfile():
+            return
+        local_path = os.path.join(local_dir, *name.split('/'))
+        _write_member(tar, member, local_path)
+        with lock:
+            arrived.add(name)
+        if on_file:
+            on_file(RemoteFile(f.path, member.size, int(member.mtime)), local_path)
+        progress.file_done(member.size)
+    
+    def run(index: int, command: str):
+        with crediting(tallies or []), tracer.span(f"tar stream {index}", 'pull', device.serial) as span:
+            error = stream_tar(device, command, extract, cancel)
+            if error:
+                span.set(error=error)
+    
+    commands = tar_batches(files, remote_root, workers)
+    with ThreadPoolExecutor(max_workers=max(1, len(commands)), thread_name_prefix='pull') as pool:
+        for future in [pool.submit(run, i, command) for i, command in enumerate(commands)]:
+            future.result()
+    return [f for name, f in wanted.items() if name not in arrived]
+
+def _write_member(tar: tarfile.TarFile, member: tarfile.TarInfo, local_path: str):
+    """Write one regular file from a tar stream, keeping its mtime"""
+    os.makedirs(os.path.dirname(local_path), exist_ok=True)
+    source = tar.extractfile(member)
+    try:
+        with open(local_path, 'wb') as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+    except OSError:
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        raise
+    os.utime(local_path, (member.mtime, member.mtime))
+
+def archive_files(device: 'DeviceHandle', files: List[RemoteFile], remote_root: str, archive_path: str,
+                  progress: Optional[Callable[[PullProgress], None]] = None,
+                  cancel: Optional[CancelToken] = None) -> PullResult:
+    """Stream already listed files into one local tar archive
+    
+    A .gz / .tgz archive_path is gzip-compressed on the host. Members keep
+    the names tar gave them (<basename of remote_root>/...); files missing
+    from the streams are reported as failed.
+    """
+    cancel = cancel or device.adb.current_token()
+    start = time.monotonic()
+    tracker = PullProgress(files, progress)
+    parent = tar_parent(remote_root)
+    wanted = {posixpath.relpath(f.path, parent): f for f in files}
+    arrived = set()
+    errors = []
+    
+    os.makedirs(os.path.dirname(os.path.abspath(archive_path)), exist_ok=True)
+    mode = 'w:gz' if archive_path.endswith(('.gz', '.tgz')) else 'w'
+    with tarfile.open(archive_path, mode) as archive:
+        def copy(tar: tarfile.TarFile, member: tarfile.TarInfo):
+            name = _member_name(member)
+            if name not in wanted or not member.isfile():
+                return
+            archive.addfile(member, tar.extractfile(member))
+            arrived.add(name)
+            tracker.file_done(member.size)
+        
+        # One archive, so the streams run one after another
+        for command in tar_batches(files, remote_root):
+            if cancel and cancel.cancelled:
+                break
+            error = stream_tar(device, command, copy, cancel)
+            if error:
+                errors.append(error)
+    
+    for name, f in wanted.items():
+        if name not in arrived and not (cancel and cancel.cancelled):
+            tracker.file_failed(f.path, errors[-1] if errors else "missing from tar stream")
+    return PullResult(
+        files=tracker.files_done,
+        bytes=tracker.bytes_done,
+        failed=tracker.failed,
+        elapsed=time.monotonic() - start,
+        cancelled=bool(cancel and cancel.cancelled),
+    )
+
+def archive_tree(device: 'DeviceHandle', remote_path: str, archive_path: str,
+                 progress: Optional[Callable[[PullProgress], None]] = None,
+                 cancel: Optional[CancelToken] = None) -> PullResult:
+    """Archive a remote file or directory into a local .tar / .tar.gz"""
+    start = time.monotonic()
+    listing = list_remote_files(device, remote_path)
+    if listing.missing:
+        return PullResult(error=f"remote object '{remote_path}' does not exist")
+    if listing.unlisted:
+        return PullResult(error=f"remote object '{remote_path}' could not be listed")
+    result = archive_files(device, listing.files, remote_path, archive_path, progress, cancel)
+    result.elapsed = time.monotonic() - start
+    return result
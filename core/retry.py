@@ -0,0 +1,200 @@
+"""
+Retry policy for transient device errors and per-device circuit breakers
+"""
+
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+# stderr of a command that failed because the link to the device hiccupped,
+# not because the command itself failed; "circuit open" is our own fail-fast
+DEVICE_UNAVAILABLE_RE = re.compile(
+    r"device offline|protocol fault|device '[^']*' not found|device still (?:connecting|authorizing)"
+    r"|connection reset|broken pipe|error: closed|circuit open",
+    re.IGNORECASE
+)
+
+# adb subcommands that can be repeated without changing the outcome
+IDEMPOTENT_SUBCOMMANDS = frozenset({
+    'devices', 'get-state', 'get-serialno', 'get-devpath', 'features', 'pull', 'push',
+})
+
+# Shell commands that only read device state. A set value limits the
+# command to those first arguments ('' meaning no arguments at all).
+READ_ONLY_COMMANDS: Dict[str, Optional[frozenset]] = {
+    name: None for name in (
+        'cat', 'ls', 'stat', 'getprop', 'df', 'du', 'id', 'whoami', 'uname', 'echo', 'printf',
+        'grep', 'head', 'tail', 'wc', 'sort', 'uniq', 'cut', 'md5sum', 'sha1sum', 'sha256sum',
+        'which', 'getenforce', 'dumpsys', 'test', '[', 'true', 'false', 'date', 'uptime', 'ps',
+        'readlink', 'realpath', 'basename', 'dirname', 'dd', 'find', 'screencap', 'ip', 'ifconfig',
+    )
+}
+READ_ONLY_COMMANDS.update({
+    'pm': frozenset({'list', 'path', 'dump'}),
+    'settings': frozenset({'get', 'list'}),
+    'magisk': frozenset({'-v', '-V', '-c', '--path'}),
+    'ksud': frozenset({'', '-V', '--version'}),
+    'su': frozenset({'-v', '-V', '--version'}),
+})
+
+# Arguments that turn an otherwise read-only command into a write
+_WRITING_ARGS_RE = re.compile(r'^(?:of=|-delete$|-exec|add$|del$|delete$|flush$|set$|up$|down$)')
+
+_SEGMENT_SPLIT_RE = re.compile(r'\|\||&&|[;|&\n]')
+_QUIET_REDIRECT_RE = re.compile(r'\d?>\s*/dev/null|\d?>&\d')
+_SU_C_RE = re.compile(r'^su(?:\s+\d+)?\s+-c\s+(.+)$', re.DOTALL)
+
+def is_device_unavailable(result: Any) -> bool:
+    """True when a failed result means the device dropped off, not a real error"""
+    if result.success or result.timed_out or result.cancelled:
+        return False
+    return bool(DEVICE_UNAVAILABLE_RE.search(result.stderr or ''))
+
+def is_read_only_shell(command: str) -> bool:
+    """Conservatively decide whether a shell command line only reads state"""
+    command = command.strip()
+    match = _SU_C_RE.match(command)
+    if match:
+        inner = match.group(1).strip()
+        if len(inner) >= 2 and inner[0] == inner[-1] and inner[0] in '"\'':
+            inner = inner[1:-1]
+        return is_read_only_shell(inner)
+    
+    command = _QUIET_REDIRECT_RE.sub(' ', command)
+    if '>' in command or '`' in command or '$(' in command:
+        return False
+    segments = [segment.split() for segment in _SEGMENT_SPLIT_RE.split(command)]
+    segments = [words for words in segments if words]
+    if not segments:
+        return False
+    for words in segments:
+        if words[0] == 'timeout' and len(words) > 2:
+            # `timeout DURATION command ...` is as read-only as the command
+            words = words[2:]
+        if words[0] not in READ_ONLY_COMMANDS:
+            return False
+        allowed = READ_ONLY_COMMANDS[words[0]]
+        if allowed is not None and (words[1] if len(words) > 1 else '') not in allowed:
+            return False
+        if any(_WRITING_ARGS_RE.match(word) for word in words[1:]):
+            return False
+    return True
+
+def is_idempotent(args: List[str]) -> bool:
+    """Whether adb arguments (without -s) are safe to run again"""
+    if not args:
+        return False
+    if args[0] in ('shell', 'exec-out'):
+        rest = list(args[1:])
+        # Drop shell's own flags (-T, -x, -n ...)
+        while rest and rest[0].startswith('-'):
+            rest.pop(0)
+        return bool(rest) and is_read_only_shell(' '.join(rest))
+    return args[0] in IDEMPOTENT_SUBCOMMANDS
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with jitter for transient device errors"""
+    attempts: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+    multiplier: float = 2.0
+    jitter: float = 0.5
+    
+    @classmethod
+    def from_config(cls, config) -> 'RetryPolicy':
+        return cls(
+            attempts=max(1, config.RETRY_ATTEMPTS),
+            base_delay=config.RETRY_BASE_DELAY,
+            max_delay=config.RETRY_MAX_DELAY,
+        )
+    
+    def delay(self, retry: int) -> float:
+        """Sleep before retry number retry (0-based), up to jitter shorter"""
+        delay = min(self.max_delay, self.base_delay * self.multiplier ** retry)
+        # Randomising spreads out devices that dropped off the same hub together
+        return delay * (1 - self.jitter * random.random())
+
+class CircuitBreaker:
+    """Stops commands to a device after repeated unavailable errors
+    
+    closed: commands flow. open: commands fail fast until reset_timeout has
+    passed. half-open: one trial command goes through; success closes the
+    circuit, another failure opens it again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+    
+    def __init__(self, serial: str, failure_threshold: int = 3, reset_timeout: float = 15.0,
+                 on_change: Optional[Callable[[str, str], None]] = None):
+        self.serial = serial
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_change = on_change
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """Whether a command may go out now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                changed = self._set(self.HALF_OPEN)
+            elif self._trial:
+                return False
+            else:
+                changed = None
+            self._trial = True
+        self._notify(changed)
+        return True
+    
+    def retry_after(self) -> float:
+        """Seconds until an open circuit lets a trial through"""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial = False
+            changed = self._set(self.CLOSED)
+        self._notify(changed)
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            changed = None
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                changed = self._set(self.OPEN)
+        self._notify(changed)
+    
+    def reset(self):
+        """Close the circuit, e.g. when the device reconnects"""
+        self.record_success()
+    
+    def _set(self, state: str) -> Optional[str]:
+        if self.state == state:
+            return None
+        self.state = state
+        return state
+    
+    def _notify(self, state: Optional[str]):
+        if state and self.on_change:
+            try:
+                self.on_change(self.serial, state)
+            except Exception as e:
+                print(f"Error in circuit breaker listener: {e}")
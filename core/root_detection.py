@@ -0,0 +1,102 @@
+"""
+Pluggable root method detectors, probed in one device-side script
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+# (rooted, status, method) as returned by DeviceManager.check_root_status
+RootStatus = Tuple[bool, str, Optional[str]]
+
+NOT_ROOTED: RootStatus = (False, "Not rooted", None)
+
+# The probe never answered (offline, unauthorized, timed out or cancelled)
+ROOT_UNKNOWN: RootStatus = (False, "Unknown", None)
+
+# Locating su never blocks, so it runs without a per-probe timeout
+SU_PATH_COMMAND = "which su"
+
+@dataclass(frozen=True)
+class RootDetector:
+    """Recognises one root method from the output of unprivileged commands
+    
+    probes pairs a device command with a regex; the first group of the
+    first match, if any, is the version. No command may need a root grant,
+    so a pending su prompt can never stall detection.
+    """
+    name: str
+    probes: Tuple[Tuple[str, str], ...]
+    
+    def detect(self, outputs: Dict[str, str]) -> Optional[str]:
+        """Method label when any probe output matches, else None"""
+        for command, pattern in self.probes:
+            match = re.search(pattern, outputs.get(command, ''), re.MULTILINE)
+            if match:
+                version = match.group(1) if match.groups() else ''
+                return f"{self.name} {version}".strip()
+        return None
+
+# Checked in order; the first detector that matches names the method
+ROOT_DETECTORS: List[RootDetector] = []
+
+def register_detector(detector: RootDetector):
+    """Add a detector, replacing any registered under the same name"""
+    for i, existing in enumerate(ROOT_DETECTORS):
+        if existing.name == detector.name:
+            ROOT_DETECTORS[i] = detector
+            return
+    ROOT_DETECTORS.append(detector)
+
+def probe_commands() -> List[str]:
+    """Every distinct device command the registered detectors need"""
+    commands = [SU_PATH_COMMAND]
+    for detector in ROOT_DETECTORS:
+        for command, _ in detector.probes:
+            if command not in commands:
+                commands.append(command)
+    return commands
+
+def probe_sections(timeout: float) -> Dict[str, str]:
+    """Probe section table for DeviceHandle.probe, one section per command
+    
+    Each command runs under toybox `timeout`, so a hanging binary costs at
+    most timeout seconds instead of the whole detection.
+    """
+    sections = {}
+    for i, command in enumerate(probe_commands()):
+        if command != SU_PATH_COMMAND:
+            command = f"timeout {timeout:g} {command}"
+        sections[f"root{i}"] = f"{command} 2>/dev/null"
+    return sections
+
+def detect_root(sections: Dict[str, str]) -> RootStatus:
+    """Root status from the output of a probe_sections() run"""
+    outputs = {command: sections.get(f"root{i}", '') for i, command in enumerate(probe_commands())}
+    # KernelSU and APatch only expose su to granted apps, so a detector
+    # match counts even when the shell cannot see su
+    for detector in ROOT_DETECTORS:
+        method = detector.detect(outputs)
+        if method:
+            return True, "Rooted", method
+    if not outputs[SU_PATH_COMMAND].strip():
+        return NOT_ROOTED
+    return True, "Rooted", "Unknown"
+
+# `su -v` prints "<version>:<implementation>" for every su listed here
+register_detector(RootDetector('Magisk', (
+    ("magisk -v", r'^(\S+:MAGISK\S*)'),
+    ("su -v", r'^(\S+):MAGISKSU'),
+)))
+# ksud/apd and their /data/adb directories are only visible under adb root
+register_detector(RootDetector('KernelSU', (
+    ("su -v", r'^(\S+):KernelSU'),
+    ("ksud -V", r'^ksud (\S+)'),
+    ("ls -d /data/adb/ksu", r'^/data/adb/ksu$'),
+)))
+register_detector(RootDetector('APatch', (
+    ("su -v", r'^(\S+):APatch'),
+    ("apd -V", r'^apd (\S+)'),
+    ("ls -d /data/adb/ap", r'^/data/adb/ap$'),
+)))
+register_detector(RootDetector('SuperSU', (("su -v", r'^(\S+):SUPERSU'),)))
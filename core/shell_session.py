@@ -0,0 +1,287 @@
+"""
+Persistent device shell sessions
+
+A ShellSession keeps one ``sh`` (or ``su``) process open on the device and
+runs commands back to back over it, framing each one with a unique
+sentinel line that carries the exit code.
+"""
+
+import os
+import queue
+import socket
+import subprocess
+import threading
+import uuid
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+from .cancellation import CancelToken, PROCESS_GROUP_KWARGS, Watchdog, kill_process_group
+
+
+class ShellSessionError(Exception):
+    """Raised when a shell session cannot be opened or breaks mid-command"""
+
+
+class ShellSessionTimeout(ShellSessionError):
+    """Raised when a command did not finish in time; the shell was torn down"""
+
+
+class ShellSessionCancelled(ShellSessionError):
+    """Raised when a command was cancelled; the shell was torn down"""
+
+
+class SocketChannel:
+    """Shell channel over an ADB server socket (exec:sh / exec:su)"""
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def write(self, data: bytes):
+        self.sock.sendall(data)
+
+    def read(self) -> bytes:
+        return self.sock.recv(65536)
+
+    def abort(self):
+        """Unblock a read in progress on another thread"""
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class ProcessChannel:
+    """Shell channel over an `adb shell` child process"""
+
+    def __init__(self, cmd: List[str]):
+        self.proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            **PROCESS_GROUP_KWARGS
+        )
+
+    def write(self, data: bytes):
+        self.proc.stdin.write(data)
+        self.proc.stdin.flush()
+
+    def read(self) -> bytes:
+        return os.read(self.proc.stdout.fileno(), 65536)
+
+    def abort(self):
+        """Unblock a read in progress on another thread"""
+        kill_process_group(self.proc)
+
+    def close(self):
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        if self.proc.poll() is None:
+            self.proc.terminate()
+        try:
+            self.proc.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+
+@dataclass
+class _Request:
+    """A queued command waiting for the session worker"""
+    command: str
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Optional[Tuple[int, str]] = None
+    error: Optional[Exception] = None
+    aborted: bool = False
+
+
+class ShellSession:
+    """Long-lived shell on one device serving a queue of commands"""
+
+    def __init__(self, opener: Callable[[], object], root: bool = False,
+                 idle_timeout: float = 60.0):
+        self._opener = opener
+        self.root = root
+        self.idle_timeout = idle_timeout
+        self.unavailable: Optional[str] = None
+
+        self._queue: 'queue.Queue[_Request]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker: Optional[threading.Thread] = None
+        self._channel = None
+        self._buffer = b''
+        self._current: Optional[_Request] = None
+
+    @property
+    def connected(self) -> bool:
+        """Whether the device-side shell is currently open"""
+        return self._channel is not None
+
+    def run(self, command: str, timeout: Optional[float] = None,
+            cancel: Optional[CancelToken] = None) -> Tuple[int, str]:
+        """Run a command and return (exit code, output)
+
+        On timeout or cancellation the device-side shell is torn down (the
+        next command reconnects) and ShellSessionTimeout/Cancelled is raised.
+        """
+        if self.unavailable:
+            raise ShellSessionError(self.unavailable)
+
+        request = _Request(command)
+        with self._lock:
+            self._queue.put(request)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._serve, daemon=True)
+                self._worker.start()
+
+        with Watchdog(lambda: self._abort(request), timeout, cancel) as watchdog:
+            request.done.wait()
+        if watchdog.timed_out:
+            raise ShellSessionTimeout(f"timed out after {timeout}s")
+        if watchdog.cancelled:
+            raise ShellSessionCancelled("cancelled")
+        if request.error:
+            raise request.error
+        return request.result
+
+    def _abort(self, request: _Request):
+        """Stop a request, killing the shell if it is already running"""
+        request.aborted = True
+        channel = self._channel
+        if self._current is request and channel is not None:
+            channel.abort()
+        else:
+            # Still queued; the worker skips it
+            request.done.set()
+
+    def close(self):
+        """Tear down the device-side shell
+
+        A command in flight fails with ShellSessionError. A root session
+        that was refused su asks again on its next command.
+        """
+        with self._lock:
+            channel = self._channel
+            if channel is not None:
+                # Wake the worker if it is blocked reading this channel
+                channel.abort()
+            self._disconnect()
+            self.unavailable = None
+
+    # ==================== Worker ====================
+
+    def _serve(self):
+        """Serve queued commands until the session sits idle"""
+        while True:
+            try:
+                request = self._queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._disconnect()
+                        self._worker = None
+                        return
+                continue
+            self._execute(request)
+
+    def _execute(self, request: _Request):
+        """Run one request, reconnecting once if the shell went away"""
+        self._current = request
+        try:
+            if not request.aborted:
+                self._attempt(request)
+        except Exception as e:
+            # close() from another thread can pull the channel out mid-command
+            self._disconnect()
+            request.error = ShellSessionError(f"shell session lost: {e}")
+        finally:
+            self._current = None
+            request.done.set()
+
+    def _attempt(self, request: _Request):
+        """Send the command (again on a fresh shell if the write failed) and read its reply"""
+        sentinel = f'__ARS_{uuid.uuid4().hex}__'
+        payload = (f"( {request.command}\n) </dev/null 2>&1; "
+                   f"printf '\\n{sentinel} %d\\n' $?\n").encode('utf-8')
+
+        for attempt in range(2):
+            try:
+                if self._channel is None:
+                    self._connect()
+                if request.aborted:
+                    return
+                self._channel.write(payload)
+            except ShellSessionError as e:
+                request.error = e
+                return
+            except OSError as e:
+                # The command never reached the device, so a retry is safe
+                self._disconnect()
+                if attempt == 0 and not request.aborted:
+                    continue
+                request.error = ShellSessionError(f"shell session lost: {e}")
+                return
+
+            try:
+                request.result = self._read_reply(sentinel)
+            except (OSError, ShellSessionError) as e:
+                self._disconnect()
+                request.error = ShellSessionError(f"shell session lost: {e}")
+            return
+
+    def _connect(self):
+        """Open the device-side shell"""
+        try:
+            self._channel = self._opener()
+        except Exception as e:
+            self._channel = None
+            raise ShellSessionError(f"cannot open shell session: {e}")
+        self._buffer = b''
+
+        if self.root:
+            # su either hands us a root shell or exits; find out which now
+            sentinel = f'__ARS_{uuid.uuid4().hex}__'
+            try:
+                self._channel.write(f"id -u; printf '\\n{sentinel} %d\\n' $?\n".encode())
+                code, output = self._read_reply(sentinel)
+            except (OSError, ShellSessionError):
+                code, output = 1, ''
+            if code != 0 or output.strip() != '0':
+                self._disconnect()
+                self.unavailable = "root shell not granted"
+                raise ShellSessionError(self.unavailable)
+
+    def _disconnect(self):
+        """Close the channel if open"""
+        channel, self._channel = self._channel, None
+        if channel is not None:
+            channel.close()
+        self._buffer = b''
+
+    def _read_reply(self, sentinel: str) -> Tuple[int, str]:
+        """Read output up to the sentinel line and parse the exit code"""
+        marker = f'\n{sentinel} '.encode()
+        while True:
+            idx = self._buffer.find(marker)
+            if idx != -1:
+                end = self._buffer.find(b'\n', idx + len(marker))
+                if end != -1:
+                    output = self._buffer[:idx]
+                    code = int(self._buffer[idx + len(marker):end].strip() or b'0')
+                    self._buffer = self._buffer[end + 1:]
+                    return code, output.decode('utf-8', errors='ignore')
+
+            channel = self._channel
+            if channel is None:
+                raise ShellSessionError("shell session closed")
+            chunk = channel.read()
+            if not chunk:
+                raise ShellSessionError("shell exited")
+            self._buffer += chunk
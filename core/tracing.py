@@ -0,0 +1,151 @@
+"""
+Span recorder producing Chrome trace event JSON
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Upper bound on buffered events; a forgotten trace must not eat the heap
+MAX_TRACE_EVENTS = 1_000_000
+
+class _NullSpan:
+    """Stand-in returned while tracing is off"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def set(self, **args):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    """One timed region; recorded as a complete ('X') event on exit"""
+    
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+    
+    def __init__(self, tracer: 'Tracer', name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = 0.0
+    
+    def set(self, **args):
+        """Attach extra arguments, e.g. a result known only at the end"""
+        self.args.update(args)
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.complete(self.name, self.category, self.start, time.perf_counter(), self.args)
+        return False
+
+class Tracer:
+    """Collects nested spans (operation, step, adb command) per thread
+    
+    Off by default. While off, span() hands back a shared no-op object and
+    complete() returns at once, so instrumented code pays for one
+    attribute check. Spans on the same thread nest by time in the viewer;
+    each carries the device serial in its args.
+    """
+    
+    def __init__(self, max_events: int = MAX_TRACE_EVENTS):
+        self.enabled = False
+        self.max_events = max_events
+        self.dropped = 0
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+    
+    def start(self):
+        """Discard earlier events and begin recording"""
+        self.clear()
+        self.enabled = True
+    
+    def stop(self):
+        """Stop recording; collected events are kept for write()"""
+        self.enabled = False
+    
+    def clear(self):
+        with self._lock:
+            self._events = []
+            self._threads = {}
+            self.dropped = 0
+            self._origin = time.perf_counter()
+    
+    def span(self, name: str, category: str = 'step', serial: Optional[str] = None, **args) -> Any:
+        """Context manager timing a region of the calling thread"""
+        if not self.enabled:
+            return _NULL_SPAN
+        if serial:
+            args['serial'] = serial
+        return Span(self, name, category, args)
+    
+    def complete(self, name: str, category: str, start: float, end: float,
+                 args: Optional[Dict[str, Any]] = None):
+        """Record a finished region from perf_counter() start/end times"""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start - self._origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self._pid,
+            'tid': thread.ident,
+            'args': args or {},
+        }
+        with self._lock:
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append(event)
+            if thread.ident not in self._threads:
+                self._threads[thread.ident] = thread.name
+    
+    def events(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._events)
+    
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Trace event JSON object, loadable by chrome://tracing and Perfetto"""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': self._pid, 'tid': 0,
+                     'args': {'name': 'Android Root Suite'}}]
+        for tid, thread_name in threads.items():
+            metadata.append({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid,
+                             'args': {'name': thread_name}})
+        return {
+            'traceEvents': metadata + events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_events': self.dropped},
+        }
+    
+    def write(self, path: str) -> str:
+        """Write the trace as JSON, atomically"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_chrome_trace(), f)
+        os.replace(temp_path, path)
+        return path
+
+# Global tracer instance
+tracer = Tracer()
@@ -155,7 +155,6 @@ class ADBRootToolGUI:
         
         def check():
             self.adb.start_adb_server()
-            time.sleep(1)
             devices = self.adb.get_devices()
             
             self.root.after(0, self.update_device_status, devices)
@@ -126,7 +126,7 @@ class BackupDialog:
     def start_adb_backup(self):
         """Start ADB backup process"""
         from core.backup_manager import BackupManager
-        backup_mgr = BackupManager(self.app.adb)
+        backup_mgr = BackupManager(self.app.adb.device(self.app.current_device))
         
         self.app.update_status("Backing up boot image...")
         self.app.progress.start()
@@ -3,18 +3,29 @@ Device Information Dialog
 """
 
 import tkinter as tk
+from datetime import datetime
 from tkinter import ttk, scrolledtext, filedialog
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from core.device_manager import DeviceManager
+from core.root_detection import ROOT_UNKNOWN
 
 if TYPE_CHECKING:
     from gui.app import ADBRootToolGUI
 
 class DeviceInfoDialog:
-    """Device Information Dialog"""
+    """Device Information Dialog
+    
+    Opens with whatever the device cache holds and refreshes in the
+    background, so no device round trip runs on the Tk thread.
+    """
     
     def __init__(self, app: 'ADBRootToolGUI'):
         self.app = app
         self.window = None
+        self.device_mgr: Optional[DeviceManager] = None
+        self.info: Dict[str, Dict[str, str]] = {}
+        self.root_status: Optional[Tuple[bool, str, Optional[str]]] = None
     
     def show(self):
         """Show device information window"""
@@ -27,10 +38,16 @@ class DeviceInfoDialog:
         self.window.geometry("700x600")
         self.window.configure(bg=self.app.style_manager.colors['bg'])
         
+        self.device_mgr = DeviceManager(self.app.adb.device(self.app.current_device))
         self.create_ui()
+        self.refresh(force=False)
     
     def create_ui(self):
         """Create UI for device info dialog"""
+        # Cached info shows up right away; refresh() fills in the rest
+        self.info = self.device_mgr.cached_device_info() or {}
+        self.root_status = self.device_mgr.cached_root_status()
+        
         # Create notebook for different info sections
         notebook = ttk.Notebook(self.window, style='Custom.TNotebook')
         notebook.pack(fill='both', expand=True, padx=10, pady=10)
@@ -41,85 +58,114 @@ class DeviceInfoDialog:
         # Advanced Info Tab
         self.create_advanced_info_tab(notebook)
         
+        # Storage, battery and network
+        self.create_status_info_tab(notebook)
+        
         # Root Check Tab
         self.create_root_info_tab(notebook)
         
         # Buttons
         self.create_buttons()
+        
+        self.fill_tabs()
     
-    def create_basic_info_tab(self, notebook):
-        """Create basic device info tab"""
+    def create_text_tab(self, notebook, title: str, font_size: int) -> scrolledtext.ScrolledText:
+        """Add a tab holding a read-only text area"""
         frame = ttk.Frame(notebook)
-        notebook.add(frame, text="Basic Info")
-        
-        # Get device properties
-        from config.constants import DEVICE_PROPERTIES
-        props = self.app.adb.get_device_props(DEVICE_PROPERTIES[:9])  # First 9 basic props
+        notebook.add(frame, text=title)
         
         text_widget = scrolledtext.ScrolledText(
             frame,
             bg='#0c0c0c',
             fg='#00ff00',
-            font=('Consolas', 10)
+            font=('Consolas', font_size)
         )
         text_widget.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        for prop, value in props.items():
-            prop_name = prop.replace('ro.', '').replace('.', ' ')
-            text_widget.insert('end', f"{prop_name.title()}: {value}\n")
-        
         text_widget.config(state='disabled')
+        return text_widget
+    
+    def create_basic_info_tab(self, notebook):
+        """Create basic device info tab"""
+        self.basic_text = self.create_text_tab(notebook, "Basic Info", 10)
     
     def create_advanced_info_tab(self, notebook):
         """Create advanced device info tab"""
-        frame = ttk.Frame(notebook)
-        notebook.add(frame, text="Advanced")
-        
-        text_widget = scrolledtext.ScrolledText(
-            frame,
-            bg='#0c0c0c',
-            fg='#00ff00',
-            font=('Consolas', 9)
-        )
-        text_widget.pack(fill='both', expand=True, padx=10, pady=10)
-        
-        # Get more props
-        from config.constants import DEVICE_PROPERTIES
-        props = self.app.adb.get_device_props(DEVICE_PROPERTIES[9:])  # Remaining props
-        
-        for prop, value in props.items():
-            prop_name = prop.replace('ro.', '').replace('.', ' ')
-            text_widget.insert('end', f"{prop_name}: {value}\n")
-        
-        text_widget.config(state='disabled')
+        self.advanced_text = self.create_text_tab(notebook, "Advanced", 9)
+    
+    def create_status_info_tab(self, notebook):
+        """Create storage/battery/network tab"""
+        self.status_text = self.create_text_tab(notebook, "Storage & Battery", 10)
     
     def create_root_info_tab(self, notebook):
         """Create root status tab"""
-        frame = ttk.Frame(notebook)
-        notebook.add(frame, text="Root Status")
+        self.root_text = self.create_text_tab(notebook, "Root Status", 10)
+    
+    def fill_tabs(self):
+        """Render self.info and self.root_status into the tabs"""
+        basic = []
+        for prop, value in self.info.get('basic', {}).items():
+            prop_name = prop.replace('ro.', '').replace('.', ' ')
+            basic.append(f"{prop_name.title()}: {value}")
+        self.set_text(self.basic_text, basic or ["Loading..."])
         
-        text_widget = scrolledtext.ScrolledText(
-            frame,
-            bg='#0c0c0c',
-            fg='#00ff00',
-            font=('Consolas', 10)
-        )
-        text_widget.pack(fill='both', expand=True, padx=10, pady=10)
+        advanced = []
+        for prop, value in self.info.get('advanced', {}).items():
+            prop_name = prop.replace('ro.', '').replace('.', ' ')
+            advanced.append(f"{prop_name}: {value}")
+        self.set_text(self.advanced_text, advanced or ["Loading..."])
+        
+        status = []
+        for section in ('storage', 'battery', 'network'):
+            values = self.info.get(section, {})
+            if values:
+                status.append(f"[{section.title()}]")
+                status.extend(f"{key.replace('_', ' ')}: {value}" for key, value in values.items())
+                status.append("")
+        self.set_text(self.status_text, status or ["Loading..."])
+        
+        if self.root_status is None:
+            self.set_text(self.root_text, ["Checking root status..."])
+            return
+        rooted, _, method = self.root_status
+        if self.root_status == ROOT_UNKNOWN:
+            lines = ["[?] UNKNOWN", "The device did not answer"]
+        elif rooted:
+            lines = ["[✓] ROOTED", f"Method: {method or 'Unknown'}"]
+        else:
+            lines = ["[✗] NOT ROOTED"]
+        self.set_text(self.root_text, lines)
+    
+    @staticmethod
+    def set_text(text_widget, lines):
+        text_widget.config(state='normal')
+        text_widget.delete(1.0, 'end')
+        text_widget.insert('end', "\n".join(lines) + "\n")
+        text_widget.config(state='disabled')
+    
+    def refresh(self, force: bool = True):
+        """Fetch fresh info and root status on a worker thread
         
-        # Check root status
-        from core.device_manager import DeviceManager
-        device_mgr = DeviceManager(self.app.adb)
-        status = device_mgr.check_root_status()
+        Root status is detected once per boot; force re-probes it.
+        """
+        window = self.window
+        device_mgr = self.device_mgr
+        self.status_label.config(text="Refreshing..." if self.info else "Loading...")
         
-        if status['rooted']:
-            text_widget.insert('end', "[✓] ROOTED\n")
-            text_widget.insert('end', f"Method: {status['method']}\n")
-            if status['version'] != 'Unknown':
-                text_widget.insert('end', f"Version: {status['version']}\n")
-        else:
-            text_widget.insert('end', "[✗] NOT ROOTED\n")
+        def fetch():
+            info = device_mgr.get_detailed_device_info()
+            root_status = device_mgr.check_root_status(refresh=force)
+            self.app.root.after(0, self.apply_refresh, window, info, root_status)
         
-        text_widget.config(state='disabled')
+        self.app.run_threaded(fetch)
+    
+    def apply_refresh(self, window, info, root_status):
+        """Show fetched data unless the dialog was closed or reopened meanwhile"""
+        if window is not self.window or not window.winfo_exists():
+            return
+        self.info = info
+        self.root_status = root_status
+        self.fill_tabs()
+        self.status_label.config(text=f"Updated {datetime.now().strftime('%H:%M:%S')}")
     
     def create_buttons(self):
         """Create dialog buttons"""
@@ -132,6 +178,15 @@ class DeviceInfoDialog:
             command=self.save_device_info
         ).pack(side='left', padx=5)
         
+        ttk.Button(
+            btn_frame,
+            text="Refresh",
+            command=self.refresh
+        ).pack(side='left', padx=5)
+        
+        self.status_label = ttk.Label(btn_frame, text="")
+        self.status_label.pack(side='left', padx=10)
+        
         ttk.Button(
             btn_frame,
             text="Close",
@@ -140,8 +195,7 @@ class DeviceInfoDialog:
     
     def save_device_info(self):
         """Save device info to file"""
-        from config.constants import DEVICE_PROPERTIES
-        props = self.app.adb.get_device_props(DEVICE_PROPERTIES)
+        props = {**self.info.get('basic', {}), **self.info.get('advanced', {})}
         
         filename = filedialog.asksaveasfilename(
             defaultextension=".txt",
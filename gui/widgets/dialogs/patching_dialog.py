@@ -76,7 +76,7 @@ Steps to patch boot image:
                 filetypes=[("Boot images", "*.img"), ("All files", "*.*")]
             )
             if filename:
-                self.app.adb.push_file(filename, '/sdcard/boot.img')
+                self.app.adb.device(self.app.current_device).push_file(filename, '/sdcard/boot.img')
                 self.app.show_info(
                     "Success",
                     "boot.img copied to device\n\nNow install Magisk app and patch the file."
@@ -122,7 +122,7 @@ class BackupToolsTab(BaseTab):
         """Update backup statistics"""
         try:
             from core.backup_manager import BackupManager
-            backup_manager = BackupManager(self.adb)
+            backup_manager = BackupManager(self.adb.device(self.app.current_device))
             backups = backup_manager.list_backups()
             
             if backups:
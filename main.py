@@ -12,12 +12,22 @@ import os
 import time
 import threading
 from datetime import datetime
+from typing import Dict, List, Set
 
 # Import refactored modules
 from config.settings import config
+from config.constants import BACKUP_FOLDERS
 from core.adb_manager import ADBManager, CommandResult
+from core.cancellation import CancelToken
 from core.device_manager import DeviceManager
+from core.bloat_rules import SAFETY_LEVELS
 from core.backup_manager import BackupManager
+from core.device_handle import DeviceHandle
+from core.device_tracker import DeviceEvent, DeviceTracker
+from core.metrics import registry as metrics_registry, summary_rows
+from core.package_inventory import CHANGES_SCOPE, INVENTORY_SCOPES, PackageInventory
+from core.root_detection import ROOT_UNKNOWN
+from core.tracing import tracer
 from gui.styles import StyleManager
 from gui.widgets.dialogs.device_info_dialog import DeviceInfoDialog
 from gui.widgets.dialogs.backup_dialog import BackupDialog
@@ -27,6 +37,7 @@ from tools.samsung_tools import SamsungTools
 from tools.xiaomi_tools import XiaomiTools
 from tools.qualcomm_tools import QualcommTools
 from tools.mediatek_tools import MediaTekTools
+from utils.file_utils import format_file_size
 
 class ADBRootToolGUI:
     """Main GUI Application with all integrated functionality"""
@@ -34,8 +45,7 @@ class ADBRootToolGUI:
     def __init__(self):
         self.config = config
         self.adb = ADBManager(config)
-        self.device_mgr = DeviceManager(self.adb)
-        self.backup_mgr = BackupManager(self.adb)
+        self.device_tracker = DeviceTracker(self.adb)
         self.style_manager = StyleManager()
         
         # Initialize dialog managers
@@ -51,12 +61,34 @@ class ADBRootToolGUI:
         self.mediatek_tools = MediaTekTools(self)
         
         self.current_device = None
-        self.logcat_running = False
-        self.logcat_process = None
+        self.selected_devices: List[str] = []
+        self.active_tokens: Set[CancelToken] = set()
+        self.tokens_lock = threading.Lock()
+        self.logcat_stream = None
+        
+        if self.config.TRACE_FILE:
+            tracer.start()
         
         self.setup_gui()
         self.check_initial_status()
     
+    @property
+    def device(self) -> DeviceHandle:
+        """Handle for the primary selected device"""
+        return self.adb.device(self.current_device)
+    
+    @property
+    def device_mgr(self) -> DeviceManager:
+        return DeviceManager(self.device)
+    
+    @property
+    def backup_mgr(self) -> BackupManager:
+        return BackupManager(self.device)
+    
+    def selected_handles(self) -> List[DeviceHandle]:
+        """Handles for every selected device"""
+        return [self.adb.device(serial) for serial in self.selected_devices]
+    
     # ==================== GUI Setup Methods ====================
     
     def setup_gui(self):
@@ -132,6 +164,23 @@ class ADBRootToolGUI:
         )
         self.device_status_label.pack(side='left', padx=10)
         
+        # Several devices can be selected; the first one is the primary
+        self.device_listbox = tk.Listbox(
+            status_frame,
+            selectmode='extended',
+            exportselection=False,
+            height=3,
+            width=45,
+            bg='#0c0c0c',
+            fg=self.style_manager.colors['fg'],
+            font=('Consolas', 9)
+        )
+        self.device_listbox.pack(side='left', padx=10)
+        self.device_listbox.bind('<<ListboxSelect>>', self.on_device_select)
+        self.device_serials: List[str] = []
+        self.device_rows: Dict[str, Dict[str, str]] = {}
+        self.adb.breaker_listeners.append(self.on_breaker_change)
+        
         tk.Button(
             status_frame,
             text="Check Connection",
@@ -544,6 +593,27 @@ class ADBRootToolGUI:
         )
         self.progress.pack(side='right', padx=10)
         
+        # Cancels every operation started through run_threaded
+        tk.Button(
+            status_bar_frame,
+            text="Cancel",
+            command=self.cancel_operations,
+            bg=self.style_manager.colors['button_bg'],
+            fg='white',
+            relief='raised',
+            padx=10
+        ).pack(side='right', padx=5)
+        
+        tk.Button(
+            status_bar_frame,
+            text="Stats",
+            command=self.show_operations_stats,
+            bg=self.style_manager.colors['button_bg'],
+            fg='white',
+            relief='raised',
+            padx=10
+        ).pack(side='right', padx=5)
+        
         # Version info
         tk.Label(
             status_bar_frame,
@@ -577,11 +647,41 @@ class ADBRootToolGUI:
         return messagebox.askyesno(title, message)
     
     def run_threaded(self, func, *args, **kwargs):
-        """Run function in thread to avoid GUI freeze"""
-        thread = threading.Thread(target=func, args=args, kwargs=kwargs, daemon=True)
+        """Run function in thread to avoid GUI freeze
+        
+        ADB calls made by the thread are bound to a fresh cancel token, so
+        the status bar's Cancel button can stop them.
+        """
+        token = CancelToken()
+        
+        def worker():
+            with self.tokens_lock:
+                self.active_tokens.add(token)
+            try:
+                with self.adb.cancellation(token):
+                    func(*args, **kwargs)
+            finally:
+                with self.tokens_lock:
+                    self.active_tokens.discard(token)
+        
+        thread = threading.Thread(target=worker, daemon=True)
         thread.start()
         return thread
     
+    def cancel_operations(self):
+        """Cancel every running background operation"""
+        count = self.cancel_active_tokens()
+        if count:
+            self.update_status(f"Cancelled {count} operation(s)")
+    
+    def cancel_active_tokens(self) -> int:
+        """Cancel the tokens of all running run_threaded calls"""
+        with self.tokens_lock:
+            tokens = list(self.active_tokens)
+        for token in tokens:
+            token.cancel()
+        return len(tokens)
+    
     def check_initial_status(self):
         """Check initial device status"""
         self.update_status("Initializing...")
@@ -589,6 +689,17 @@ class ADBRootToolGUI:
         if not adb_ok:
             self.show_warning("ADB not found", "Please install ADB or check configuration")
         self.check_device_connection()
+        
+        # Connects, disconnects and state changes are pushed from here on
+        self.device_tracker.subscribe(self.on_device_event)
+        self.device_tracker.start()
+    
+    def on_device_event(self, event: DeviceEvent):
+        """Device tracker callback, called on the tracker thread"""
+        def apply():
+            self.update_device_status(event.devices)
+            self.update_status(f"{event.serial}: {event.status}")
+        self.root.after(0, apply)
     
     def check_device_connection(self):
         """Check device connection"""
@@ -597,7 +708,6 @@ class ADBRootToolGUI:
         
         def check():
             self.adb.start_adb_server()
-            time.sleep(1)
             devices = self.adb.get_devices()
             
             self.root.after(0, self.update_device_status, devices)
@@ -606,23 +716,68 @@ class ADBRootToolGUI:
         self.run_threaded(check)
     
     def update_device_status(self, devices):
-        """Update device status label"""
+        """Update device status label and device list"""
+        previous = set(self.selected_devices)
+        self.device_serials = [d['serial'] for d in devices]
+        self.device_rows = {d['serial']: d for d in devices}
+        self.device_listbox.delete(0, 'end')
+        for device in devices:
+            self.device_listbox.insert('end', self.device_line(device))
+        
         if devices:
-            device_text = "\n".join([f"{d['serial']} - {d['status']}" for d in devices])
             self.device_status_label.config(
-                text=f"Connected devices:\n{device_text}",
+                text="Connected devices:",
                 fg=self.style_manager.colors['fg']
             )
-            self.current_device = devices[0]['serial']
+            # Keep the selection across refreshes, default to the first device
+            kept = [i for i, serial in enumerate(self.device_serials) if serial in previous]
+            for index in kept or [0]:
+                self.device_listbox.selection_set(index)
+            self.on_device_select()
             self.update_status(f"{len(devices)} device(s) connected")
         else:
             self.device_status_label.config(
                 text="No device connected\nEnable USB Debugging and connect device",
                 fg=self.style_manager.colors['info']
             )
+            self.selected_devices = []
             self.current_device = None
             self.update_status("No devices detected")
     
+    def device_line(self, device) -> str:
+        """Device list entry, flagged while its circuit breaker is not closed"""
+        model = device.get('model', '').replace('_', ' ')
+        line = f"{device['serial']} - {device['status']} {model}".rstrip()
+        breaker = self.adb.breaker_state(device['serial'])
+        if breaker != 'closed':
+            line += f" [circuit {breaker}]"
+        return line
+    
+    def on_breaker_change(self, serial: str, state: str):
+        """Circuit breaker callback, called on whichever thread ran the command"""
+        def apply():
+            if serial not in self.device_serials:
+                return
+            index = self.device_serials.index(serial)
+            selected = self.device_listbox.selection_includes(index)
+            self.device_listbox.delete(index)
+            self.device_listbox.insert(index, self.device_line(self.device_rows[serial]))
+            if selected:
+                self.device_listbox.selection_set(index)
+            if state == 'open':
+                self.update_status(f"{serial}: not responding, pausing commands")
+            elif state == 'closed':
+                self.update_status(f"{serial}: responding again")
+        self.root.after(0, apply)
+    
+    def on_device_select(self, event=None):
+        """Track the selected devices; the first one is the primary device"""
+        self.selected_devices = [self.device_serials[i] for i in self.device_listbox.curselection()]
+        self.current_device = self.selected_devices[0] if self.selected_devices else None
+        self.adb.current_device = self.current_device
+        if len(self.selected_devices) > 1:
+            self.update_status(f"{len(self.selected_devices)} devices selected")
+    
     # ==================== Tool Methods ====================
     
     def show_adb_setup(self):
@@ -696,31 +851,54 @@ class ADBRootToolGUI:
         if not result:
             return
             
-        self.update_status("Starting complete backup...")
+        handles = self.selected_handles()
+        self.update_status(f"Starting complete backup of {len(handles)} device(s)...")
         self.progress.start()
+        remaining = [len(handles)]
+        failures: List[str] = []
+        lock = threading.Lock()
         
-        def backup():
-            backup_folder = self.config.get_backup_folder()
-            os.makedirs(backup_folder, exist_ok=True)
-            
-            # Save device props
-            props_file = os.path.join(backup_folder, "device_properties.txt")
-            props = self.adb.get_device_props([
-                'ro.product.manufacturer',
-                'ro.product.model',
-                'ro.build.version.release',
-                'ro.build.id',
-            ])
-            
-            with open(props_file, 'w') as f:
-                for prop, value in props.items():
-                    f.write(f"{prop}={value}\n")
-            
-            self.root.after(0, self.backup_complete, backup_folder)
-            self.progress.stop()
-            self.update_status("Backup completed")
-            
-        self.run_threaded(backup)
+        def backup(handle: DeviceHandle):
+            try:
+                with tracer.span('complete_backup', 'operation', handle.serial):
+                    backup_folder = self.config.get_backup_folder()
+                    if len(handles) > 1:
+                        backup_folder = os.path.join(backup_folder, handle.serial)
+                    os.makedirs(backup_folder, exist_ok=True)
+                    
+                    # Save device props from a single getprop snapshot
+                    props_file = os.path.join(backup_folder, "device_properties.txt")
+                    with tracer.span('prop_snapshot', serial=handle.serial):
+                        props = handle.get_prop_snapshot()
+                    
+                    with tracer.span('write_properties', serial=handle.serial):
+                        with open(props_file, 'w', encoding='utf-8') as f:
+                            for prop in sorted(props):
+                                f.write(f"{prop}={props[prop]}\n")
+            except Exception as e:
+                with lock:
+                    failures.append(f"{handle.serial}: {e}")
+                self.update_status(f"Backup of {handle.serial} failed: {e}")
+            finally:
+                with lock:
+                    remaining[0] -= 1
+                    done = remaining[0] == 0
+                if done:
+                    self.progress.stop()
+                    if failures:
+                        message = "\n".join(failures)
+                        self.root.after(0, lambda: self.show_error(
+                            "Backup Failed",
+                            f"Backup failed on {len(failures)} of {len(handles)} device(s):\n\n{message}"
+                        ))
+                        self.update_status(f"Backup finished with {len(failures)} error(s)")
+                    else:
+                        self.root.after(0, self.backup_complete, self.config.get_backup_folder())
+                        self.update_status("Backup completed")
+        
+        # Devices are backed up side by side, each through its own handle
+        for handle in handles:
+            self.run_threaded(backup, handle)
     
     def backup_complete(self, backup_folder):
         """Show backup completion message"""
@@ -806,29 +984,39 @@ class ADBRootToolGUI:
         self.update_status("Flashing boot image...")
         self.progress.start()
         
+        # Bound now, so changing the selection mid-flash cannot retarget it
+        handle = self.device
+        serial = handle.serial
+        
         def flash():
-            # Reboot to bootloader
-            self.adb.reboot_device('bootloader')
-            time.sleep(5)
-            
-            # Flash boot image
-            result = self.adb.run_command([self.adb.fastboot_path, 'flash', 'boot', patched_boot])
-            
-            self.progress.stop()
-            
-            if result.success:
-                self.root.after(0, lambda: self.show_info(
-                    "Success",
-                    "Boot image flashed successfully!\n\nDevice will reboot."
-                ))
-                self.adb.run_command([self.adb.fastboot_path, 'reboot'])
-                self.update_status("Flash completed")
-            else:
-                self.root.after(0, lambda: self.show_error(
-                    "Flash Failed",
-                    f"Flash failed!\n\nError: {result.stderr}\n\nPossible issues:\n- Bootloader locked\n- Wrong boot image\n- Fastboot connection"
-                ))
-                self.adb.run_command([self.adb.fastboot_path, 'reboot'])
+            with tracer.span('generic_flash', 'operation', serial):
+                # Reboot to bootloader
+                with tracer.span('reboot_bootloader', serial=serial):
+                    handle.reboot('bootloader')
+                with tracer.span('wait_bootloader', serial=serial):
+                    time.sleep(5)
+                
+                # Flash boot image
+                with tracer.span('flash_boot', serial=serial):
+                    result = self.adb.run_command(handle.fastboot_command(['flash', 'boot', patched_boot]))
+                
+                self.progress.stop()
+                
+                if result.success:
+                    self.root.after(0, lambda: self.show_info(
+                        "Success",
+                        "Boot image flashed successfully!\n\nDevice will reboot."
+                    ))
+                    with tracer.span('reboot_system', serial=serial):
+                        self.adb.run_command(handle.fastboot_command(['reboot']))
+                    self.update_status("Flash completed")
+                else:
+                    self.root.after(0, lambda: self.show_error(
+                        "Flash Failed",
+                        f"Flash failed!\n\nError: {result.stderr}\n\nPossible issues:\n- Bootloader locked\n- Wrong boot image\n- Fastboot connection"
+                    ))
+                    with tracer.span('reboot_system', serial=serial):
+                        self.adb.run_command(handle.fastboot_command(['reboot']))
         
         self.run_threaded(flash)
     
@@ -1422,7 +1610,7 @@ Qualcomm EDL mode (9008):
         
         # Run in background
         def record():
-            self.adb.run_command([self.adb.adb_path, 'shell', 'screenrecord', '/sdcard/screenrecord.mp4'])
+            self.device.run_command(['shell', 'screenrecord', '/sdcard/screenrecord.mp4'])
         
         self.run_threaded(record)
     
@@ -1482,7 +1670,7 @@ Qualcomm EDL mode (9008):
         """Pull files from device"""
         window = tk.Toplevel(self.root)
         window.title("Pull Files from Device")
-        window.geometry("500x300")
+        window.geometry("500x340")
         window.configure(bg=self.style_manager.colors['bg'])
         
         tk.Label(
@@ -1536,6 +1724,18 @@ Qualcomm EDL mode (9008):
             pady=5
         ).pack(pady=5)
         
+        # Archive: the tar stream is kept, gzip-compressed, instead of unpacked
+        archive_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(
+            window,
+            text="Save as compressed archive (.tar.gz)",
+            variable=archive_var,
+            bg=self.style_manager.colors['bg'],
+            fg='white',
+            selectcolor=self.style_manager.colors['button_bg'],
+            activebackground=self.style_manager.colors['bg']
+        ).pack(anchor='w', padx=20)
+        
         def start_pull():
             source = source_var.get()
             dest = dest_var.get()
@@ -1547,21 +1747,33 @@ Qualcomm EDL mode (9008):
             self.update_status(f"Pulling files from {source}...")
             self.progress.start()
             
+            def report(progress):
+                self.update_status(f"Pulling {source}... {progress.files_done}/{progress.total_files} files "
+                                   f"({progress.fraction:.0%})")
+            
+            archive = None
+            if archive_var.get():
+                archive = os.path.join(dest, f"{os.path.basename(source.rstrip('/')) or 'root'}.tar.gz")
+            
             def pull():
-                result = self.adb.pull_file(source, dest)
+                if archive:
+                    result = self.device.archive_tree(source, archive, progress=report)
+                else:
+                    result = self.device.pull_tree(source, dest, progress=report)
                 
                 self.progress.stop()
                 
                 if result.success:
                     self.root.after(0, lambda: self.show_info(
                         "Pull Successful",
-                        f"Files pulled successfully to:\n{dest}"
+                        f"Files pulled successfully to:\n{archive or dest}\n\n{result.summary()}"
                     ))
                     self.update_status("Files pulled")
                 else:
+                    failed = "\n".join(f"{path}: {error}" for path, error in result.failed[:10])
                     self.root.after(0, lambda: self.show_error(
                         "Pull Failed",
-                        f"Failed to pull files:\n{result.stderr}"
+                        f"Failed to pull files:\n{result.summary()}\n\n{failed}".rstrip()
                     ))
                 
                 window.destroy()
@@ -1671,7 +1883,7 @@ Qualcomm EDL mode (9008):
             self.progress.start()
             
             def push():
-                result = self.adb.push_file(source, dest)
+                result = self.device.push_file(source, dest)
                 
                 self.progress.stop()
                 
@@ -1725,7 +1937,7 @@ Qualcomm EDL mode (9008):
         
         # For Windows, open command prompt with ADB
         import subprocess
-        subprocess.Popen(['start', 'cmd', '/k', f'"{self.adb.adb_path}" shell'], shell=True)
+        subprocess.Popen(['start', 'cmd', '/k', f'"{self.adb.adb_path}" -s {self.current_device} shell'], shell=True)
     
     def show_reboot_menu(self):
         """Show reboot options menu"""
@@ -1754,7 +1966,7 @@ Qualcomm EDL mode (9008):
             btn = tk.Button(
                 window,
                 text=text,
-                command=lambda cmd=command: (self.adb.reboot_device(cmd), window.destroy()),
+                command=lambda cmd=command: (self.reboot_selected(cmd), window.destroy()),
                 bg=self.style_manager.colors['button_bg'],
                 fg='white',
                 relief='raised',
@@ -1775,6 +1987,11 @@ Qualcomm EDL mode (9008):
             pady=5
         ).pack(pady=10)
     
+    def reboot_selected(self, mode: str = ""):
+        """Reboot every selected device in parallel"""
+        for handle in self.selected_handles():
+            self.run_threaded(handle.reboot, mode)
+    
     def remove_bloatware(self):
         """Show bloatware removal window"""
         window = tk.Toplevel(self.root)
@@ -1802,21 +2019,22 @@ Qualcomm EDL mode (9008):
         self.update_status("Getting package list...")
         self.progress.start()
         
+        device_mgr = self.device_mgr
+        
+        bloat = {}
+        
         def get_packages():
-            apps = self.device_mgr.get_installed_apps()
+            inventory = device_mgr.get_package_inventory()
             
             self.progress.stop()
             
-            if apps:
-                # Filter for common bloatware
-                bloat_keywords = ['facebook', 'test', 'demo', 'sample', 'carrier', 'bloat']
-                bloat_packages = []
+            if inventory:
+                # Curated rules for this brand and SoC; disabled packages are done
+                bloat.update(device_mgr.classify_packages(inventory))
+                enabled = inventory.enabled_names()
+                matches = {name: rule for name, rule in bloat.items() if name in enabled}
                 
-                for pkg in apps:
-                    if any(keyword in pkg.lower() for keyword in bloat_keywords):
-                        bloat_packages.append(pkg)
-                
-                self.root.after(0, lambda: self.display_bloatware(text_widget, bloat_packages))
+                self.root.after(0, lambda: self.display_bloatware(text_widget, matches))
             else:
                 self.root.after(0, lambda: text_widget.insert('end', "Error getting package list"))
                 text_widget.config(state='disabled')
@@ -1826,7 +2044,7 @@ Qualcomm EDL mode (9008):
         # Package entry
         tk.Label(
             window,
-            text="Package to disable:",
+            text="Packages to disable (space or comma separated):",
             bg=self.style_manager.colors['bg'],
             fg='white'
         ).pack(anchor='w', padx=20)
@@ -1835,22 +2053,74 @@ Qualcomm EDL mode (9008):
         pkg_entry = tk.Entry(window, textvariable=pkg_var, width=50)
         pkg_entry.pack(padx=20, pady=5, fill='x')
         
-        def disable_package():
-            pkg = pkg_var.get().strip()
-            if pkg:
-                self.adb.run_command([self.adb.adb_path, 'shell', 'pm', 'disable-user', '--user', '0', pkg])
-                self.show_info("Disabled", f"Package disabled: {pkg}")
+        def run_batch(title, run):
+            # One script per batch and one summary dialog, off the UI thread
+            def worker():
+                self.progress.start()
+                batch = run()
+                self.progress.stop()
+                if batch is None:
+                    self.root.after(0, lambda: self.show_info(title, "Nothing to undo"))
+                    return
+                inventory = device_mgr.get_package_inventory()
+                enabled = inventory.enabled_names()
+                matches = {name: rule for name, rule in bloat.items() if name in enabled}
+                self.root.after(0, lambda: self.display_bloatware(text_widget, matches))
+                show = self.show_error if batch.failed else self.show_info
+                self.root.after(0, lambda: show(title, batch.summary()))
+            self.run_threaded(worker)
+        
+        def disable_packages(packages):
+            refused = [pkg for pkg in packages if pkg in bloat and bloat[pkg].safety == 'unsafe']
+            if refused:
+                self.show_error("Disable Refused", "Required by the system:\n" + "\n".join(
+                    f"{pkg} ({bloat[pkg].description})" for pkg in refused))
+                return
+            if packages:
+                run_batch("Disable Packages",
+                          lambda: device_mgr.apply_package_actions([('disable', pkg) for pkg in packages]))
+        
+        def disable_entered():
+            disable_packages(list(dict.fromkeys(pkg_var.get().replace(',', ' ').split())))
+        
+        def disable_recommended():
+            enabled = device_mgr.get_package_inventory().enabled_names()
+            packages = sorted(name for name, rule in bloat.items()
+                              if rule.safety == 'recommended' and name in enabled)
+            if not packages:
+                self.show_info("Disable Recommended", "No recommended packages left to disable")
+            elif self.show_yesno_dialog("Disable Recommended",
+                                        f"Disable {len(packages)} packages rated safe to remove?\n\n"
+                                        "The batch can be undone with Undo Last Batch."):
+                disable_packages(packages)
+        
+        def undo_last_batch():
+            batch = device_mgr.last_package_batch()
+            if batch is None:
+                self.show_info("Undo Last Batch", "Nothing to undo")
+            elif self.show_yesno_dialog("Undo Last Batch",
+                                        f"Revert {len(batch.succeeded)} package changes from "
+                                        f"{datetime.fromtimestamp(batch.started):%Y-%m-%d %H:%M}?"):
+                run_batch("Undo Last Batch", lambda: device_mgr.rollback_package_batch(batch))
         
-        tk.Button(
-            window,
-            text="Disable Package",
-            command=disable_package,
-            bg='#c62828',
-            fg='white',
-            relief='raised',
-            padx=10,
-            pady=5
-        ).pack(pady=10)
+        btn_frame = tk.Frame(window, bg=self.style_manager.colors['bg'])
+        btn_frame.pack(pady=10)
+        
+        for text, command, color in [
+            ("Disable Packages", disable_entered, '#c62828'),
+            ("Disable All Recommended", disable_recommended, '#c62828'),
+            ("Undo Last Batch", undo_last_batch, self.style_manager.colors['button_bg']),
+        ]:
+            tk.Button(
+                btn_frame,
+                text=text,
+                command=command,
+                bg=color,
+                fg='white',
+                relief='raised',
+                padx=10,
+                pady=5
+            ).pack(side='left', padx=5)
         
         tk.Button(
             window,
@@ -1863,18 +2133,28 @@ Qualcomm EDL mode (9008):
             pady=5
         ).pack(pady=10)
     
-    def display_bloatware(self, text_widget, packages):
-        """Display bloatware packages in text widget"""
+    def display_bloatware(self, text_widget, matches):
+        """Display classified bloatware grouped by removal safety"""
         text_widget.config(state='normal')
         text_widget.delete(1.0, 'end')
         
-        if packages:
-            text_widget.insert('end', f"Found {len(packages)} possible bloatware packages:\n\n")
-            for pkg in packages:
-                text_widget.insert('end', f"{pkg}\n")
+        removable = {name: rule for name, rule in matches.items() if rule.safety != 'unsafe'}
+        if removable:
+            text_widget.insert('end', f"Found {len(removable)} bloatware packages:\n")
+            for safety in SAFETY_LEVELS[:-1]:
+                group = sorted((rule.category, name, rule) for name, rule in removable.items()
+                               if rule.safety == safety)
+                if not group:
+                    continue
+                text_widget.insert('end', f"\n[{safety.upper()}] ({len(group)})\n")
+                for category, name, rule in group:
+                    text_widget.insert('end', f"  {name:<50} {category:<10} {rule.description}\n")
         else:
-            text_widget.insert('end', "No obvious bloatware packages found.\n")
-            text_widget.insert('end', "Common bloatware keywords: facebook, test, demo, sample, carrier\n")
+            text_widget.insert('end', "No known bloatware packages found.\n")
+        
+        protected = len(matches) - len(removable)
+        if protected:
+            text_widget.insert('end', f"\n{protected} system-critical packages hidden\n")
         
         text_widget.config(state='disabled')
         self.update_status("Package list loaded")
@@ -1897,39 +2177,31 @@ Qualcomm EDL mode (9008):
         text_widget.insert('end', "Starting logcat...\n")
         text_widget.insert('end', "Press Stop to stop logging.\n\n")
         
-        # Control variables
-        self.logcat_running = True
-        self.logcat_process = None
+        def append(line):
+            text_widget.insert('end', line)
+            text_widget.see('end')
         
         def start_logcat():
-            import subprocess
-            self.logcat_process = subprocess.Popen(
-                [self.adb.adb_path, 'logcat'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
+            stream = self.logcat_stream = self.device.stream_shell('logcat')
             
             # Read output in background thread
             def read_output():
-                while self.logcat_running and self.logcat_process:
-                    line = self.logcat_process.stdout.readline()
-                    if line:
-                        window.after(0, text_widget.insert, 'end', line)
-                        text_widget.see('end')
-                    else:
-                        break
+                with stream:
+                    for line in stream.lines(keepends=True):
+                        if stream.cancelled:
+                            return
+                        window.after(0, append, line)
+                if not stream.cancelled and not stream.success:
+                    reason = stream.stderr.strip() or f"exit code {stream.returncode}"
+                    window.after(0, append, f"\nlogcat exited: {reason}\n")
             
             threading.Thread(target=read_output, daemon=True).start()
         
         def stop_logcat():
-            self.logcat_running = False
-            if self.logcat_process:
-                self.logcat_process.terminate()
-                self.logcat_process = None
-            text_widget.insert('end', "\n\nLogcat stopped.\n")
+            if self.logcat_stream:
+                self.logcat_stream.cancel()
+                self.logcat_stream = None
+                text_widget.insert('end', "\n\nLogcat stopped.\n")
         
         # Start logcat
         start_logcat()
@@ -1996,28 +2268,158 @@ Qualcomm EDL mode (9008):
             pady=5
         ).pack(side='right', padx=5)
     
+    def show_operations_stats(self):
+        """Show per-command and per-operation latency statistics"""
+        window = tk.Toplevel(self.root)
+        window.title("Operations Stats")
+        window.geometry("900x500")
+        window.configure(bg=self.style_manager.colors['bg'])
+        
+        stats_frame = tk.LabelFrame(
+            window,
+            text="Commands and Operations",
+            bg=self.style_manager.colors['bg'],
+            fg='white',
+            padx=10,
+            pady=10
+        )
+        stats_frame.pack(fill='both', expand=True, padx=10, pady=10)
+        
+        columns = ("Kind", "Name", "Serial", "Count", "Failed", "Mean", "p50", "p95", "Total", "Bytes")
+        tree = tk.ttk.Treeview(stats_frame, columns=columns, show="headings", height=15)
+        for column in columns:
+            tree.heading(column, text=column)
+            tree.column(column, width=160 if column == "Name" else 75, anchor='w' if column in ("Kind", "Name", "Serial") else 'e')
+        
+        scrollbar = tk.ttk.Scrollbar(stats_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        def refresh():
+            tree.delete(*tree.get_children())
+            rows = sorted(summary_rows(), key=lambda row: row['total'], reverse=True)
+            for row in rows:
+                tree.insert("", "end", values=(
+                    row['kind'], row['name'], row['serial'] or '-', row['count'], row['failures'],
+                    f"{row['mean'] * 1000:.1f} ms", f"{row['p50'] * 1000:.1f} ms",
+                    f"{row['p95'] * 1000:.1f} ms", f"{row['total']:.2f} s", format_file_size(row['bytes'])
+                ))
+        
+        def export(extension, label):
+            filename = filedialog.asksaveasfilename(
+                defaultextension=extension,
+                filetypes=[(label, f"*{extension}"), ("All files", "*.*")],
+                initialfile=f"metrics_{self.config.TIMESTAMP}{extension}"
+            )
+            if filename:
+                try:
+                    metrics_registry.write(filename)
+                    self.show_info("Exported", f"Metrics saved to:\n{filename}")
+                except OSError as e:
+                    self.show_error("Export Failed", str(e))
+        
+        def reset():
+            metrics_registry.reset()
+            refresh()
+        
+        def toggle_trace():
+            if not tracer.enabled:
+                tracer.start()
+                trace_button.config(text="Stop Trace")
+                self.update_status("Tracing operations...")
+                return
+            tracer.stop()
+            trace_button.config(text="Start Trace")
+            filename = filedialog.asksaveasfilename(
+                defaultextension=".json",
+                filetypes=[("Chrome trace", "*.json"), ("All files", "*.*")],
+                initialfile=f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            )
+            if filename:
+                try:
+                    tracer.write(filename)
+                    self.show_info("Trace Saved", f"Trace saved to:\n{filename}\n\nOpen it in chrome://tracing or ui.perfetto.dev")
+                except OSError as e:
+                    self.show_error("Trace Failed", str(e))
+            self.update_status("Ready")
+        
+        btn_frame = tk.Frame(window, bg=self.style_manager.colors['bg'])
+        btn_frame.pack(fill='x', padx=10, pady=10)
+        
+        for text, command in [
+            ("Refresh", refresh),
+            ("Export Prometheus", lambda: export(".prom", "Prometheus text")),
+            ("Export JSON", lambda: export(".json", "JSON snapshot")),
+            ("Reset", reset),
+        ]:
+            tk.Button(
+                btn_frame,
+                text=text,
+                command=command,
+                bg=self.style_manager.colors['button_bg'],
+                fg='white',
+                relief='raised',
+                padx=10,
+                pady=5
+            ).pack(side='left', padx=5)
+        
+        # Tracing is process-wide and keeps running after the window closes
+        trace_button = tk.Button(
+            btn_frame,
+            text="Stop Trace" if tracer.enabled else "Start Trace",
+            command=toggle_trace,
+            bg=self.style_manager.colors['button_bg'],
+            fg='white',
+            relief='raised',
+            padx=10,
+            pady=5
+        )
+        trace_button.pack(side='left', padx=5)
+        
+        tk.Button(
+            btn_frame,
+            text="Close",
+            command=window.destroy,
+            bg=self.style_manager.colors['button_bg'],
+            fg='white',
+            relief='raised',
+            padx=10,
+            pady=5
+        ).pack(side='right', padx=5)
+        
+        refresh()
+    
     def check_root(self):
         """Check root status"""
         if not self.current_device:
             self.show_warning("No Device", "Connect a device first")
             return
         
+        def show(status):
+            rooted, _, method = status
+            if status == ROOT_UNKNOWN:
+                self.show_warning("Root Status", "[?] UNKNOWN\n\nThe device did not answer; check the connection.")
+            elif rooted:
+                self.show_info("Root Status", f"[✓] ROOTED - {method or 'Unknown'}\n")
+            else:
+                self.show_info("Root Status", "[✗] NOT ROOTED\n\nNo su binary found.")
+        
+        # Detected earlier this boot: no device round trip needed
+        device_mgr = self.device_mgr
+        status = device_mgr.cached_root_status()
+        if status is not None:
+            show(status)
+            return
+        
         self.update_status("Checking root status...")
         self.progress.start()
         
         def check():
-            status = self.device_mgr.check_root_status()
+            status = device_mgr.check_root_status()
             
             self.progress.stop()
-            
-            if status['rooted']:
-                message = f"[✓] ROOTED - {status['method']}\n"
-                if status['version'] != 'Unknown':
-                    message += f"Version: {status['version']}\n"
-                self.root.after(0, lambda: self.show_info("Root Status", message))
-            else:
-                self.root.after(0, lambda: self.show_info("Root Status", "[✗] NOT ROOTED\n\nNo su binary found."))
-            
+            self.root.after(0, lambda: show(status))
             self.update_status("Root check completed")
         
         self.run_threaded(check)
@@ -2029,6 +2431,30 @@ Qualcomm EDL mode (9008):
         window.geometry("800x600")
         window.configure(bg=self.style_manager.colors['bg'])
         
+        device_mgr = self.device_mgr
+        inventory = {'packages': None}
+        
+        # Filtering and sorting work on the in-memory package index
+        filter_frame = tk.Frame(window, bg=self.style_manager.colors['bg'])
+        filter_frame.pack(fill='x', padx=10, pady=(10, 0))
+        
+        tk.Label(filter_frame, text="Show:", bg=self.style_manager.colors['bg'], fg='white').pack(side='left')
+        scope_var = tk.StringVar(value="All")
+        tk.ttk.Combobox(
+            filter_frame, textvariable=scope_var, values=list(INVENTORY_SCOPES) + [CHANGES_SCOPE],
+            state='readonly', width=10
+        ).pack(side='left', padx=5)
+        
+        tk.Label(filter_frame, text="Sort:", bg=self.style_manager.colors['bg'], fg='white').pack(side='left')
+        sort_var = tk.StringVar(value="name")
+        tk.ttk.Combobox(
+            filter_frame, textvariable=sort_var, values=list(PackageInventory.SORT_KEYS), state='readonly', width=12
+        ).pack(side='left', padx=5)
+        
+        tk.Label(filter_frame, text="Search:", bg=self.style_manager.colors['bg'], fg='white').pack(side='left')
+        search_var = tk.StringVar()
+        tk.Entry(filter_frame, textvariable=search_var, width=30).pack(side='left', padx=5, fill='x', expand=True)
+        
         text_widget = scrolledtext.ScrolledText(
             window,
             bg='#0c0c0c',
@@ -2037,22 +2463,42 @@ Qualcomm EDL mode (9008):
         )
         text_widget.pack(fill='both', expand=True, padx=10, pady=10)
         
-        self.update_status("Getting app list...")
-        self.progress.start()
+        def render(*_):
+            if inventory['packages'] is None:
+                return
+            if scope_var.get() == CHANGES_SCOPE:
+                self.display_package_changes(text_widget, device_mgr.package_changes(), search_var.get().strip())
+                return
+            packages = inventory['packages'].filter(contains=search_var.get().strip(), **INVENTORY_SCOPES[scope_var.get()])
+            self.display_apps(text_widget, packages.sort(sort_var.get()))
+        
+        for var in (scope_var, sort_var, search_var):
+            var.trace_add('write', render)
         
-        def get_apps():
-            apps = self.device_mgr.get_installed_apps()
+        def load(refresh: bool = False):
+            self.update_status("Getting app list...")
+            self.progress.start()
             
-            self.progress.stop()
+            def get_apps():
+                packages = device_mgr.get_package_inventory(refresh=refresh)
+                
+                self.progress.stop()
+                
+                if packages:
+                    inventory['packages'] = packages
+                    changes = device_mgr.package_changes()
+                    if changes and changes[1]:
+                        # Something moved since the last visit: lead with that
+                        self.root.after(0, lambda: scope_var.set(CHANGES_SCOPE))
+                    self.root.after(0, render)
+                else:
+                    self.root.after(0, lambda: text_widget.insert('end', "Error getting app list"))
+                    text_widget.config(state='disabled')
+                    self.update_status("Failed to get apps")
             
-            if apps:
-                self.root.after(0, lambda: self.display_apps(text_widget, apps))
-            else:
-                self.root.after(0, lambda: text_widget.insert('end', "Error getting app list"))
-                text_widget.config(state='disabled')
-                self.update_status("Failed to get apps")
+            self.run_threaded(get_apps)
         
-        self.run_threaded(get_apps)
+        load()
         
         # Buttons
         btn_frame = tk.Frame(window, bg=self.style_manager.colors['bg'])
@@ -2083,6 +2529,17 @@ Qualcomm EDL mode (9008):
             pady=5
         ).pack(side='left', padx=5)
         
+        tk.Button(
+            btn_frame,
+            text="Reload",
+            command=lambda: load(refresh=True),
+            bg=self.style_manager.colors['button_bg'],
+            fg='white',
+            relief='raised',
+            padx=10,
+            pady=5
+        ).pack(side='left', padx=5)
+        
         tk.Button(
             btn_frame,
             text="Close",
@@ -2094,21 +2551,49 @@ Qualcomm EDL mode (9008):
             pady=5
         ).pack(side='right', padx=5)
     
-    def display_apps(self, text_widget, apps):
+    def display_apps(self, text_widget, packages: PackageInventory):
         """Display apps in text widget"""
         text_widget.config(state='normal')
         text_widget.delete(1.0, 'end')
         
-        text_widget.insert('end', f"Found {len(apps)} installed apps:\n\n")
+        text_widget.insert('end', f"Found {len(packages)} installed apps:\n\n")
+        
+        lines = []
+        for i, package in enumerate(packages, 1):
+            kind = "system" if package.system else "user"
+            state = "" if package.enabled else " [disabled]"
+            lines.append(f"{i:4}. {package.name:<50} {package.version_code:>10}  {kind:<6} "
+                         f"{package.installer or '-'}{state}")
+        text_widget.insert('end', "\n".join(lines) + "\n")
         
-        for i, app in enumerate(apps[:100], 1):  # Show first 100
-            text_widget.insert('end', f"{i:3}. {app}\n")
+        text_widget.config(state='disabled')
+        self.update_status(f"Found {len(packages)} apps")
+    
+    def display_package_changes(self, text_widget, changes, search: str = ''):
+        """Display what changed in the package list since the last visit"""
+        text_widget.config(state='normal')
+        text_widget.delete(1.0, 'end')
         
-        if len(apps) > 100:
-            text_widget.insert('end', f"\n... and {len(apps)-100} more apps.\n")
+        if changes is None:
+            text_widget.insert('end', "First visit: no earlier package list stored for this device.\n")
+        else:
+            taken, diff = changes
+            since = datetime.fromtimestamp(taken).strftime('%Y-%m-%d %H:%M')
+            text_widget.insert('end', f"Changes since last visit ({since}): {diff.summary()}\n")
+            sections = [
+                ("Installed", diff.installed),
+                ("Removed", diff.removed),
+                ("Updated", [f"{name}  {old} -> {new}" for name, old, new in diff.updated]),
+                ("Disabled", diff.disabled),
+                ("Enabled", diff.enabled),
+            ]
+            for title, lines in sections:
+                lines = [line for line in lines if search.lower() in line.lower()]
+                if lines:
+                    text_widget.insert('end', f"\n[{title}]\n" + "\n".join(lines) + "\n")
         
         text_widget.config(state='disabled')
-        self.update_status(f"Found {len(apps)} apps")
+        self.update_status("Package changes loaded")
     
     def backup_single_app(self):
         """Backup single app"""
@@ -2134,9 +2619,18 @@ Qualcomm EDL mode (9008):
         ).pack(anchor='w', padx=20)
         
         pkg_var = tk.StringVar()
-        pkg_entry = tk.Entry(window, textvariable=pkg_var, width=50)
+        pkg_entry = tk.ttk.Combobox(window, textvariable=pkg_var, width=50)
         pkg_entry.pack(padx=20, pady=5, fill='x')
         
+        # Offer the user apps from the shared package index
+        device_mgr = self.device_mgr
+        
+        def load_packages():
+            names = device_mgr.get_package_inventory().filter(system=False).sort().names
+            self.root.after(0, lambda: window.winfo_exists() and pkg_entry.configure(values=names))
+        
+        self.run_threaded(load_packages)
+        
         # Output file
         tk.Label(
             window,
@@ -2250,6 +2744,11 @@ Qualcomm EDL mode (9008):
             self.show_warning("No Device", "Connect a device first")
             return
         
+        # An interrupted backup is finished in place instead of starting over
+        backup_folder = self.backup_mgr.interrupted_backup()
+        resume_note = (f"An interrupted backup will be resumed:\n{os.path.basename(backup_folder)}\n\n"
+                       if backup_folder else "")
+        
         result = self.show_yesno_dialog(
             "Backup User Data",
             "This will backup user data including:\n\n"
@@ -2257,6 +2756,8 @@ Qualcomm EDL mode (9008):
             "- Downloads\n"
             "- Documents\n"
             "- WhatsApp (if exists)\n\n"
+            "Files unchanged since the last backup are linked, not pulled again.\n\n"
+            f"{resume_note}"
             "Continue?"
         )
         
@@ -2267,7 +2768,9 @@ Qualcomm EDL mode (9008):
         self.progress.start()
         
         def backup():
-            stats = self.backup_mgr.backup_user_data(self.config.get_backup_folder())
+            with tracer.span('backup_user_data', 'operation', self.current_device):
+                stats = self.backup_mgr.backup_user_data(
+                    backup_folder or self.config.get_backup_folder(), BACKUP_FOLDERS, self.update_status)
             
             self.progress.stop()
             
@@ -2288,7 +2791,7 @@ Qualcomm EDL mode (9008):
             return
         
         # Try to open file manager via ADB
-        self.adb.run_command([self.adb.adb_path, 'shell', 'am', 'start', '-n', 'com.android.documentsui/.DocumentsActivity'])
+        self.device.run_command(['shell', 'am', 'start', '-n', 'com.android.documentsui/.DocumentsActivity'])
         self.show_info("File Explorer", "Opening file explorer on device...")
     
     def show_brand_guide(self, brand):
@@ -2489,7 +2992,7 @@ OnePlus devices generally have good developer support."""
         # Get device info if available
         device_info = ""
         if self.current_device:
-            props = self.adb.get_device_props(['ro.product.manufacturer', 'ro.product.model'])
+            props = self.device.get_device_props(['ro.product.manufacturer', 'ro.product.model'])
             if props:
                 manufacturer = props.get('ro.product.manufacturer', 'Unknown')
                 model = props.get('ro.product.model', 'Unknown')
@@ -2565,6 +3068,26 @@ OnePlus devices generally have good developer support."""
     def run(self):
         """Start the GUI application"""
         self.root.mainloop()
+        
+        # Don't leave adb children or sessions behind once the window closes
+        self.shutdown()
+    
+    def shutdown(self):
+        """Stop background work and reap child processes"""
+        self.cancel_active_tokens()
+        self.device_tracker.stop()
+        self.adb.shutdown()
+        if self.config.METRICS_FILE:
+            try:
+                metrics_registry.write(self.config.METRICS_FILE)
+            except OSError as e:
+                print(f"Error writing metrics: {e}")
+        if self.config.TRACE_FILE:
+            tracer.stop()
+            try:
+                tracer.write(self.config.TRACE_FILE)
+            except OSError as e:
+                print(f"Error writing trace: {e}")
 
 # ============================================
 # MAIN ENTRY POINT
@@ -0,0 +1,378 @@
+"""
+Benchmarks for core ADB operations
+
+Runs each operation against the device simulator (or a real device with
+--no-simulator) and reports p50/p95/p99 latency, throughput, spawned
+processes and peak RSS. Results are written as JSON so two commits can
+be compared:
+
+    python -m tests.benchmarks --output before.json
+    git checkout other-branch
+    python -m tests.benchmarks --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.constants import BACKUP_FOLDERS, DEVICE_PROPERTIES_BASIC
+from config.settings import AppConfig
+from core.adb_manager import ADBManager
+from core.backup_manager import BackupManager
+from core.device_handle import DeviceHandle
+from core.device_manager import DeviceManager
+from tests.support.device_simulator import DeviceSimulator
+from utils.file_utils import get_directory_size
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# ==================== Measurement ====================
+
+class _ProcessCounter:
+    """Counts child processes through the subprocess audit event
+    
+    Audit hooks cannot be removed, so one counter is installed per process
+    and benchmarks read the difference.
+    """
+    
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+        sys.addaudithook(self._hook)
+    
+    def _hook(self, event: str, args):
+        if event in ('subprocess.Popen', 'os.posix_spawn', 'os.spawn', 'os.startfile'):
+            with self._lock:
+                self.count += 1
+
+_process_counter: Optional[_ProcessCounter] = None
+
+def spawned_processes() -> int:
+    """Child processes started by this interpreter so far"""
+    global _process_counter
+    if _process_counter is None:
+        _process_counter = _ProcessCounter()
+    return _process_counter.count
+
+def reset_peak_rss():
+    """Reset the kernel's peak RSS counter where supported (Linux)"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    return None
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+@dataclass
+class BenchmarkResult:
+    """Summary of one benchmark"""
+    name: str
+    iterations: int
+    concurrency: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+    ops_per_sec: float
+    bytes_per_sec: Optional[float]
+    processes: int
+    peak_rss_mb: Optional[float]
+    errors: int = 0
+    
+    @classmethod
+    def from_samples(cls, name: str, samples: List[float], wall: float, total_bytes: int,
+                     concurrency: int, processes: int, errors: int) -> 'BenchmarkResult':
+        ordered = sorted(samples)
+        to_ms = 1000.0
+        rss = peak_rss_mb()
+        return cls(
+            name=name,
+            iterations=len(samples),
+            concurrency=concurrency,
+            p50_ms=round(percentile(ordered, 50) * to_ms, 3),
+            p95_ms=round(percentile(ordered, 95) * to_ms, 3),
+            p99_ms=round(percentile(ordered, 99) * to_ms, 3),
+            mean_ms=round(statistics.fmean(ordered) * to_ms, 3) if ordered else 0.0,
+            max_ms=round(ordered[-1] * to_ms, 3) if ordered else 0.0,
+            ops_per_sec=round(len(samples) / wall, 2) if wall > 0 else 0.0,
+            bytes_per_sec=round(total_bytes / wall, 1) if total_bytes and wall > 0 else None,
+            processes=processes,
+            peak_rss_mb=round(rss, 1) if rss is not None else None,
+            errors=errors,
+        )
+
+# ==================== Benchmarks ====================
+
+# An operation runs once against a device handle and returns the number of
+# bytes it moved (or None when throughput in bytes is meaningless)
+Operation = Callable[[DeviceHandle, str], Optional[int]]
+
+@dataclass
+class Benchmark:
+    name: str
+    operation: Operation
+    iterations: Optional[int] = None
+    description: str = ''
+
+def _get_devices(device: DeviceHandle, scratch: str) -> None:
+    if not device.adb.get_devices():
+        raise RuntimeError("no devices listed")
+
+def _get_device_props(device: DeviceHandle, scratch: str) -> None:
+    if not device.get_device_props(DEVICE_PROPERTIES_BASIC).get('ro.product.model'):
+        raise RuntimeError("model property missing")
+
+def _get_detailed_device_info(device: DeviceHandle, scratch: str) -> None:
+    DeviceManager(device).get_detailed_device_info()
+
+def _check_root_status(device: DeviceHandle, scratch: str) -> None:
+    DeviceManager(device).check_root_status()
+
+def _get_installed_apps(device: DeviceHandle, scratch: str) -> None:
+    if not DeviceManager(device).get_installed_apps():
+        raise RuntimeError("no packages listed")
+
+def _pull_many_small(device: DeviceHandle, scratch: str) -> int:
+    target = tempfile.mkdtemp(dir=scratch)
+    result = device.pull_file('/sdcard/DCIM', target)
+    if not result.success:
+        raise RuntimeError(result.stderr)
+    return get_directory_size(target)
+
+def _pull_large(device: DeviceHandle, scratch: str) -> int:
+    target = tempfile.mkdtemp(dir=scratch)
+    result = device.pull_file('/sdcard/Download/large_file.bin', target)
+    if not result.success:
+        raise RuntimeError(result.stderr)
+    return get_directory_size(target)
+
+def _backup_user_data(device: DeviceHandle, scratch: str) -> int:
+    folder = tempfile.mkdtemp(dir=scratch)
+    BackupManager(device).backup_user_data(folder, BACKUP_FOLDERS)
+    return get_directory_size(folder)
+
+BENCHMARKS = [
+    Benchmark('get_devices', _get_devices, description="adb devices -l"),
+    Benchmark('get_device_props', _get_device_props, description="basic props from one getprop dump"),
+    Benchmark('get_detailed_device_info', _get_detailed_device_info, description="props, storage, battery"),
+    Benchmark('check_root_status', _check_root_status, description="su / magisk / ksud probes"),
+    Benchmark('get_installed_apps', _get_installed_apps, description="pm list packages"),
+    Benchmark('pull_many_small_files', _pull_many_small, iterations=10, description="pull /sdcard/DCIM"),
+    Benchmark('pull_large_file', _pull_large, iterations=10, description="pull one large file"),
+    Benchmark('backup_user_data', _backup_user_data, iterations=5, description="BackupManager.backup_user_data"),
+]
+
+def run_benchmark(benchmark: Benchmark, devices: List[DeviceHandle], iterations: int,
+                  warmup: int = 1, concurrency: int = 1) -> BenchmarkResult:
+    """Run one benchmark, spreading iterations over devices
+    
+    Warmup iterations fill caches and open shell sessions first, so the
+    figures describe steady state. With concurrency > 1 that many
+    operations run at once, each on its own device where possible.
+    """
+    if benchmark.iterations:
+        iterations = min(benchmark.iterations, iterations)
+    scratch = tempfile.mkdtemp(prefix=f"bench_{benchmark.name}_")
+    try:
+        for i in range(warmup):
+            benchmark.operation(devices[i % len(devices)], scratch)
+        
+        samples: List[float] = []
+        total_bytes = 0
+        errors = 0
+        lock = threading.Lock()
+        
+        def one(i: int):
+            nonlocal total_bytes, errors
+            start = time.perf_counter()
+            try:
+                moved = benchmark.operation(devices[i % len(devices)], scratch)
+            except Exception:
+                with lock:
+                    errors += 1
+                return
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append(elapsed)
+                total_bytes += moved or 0
+        
+        reset_peak_rss()
+        processes = spawned_processes()
+        wall_start = time.perf_counter()
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as pool:
+                list(pool.map(one, range(iterations)))
+        else:
+            for i in range(iterations):
+                one(i)
+        wall = time.perf_counter() - wall_start
+        processes = spawned_processes() - processes
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    
+    return BenchmarkResult.from_samples(benchmark.name, samples, wall, total_bytes,
+                                        concurrency, processes, errors)
+
+def run_suite(adb: ADBManager, serials: List[str], iterations: int = 50, warmup: int = 1,
+              concurrency: int = 1, only: Optional[List[str]] = None,
+              progress: Optional[Callable[[BenchmarkResult], None]] = None) -> List[BenchmarkResult]:
+    """Run every (or the selected) benchmark"""
+    devices = [adb.device(serial) for serial in serials]
+    results = []
+    for benchmark in BENCHMARKS:
+        if only and benchmark.name not in only:
+            continue
+        result = run_benchmark(benchmark, devices, iterations, warmup, concurrency)
+        results.append(result)
+        if progress:
+            progress(result)
+    return results
+
+# ==================== Reporting ====================
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def build_report(results: List[BenchmarkResult], settings: Dict) -> Dict:
+    """JSON-serialisable report of a run"""
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': settings,
+        },
+        'results': {result.name: asdict(result) for result in results},
+    }
+
+def format_table(results: List[BenchmarkResult], baseline: Optional[Dict] = None) -> str:
+    """Human readable summary, with p50 and throughput deltas against a baseline report"""
+    header = f"{'benchmark':<26} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'MB/s':>8} {'procs':>6} {'RSS MB':>7}"
+    lines = [header, '-' * len(header)]
+    old = (baseline or {}).get('results', {})
+    for r in results:
+        mb = f"{r.bytes_per_sec / (1024 * 1024):.1f}" if r.bytes_per_sec else '-'
+        rss = f"{r.peak_rss_mb:.0f}" if r.peak_rss_mb is not None else '-'
+        line = (f"{r.name:<26} {r.p50_ms:>9.2f} {r.p95_ms:>9.2f} {r.p99_ms:>9.2f} {r.ops_per_sec:>9.1f} "
+                f"{mb:>8} {r.processes:>6} {rss:>7}")
+        if r.errors:
+            line += f"  ({r.errors} errors)"
+        previous = old.get(r.name)
+        if previous and previous.get('p50_ms'):
+            change = (r.p50_ms - previous['p50_ms']) / previous['p50_ms'] * 100
+            line += f"  p50 {change:+.1f}%"
+            if previous.get('ops_per_sec'):
+                line += f", ops/s {(r.ops_per_sec - previous['ops_per_sec']) / previous['ops_per_sec'] * 100:+.1f}%"
+        lines.append(line)
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark core ADB operations")
+    parser.add_argument('--iterations', type=int, default=50, help="measured runs per benchmark")
+    parser.add_argument('--warmup', type=int, default=1, help="unmeasured runs first")
+    parser.add_argument('--concurrency', type=int, default=1, help="operations in flight at once")
+    parser.add_argument('--devices', type=int, default=1, help="simulated devices")
+    parser.add_argument('--latency', type=float, default=2.0, help="simulated round trip in milliseconds")
+    parser.add_argument('--bandwidth', type=float, default=40.0, help="simulated MB/s per device (0 = unlimited)")
+    parser.add_argument('--files', type=int, default=200, help="small files per simulated device")
+    parser.add_argument('--no-simulator', action='store_true', help="use the real adb server and devices")
+    parser.add_argument('--only', nargs='*', help="benchmark names to run")
+    parser.add_argument('--output', help="write the JSON report here")
+    parser.add_argument('--compare', help="baseline JSON report to compare against")
+    args = parser.parse_args(argv)
+    
+    settings = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    
+    base_dir = tempfile.mkdtemp(prefix='bench_config_')
+    simulator = None
+    try:
+        app_config = AppConfig(BASE_DIR=base_dir)
+        if not args.no_simulator:
+            bandwidth = args.bandwidth * 1024 * 1024 if args.bandwidth else None
+            simulator = DeviceSimulator(args.devices, latency=args.latency / 1000, bandwidth=bandwidth,
+                                        file_count=args.files).start()
+            simulator.configure(app_config)
+        adb = ADBManager(app_config)
+        serials = [d['serial'] for d in adb.get_devices() if d['status'] == 'device']
+        if not serials:
+            print("No devices available")
+            return 1
+        
+        results = run_suite(adb, serials, args.iterations, args.warmup, args.concurrency, args.only,
+                            progress=lambda r: print(f"  {r.name}: p50 {r.p50_ms:.2f} ms", file=sys.stderr))
+        adb.shutdown()
+    finally:
+        if simulator:
+            simulator.stop()
+        shutil.rmtree(base_dir, ignore_errors=True)
+    
+    print(format_table(results, baseline))
+    report = build_report(results, settings)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
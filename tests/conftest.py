@@ -0,0 +1,24 @@
+"""
+Shared fixtures: a small simulated fleet and an ADBManager bound to it
+"""
+
+import pytest
+
+from config.settings import AppConfig
+from core.adb_manager import ADBManager
+from tests.support.device_simulator import DeviceSimulator
+
+@pytest.fixture
+def simulator():
+    """Two simulated devices, sized to keep tests fast"""
+    with DeviceSimulator(device_count=2, package_count=60, file_count=30,
+                         large_file_size=256 * 1024, boot_size=64 * 1024) as sim:
+        yield sim
+
+@pytest.fixture
+def adb(simulator, tmp_path):
+    """ADBManager talking to the simulator"""
+    manager = ADBManager(simulator.configure(AppConfig(BASE_DIR=str(tmp_path))))
+    manager.get_devices()
+    yield manager
+    manager.shutdown()
@@ -0,0 +1,4 @@
+"""
+Test support: a simulated adb/fastboot device fleet (device_simulator)
+and the shell its devices run (device_shell)
+"""
@@ -0,0 +1,1026 @@
+"""
+Minimal Android shell interpreter for simulated devices
+
+Understands the subset of sh the application sends to devices: command
+lists (; && ||), pipelines, ( ) groups, quoting, $? and /dev/null or
+fd-duplicating redirects, plus the toybox/framework commands the core
+modules use (getprop, pm, dumpsys, df, grep, dd, ...). Everything runs
+in-process against a SimulatedDevice, so thousands of commands cost no
+process spawns.
+"""
+
+import hashlib
+import io
+import posixpath
+import re
+import stat
+import tarfile
+import time
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .device_simulator import SimulatedDevice
+
+# (returncode, stdout, stderr)
+ShellResult = Tuple[int, bytes, bytes]
+
+# Stands in for $? until the command it belongs to runs
+_STATUS = '\ue000'
+
+_OPERATORS = ('&&', '||', ';', '|', '(', ')', '\n', '&')
+
+# Paths only root may read
+_PROTECTED = ('/dev/block', '/data/')
+
+class ShellSyntaxError(ValueError):
+    """The script cannot be parsed"""
+
+class IncompleteInput(ShellSyntaxError):
+    """The script ends inside a quote, group or after an operator"""
+
+class ShellExit(Exception):
+    """`exit` was run; carries the output the shell produced before it
+    
+    Subshells (`( ... )`, pipeline stages, `sh -c`) stop it at their
+    boundary, so only the shell that ran `exit` ends.
+    """
+    
+    def __init__(self, code: int, out: bytes = b'', err: bytes = b''):
+        super().__init__(code)
+        self.code = code
+        self.out = out
+        self.err = err
+
+# ==================== Parsing ====================
+
+def tokenize(script: str) -> List[tuple]:
+    """Split a script into ('word', text), ('op', text) and ('redir', fd, op, target)"""
+    tokens = []
+    word: List[str] = []
+    in_word = False
+    i, n = 0, len(script)
+    
+    def flush():
+        nonlocal word, in_word
+        if in_word:
+            tokens.append(('word', ''.join(word)))
+        word, in_word = [], False
+    
+    while i < n:
+        c = script[i]
+        if c in ' \t\r':
+            flush()
+            i += 1
+        elif c == '#' and not in_word:
+            while i < n and script[i] != '\n':
+                i += 1
+        elif c == "'":
+            end = script.find("'", i + 1)
+            if end == -1:
+                raise IncompleteInput("unterminated quote")
+            word.append(script[i + 1:end])
+            in_word = True
+            i = end + 1
+        elif c == '"':
+            i += 1
+            while True:
+                if i >= n:
+                    raise IncompleteInput("unterminated quote")
+                c = script[i]
+                if c == '"':
+                    i += 1
+                    break
+                if c == '\\' and i + 1 < n and script[i + 1] in '"\\$`\n':
+                    word.append(script[i + 1])
+                    i += 2
+                elif script.startswith('$?', i):
+                    word.append(_STATUS)
+                    i += 2
+                else:
+                    word.append(c)
+                    i += 1
+            in_word = True
+        elif c == '\\':
+            if i + 1 < n and script[i + 1] != '\n':
+                word.append(script[i + 1])
+                in_word = True
+            i += 2
+        elif script.startswith('$?', i):
+            word.append(_STATUS)
+            in_word = True
+            i += 2
+        elif c in '<>' or (c.isdigit() and not in_word and i + 1 < n and script[i + 1] in '<>'):
+            flush()
+            fd = ''
+            if c.isdigit():
+                fd, i = c, i + 1
+            op = script[i]
+            i += 1
+            if i < n and script[i] in '>&' and op == '>':
+                op += script[i]
+                i += 1
+            while i < n and script[i] in ' \t':
+                i += 1
+            start = i
+            while i < n and script[i] not in ' \t\r\n;&|()<>':
+                i += 1
+            if start == i:
+                raise ShellSyntaxError("missing redirect target")
+            tokens.append(('redir', fd or ('0' if op == '<' else '1'), op, script[start:i]))
+        else:
+            for op in _OPERATORS:
+                if script.startswith(op, i):
+                    flush()
+                    tokens.append(('op', op))
+                    i += len(op)
+                    break
+            else:
+                word.append(c)
+                in_word = True
+                i += 1
+    flush()
+    return tokens
+
+class _Parser:
+    """Recursive descent over tokenize() output
+    
+    Produces ('seq', [(connector, pipeline), ...]), ('pipe', [command, ...]),
+    ('cmd', words, redirs) and ('group', seq, redirs) nodes.
+    """
+    
+    def __init__(self, tokens: List[tuple]):
+        self.tokens = tokens
+        self.pos = 0
+    
+    def peek(self) -> Optional[tuple]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+    
+    def parse(self) -> tuple:
+        seq = self.sequence()
+        if self.peek() is not None:
+            raise ShellSyntaxError(f"unexpected {self.peek()[1]!r}")
+        return seq
+    
+    def sequence(self, closing: bool = False) -> tuple:
+        items = []
+        connector = None
+        while True:
+            token = self.peek()
+            if token is None:
+                if closing:
+                    raise IncompleteInput("unclosed (")
+                if connector in ('&&', '||'):
+                    raise IncompleteInput(f"dangling {connector}")
+                break
+            if token == ('op', ')') and closing:
+                break
+            if token[0] == 'op' and token[1] in (';', '\n', '&'):
+                self.pos += 1
+                continue
+            items.append((connector, self.pipeline()))
+            token = self.peek()
+            connector = ';'
+            if token and token[0] == 'op' and token[1] in ('&&', '||'):
+                connector = token[1]
+                self.pos += 1
+        return ('seq', items)
+    
+    def pipeline(self) -> tuple:
+        commands = [self.command()]
+        while self.peek() == ('op', '|'):
+            self.pos += 1
+            while self.peek() == ('op', '\n'):
+                self.pos += 1
+            if self.peek() is None:
+                raise IncompleteInput("dangling |")
+            commands.append(self.command())
+        return ('pipe', commands)
+    
+    def command(self) -> tuple:
+        token = self.peek()
+        if token == ('op', '('):
+            self.pos += 1
+            seq = self.sequence(closing=True)
+            self.pos += 1
+            return ('group', seq, self.redirects())
+        
+        words, redirs = [], []
+        while True:
+            token = self.peek()
+            if token is None or token[0] == 'op':
+                break
+            if token[0] == 'word':
+                words.append(token[1])
+            else:
+                redirs.append(token[1:])
+            self.pos += 1
+        if not words and not redirs:
+            raise ShellSyntaxError(f"unexpected {token[1]!r}" if token else "empty command")
+        return ('cmd', words, redirs)
+    
+    def redirects(self) -> list:
+        redirs = []
+        while self.peek() and self.peek()[0] == 'redir':
+            redirs.append(self.peek()[1:])
+            self.pos += 1
+        return redirs
+
+def parse(script: str) -> tuple:
+    """Parse a script into a command tree"""
+    return _Parser(tokenize(script)).parse()
+
+# ==================== Helpers ====================
+
+def _bre_to_python(pattern: str) -> str:
+    """Translate a POSIX basic regular expression to Python syntax"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if c == '\\' and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            out.append(nxt if nxt in '(){}|+?' else c + nxt)
+            i += 2
+            continue
+        out.append('\\' + c if c in '(){}|+?' else c)
+        i += 1
+    return ''.join(out)
+
+def _unescape(text: str) -> str:
+    """Expand the backslash escapes printf and echo -e understand"""
+    return (text.replace('\\\\', '\x00').replace('\\n', '\n').replace('\\t', '\t')
+            .replace('\\r', '\r').replace('\\e', '\x1b').replace('\x00', '\\'))
+
+def _printf(fmt: str, args: List[str]) -> str:
+    """printf(1) for %s, %d, %x and %% conversions"""
+    fmt = _unescape(fmt)
+    args = list(args)
+    out = []
+    while True:
+        def convert(match):
+            spec = match.group(0)
+            if spec == '%%':
+                return '%'
+            value = args.pop(0) if args else ''
+            if spec[-1] in 'dixX':
+                try:
+                    value = int(value or 0, 0)
+                except ValueError:
+                    value = 0
+            return spec % value
+        out.append(re.sub(r'%[-0-9.]*[sdixX%]', convert, fmt))
+        if not args or '%' not in fmt:
+            break
+    return ''.join(out)
+
+def _split_flags(args: List[str], with_value: str = '') -> Tuple[Dict[str, str], List[str]]:
+    """Split `-abc -n 5 rest` style arguments into flags and operands"""
+    flags: Dict[str, str] = {}
+    rest = []
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg == '--':
+            rest.extend(args[i + 1:])
+            break
+        if arg.startswith('-') and len(arg) > 1 and not arg[1:].isdigit():
+            for j, flag in enumerate(arg[1:]):
+                if flag in with_value:
+                    value = arg[j + 2:]
+                    if not value and i + 1 < len(args):
+                        i += 1
+                        value = args[i]
+                    flags[flag] = value
+                    break
+                flags[flag] = ''
+        else:
+            rest.append(arg)
+        i += 1
+    return flags, rest
+
+def _human(size: int) -> str:
+    for unit in ('', 'K', 'M', 'G', 'T'):
+        if size < 1024:
+            return f"{size}{unit}" if unit == '' else f"{size:.1f}{unit}".replace('.0', '')
+        size /= 1024
+    return f"{size:.1f}P"
+
+# ==================== Interpreter ====================
+
+class DeviceShell:
+    """One shell process on a simulated device
+    
+    Keeps $? across calls, so an interactive session (exec:sh) behaves like
+    a long-lived sh. root selects uid 0, as `su` would.
+    """
+    
+    def __init__(self, device: 'SimulatedDevice', root: bool = False):
+        self.device = device
+        self.root = root
+        self.status = 0
+        self._commands: Dict[str, Callable[[List[str], bytes], ShellResult]] = {
+            name[len('_cmd_'):].replace('_', '-'): getattr(self, name)
+            for name in dir(self) if name.startswith('_cmd_')
+        }
+        self._commands.update({'[': self._cmd_test, ':': self._cmd_true})
+    
+    def run(self, script: str, stdin: bytes = b'') -> ShellResult:
+        """Parse and run a whole script, like `sh -c script`"""
+        try:
+            tree = parse(script)
+        except ShellSyntaxError as e:
+            self.status = 2
+            return 2, b'', f"sh: syntax error: {e}\n".encode()
+        try:
+            return self.execute(tree, stdin)
+        except ShellExit as e:
+            self.status = e.code
+            return e.code, e.out, e.err
+    
+    def execute(self, seq: tuple, stdin: bytes = b'', merge: bool = False) -> ShellResult:
+        """Run a parsed command sequence
+        
+        With merge, stderr is folded into stdout command by command, keeping
+        the order a terminal would show (`( ... ) 2>&1`).
+        """
+        out, err = bytearray(), bytearray()
+        for connector, pipeline in seq[1]:
+            if connector == '&&' and self.status != 0:
+                continue
+            if connector == '||' and self.status == 0:
+                continue
+            try:
+                code, o, e = self._pipeline(pipeline, stdin)
+            except ShellExit as exit_:
+                exit_.out = bytes(out) + exit_.out + (exit_.err if merge else b'')
+                exit_.err = b'' if merge else bytes(err) + exit_.err
+                raise
+            self.status = code
+            out += o
+            if merge:
+                out += e
+            else:
+                err += e
+        return self.status, bytes(out), bytes(err)
+    
+    def _pipeline(self, pipeline: tuple, stdin: bytes) -> ShellResult:
+        data, err = stdin, bytearray()
+        code = 0
+        subshell = len(pipeline[1]) > 1
+        for i, command in enumerate(pipeline[1]):
+            try:
+                code, data, e = self._command(command, data if i else stdin)
+            except ShellExit as exit_:
+                if not subshell:
+                    raise
+                code, data, e = exit_.code, exit_.out, exit_.err
+            err += e
+        return code, data, bytes(err)
+    
+    def _command(self, node: tuple, stdin: bytes) -> ShellResult:
+        redirs = node[2]
+        targets = {'1': 'out', '2': 'err'}
+        for fd, op, target in redirs:
+            if op == '<':
+                stdin = b'' if target == '/dev/null' else self.device.read_file(target) or b''
+            elif op == '>&':
+                targets[fd] = targets.get(target, 'null')
+            else:
+                targets[fd] = 'null' if target == '/dev/null' else (op, target)
+        
+        if node[0] == 'group':
+            try:
+                code, out, err = self.execute(node[1], stdin, merge=targets['1'] == targets['2'] == 'out')
+            except ShellExit as e:
+                code, out, err = e.code, e.out, e.err
+        elif not node[1]:
+            code, out, err = 0, b'', b''
+        else:
+            words = [w.replace(_STATUS, str(self.status)) for w in node[1]]
+            code, out, err = self.call(words, stdin)
+        
+        streams = {'out': bytearray(), 'err': bytearray()}
+        for fd, data in (('1', out), ('2', err)):
+            target = targets[fd]
+            if target == 'null' or not data:
+                continue
+            if isinstance(target, tuple):
+                op, path = target
+                previous = self.device.read_file(path) if op == '>>' else None
+                self.device.write_file(path, (previous or b'') + data)
+            else:
+                streams[target] += data
+        return code, bytes(streams['out']), bytes(streams['err'])
+    
+    def call(self, words: List[str], stdin: bytes = b'') -> ShellResult:
+        """Run one simple command"""
+        name = posixpath.basename(words[0])
+        handler = self._commands.get(name)
+        if handler is None:
+            return 127, b'', f"/system/bin/sh: {words[0]}: inaccessible or not found\n".encode()
+        return handler(words[1:], stdin)
+    
+    def _denied(self, path: str) -> bool:
+        return not self.root and (path.startswith(_PROTECTED) and not path.startswith('/data/local/tmp'))
+    
+    def _read(self, path: str, tool: str) -> Tuple[Optional[bytes], bytes]:
+        """Read a file for a command, returning (data, error message)"""
+        if self._denied(path):
+            return None, f"{tool}: {path}: Permission denied\n".encode()
+        data = self.device.read_file(path)
+        if data is None:
+            what = 'Is a directory' if self.device.fs.isdir(path) else 'No such file or directory'
+            return None, f"{tool}: {path}: {what}\n".encode()
+        return data, b''
+    
+    def _input(self, files: List[str], stdin: bytes, tool: str) -> Tuple[int, bytes, bytes]:
+        """Concatenate file operands, or use stdin when there are none"""
+        if not files:
+            return 0, stdin, b''
+        code, out, err = 0, bytearray(), bytearray()
+        for path in files:
+            data, message = self._read(path, tool)
+            if data is None:
+                code = 1
+                err += message
+            else:
+                out += data
+        return code, bytes(out), bytes(err)
+    
+    # ==================== Shell Builtins ====================
+    
+    def _cmd_true(self, args, stdin):
+        return 0, b'', b''
+    
+    def _cmd_false(self, args, stdin):
+        return 1, b'', b''
+    
+    def _cmd_exit(self, args, stdin):
+        raise ShellExit(int(args[0]) if args and args[0].isdigit() else self.status)
+    
+    def _cmd_echo(self, args, stdin):
+        newline = True
+        escapes = False
+        while args and args[0] in ('-n', '-e', '-ne', '-en'):
+            newline = newline and 'n' not in args[0]
+            escapes = escapes or 'e' in args[0]
+            args = args[1:]
+        text = ' '.join(args)
+        if escapes:
+            text = _unescape(text)
+        return 0, (text + ('\n' if newline else '')).encode(), b''
+    
+    def _cmd_printf(self, args, stdin):
+        if not args:
+            return 1, b'', b'printf: Need 1 argument\n'
+        return 0, _printf(args[0], args[1:]).encode(), b''
+    
+    def _cmd_test(self, args, stdin):
+        args = [a for a in args if a != ']']
+        if len(args) == 2 and args[0] in ('-e', '-f', '-d', '-n', '-z'):
+            flag, value = args
+            checks = {
+                '-e': lambda: self.device.fs.exists(value),
+                '-f': lambda: self.device.fs.isfile(value),
+                '-d': lambda: self.device.fs.isdir(value),
+                '-n': lambda: bool(value),
+                '-z': lambda: not value,
+            }
+            return (0 if checks[flag]() else 1), b'', b''
+        if len(args) == 3 and args[1] in ('=', '!='):
+            return (0 if (args[0] == args[2]) == (args[1] == '=') else 1), b'', b''
+        return (0 if args and args[0] else 1), b'', b''
+    
+    def _cmd_sh(self, args, stdin):
+        if len(args) >= 2 and args[0] == '-c':
+            return DeviceShell(self.device, self.root).run(args[1], stdin)
+        return DeviceShell(self.device, self.root).run(stdin.decode('utf-8', errors='replace'))
+    
+    def _cmd_su(self, args, stdin):
+        method = self.device.root_method
+        if not method:
+            return 127, b'', b'/system/bin/sh: su: inaccessible or not found\n'
+        if args and args[0] in ('-v', '--version'):
+            versions = {'magisk': '27.0:MAGISKSU', 'kernelsu': '1.0.1:KernelSU', 'apatch': '10763:APatch',
+                        'supersu': '2.82:SUPERSU'}
+            return 0, (versions.get(method, method) + '\n').encode(), b''
+        if args and args[0] == '-V':
+            return 0, b'27000\n', b''
+        if args and args[0] == '-c':
+            return DeviceShell(self.device, root=True).run(' '.join(args[1:]), stdin)
+        if args and args[0] in ('0', 'root') and len(args) > 1:
+            return DeviceShell(self.device, root=True).call(args[1:], stdin)
+        return DeviceShell(self.device, root=True).run(stdin.decode('utf-8', errors='replace'))
+    
+    def _cmd_timeout(self, args, stdin):
+        # Options stop at the duration; everything after it is the command
+        i = 0
+        while i < len(args) and args[i].startswith('-'):
+            i += 2 if args[i] in ('-s', '-k') else 1
+        if len(args) < i + 2:
+            return 125, b'', b'timeout: need DURATION COMMAND\n'
+        return self.call(args[i + 1:], stdin)
+    
+    def _cmd_sleep(self, args, stdin):
+        try:
+            time.sleep(float(args[0]) if args else 0)
+        except ValueError:
+            return 1, b'', f"sleep: invalid number '{args[0]}'\n".encode()
+        return 0, b'', b''
+    
+    # ==================== Toybox ====================
+    
+    def _cmd_toybox(self, args, stdin):
+        if not args:
+            return 0, ' '.join(sorted(self._commands)).encode() + b'\n', b''
+        return self.call(args, stdin)
+    
+    def _cmd_id(self, args, stdin):
+        uid, name = (0, 'root') if self.root else (2000, 'shell')
+        if '-u' in args:
+            return 0, f"{uid}\n".encode(), b''
+        if '-un' in args or '-nu' in args:
+            return 0, f"{name}\n".encode(), b''
+        context = 'u:r:magisk:s0' if self.root else 'u:r:shell:s0'
+        return 0, f"uid={uid}({name}) gid={uid}({name}) groups={uid}({name}) context={context}\n".encode(), b''
+    
+    def _cmd_whoami(self, args, stdin):
+        return 0, b'root\n' if self.root else b'shell\n', b''
+    
+    def _cmd_uname(self, args, stdin):
+        props = self.device.props
+        release = self.device.kernel_release
+        machine = 'aarch64' if 'arm64' in props.get('ro.product.cpu.abi', 'arm64') else 'armv7l'
+        if not args:
+            return 0, b'Linux\n', b''
+        if args[0] == '-r':
+            return 0, f"{release}\n".encode(), b''
+        if args[0] == '-m':
+            return 0, f"{machine}\n".encode(), b''
+        return 0, f"Linux localhost {release} #1 SMP PREEMPT {machine} Toybox\n".encode(), b''
+    
+    def _cmd_cat(self, args, stdin):
+        return self._input([a for a in args if a != '-'], stdin, 'cat')
+    
+    def _cmd_ls(self, args, stdin):
+        flags, paths = _split_flags(args)
+        paths = paths or ['.']
+        fs = self.device.fs
+        code, out, err = 0, [], bytearray()
+        for path in paths:
+            if self._denied(path):
+                code = 1
+                err += f"ls: {path}: Permission denied\n".encode()
+                continue
+            if fs.isdir(path) and 'd' not in flags:
+                names = fs.listdir(path)
+                if 'a' in flags:
+                    names = ['.', '..'] + names
+                if len(paths) > 1:
+                    out.append(f"{path}:")
+                if 'l' in flags:
+                    out.extend(self._ls_long(posixpath.join(path, name), name) for name in names)
+                else:
+                    out.extend(names)
+            elif fs.exists(path):
+                out.append(self._ls_long(path, path) if 'l' in flags else path)
+            else:
+                code = 1
+                err += f"ls: {path}: No such file or directory\n".encode()
+        text = '\n'.join(out)
+        return code, (text + '\n' if text else '').encode(), bytes(err)
+    
+    def _ls_long(self, path: str, name: str) -> str:
+        st = self.device.fs.stat(path)
+        mode, size, mtime = st if st else (0, 0, 0)
+        kind = 'd' if self.device.fs.isdir(path) else '-'
+        stamp = time.strftime('%Y-%m-%d %H:%M', time.gmtime(mtime))
+        return f"{kind}rw-rw---- 1 root sdcard_rw {size:>8} {stamp} {name}"
+    
+    def _cmd_stat(self, args, stdin):
+        flags, paths = _split_flags(args, with_value='c')
+        fmt = flags.get('c', "  File: %n\n  Size: %s\n")
+        code, out, err = 0, bytearray(), bytearray()
+        for path in paths:
+            target = None if 'L' in flags else self.device.fs.readlink(path)
+            # Without -L a symlink describes itself, like lstat
+            st = (stat.S_IFLNK | 0o777, len(target), 0) if target else self.device.fs.stat(path)
+            if st is None:
+                code = 1
+                err += f"stat: '{path}': No such file or directory\n".encode()
+                continue
+            mode, size, mtime = st
+            values = {'n': path, 's': str(size), 'Y': str(mtime), 'f': f"{mode:x}", 'a': f"{mode & 0o7777:o}",
+                      'F': 'symbolic link' if target else 'directory' if self.device.fs.isdir(path) else 'regular file'}
+            out += (re.sub(r'%([a-zA-Z])', lambda m: values.get(m.group(1), m.group(0)), _unescape(fmt))
+                    + ('\n' if 'c' in flags else '')).encode()
+        return code, bytes(out), bytes(err)
+    
+    def _cmd_find(self, args, stdin):
+        # -H/-L follow symlinked starting points; by default (-P) a symlinked
+        # root is reported as the link itself
+        follow = False
+        while args and args[0] in ('-H', '-L', '-P'):
+            follow = args.pop(0) != '-P'
+        roots = []
+        while args and not args[0].startswith('-'):
+            roots.append(args.pop(0))
+        kind = None
+        if '-type' in args:
+            kind = args[args.index('-type') + 1]
+        name = None
+        if '-name' in args:
+            name = args[args.index('-name') + 1]
+        # -exec CMD {} + runs CMD once with every match, -exec CMD {} ; once per match
+        exec_words, per_match = None, False
+        if '-exec' in args:
+            exec_words = args[args.index('-exec') + 1:]
+            per_match = exec_words[-1] == ';'
+            exec_words = [w for w in exec_words[:-1] if w != '{}']
+        out, missing = [], bytearray()
+        for root in roots or ['.']:
+            if not self.device.fs.exists(root):
+                missing += f"find: {root}: No such file or directory\n".encode()
+            fs = self.device.fs
+            for path in fs.walk(root) if follow or not fs.islink(root) else [root]:
+                is_link = fs.islink(path) and not (follow and path == fs.normalize(root))
+                path_kind = 'l' if is_link else 'd' if fs.isdir(path) else 'f'
+                if kind and path_kind != kind:
+                    continue
+                if name and not re.fullmatch(re.escape(name).replace('\\*', '.*').replace('\\?', '.'),
+                                             posixpath.basename(path)):
+                    continue
+                out.append(path)
+        if exec_words is None:
+            return int(bool(missing)), ''.join(p + '\n' for p in out).encode(), bytes(missing)
+        
+        code, stdout, stderr = int(bool(missing)), bytearray(), missing
+        for paths in ([[p] for p in out] if per_match else [out] if out else []):
+            c, o, e = self.call(exec_words + paths, stdin)
+            code, stdout, stderr = code or c, stdout + o, stderr + e
+        return code, bytes(stdout), bytes(stderr)
+    
+    def _cmd_mkdir(self, args, stdin):
+        _, paths = _split_flags(args)
+        for path in paths:
+            self.device.fs.mkdirs(path)
+        return 0, b'', b''
+    
+    def _cmd_touch(self, args, stdin):
+        for path in args:
+            if self.device.read_file(path) is None:
+                self.device.write_file(path, b'')
+        return 0, b'', b''
+    
+    def _cmd_rm(self, args, stdin):
+        flags, paths = _split_flags(args)
+        code, err = 0, bytearray()
+        for path in paths:
+            if self.device.fs.isdir(path) and 'r' not in flags:
+                code = 1
+                err += f"rm: {path}: is a directory\n".encode()
+            elif not self.device.fs.remove(path) and 'f' not in flags:
+                code = 1
+                err += f"rm: {path}: No such file or directory\n".encode()
+        return code, b'', bytes(err)
+    
+    def _cmd_grep(self, args, stdin):
+        flags, rest = _split_flags(args, with_value='e')
+        if 'e' in flags:
+            pattern = flags['e']
+        elif rest:
+            pattern = rest.pop(0)
+        else:
+            return 2, b'', b'grep: no pattern\n'
+        if 'F' in flags:
+            pattern = re.escape(pattern)
+        elif 'E' not in flags:
+            pattern = _bre_to_python(pattern)
+        if 'w' in flags:
+            pattern = rf'\b(?:{pattern})\b'
+        try:
+            regex = re.compile(pattern, re.IGNORECASE if 'i' in flags else 0)
+        except re.error as e:
+            return 2, b'', f"grep: bad regex: {e}\n".encode()
+        
+        code, data, err = self._input(rest, stdin, 'grep')
+        invert = 'v' in flags
+        lines = [line for line in data.decode('utf-8', errors='replace').splitlines()
+                 if bool(regex.search(line)) != invert]
+        if 'q' in flags:
+            return (0 if lines else 1), b'', b''
+        if 'c' in flags:
+            return (0 if lines else 1), f"{len(lines)}\n".encode(), err
+        return (0 if lines else 1), ''.join(line + '\n' for line in lines).encode(), err
+    
+    def _head_tail(self, args, stdin, tool):
+        flags, rest = _split_flags(args, with_value='nc')
+        count = flags.get('n', '10')
+        for arg in args:
+            if arg.startswith('-') and arg[1:].isdigit():
+                count = arg[1:]
+                rest.remove(arg)
+        code, data, err = self._input(rest, stdin, tool)
+        if 'c' in flags:
+            size = int(flags['c'])
+            return code, data[:size] if tool == 'head' else data[-size:], err
+        lines = data.splitlines(keepends=True)
+        if count.startswith('+'):
+            return code, b''.join(lines[int(count) - 1:]), err
+        count = int(count)
+        picked = lines[:count] if tool == 'head' else (lines[-count:] if count else [])
+        return code, b''.join(picked), err
+    
+    def _cmd_head(self, args, stdin):
+        return self._head_tail(args, stdin, 'head')
+    
+    def _cmd_tail(self, args, stdin):
+        return self._head_tail(args, stdin, 'tail')
+    
+    def _cmd_wc(self, args, stdin):
+        flags, rest = _split_flags(args)
+        code, data, err = self._input(rest, stdin, 'wc')
+        if 'c' in flags:
+            return code, f"{len(data)}\n".encode(), err
+        lines = data.count(b'\n')
+        return code, f"{lines}\n".encode(), err
+    
+    def _cmd_sort(self, args, stdin):
+        flags, rest = _split_flags(args)
+        code, data, err = self._input(rest, stdin, 'sort')
+        lines = sorted(data.decode('utf-8', errors='replace').splitlines(), reverse='r' in flags)
+        return code, ''.join(line + '\n' for line in lines).encode(), err
+    
+    def _cmd_md5sum(self, args, stdin):
+        return self._checksum(args, stdin, 'md5')
+    
+    def _cmd_sha1sum(self, args, stdin):
+        return self._checksum(args, stdin, 'sha1')
+    
+    def _cmd_sha256sum(self, args, stdin):
+        return self._checksum(args, stdin, 'sha256')
+    
+    def _checksum(self, args, stdin, algorithm):
+        if not args:
+            return 0, f"{hashlib.new(algorithm, stdin).hexdigest()}  -\n".encode(), b''
+        code, out, err = 0, bytearray(), bytearray()
+        for path in args:
+            data, message = self._read(path, f"{algorithm}sum")
+            if data is None:
+                code = 1
+                err += message
+            else:
+                out += f"{hashlib.new(algorithm, data).hexdigest()}  {path}\n".encode()
+        return code, bytes(out), bytes(err)
+    
+    def _cmd_dd(self, args, stdin):
+        options = dict(arg.split('=', 1) for arg in args if '=' in arg)
+        
+        def size(value: str) -> int:
+            units = {'k': 1024, 'K': 1024, 'm': 1024 ** 2, 'M': 1024 ** 2, 'g': 1024 ** 3, 'G': 1024 ** 3}
+            return int(value[:-1]) * units[value[-1]] if value[-1] in units else int(value)
+        
+        if 'if' in options:
+            data, message = self._read(options['if'], 'dd')
+            if data is None:
+                return 1, b'', message
+        else:
+            data = stdin
+        block = size(options.get('bs', '512'))
+        start = size(options.get('skip', '0')) * block
+        end = start + size(options['count']) * block if 'count' in options else len(data)
+        data = data[start:end]
+        
+        records = -(-len(data) // block)
+        stats = (f"{records}+0 records in\n{records}+0 records out\n"
+                 f"{len(data)} bytes ({_human(len(data))}) copied, 0.1 s, 1.0 G/s\n").encode()
+        if 'of' in options:
+            if self._denied(options['of']):
+                return 1, b'', f"dd: {options['of']}: Permission denied\n".encode()
+            self.device.write_file(options['of'], data)
+            return 0, b'', stats
+        return 0, data, stats
+    
+    def _cmd_tar(self, args, stdin):
+        flags, names = _split_flags(args, with_value='fC')
+        if 'c' not in flags or flags.get('f', '-') != '-':
+            return 1, b'', b'tar: only -c to stdout is supported\n'
+        base = flags.get('C', '')
+        fs = self.device.fs
+        code, err = 0, bytearray()
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w', format=tarfile.GNU_FORMAT) as tar:
+            for name in names:
+                root = posixpath.join(base, name) if base else name
+                if not fs.exists(root) or self._denied(root):
+                    code = 1
+                    err += f"tar: {name}: No such file or directory\n".encode()
+                    continue
+                for path in fs.walk(root):
+                    if fs.isdir(path):
+                        continue
+                    mode, size, mtime = fs.stat(path)
+                    member = name if path == root else posixpath.join(name, posixpath.relpath(path, root))
+                    info = tarfile.TarInfo(member)
+                    info.size, info.mtime, info.mode = size, mtime, mode & 0o7777
+                    tar.addfile(info, io.BytesIO(fs.read(path)))
+        return code, buffer.getvalue(), bytes(err)
+    
+    def _cmd_df(self, args, stdin):
+        flags, paths = _split_flags(args)
+        total, used = self.device.storage
+        fmt = _human if 'h' in flags else (lambda value: str(value // 1024))
+        header = "Filesystem        Size Used Avail Use% Mounted on\n" if 'h' in flags else \
+            "Filesystem      1K-blocks     Used Available Use% Mounted on\n"
+        line = (f"/dev/block/dm-48 {fmt(total):>8} {fmt(used):>8} {fmt(total - used):>8} "
+                f"{used * 100 // total:>3}% /data\n")
+        return 0, (header + line).encode(), b''
+    
+    def _cmd_which(self, args, stdin):
+        out = []
+        for name in args:
+            if name == 'su':
+                if self.device.root_method:
+                    out.append('/system/bin/su')
+            elif name in ('magisk', 'ksud'):
+                if self.device.root_method == ('magisk' if name == 'magisk' else 'kernelsu'):
+                    out.append(f'/data/adb/{name}' if name == 'ksud' else '/debug_ramdisk/magisk')
+            elif name in self._commands:
+                out.append(f'/system/bin/{name}')
+        return (0 if len(out) == len(args) else 1), ''.join(p + '\n' for p in out).encode(), b''
+    
+    def _cmd_getenforce(self, args, stdin):
+        return 0, b'Enforcing\n', b''
+    
+    def _cmd_ip(self, args, stdin):
+        words = [arg for arg in args if not arg.startswith('-')]
+        if not words or words[0] not in ('a', 'addr', 'address'):
+            return 255, b'', f'Object "{words[0] if words else ""}" is unknown, try "ip help".\n'.encode()
+        lines = []
+        for number, (iface, address) in enumerate(self.device.interfaces.items(), start=1):
+            scope = 'host' if iface == 'lo' else 'global'
+            if '-o' in args:
+                lines.append(f"{number}: {iface}    inet {address} scope {scope} {iface}\\"
+                             f"       valid_lft forever preferred_lft forever")
+            else:
+                lines += [f"{number}: {iface}: <UP,LOWER_UP> mtu 1500 state UP",
+                          f"    inet {address} scope {scope} {iface}"]
+        return 0, ''.join(line + '\n' for line in lines).encode(), b''
+    
+    # ==================== Android Commands ====================
+    
+    def _cmd_getprop(self, args, stdin):
+        props = self.device.props
+        if args:
+            return 0, (props.get(args[0], args[1] if len(args) > 1 else '') + '\n').encode(), b''
+        return 0, ''.join(f"[{k}]: [{v}]\n" for k, v in sorted(props.items())).encode(), b''
+    
+    def _cmd_logcat(self, args, stdin):
+        # A live `logcat` is followed by the server (see
+        # _ADBHandler._follow_log); here it only dumps the buffer
+        flags, _ = _split_flags(args, with_value='bvt')
+        if 'c' in flags:
+            self.device.log_lines.clear()
+            return 0, b'', b''
+        lines = self.device.log_lines
+        if 't' in flags and flags['t'].isdigit():
+            lines = lines[-int(flags['t']):]
+        return 0, ''.join(line + '\n' for line in lines).encode(), b''
+    
+    def _cmd_setprop(self, args, stdin):
+        if len(args) != 2:
+            return 1, b'', b'usage: setprop NAME VALUE\n'
+        if args[0].startswith('ro.') and args[0] in self.device.props:
+            return 1, b'', f"Failed to set property '{args[0]}' to '{args[1]}'.\n".encode()
+        self.device.props[args[0]] = args[1]
+        return 0, b'', b''
+    
+    def _cmd_settings(self, args, stdin):
+        if len(args) >= 3 and args[0] == 'get':
+            return 0, (self.device.settings.get((args[1], args[2]), 'null') + '\n').encode(), b''
+        if len(args) >= 4 and args[0] == 'put':
+            self.device.settings[(args[1], args[2])] = args[3]
+            return 0, b'', b''
+        return 255, b'', b'usage: settings [--user NUM] get|put NAMESPACE KEY [VALUE]\n'
+    
+    def _cmd_dumpsys(self, args, stdin):
+        if args and args[0] == 'battery':
+            battery = self.device.battery
+            lines = [
+                "Current Battery Service state:",
+                f"  AC powered: {str(battery['plugged'] == 1).lower()}",
+                f"  USB powered: {str(battery['plugged'] == 2).lower()}",
+                "  Wireless powered: false",
+                f"  status: {battery['status']}",
+                "  health: 2",
+                "  present: true",
+                f"  level: {battery['level']}",
+                "  scale: 100",
+                f"  voltage: {battery['voltage']}",
+                f"  temperature: {battery['temperature']}",
+                "  technology: Li-ion",
+            ]
+            return 0, ('\n'.join(lines) + '\n').encode(), b''
+        if len(args) >= 2 and args[0] == 'package':
+            package = self.device.packages.get(args[1])
+            if package is None:
+                return 0, b'', b''
+            return 0, self.device.describe_package(args[1]).encode(), b''
+        return 0, b'', b''
+    
+    def _cmd_cmd(self, args, stdin):
+        if args and args[0] == 'package':
+            return self._cmd_pm(args[1:], stdin)
+        return 255, b'', f"cmd: Can't find service: {args[0] if args else ''}\n".encode()
+    
+    def _cmd_pm(self, args, stdin):
+        if not args:
+            return 1, b'', b'usage: pm [list|path|disable-user|enable|uninstall] ...\n'
+        packages = self.device.packages
+        action, args = args[0], args[1:]
+        
+        # --user N applies to every action; one user is simulated
+        if '--user' in args:
+            index = args.index('--user')
+            del args[index:index + 2]
+        
+        if action == 'list' and args and args[0] == 'packages':
+            # -3 looks like a number to _split_flags
+            flags, rest = _split_flags([a for a in args[1:] if a not in ('-3', '--show-versioncode')])
+            if '-3' in args:
+                flags['3'] = ''
+            match = rest[0] if rest else ''
+            out = []
+            for name, package in packages.items():
+                if not package['installed'] and 'u' not in flags:
+                    continue
+                if 's' in flags and not package['system'] or '3' in flags and package['system']:
+                    continue
+                if 'd' in flags and package['enabled'] or 'e' in flags and not package['enabled']:
+                    continue
+                if match not in name:
+                    continue
+                line = 'package:' + (f"{package['path']}=" if 'f' in flags else '') + name
+                if '--show-versioncode' in args:
+                    line += f" versionCode:{package['version_code']}"
+                if 'i' in flags:
+                    line += f"  installer={package['installer'] or 'null'}"
+                if 'U' in flags:
+                    line += f" uid:{package['uid']}"
+                out.append(line)
+            return 0, ''.join(line + '\n' for line in out).encode(), b''
+        
+        name = args[-1] if args else ''
+        package = packages.get(name)
+        if action == 'path':
+            if package is None or not package['installed']:
+                return 1, b'', b''
+            return 0, f"package:{package['path']}\n".encode(), b''
+        if action in ('disable-user', 'disable', 'enable', 'uninstall', 'install-existing'):
+            if action == 'uninstall':
+                if package is None or not package['installed']:
+                    return 1, b'Failure [not installed for 0]\n', b''
+                package['installed'] = False
+                return 0, b'Success\n', b''
+            if package is None:
+                return 1, b'', f"Error: Unknown package: {name}\n".encode()
+            if action == 'install-existing':
+                package['installed'] = True
+                return 0, f"Package {name} installed for user: 0\n".encode(), b''
+            package['enabled'] = action == 'enable'
+            state = 'enabled' if package['enabled'] else 'disabled-user'
+            return 0, f"Package {name} new state: {state}\n".encode(), b''
+        return 1, b'', f"Unknown command: {action}\n".encode()
+    
+    def _cmd_screencap(self, args, stdin):
+        flags, rest = _split_flags(args)
+        image = self.device.screenshot()
+        if rest:
+            self.device.write_file(rest[0], image)
+            return 0, b'', b''
+        return 0, image, b''
+    
+    def _cmd_magisk(self, args, stdin):
+        if self.device.root_method != 'magisk':
+            return 127, b'', b'/system/bin/sh: magisk: inaccessible or not found\n'
+        if '-V' in args:
+            return 0, b'27000\n', b''
+        return 0, b'27.0:MAGISK:R\n', b''
+    
+    def _cmd_ksud(self, args, stdin):
+        if self.device.root_method != 'kernelsu':
+            return 127, b'', b'/system/bin/sh: ksud: inaccessible or not found\n'
+        if args and args[0] in ('-V', '--version'):
+            return 0, b'ksud 1.0.1\n', b''
+        return 0, b'KernelSU userspace cli\n', b''
+    
+    def _cmd_apd(self, args, stdin):
+        if self.device.root_method != 'apatch':
+            return 127, b'', b'/system/bin/sh: apd: inaccessible or not found\n'
+        if args and args[0] in ('-V', '--version'):
+            return 0, b'apd 10763\n', b''
+        return 0, b'APatch userspace cli\n', b''
+    
+    def _cmd_reboot(self, args, stdin):
+        self.device.request_reboot(args[0] if args else '')
+        return 0, b'', b''
@@ -0,0 +1,1167 @@
+"""
+Simulated ADB and fastboot devices
+
+Serves enough of the adb server protocol (host services, shell, exec,
+sync) and of fastboot over TCP to drive ADBManager, DeviceManager and
+BackupManager without hardware. Latency, bandwidth and the number of
+devices are configurable, so one host can stand in for a whole fleet:
+
+    with DeviceSimulator(device_count=50, latency=0.005) as sim:
+        sim.configure(config)
+        manager = ADBManager(config)
+        ...
+
+Run `python -m tests.support.device_simulator --devices 50` to serve a fleet on
+the default adb port for manual testing with the GUI or a real adb/fastboot
+client (`fastboot -s tcp:127.0.0.1:<port> getvar all`).
+"""
+
+import argparse
+import functools
+import posixpath
+import random
+import select
+import socket
+import socketserver
+import stat
+import struct
+import threading
+import time
+import uuid
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .device_shell import DeviceShell, IncompleteInput, ShellExit, ShellSyntaxError, parse, tokenize
+
+# Sync protocol chunk limit, same as adbd
+SYNC_DATA_MAX = 64 * 1024
+
+# Fastboot download limit advertised through getvar:max-download-size
+FASTBOOT_MAX_DOWNLOAD = 256 * 1024 * 1024
+
+# A followed logcat gets a new line this often
+LOGCAT_INTERVAL = 0.05
+
+BOOT_ID_PATH = '/proc/sys/kernel/random/boot_id'
+PARTITION_DIR = '/dev/block/bootdevice/by-name'
+
+# (manufacturer, brand, model, device, hardware, platform)
+DEVICE_MODELS = [
+    ('Google', 'google', 'Pixel 7', 'panther', 'panther', 'gs201'),
+    ('samsung', 'samsung', 'SM-S911B', 'dm1q', 'qcom', 'kalama'),
+    ('Xiaomi', 'Redmi', '2201117TG', 'spes', 'qcom', 'bengal'),
+    ('OnePlus', 'OnePlus', 'CPH2449', 'OP5913L1', 'qcom', 'kalama'),
+    ('motorola', 'motorola', 'moto g power (2022)', 'tonga', 'mt6765', 'mt6765'),
+]
+
+SYSTEM_PACKAGES = [
+    'android', 'com.android.systemui', 'com.android.settings', 'com.android.phone',
+    'com.android.providers.contacts', 'com.android.providers.media', 'com.android.providers.settings',
+    'com.android.providers.telephony', 'com.android.shell', 'com.android.bluetooth',
+    'com.android.nfc', 'com.android.vending', 'com.android.chrome', 'com.android.camera2',
+    'com.android.documentsui', 'com.android.packageinstaller', 'com.android.permissioncontroller',
+    'com.android.inputmethod.latin', 'com.android.launcher3', 'com.android.webview',
+    'com.google.android.gms', 'com.google.android.gsf', 'com.google.android.youtube',
+    'com.google.android.apps.maps', 'com.google.android.gm', 'com.google.android.apps.photos',
+    'com.google.android.googlequicksearchbox', 'com.google.android.apps.docs',
+    'com.google.android.music', 'com.google.android.videos', 'com.google.android.apps.tachyon',
+    'com.facebook.appmanager', 'com.facebook.services', 'com.facebook.system',
+]
+
+VENDOR_PACKAGES = {
+    'samsung': ['com.samsung.android.bixby.agent', 'com.samsung.android.game.gamehome',
+                'com.samsung.android.app.tips', 'com.sec.android.app.samsungapps',
+                'com.samsung.android.arzone', 'com.samsung.android.visionintelligence'],
+    'Xiaomi': ['com.miui.analytics', 'com.miui.msa.global', 'com.miui.videoplayer',
+               'com.xiaomi.glgm', 'com.miui.cleanmaster', 'com.mi.globalbrowser'],
+    'OnePlus': ['com.oneplus.brickmode', 'com.heytap.cloud', 'com.oplus.games'],
+    'motorola': ['com.motorola.help', 'com.motorola.demo', 'com.motorola.ccc.notification'],
+    'Google': ['com.google.android.apps.wellbeing', 'com.google.android.apps.subscriptions.red'],
+}
+
+USER_PACKAGES = [
+    'com.whatsapp', 'com.facebook.katana', 'com.instagram.android', 'com.spotify.music',
+    'org.telegram.messenger', 'com.netflix.mediaclient', 'com.twitter.android',
+    'com.topjohnwu.magisk', 'com.termux', 'org.mozilla.firefox',
+]
+
+@functools.lru_cache(maxsize=16)
+def _blob(size: int) -> bytes:
+    """Deterministic filler data, shared between devices"""
+    return random.Random(size).randbytes(size)
+
+def _boot_image(size: int) -> bytes:
+    """Filler behind a boot image header, empty for size 0"""
+    return (b'ANDROID!' + _blob(size)[8:])[:size] if size else b''
+
+@functools.lru_cache(maxsize=4)
+def _png(width: int, height: int) -> bytes:
+    """A valid RGB PNG with a gradient, standing in for screencap output"""
+    raw = b''.join(b'\x00' + b''.join(bytes((x * 255 // width, y * 255 // height, 128)) for x in range(width))
+                   for y in range(height))
+    
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+def _follows_log(command: str) -> bool:
+    """True when the command starts with a `logcat` that keeps running (no -d/-c/-t)"""
+    try:
+        tokens = tokenize(command)
+    except ShellSyntaxError:
+        return False
+    words = []
+    for token in tokens:
+        if token[0] != 'word':
+            break
+        words.append(token[1])
+    return bool(words) and words[0] == 'logcat' and not {'-d', '-c', '-t'} & set(words[1:])
+
+# ==================== Device Model ====================
+
+class SimulatedFileSystem:
+    """In-memory file tree of a simulated device
+    
+    Symlinks are followed in every path component, like the kernel does;
+    walk() follows only its starting point, like `find -H`.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._files: Dict[str, Tuple[bytes, int]] = {}
+        self._dirs: Dict[str, set] = {'/': set()}
+        self._links: Dict[str, str] = {}
+    
+    @staticmethod
+    def normalize(path: str) -> str:
+        return posixpath.normpath('/' + path.strip().lstrip('/'))
+    
+    def resolve(self, path: str) -> str:
+        """path with every symlinked component replaced by its target"""
+        path = self.normalize(path)
+        for _ in range(40):
+            parts = path.split('/')
+            for i in range(2, len(parts) + 1):
+                target = self._links.get('/'.join(parts[:i]))
+                if target is not None:
+                    path = self.normalize(posixpath.join(target, *parts[i:]))
+                    break
+            else:
+                break
+        return path
+    
+    def _resolve_parent(self, path: str) -> str:
+        """path with its parent resolved but the last component kept (lstat)"""
+        path = self.normalize(path)
+        return posixpath.join(self.resolve(posixpath.dirname(path)), posixpath.basename(path))
+    
+    def symlink(self, path: str, target: str):
+        path = self._resolve_parent(path)
+        with self._lock:
+            parent = posixpath.dirname(path)
+            self._mkdirs(parent)
+            self._dirs[parent].add(posixpath.basename(path))
+            self._links[path] = self.normalize(target)
+    
+    def islink(self, path: str) -> bool:
+        return self._resolve_parent(path) in self._links
+    
+    def readlink(self, path: str) -> Optional[str]:
+        return self._links.get(self._resolve_parent(path))
+    
+    def mkdirs(self, path: str):
+        path = self.resolve(path)
+        with self._lock:
+            self._mkdirs(path)
+    
+    def _mkdirs(self, path: str):
+        if path in self._dirs:
+            return
+        parent = posixpath.dirname(path)
+        self._mkdirs(parent)
+        self._dirs[parent].add(posixpath.basename(path))
+        self._dirs[path] = set()
+    
+    def write(self, path: str, data: bytes, mtime: Optional[int] = None):
+        path = self.resolve(path)
+        with self._lock:
+            parent = posixpath.dirname(path)
+            self._mkdirs(parent)
+            self._dirs[parent].add(posixpath.basename(path))
+            self._files[path] = (data, int(time.time()) if mtime is None else mtime)
+    
+    def read(self, path: str) -> Optional[bytes]:
+        entry = self._files.get(self.resolve(path))
+        return entry[0] if entry else None
+    
+    def exists(self, path: str) -> bool:
+        path = self.resolve(path)
+        return path in self._files or path in self._dirs
+    
+    def isfile(self, path: str) -> bool:
+        return self.resolve(path) in self._files
+    
+    def isdir(self, path: str) -> bool:
+        return self.resolve(path) in self._dirs
+    
+    def stat(self, path: str) -> Optional[Tuple[int, int, int]]:
+        """(mode, size, mtime) like sync STAT, None if missing"""
+        path = self.resolve(path)
+        entry = self._files.get(path)
+        if entry:
+            return stat.S_IFREG | 0o660, len(entry[0]), entry[1]
+        if path in self._dirs:
+            return stat.S_IFDIR | 0o771, 4096, 0
+        return None
+    
+    def listdir(self, path: str) -> List[str]:
+        with self._lock:
+            return sorted(self._dirs.get(self.resolve(path), ()))
+    
+    def walk(self, path: str) -> List[str]:
+        """Every path below (and including) path, depth first
+        
+        A symlinked path is followed; links below it are listed, not entered.
+        """
+        path = self.normalize(path)
+        if not self.exists(path):
+            return []
+        out = [path]
+        for name in self.listdir(path):
+            child = posixpath.join(path, name)
+            out.extend(self.walk(child) if self.isdir(child) and not self.islink(child) else [child])
+        return out
+    
+    def remove(self, path: str) -> bool:
+        link = self._resolve_parent(path)
+        path = self.resolve(path)
+        with self._lock:
+            if link in self._links:
+                # rm removes the link, not what it points to
+                del self._links[link]
+                path = link
+            elif path in self._files:
+                del self._files[path]
+            elif path in self._dirs and path != '/':
+                prefix = path + '/'
+                for key in [k for k in self._files if k.startswith(prefix)]:
+                    del self._files[key]
+                for key in [k for k in self._dirs if k.startswith(prefix) or k == path]:
+                    del self._dirs[key]
+            else:
+                return False
+            self._dirs.get(posixpath.dirname(path), set()).discard(posixpath.basename(path))
+        return True
+
+class Link:
+    """Latency and bandwidth of one device's USB/TCP connection
+    
+    Concurrent transfers to the same device share its bandwidth, as they
+    would on a real cable.
+    """
+    
+    def __init__(self, latency: float = 0.0, bandwidth: Optional[float] = None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._lock = threading.Lock()
+        self._busy_until = 0.0
+    
+    def round_trip(self):
+        """Wait out one request/response latency"""
+        if self.latency:
+            time.sleep(self.latency)
+    
+    def transfer(self, size: int):
+        """Wait as long as size bytes take at the link bandwidth"""
+        if not self.bandwidth or not size:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._busy_until = max(now, self._busy_until) + size / self.bandwidth
+            wait = self._busy_until - now
+        time.sleep(wait)
+
+class SimulatedDevice:
+    """State of one simulated phone: props, packages, files and partitions
+    
+    state follows adb naming: device, unauthorized, offline, recovery,
+    sideload, plus bootloader (fastboot only) and disconnected.
+    """
+    
+    def __init__(self, serial: str, index: int = 0, seed: int = 0,
+                 root_method: Optional[str] = 'magisk', shell_v2: bool = True,
+                 package_count: int = 250, prop_count: int = 600, file_count: int = 200,
+                 file_size: int = 4096, large_file_size: int = 8 * 1024 * 1024,
+                 boot_size: int = 8 * 1024 * 1024, screen_size: Tuple[int, int] = (270, 600)):
+        self.serial = serial
+        self.index = index
+        self.root_method = root_method
+        self.shell_v2 = shell_v2
+        self.state = 'device'
+        self.transport_id = index + 1
+        self.link = Link()
+        self.unlocked = False
+        self.screen_size = screen_size
+        self.settings: Dict[Tuple[str, str], str] = {}
+        self.storage = (110 * 1024 ** 3, 42 * 1024 ** 3)
+        self.interfaces = {'lo': '127.0.0.1/8', 'wlan0': f"192.168.1.{100 + index % 100}/24"}
+        self.battery = {'level': 85, 'status': 3, 'plugged': 2, 'voltage': 4123, 'temperature': 291}
+        self.kernel_release = '5.10.177-android12-9-00001-g2d3f1a0c9b1e'
+        self.reboot_requests: List[str] = []
+        self.simulator: Optional['DeviceSimulator'] = None
+        self.fs = SimulatedFileSystem()
+        self.log_lines: List[str] = []
+        
+        rng = random.Random(seed * 100003 + index)
+        self.manufacturer, self.brand, self.model, self.device_name, hardware, platform = \
+            DEVICE_MODELS[index % len(DEVICE_MODELS)]
+        self.props = self._generate_props(rng, hardware, platform, prop_count)
+        self.packages: Dict[str, dict] = self._generate_packages(rng, package_count)
+        self._generate_files(file_count, file_size, large_file_size, boot_size)
+        self.boot_id = ''
+        self.new_boot()
+    
+    def __repr__(self) -> str:
+        return f"SimulatedDevice({self.serial!r}, {self.state!r})"
+    
+    # ==================== Generation ====================
+    
+    def _generate_props(self, rng: random.Random, hardware: str, platform: str, count: int) -> Dict[str, str]:
+        release, sdk = rng.choice([('12', '31'), ('13', '33'), ('14', '34')])
+        build_id = f"UP1A.{rng.randint(230000, 231231)}.{rng.randint(1, 99):03d}"
+        incremental = str(rng.randint(9000000, 9999999))
+        fingerprint = (f"{self.brand}/{self.device_name}/{self.device_name}:{release}/"
+                       f"{build_id}/{incremental}:user/release-keys")
+        props = {
+            'ro.product.manufacturer': self.manufacturer,
+            'ro.product.model': self.model,
+            'ro.product.brand': self.brand,
+            'ro.product.device': self.device_name,
+            'ro.product.name': self.device_name,
+            'ro.product.board': platform,
+            'ro.product.cpu.abi': 'arm64-v8a',
+            'ro.build.version.release': release,
+            'ro.build.version.sdk': sdk,
+            'ro.build.version.security_patch': f"2024-{rng.randint(1, 12):02d}-05",
+            'ro.build.version.incremental': incremental,
+            'ro.build.fingerprint': fingerprint,
+            'ro.build.type': 'user',
+            'ro.build.tags': 'release-keys',
+            'ro.build.user': 'android-build',
+            'ro.build.id': build_id,
+            'ro.bootloader': f"{self.device_name}-{rng.randint(1, 9)}.{rng.randint(0, 9)}-{incremental}",
+            'ro.hardware': hardware,
+            'ro.board.platform': platform,
+            'ro.serialno': self.serial,
+            'ro.boot.serialno': self.serial,
+            'ro.boot.verifiedbootstate': 'orange' if self.root_method else 'green',
+            'ro.boot.flash.locked': '0' if self.root_method else '1',
+            'ro.crypto.state': 'encrypted',
+            'ro.debuggable': '0',
+            'ro.secure': '1',
+            'sys.boot_completed': '1',
+            'persist.sys.timezone': 'Europe/London',
+            'gsm.operator.alpha': 'Simulated',
+            'gsm.sim.state': 'READY',
+            'net.bt.name': 'Android',
+            'dalvik.vm.heapsize': '512m',
+        }
+        for i in range(max(0, count - len(props))):
+            # Pad out to a realistic getprop size, mostly read-only vendor props
+            prefix = 'ro.vendor.sim' if i % 4 else 'vendor.sim.state'
+            props[f"{prefix}.prop{i:04d}"] = f"value{rng.randint(0, 1 << 30):x}"
+        return props
+    
+    def _generate_packages(self, rng: random.Random, count: int) -> Dict[str, dict]:
+        names = [(name, True) for name in SYSTEM_PACKAGES + VENDOR_PACKAGES.get(self.manufacturer, [])]
+        names += [(name, False) for name in USER_PACKAGES]
+        i = 0
+        while len(names) < count:
+            names.append((f"com.sim.{'system' if i % 3 == 0 else 'user'}.app{i:04d}", i % 3 == 0))
+            i += 1
+        
+        packages = {}
+        for uid, (name, system) in enumerate(names[:count], start=10000):
+            if system:
+                folder = 'priv-app' if name.startswith('com.android') else 'app'
+                path = f"/system/{folder}/{name.split('.')[-1].title()}/{name.split('.')[-1].title()}.apk"
+            else:
+                path = f"/data/app/~~{uuid.UUID(int=rng.getrandbits(128)).hex[:22]}==/{name}-1/base.apk"
+            packages[name] = {
+                'system': system,
+                'path': path,
+                'enabled': True,
+                'installed': True,
+                'uid': 1000 if name == 'android' else uid,
+                'version_code': rng.randint(1, 999999),
+                'version_name': f"{rng.randint(1, 30)}.{rng.randint(0, 9)}.{rng.randint(0, 99)}",
+                'installer': None if system else 'com.android.vending',
+                'first_install': 1700000000 + rng.randint(0, 10 ** 7),
+            }
+        return packages
+    
+    def _generate_files(self, file_count: int, file_size: int, large_file_size: int, boot_size: int):
+        fs = self.fs
+        # /sdcard is a symlink to the emulated storage, as on real devices
+        fs.mkdirs('/storage/emulated/0')
+        fs.symlink('/sdcard', '/storage/emulated/0')
+        for path in ('/sdcard/Documents', '/sdcard/Download', '/sdcard/DCIM/Camera',
+                     '/data/local/tmp', '/data/adb', '/system/bin'):
+            fs.mkdirs(path)
+        filler = _blob(max(file_size, 1))
+        for i in range(file_count):
+            folder = ('/sdcard/DCIM/Camera', '/sdcard/Download', '/sdcard/Documents')[i % 5 % 3]
+            extension = {'/sdcard/DCIM/Camera': 'jpg', '/sdcard/Download': 'pdf', '/sdcard/Documents': 'txt'}[folder]
+            path = f"{folder}/file_{i:05d}.{extension}"
+            # Unique bytes per file so checksums and dedup behave realistically
+            tag = f"{self.serial}:{path}:".encode()
+            fs.write(path, (tag + filler)[:file_size], 1700000000 + i)
+        if large_file_size:
+            fs.write('/sdcard/Download/large_file.bin', _blob(large_file_size), 1700000000)
+        
+        for partition in ('boot', 'boot_a', 'boot_b'):
+            fs.write(f"{PARTITION_DIR}/{partition}", _boot_image(boot_size), 1600000000)
+        fs.write('/proc/meminfo', b"MemTotal:        7861232 kB\nMemFree:          912344 kB\n"
+                                  b"MemAvailable:    3411220 kB\n", 0)
+        fs.write('/proc/version', f"Linux version {self.kernel_release} (build@android)\n".encode(), 0)
+        fs.write('/sys/class/power_supply/battery/capacity', f"{self.battery['level']}\n".encode(), 0)
+    
+    # ==================== Runtime ====================
+    
+    def new_boot(self):
+        """Start a new boot: fresh boot_id, volatile state reset"""
+        self.boot_id = str(uuid.uuid4())
+        self.fs.write(BOOT_ID_PATH, f"{self.boot_id}\n".encode(), 0)
+        self.log_lines.clear()
+        self.log('init', f"boot_id {self.boot_id}")
+    
+    def log(self, tag: str, message: str, priority: str = 'I'):
+        """Append a line to the log buffer in logcat's threadtime format"""
+        now = time.time()
+        stamp = time.strftime('%m-%d %H:%M:%S', time.localtime(now))
+        self.log_lines.append(f"{stamp}.{int(now * 1000) % 1000:03d}  1000  1000 {priority} {tag}: {message}")
+    
+    def read_file(self, path: str) -> Optional[bytes]:
+        return self.fs.read(path)
+    
+    def write_file(self, path: str, data: bytes):
+        self.fs.write(path, data)
+    
+    def screenshot(self) -> bytes:
+        return _png(*self.screen_size)
+    
+    def shell(self, command: str, root: bool = False) -> Tuple[int, bytes, bytes]:
+        """Run a command like `adb shell` would"""
+        return DeviceShell(self, root).run(command)
+    
+    def describe_package(self, name: str) -> str:
+        """dumpsys package output for one package"""
+        package = self.packages[name]
+        installed = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(package['first_install']))
+        return (f"Packages:\n  Package [{name}] (sim):\n    userId={package['uid']}\n"
+                f"    codePath={posixpath.dirname(package['path'])}\n"
+                f"    versionCode={package['version_code']} minSdk=24 targetSdk=34\n"
+                f"    versionName={package['version_name']}\n"
+                f"    flags=[ {'SYSTEM ' if package['system'] else ''}HAS_CODE ALLOW_CLEAR_USER_DATA ]\n"
+                f"    firstInstallTime={installed}\n    lastUpdateTime={installed}\n"
+                f"    installerPackageName={package['installer'] or 'null'}\n"
+                f"    User 0: installed={str(package['installed']).lower()} "
+                f"enabled={0 if package['enabled'] else 3}\n")
+    
+    def request_reboot(self, mode: str = ''):
+        """Reboot into mode ('' for Android, bootloader, recovery, ...)"""
+        self.reboot_requests.append(mode)
+        if self.simulator:
+            self.simulator.reboot(self.serial, mode)
+
+# ==================== ADB Server ====================
+
+class _ADBHandler(socketserver.BaseRequestHandler):
+    """One client connection to the simulated adb server"""
+    
+    server: '_ADBServer'
+    
+    def setup(self):
+        # Replies go out in several writes; don't let Nagle hold them back
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.simulator: 'DeviceSimulator' = self.server.simulator
+        self.device: Optional[SimulatedDevice] = None
+    
+    def _read_exact(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return bytes(data)
+    
+    def _okay(self, payload: Optional[bytes] = None):
+        reply = b'OKAY'
+        if payload is not None:
+            reply += b'%04x' % len(payload) + payload
+        self.request.sendall(reply)
+    
+    def _fail(self, message: str):
+        data = message.encode()
+        self.request.sendall(b'FAIL' + b'%04x' % len(data) + data)
+    
+    def _send(self, data: bytes):
+        """Send device data, paced by the device link"""
+        link = self.device.link if self.device else None
+        for start in range(0, len(data), SYNC_DATA_MAX):
+            chunk = data[start:start + SYNC_DATA_MAX]
+            if link:
+                link.transfer(len(chunk))
+            self.request.sendall(chunk)
+    
+    def handle(self):
+        try:
+            while True:
+                length = int(self._read_exact(4), 16)
+                service = self._read_exact(length).decode('utf-8', errors='replace')
+                if self.device is None:
+                    if not self._host_service(service):
+                        return
+                else:
+                    self.simulator.track_connection(self.device, self.request)
+                    try:
+                        self._device_service(service)
+                    finally:
+                        self.simulator.untrack_connection(self.device, self.request)
+                    return
+        except (EOFError, OSError, ValueError):
+            pass
+    
+    # ==================== Host Services ====================
+    
+    def _host_service(self, service: str) -> bool:
+        """Answer a host: request; True keeps the connection for another request"""
+        sim = self.simulator
+        if sim.latency:
+            time.sleep(sim.latency)
+        
+        serial = None
+        if service.startswith('host-serial:'):
+            serial, _, rest = service[len('host-serial:'):].rpartition(':')
+            service = 'host:' + rest
+        elif service.startswith('host:tport:serial:'):
+            serial, service = service[len('host:tport:serial:'):], 'host:tport'
+        
+        if service == 'host:version':
+            self._okay(b'0029')
+        elif service in ('host:devices', 'host:devices-l'):
+            self._okay(sim.listing(long=service.endswith('-l')).encode())
+        elif service in ('host:track-devices', 'host:track-devices-l'):
+            self._okay()
+            sim.add_tracker(self.request, service.endswith('-l'))
+            # Stay open; the simulator pushes updates until the client leaves
+            while self.request.recv(1):
+                pass
+        elif service in ('host:features', 'host:host-features'):
+            device = sim.find(serial) if service == 'host:features' else None
+            features = 'shell_v2,cmd' if device is None or device.shell_v2 else 'cmd'
+            self._okay(features.encode())
+        elif service in ('host:get-state', 'host:get-serialno', 'host:get-devpath'):
+            device, error = sim.lookup(serial, require_online=False)
+            if device is None:
+                self._fail(error)
+            else:
+                value = {'host:get-state': device.state, 'host:get-serialno': device.serial,
+                         'host:get-devpath': f"usb:{device.transport_id}-1"}[service]
+                self._okay(value.encode())
+        elif service.startswith('host:transport') or service in ('host:tport', 'host:tport:any'):
+            if service.startswith('host:transport:'):
+                serial = service[len('host:transport:'):]
+            device, error = sim.lookup(serial)
+            if device is None:
+                self._fail(error)
+                return False
+            self.device = device
+            self._okay()
+            if service.startswith('host:tport'):
+                self.request.sendall(struct.pack('<Q', device.transport_id))
+            return True
+        elif service == 'host:kill':
+            self._okay()
+        else:
+            self._fail(f"unknown host service '{service}'")
+        return False
+    
+    # ==================== Device Services ====================
+    
+    def _device_service(self, service: str):
+        device = self.device
+        device.link.round_trip()
+        name, _, argument = service.partition(':')
+        
+        if name.startswith('shell'):
+            options = name.split(',')[1:]
+            self._okay()
+            if not argument:
+                self._interactive(root=False, crlf='raw' not in options)
+            elif _follows_log(argument):
+                if 'v2' in options and device.shell_v2:
+                    self._follow_log(lambda data: b'\x01' + struct.pack('<I', len(data)) + data)
+                else:
+                    self._follow_log(lambda data: data.replace(b'\n', b'\r\n'))
+            elif 'v2' in options and device.shell_v2:
+                code, out, err = device.shell(argument)
+                packets = bytearray()
+                if out:
+                    packets += b'\x01' + struct.pack('<I', len(out)) + out
+                if err:
+                    packets += b'\x02' + struct.pack('<I', len(err)) + err
+                packets += b'\x03' + struct.pack('<I', 1) + bytes([code & 0xff])
+                self._send(bytes(packets))
+            else:
+                code, out, err = device.shell(argument)
+                # Legacy shell: runs on a pty, so stderr is merged and newlines become CRLF
+                self._send((out + err).replace(b'\n', b'\r\n'))
+        elif name == 'exec':
+            self._okay()
+            if argument in ('sh', '/system/bin/sh'):
+                self._interactive(root=False, crlf=False)
+            elif argument == 'su':
+                if device.root_method:
+                    self._interactive(root=True, crlf=False)
+            elif _follows_log(argument):
+                self._follow_log(lambda data: data)
+            else:
+                code, out, err = device.shell(argument)
+                # Raw exec: has no separate stderr; adbd sends both down the socket
+                self._send(out + err)
+        elif name == 'sync':
+            self._okay()
+            self._sync()
+        elif name == 'reboot':
+            self._okay()
+            device.request_reboot(argument)
+        elif name == 'root':
+            self._okay()
+            self._send(b'adbd cannot run as root in production builds\n')
+        else:
+            self._fail(f"unknown device service '{service}'")
+    
+    def _interactive(self, root: bool, crlf: bool):
+        """A long-lived shell reading commands from the socket (exec:sh, exec:su)"""
+        shell = DeviceShell(self.device, root)
+        pending = b''
+        while True:
+            chunk = self.request.recv(65536)
+            if not chunk:
+                return
+            pending += chunk
+            end = pending.rfind(b'\n') + 1
+            if not end:
+                continue
+            script = pending[:end].decode('utf-8', errors='replace')
+            try:
+                tree = parse(script)
+            except IncompleteInput:
+                continue
+            except ShellSyntaxError as e:
+                pending = pending[end:]
+                self._send(f"/system/bin/sh: syntax error: {e}\n".encode())
+                continue
+            pending = pending[end:]
+            self.device.link.round_trip()
+            try:
+                _, out, err = shell.execute(tree)
+            except ShellExit as e:
+                out, err = e.out, e.err
+                pending = None
+            output = out + err
+            self._send(output.replace(b'\n', b'\r\n') if crlf else output)
+            if pending is None:
+                return
+    
+    def _follow_log(self, frame: Callable[[bytes], bytes]):
+        """Stream the log buffer like a live `logcat` until the client hangs up"""
+        device = self.device
+        sent = 0
+        while True:
+            lines = device.log_lines[sent:]
+            sent += len(lines)
+            if lines:
+                self._send(frame(''.join(line + '\n' for line in lines).encode()))
+            readable, _, _ = select.select([self.request], [], [], LOGCAT_INTERVAL)
+            if readable and not self.request.recv(65536):
+                return
+            device.log('ActivityManager', f"heartbeat {sent}")
+    
+    def _sync(self):
+        device = self.device
+        fs = device.fs
+        while True:
+            header = self._read_exact(8)
+            command, length = header[:4], struct.unpack('<I', header[4:])[0]
+            if command == b'QUIT':
+                return
+            path = self._read_exact(length).decode('utf-8', errors='surrogateescape')
+            device.link.round_trip()
+            
+            if command == b'STAT':
+                mode, size, mtime = fs.stat(path) or (0, 0, 0)
+                self.request.sendall(b'STAT' + struct.pack('<III', mode, size, mtime))
+            elif command == b'LIST':
+                entries = bytearray()
+                names = ['.', '..'] + fs.listdir(path) if fs.isdir(path) else []
+                for name in names:
+                    mode, size, mtime = fs.stat(posixpath.join(path, name)) or (stat.S_IFDIR | 0o771, 4096, 0)
+                    encoded = name.encode('utf-8', errors='surrogateescape')
+                    entries += b'DENT' + struct.pack('<IIII', mode, size, mtime, len(encoded)) + encoded
+                self._send(bytes(entries) + b'DONE' + b'\0' * 16)
+            elif command == b'RECV':
+                data = fs.read(path)
+                if data is None or path.startswith(('/data/', '/dev/block')) and \
+                        not path.startswith('/data/local/tmp'):
+                    message = b'No such file or directory' if data is None else b'Permission denied'
+                    self.request.sendall(b'FAIL' + struct.pack('<I', len(message)) + message)
+                    continue
+                for start in range(0, len(data), SYNC_DATA_MAX):
+                    chunk = data[start:start + SYNC_DATA_MAX]
+                    device.link.transfer(len(chunk))
+                    self.request.sendall(b'DATA' + struct.pack('<I', len(chunk)) + chunk)
+                self.request.sendall(b'DONE' + struct.pack('<I', 0))
+            elif command == b'SEND':
+                remote_path = path.rpartition(',')[0] or path
+                received = bytearray()
+                while True:
+                    header = self._read_exact(8)
+                    kind, size = header[:4], struct.unpack('<I', header[4:])[0]
+                    if kind == b'DONE':
+                        mtime = size
+                        break
+                    chunk = self._read_exact(size)
+                    device.link.transfer(size)
+                    received += chunk
+                if fs.isdir(remote_path):
+                    message = b'is a directory'
+                    self.request.sendall(b'FAIL' + struct.pack('<I', len(message)) + message)
+                else:
+                    fs.write(remote_path, bytes(received), mtime)
+                    self.request.sendall(b'OKAY' + struct.pack('<I', 0))
+            else:
+                message = f"unknown sync command {command!r}".encode()
+                self.request.sendall(b'FAIL' + struct.pack('<I', len(message)) + message)
+                return
+
+class _ADBServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+    
+    def __init__(self, address, simulator: 'DeviceSimulator'):
+        self.simulator = simulator
+        super().__init__(address, _ADBHandler)
+
+# ==================== Fastboot over TCP ====================
+
+class _FastbootHandler(socketserver.BaseRequestHandler):
+    """fastboot TCP transport: FB01 handshake, then 8-byte length framed packets"""
+    
+    server: '_FastbootServer'
+    
+    def _read_exact(self, size: int) -> bytes:
+        data = bytearray()
+        while len(data) < size:
+            chunk = self.request.recv(min(size - len(data), 1024 * 1024))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return bytes(data)
+    
+    def _read_packet(self) -> bytes:
+        return self._read_exact(struct.unpack('>Q', self._read_exact(8))[0])
+    
+    def _reply(self, message: str):
+        data = message.encode()
+        self.request.sendall(struct.pack('>Q', len(data)) + data)
+    
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def handle(self):
+        device = self.server.device
+        if device.state != 'bootloader':
+            return
+        try:
+            if self._read_exact(4)[:2] != b'FB':
+                return
+            self.request.sendall(b'FB01')
+            staged = b''
+            while True:
+                command = self._read_packet().decode('utf-8', errors='replace')
+                device.link.round_trip()
+                staged = self._command(device, command, staged)
+        except (EOFError, OSError, ValueError):
+            pass
+    
+    def _command(self, device: SimulatedDevice, command: str, staged: bytes) -> bytes:
+        """Run one fastboot command, returning the (possibly new) download buffer"""
+        name, _, argument = command.partition(':')
+        variables = self.server.simulator.fastboot_vars(device)
+        
+        if name == 'getvar':
+            if argument == 'all':
+                for key, value in variables.items():
+                    self._reply(f"INFO{key}:{value}")
+                self._reply('OKAY')
+            elif argument in variables:
+                self._reply(f"OKAY{variables[argument]}")
+            else:
+                self._reply('FAILGetVar Variable Not found')
+        elif name == 'download':
+            size = int(argument, 16)
+            if size > FASTBOOT_MAX_DOWNLOAD:
+                self._reply('FAILdata too large')
+                return staged
+            self._reply(f"DATA{size:08x}")
+            received = bytearray()
+            while len(received) < size:
+                packet = self._read_packet()
+                device.link.transfer(len(packet))
+                received += packet
+            self._reply('OKAY')
+            return bytes(received)
+        elif name in ('flash', 'erase'):
+            if not device.unlocked:
+                self._reply('FAILFlashing is not allowed in Lock State')
+            elif name == 'flash' and not staged:
+                self._reply('FAILno image downloaded')
+            else:
+                partition = argument
+                if partition in ('boot', 'recovery', 'vendor_boot') and device.fs.exists(f"{PARTITION_DIR}/{partition}_a"):
+                    partition += '_a'
+                device.fs.write(f"{PARTITION_DIR}/{partition}", staged if name == 'flash' else b'')
+                self._reply('OKAY')
+        elif command in ('flashing unlock', 'oem unlock', 'flashing lock', 'oem lock'):
+            device.unlocked = command.endswith('unlock')
+            self._reply('OKAY')
+        elif command == 'oem device-info':
+            self._reply(f"INFODevice unlocked: {str(device.unlocked).lower()}")
+            self._reply('INFODevice critical unlocked: false')
+            self._reply('OKAY')
+        elif name == 'set_active':
+            self._reply('OKAY')
+        elif name in ('reboot', 'reboot-bootloader', 'reboot-recovery', 'continue', 'boot'):
+            self._reply('OKAY')
+            mode = {'reboot-bootloader': 'bootloader', 'reboot-recovery': 'recovery'}.get(name, argument)
+            self.server.simulator.reboot(device.serial, mode)
+            raise EOFError
+        else:
+            self._reply(f"FAILunknown command {command}")
+        return staged
+
+class _FastbootServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, address, simulator: 'DeviceSimulator', device: SimulatedDevice):
+        self.simulator = simulator
+        self.device = device
+        super().__init__(address, _FastbootHandler)
+
+# ==================== Simulator ====================
+
+class DeviceSimulator:
+    """A fleet of simulated devices behind one adb server socket
+    
+    latency is added to every request round trip (seconds), bandwidth caps
+    each device's link (bytes per second, None for unlimited). Every device
+    also gets a fastboot-over-TCP port that answers while it is in
+    bootloader mode. Extra keyword arguments go to SimulatedDevice.
+    """
+    
+    def __init__(self, device_count: int = 1, latency: float = 0.0, bandwidth: Optional[float] = None,
+                 host: str = '127.0.0.1', port: int = 0, seed: int = 0, reboot_time: float = 0.5,
+                 fastboot: bool = True, root_methods: Tuple[Optional[str], ...] = ('magisk', None, 'kernelsu'),
+                 **device_options):
+        self.host = host
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.seed = seed
+        self.reboot_time = reboot_time
+        self.fastboot = fastboot
+        self.root_methods = root_methods
+        self.device_options = device_options
+        self.devices: Dict[str, SimulatedDevice] = {}
+        
+        self._lock = threading.RLock()
+        self._trackers: List[Tuple[socket.socket, bool]] = []
+        self._connections: Dict[str, set] = {}
+        self._fastboot_servers: Dict[str, _FastbootServer] = {}
+        self._faults: Dict[str, List[str]] = {}
+        self._serving: List[socketserver.BaseServer] = []
+        self._server = _ADBServer((host, port), self)
+        
+        for _ in range(device_count):
+            self.add_device()
+    
+    def __enter__(self) -> 'DeviceSimulator':
+        self.start()
+        return self
+    
+    def __exit__(self, *exc):
+        self.stop()
+    
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+    
+    def start(self) -> 'DeviceSimulator':
+        """Serve in background threads"""
+        self._serve(self._server, 'adb-simulator')
+        return self
+    
+    def stop(self):
+        """Shut down the adb and fastboot listeners and drop open connections"""
+        with self._lock:
+            serving, self._serving = self._serving, []
+        for server in serving:
+            server.shutdown()
+        for server in [self._server] + list(self._fastboot_servers.values()):
+            server.server_close()
+        with self._lock:
+            sockets = [sock for sock, _ in self._trackers]
+            sockets += [sock for conns in self._connections.values() for sock in conns]
+            self._trackers.clear()
+            self._connections.clear()
+        for sock in sockets:
+            self._close(sock)
+    
+    def _serve(self, server: socketserver.BaseServer, name: str):
+        threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.1},
+                         name=f"{name}-{server.server_address[1]}", daemon=True).start()
+        with self._lock:
+            self._serving.append(server)
+    
+    def configure(self, app_config):
+        """Point an AppConfig (and so ADBManager) at this simulator"""
+        app_config.ADB_SERVER_HOST = self.host
+        app_config.ADB_SERVER_PORT = self.port
+        app_config.USE_NATIVE_ADB = True
+        return app_config
+    
+    # ==================== Fleet ====================
+    
+    def add_device(self, device: Optional[SimulatedDevice] = None) -> SimulatedDevice:
+        """Plug in a device (generated if not given)"""
+        with self._lock:
+            if device is None:
+                index = len(self.devices)
+                while f"SIM{index:04d}" in self.devices:
+                    index += 1
+                options = dict(self.device_options)
+                options.setdefault('root_method', self.root_methods[index % len(self.root_methods)]
+                                   if self.root_methods else None)
+                device = SimulatedDevice(f"SIM{index:04d}", index, self.seed, **options)
+            device.simulator = self
+            if device.link.latency == 0 and device.link.bandwidth is None:
+                device.link = Link(self.latency, self.bandwidth)
+            self.devices[device.serial] = device
+            if self.fastboot:
+                server = _FastbootServer((self.host, 0), self, device)
+                self._fastboot_servers[device.serial] = server
+                self._serve(server, 'fastboot-simulator')
+        self.notify()
+        return device
+    
+    def remove_device(self, serial: str):
+        """Unplug a device"""
+        with self._lock:
+            device = self.devices.pop(serial, None)
+            server = self._fastboot_servers.pop(serial, None)
+        if server:
+            with self._lock:
+                serving = server in self._serving
+                if serving:
+                    self._serving.remove(server)
+            if serving:
+                server.shutdown()
+            server.server_close()
+        if device:
+            self._drop_connections(device)
+            self.notify()
+    
+    def set_state(self, serial: str, state: str):
+        """Move a device to another adb state (unauthorized, offline, ...)"""
+        device = self.devices[serial]
+        device.state = state
+        if state != 'device':
+            self._drop_connections(device)
+        self.notify()
+    
+    def inject_faults(self, serial: str, count: int = 1, message: str = "device offline"):
+        """Fail the device's next count transport requests with message
+        
+        Stands in for a flaky USB hub: the device stays listed as online
+        while individual commands fail the way adb reports them.
+        """
+        with self._lock:
+            self._faults.setdefault(serial, []).extend([message] * count)
+    
+    def reboot(self, serial: str, mode: str = ''):
+        """Disconnect now and come back in mode after reboot_time"""
+        device = self.devices.get(serial)
+        if device is None:
+            return
+        self.set_state(serial, 'disconnected')
+        
+        def boot():
+            if self.devices.get(serial) is not device:
+                return
+            device.new_boot()
+            state = {'bootloader': 'bootloader', 'fastboot': 'bootloader', 'recovery': 'recovery',
+                     'sideload': 'sideload'}.get(mode, 'device')
+            self.set_state(serial, state)
+        
+        timer = threading.Timer(self.reboot_time, boot)
+        timer.daemon = True
+        timer.start()
+    
+    def fastboot_serial(self, serial: str) -> str:
+        """The `fastboot -s` target of a device"""
+        server = self._fastboot_servers[serial]
+        return f"tcp:{self.host}:{server.server_address[1]}"
+    
+    def fastboot_vars(self, device: SimulatedDevice) -> Dict[str, str]:
+        boot_size = len(device.fs.read(f"{PARTITION_DIR}/boot") or b'')
+        return {
+            'version': '0.4',
+            'version-bootloader': device.props['ro.bootloader'],
+            'product': device.device_name,
+            'serialno': device.serial,
+            'secure': 'yes',
+            'unlocked': 'yes' if device.unlocked else 'no',
+            'current-slot': 'a',
+            'slot-count': '2',
+            'is-userspace': 'no',
+            'max-download-size': f"0x{FASTBOOT_MAX_DOWNLOAD:x}",
+            'partition-type:boot': 'raw',
+            'partition-size:boot': f"0x{boot_size:x}",
+        }
+    
+    # ==================== Server Side Helpers ====================
+    
+    def listing(self, long: bool = True) -> str:
+        with self._lock:
+            devices = [d for d in self.devices.values() if d.state not in ('bootloader', 'disconnected')]
+        if not long:
+            return ''.join(f"{d.serial}\t{d.state}\n" for d in devices)
+        return ''.join(f"{d.serial:<22} {d.state} product:{d.device_name} model:{d.model.replace(' ', '_')} "
+                       f"device:{d.device_name} transport_id:{d.transport_id}\n" for d in devices)
+    
+    def find(self, serial: Optional[str]) -> Optional[SimulatedDevice]:
+        return self.lookup(serial, require_online=False)[0]
+    
+    def lookup(self, serial: Optional[str], require_online: bool = True) -> Tuple[Optional[SimulatedDevice], str]:
+        """Resolve a serial like the adb server, returning (device, error)"""
+        with self._lock:
+            visible = [d for d in self.devices.values() if d.state not in ('bootloader', 'disconnected')]
+        if serial:
+            device = next((d for d in visible if d.serial == serial), None)
+            if device is None:
+                return None, f"device '{serial}' not found"
+        elif len(visible) == 1:
+            device = visible[0]
+        else:
+            return None, "no devices/emulators found" if not visible else "more than one device/emulator"
+        if require_online and device.state not in ('device', 'recovery', 'sideload'):
+            messages = {
+                'unauthorized': "device unauthorized.\nThis adb server's $ADB_VENDOR_KEYS is not set\n"
+                                "Try 'adb kill-server' if that seems wrong.\n"
+                                "Otherwise check for a confirmation dialog on your device.",
+                'offline': "device offline",
+            }
+            return None, messages.get(device.state, f"device '{device.serial}' not found")
+        if require_online:
+            with self._lock:
+                faults = self._faults.get(device.serial)
+                if faults:
+                    return None, faults.pop(0)
+        return device, ''
+    
+    def add_tracker(self, sock: socket.socket, long: bool):
+        with self._lock:
+            self._trackers.append((sock, long))
+            data = self.listing(long).encode()
+            self._push(sock, data)
+    
+    def notify(self):
+        """Push the device list to every track-devices client"""
+        with self._lock:
+            trackers = list(self._trackers)
+            listings = {long: self.listing(long).encode() for long in (False, True)}
+            for sock, long in trackers:
+                if not self._push(sock, listings[long]):
+                    self._trackers.remove((sock, long))
+    
+    @staticmethod
+    def _push(sock: socket.socket, data: bytes) -> bool:
+        try:
+            sock.sendall(b'%04x' % len(data) + data)
+            return True
+        except OSError:
+            return False
+    
+    def track_connection(self, device: SimulatedDevice, sock: socket.socket):
+        with self._lock:
+            self._connections.setdefault(device.serial, set()).add(sock)
+    
+    def untrack_connection(self, device: SimulatedDevice, sock: socket.socket):
+        with self._lock:
+            self._connections.get(device.serial, set()).discard(sock)
+    
+    def _drop_connections(self, device: SimulatedDevice):
+        """Close every stream to a device, as a cable pull would"""
+        with self._lock:
+            sockets = list(self._connections.pop(device.serial, ()))
+        for sock in sockets:
+            self._close(sock)
+    
+    @staticmethod
+    def _close(sock: socket.socket):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+def _parse_rate(value: str) -> float:
+    """Parse a bandwidth like 40M or 512K (bytes per second)"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    value = value.strip().upper().rstrip('B/S')
+    if value and value[-1] in units:
+        return float(value[:-1]) * units[value[-1]]
+    return float(value)
+
+def main(argv: Optional[List[str]] = None):
+    """Serve a simulated fleet until interrupted"""
+    parser = argparse.ArgumentParser(description="Simulated adb/fastboot devices")
+    parser.add_argument('--devices', type=int, default=1, help="number of devices")
+    parser.add_argument('--port', type=int, default=5037, help="adb server port (0 = any)")
+    parser.add_argument('--latency', type=float, default=0.0, help="round-trip latency in milliseconds")
+    parser.add_argument('--bandwidth', type=_parse_rate, default=None, help="per-device bandwidth, e.g. 40M")
+    parser.add_argument('--packages', type=int, default=250, help="packages per device")
+    parser.add_argument('--files', type=int, default=200, help="small files per device")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    
+    simulator = DeviceSimulator(args.devices, latency=args.latency / 1000, bandwidth=args.bandwidth,
+                                port=args.port, seed=args.seed, package_count=args.packages,
+                                file_count=args.files)
+    with simulator:
+        print(f"adb server simulator on {simulator.host}:{simulator.port} with {args.devices} device(s)")
+        for serial in simulator.devices:
+            print(f"  {serial}  fastboot -s {simulator.fastboot_serial(serial)}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == '__main__':
+    main()
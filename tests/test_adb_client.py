@@ -0,0 +1,120 @@
+"""
+ADB server wire protocol against a scripted fake server
+"""
+
+import re
+import socket
+import struct
+import threading
+
+import pytest
+
+from core.adb_client import ADBClient, ADBProtocolError, MAX_SERVICE_LENGTH
+
+OKAY = b'OKAY'
+
+def hex_block(data: bytes) -> bytes:
+    return b'%04x' % len(data) + data
+
+def packet(packet_id: int, data: bytes) -> bytes:
+    return bytes([packet_id]) + struct.pack('<I', len(data)) + data
+
+class FakeServer:
+    """Answers each request of each connection from a script
+    
+    connections is a list with one list of replies per accepted connection;
+    a reply is bytes or a function of the request payload. Replies go out
+    in write_size pieces to exercise reassembly on the client side.
+    """
+    
+    def __init__(self, connections, write_size: int = 0):
+        self.connections = connections
+        self.write_size = write_size
+        self.requests = []
+        self.raw = bytearray()
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+        self.thread.start()
+    
+    def _read(self, conn, size):
+        data = b''
+        while len(data) < size:
+            chunk = conn.recv(size - len(data))
+            if not chunk:
+                raise EOFError
+            data += chunk
+        return data
+    
+    def _serve(self):
+        for replies in self.connections:
+            conn, _ = self.listener.accept()
+            with conn:
+                try:
+                    for reply in replies:
+                        prefix = self._read(conn, 4)
+                        payload = self._read(conn, int(prefix, 16))
+                        self.raw += prefix + payload
+                        self.requests.append(payload.decode())
+                        data = reply(payload.decode()) if callable(reply) else reply
+                        step = self.write_size or len(data) or 1
+                        for start in range(0, len(data), step):
+                            conn.sendall(data[start:start + step])
+                except EOFError:
+                    pass
+        self.listener.close()
+    
+    def client(self) -> ADBClient:
+        return ADBClient(port=self.port)
+
+def test_requests_are_length_framed():
+    server = FakeServer([[OKAY + hex_block(b'0029')]])
+    
+    assert server.client().version() == 0x29
+    server.thread.join(5)
+    assert bytes(server.raw) == b'000chost:version'
+
+def test_fail_reply_raises_with_message():
+    server = FakeServer([[b'FAIL' + hex_block(b"device 'X' not found")]])
+    
+    with pytest.raises(ADBProtocolError, match="device 'X' not found"):
+        server.client().host_command('host:transport:X')
+
+def test_unexpected_status_raises():
+    server = FakeServer([[b'WHAT']])
+    
+    with pytest.raises(ADBProtocolError, match='unexpected status'):
+        server.client().host_command('host:version')
+
+def test_overlong_request_never_sent():
+    server = FakeServer([[OKAY]])
+    
+    with pytest.raises(ADBProtocolError, match='too long'):
+        server.client().host_command('host:' + 'x' * MAX_SERVICE_LENGTH)
+    assert server.requests == []
+
+@pytest.mark.parametrize('write_size', [0, 1])
+def test_shell_v2_exit_code_and_streams(write_size):
+    reply = (packet(1, b'hello\n') + packet(2, b'oops\n') + packet(1, b'world\n')
+             + packet(3, bytes([42])))
+    server = FakeServer([
+        [OKAY + hex_block(b'shell_v2,cmd,stat_v2')],
+        [OKAY, OKAY + reply],
+    ], write_size)
+    
+    assert server.client().shell('SER1', 'run it') == (42, b'hello\nworld\n', b'oops\n')
+    assert server.requests == ['host-serial:SER1:features', 'host:transport:SER1', 'shell,v2,raw:run it']
+
+def test_shell_v2_without_exit_packet_reports_255():
+    server = FakeServer([[OKAY + hex_block(b'shell_v2')], [OKAY, OKAY + packet(1, b'partial')]])
+    
+    assert server.client().shell('SER1', 'killed') == (255, b'partial', b'')
+
+def test_legacy_shell_exit_code_from_marker():
+    def run(request):
+        marker = re.search(r'(__ARS_RC_\w+__)\$\?', request).group(1)
+        return OKAY + b'line\r\n' + marker.encode() + b'7\r\n'
+    
+    server = FakeServer([[OKAY + hex_block(b'cmd')], [OKAY, run]])
+    
+    assert server.client().shell('SER1', 'false') == (7, b'line\n', b'')
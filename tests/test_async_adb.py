@@ -0,0 +1,92 @@
+"""
+asyncio front end: concurrency limits, retries and cancellation
+"""
+
+import asyncio
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from core.adb_manager import split_serial
+from core.async_adb import ADBEventLoop, AsyncADBEngine
+from core.cancellation import CancelToken
+from core.retry import RetryPolicy
+
+@pytest.fixture
+def engine(adb):
+    engine = AsyncADBEngine(adb, max_concurrency=3, per_device_concurrency=2)
+    yield engine
+    engine.close()
+
+def test_per_device_and_global_limits(adb, simulator, engine):
+    lock = threading.Lock()
+    active, peak = Counter(), Counter()
+    run_command = adb.run_command
+    
+    def tracking(cmd, *args, **kwargs):
+        serial = split_serial(cmd[1:])[0]
+        with lock:
+            active[serial] += 1
+            active['all'] += 1
+            for key in (serial, 'all'):
+                peak[key] = max(peak[key], active[key])
+        try:
+            return run_command(cmd, *args, **kwargs)
+        finally:
+            with lock:
+                active[serial] -= 1
+                active['all'] -= 1
+    adb.run_command = tracking
+    
+    async def main():
+        return await engine.gather(*(engine.shell('sleep 0.1; echo done', serial)
+                                     for serial in simulator.devices for _ in range(4)))
+    
+    results = asyncio.run(main())
+    assert [r.stdout for r in results] == ['done\n'] * 8
+    assert peak['all'] == 3
+    assert max(peak[serial] for serial in simulator.devices) == 2
+
+def test_calls_keep_manager_retries(adb, simulator, engine):
+    adb.retry_policy = RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.002)
+    serial = next(iter(simulator.devices))
+    simulator.inject_faults(serial, 1)
+    
+    result = asyncio.run(engine.shell('getprop ro.product.model', serial))
+    assert result.success
+    assert result.stdout.strip() == simulator.devices[serial].props['ro.product.model']
+
+def test_task_cancel_stops_the_command(simulator, engine):
+    serial = next(iter(simulator.devices))
+    
+    async def main():
+        task = asyncio.ensure_future(engine.shell('sleep 5', serial))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    start = time.monotonic()
+    asyncio.run(main())
+    assert time.monotonic() - start < 3
+
+def test_sync_facade(adb, simulator, engine, tmp_path):
+    serial = next(iter(simulator.devices))
+    loop = ADBEventLoop(engine)
+    try:
+        assert {d['serial'] for d in loop.get_devices()} == set(simulator.devices)
+        
+        local = str(tmp_path / 'large_file.bin')
+        assert loop.pull_file('/sdcard/Download/large_file.bin', local, serial).success
+        assert loop.push_file(local, '/sdcard/copy.bin', serial).success
+        assert simulator.devices[serial].fs.read('/sdcard/copy.bin') == \
+            simulator.devices[serial].fs.read('/sdcard/Download/large_file.bin')
+        
+        token = CancelToken()
+        threading.Timer(0.2, token.cancel).start()
+        result = loop.run_command(adb.device(serial).adb_command(['shell', 'sleep 5']), cancel=token)
+        assert result.cancelled
+    finally:
+        loop.close()
@@ -0,0 +1,56 @@
+"""
+Smoke tests for the benchmark harness
+"""
+
+import json
+
+from tests.benchmarks import BENCHMARKS, build_report, format_table, main, percentile, run_benchmark, run_suite
+
+def test_percentile_interpolates():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.5
+    assert percentile(values, 99) == 99.01
+    assert percentile([3.0], 95) == 3.0
+    assert percentile([], 50) == 0.0
+
+def test_every_benchmark_runs_against_simulator(adb, simulator):
+    results = run_suite(adb, list(simulator.devices), iterations=2, warmup=1)
+    
+    assert [r.name for r in results] == [b.name for b in BENCHMARKS]
+    for result in results:
+        assert result.errors == 0, result.name
+        assert result.iterations == 2
+        assert 0 < result.p50_ms <= result.p95_ms <= result.p99_ms <= result.max_ms
+    
+    by_name = {r.name: r for r in results}
+    assert by_name['pull_large_file'].bytes_per_sec > 0
+    # Everything goes over the server socket; nothing should fork adb
+    assert all(r.processes == 0 for r in results)
+
+def test_concurrent_run_spreads_over_devices(adb, simulator):
+    benchmark = next(b for b in BENCHMARKS if b.name == 'get_detailed_device_info')
+    devices = [adb.device(serial) for serial in simulator.devices]
+    
+    result = run_benchmark(benchmark, devices, iterations=6, concurrency=2)
+    
+    assert result.errors == 0
+    assert result.iterations == 6
+    assert result.concurrency == 2
+
+def test_report_is_json_and_compares(adb, simulator):
+    results = run_suite(adb, list(simulator.devices), iterations=2, only=['get_devices'])
+    report = json.loads(json.dumps(build_report(results, {'iterations': 2})))
+    
+    assert set(report['results']) == {'get_devices'}
+    assert {'p50_ms', 'p95_ms', 'p99_ms', 'ops_per_sec', 'processes', 'peak_rss_mb'} <= set(report['results']['get_devices'])
+    assert 'p50' in format_table(results, report)
+
+def test_cli_writes_report(tmp_path):
+    output = tmp_path / 'bench.json'
+    
+    assert main(['--iterations', '2', '--files', '10', '--only', 'get_devices', 'get_device_props',
+                 '--output', str(output)]) == 0
+    
+    report = json.loads(output.read_text())
+    assert set(report['results']) == {'get_devices', 'get_device_props'}
+    assert report['meta']['settings']['iterations'] == 2
@@ -0,0 +1,48 @@
+"""
+Curated bloatware rules compiled into one classifier
+"""
+
+import pytest
+
+from core.bloat_rules import BloatClassifier, BloatRule, classifier_for, device_rule_sets
+from core.device_manager import DeviceManager
+
+def test_exact_prefix_and_segment_precedence():
+    classifier = BloatClassifier([
+        BloatRule('prefix', 'com.vendor.', 'oem', 'advanced', "Vendor", 'test'),
+        BloatRule('prefix', 'com.vendor.core.', 'system', 'expert', "Vendor core", 'test'),
+        BloatRule('package', 'com.vendor.core.ui', 'system', 'unsafe', "Vendor UI", 'test'),
+        BloatRule('segment', 'tests', 'test', 'advanced', "Test package", 'test'),
+        BloatRule('regex', r'^org\.sample\d', 'demo', 'recommended', "Sample", 'test'),
+    ])
+    assert classifier.classify('com.vendor.core.ui').safety == 'unsafe'
+    assert classifier.classify('com.vendor.core.sync').safety == 'expert'
+    assert classifier.classify('com.vendor.cloud').safety == 'advanced'
+    # A namespace rule does not match the namespace package itself
+    assert classifier.classify('com.vendor') is None
+    assert classifier.classify('com.other.app.tests').category == 'test'
+    assert classifier.classify('com.google.android.attestation') is None
+    assert classifier.classify('org.sample2.app').category == 'demo'
+    
+    with pytest.raises(ValueError):
+        BloatClassifier([BloatRule('prefix', 'com.vendor', 'oem', 'advanced', "Vendor", 'test')])
+
+def test_rule_sets_follow_brand_and_platform():
+    assert device_rule_sets({'ro.product.manufacturer': 'Xiaomi', 'ro.product.brand': 'Redmi',
+                             'ro.hardware': 'qcom'}) == ('generic', 'carrier', 'xiaomi', 'qualcomm')
+    assert device_rule_sets({'ro.product.manufacturer': 'motorola', 'ro.board.platform': 'mt6765'}) == \
+        ('generic', 'carrier', 'mediatek')
+    assert classifier_for(('generic', 'samsung')) is classifier_for(('generic', 'samsung'))
+
+def test_device_packages_classified(adb, simulator):
+    # Second simulated device is a Samsung on a Qualcomm SoC
+    serial = list(simulator.devices)[1]
+    manager = DeviceManager(adb.device(serial))
+    assert manager.bloat_rule_sets() == ('generic', 'carrier', 'samsung', 'qualcomm')
+    
+    matches = manager.classify_packages()
+    assert matches['com.samsung.android.bixby.agent'].rule_set == 'samsung'
+    assert matches['com.samsung.android.game.gamehome'].category == 'games'
+    assert matches['com.facebook.katana'].safety == 'recommended'
+    assert matches['com.android.providers.media'].safety == 'unsafe'
+    assert set(matches) <= set(manager.get_package_inventory().names)
@@ -0,0 +1,83 @@
+"""
+Command deadlines and cancellation
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+from core.cancellation import CancelToken, Watchdog
+from tests.support.device_simulator import Link
+
+# Backgrounds a grandchild that holds stdout open, then waits on it
+SPAWNS_GRANDCHILD = ['sh', '-c', 'sleep 30 & echo $!; wait']
+
+def _running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # Killed but not yet reaped by init
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+def _reaped(pid: int, wait: float = 2.0) -> bool:
+    deadline = time.monotonic() + wait
+    while _running(pid):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.02)
+    return True
+
+def test_transfers_outlive_the_command_timeout(adb, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    handle = adb.device(serial)
+    adb.config.COMMAND_TIMEOUT = 0.2
+    
+    slow = handle.run_command(['shell', 'sleep 2'])
+    assert slow.timed_out and slow.returncode == 124
+    
+    # 256 KB at ~400 KB/s: well past COMMAND_TIMEOUT, still finishes
+    simulator.devices[serial].link = Link(bandwidth=400 * 1024)
+    result = handle.pull_file('/sdcard/Download/large_file.bin', str(tmp_path / 'large_file.bin'))
+    assert result.success and not result.timed_out
+    
+    assert adb.is_transfer(['-s', serial, 'backup', '-f', 'app.ab', 'com.example'])
+    flash = handle.fastboot_command(['flash', 'boot', 'boot.img'])
+    assert flash == [adb.fastboot_path, '-s', serial, 'flash', 'boot', 'boot.img']
+    assert adb.is_transfer(flash)
+    assert not adb.is_transfer(['shell', 'ls'])
+    assert not adb.is_transfer([adb.fastboot_path, 'getvar', 'all'])
+
+@pytest.mark.skipif(os.name == 'nt', reason='POSIX process groups')
+@pytest.mark.parametrize('stop', ['timeout', 'cancel'])
+def test_interrupt_kills_the_whole_process_group(adb, stop):
+    token = CancelToken()
+    if stop == 'cancel':
+        threading.Timer(0.3, token.cancel).start()
+    
+    start = time.monotonic()
+    result = adb.run_command(SPAWNS_GRANDCHILD, timeout=0.3 if stop == 'timeout' else 0, cancel=token)
+    # communicate() only returns once the grandchild has let go of stdout
+    assert time.monotonic() - start < 5
+    assert (result.timed_out, result.cancelled) == (stop == 'timeout', stop == 'cancel')
+    assert _reaped(int(result.stdout.split()[0]))
+
+def test_watchdog_fires_once_and_only_when_due():
+    calls = []
+    with Watchdog(lambda: calls.append('abort'), timeout=0.5) as watchdog:
+        pass
+    time.sleep(0.7)
+    assert calls == [] and not watchdog.interrupted
+    
+    token = CancelToken()
+    token.cancel()
+    with Watchdog(lambda: calls.append('abort'), timeout=0.05, token=token) as watchdog:
+        time.sleep(0.2)
+    assert calls == ['abort']
+    assert watchdog.cancelled and not watchdog.timed_out
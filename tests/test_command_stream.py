@@ -0,0 +1,74 @@
+"""
+Streaming command output: lines, chunks and cancellation
+"""
+
+import threading
+import time
+
+import pytest
+
+from core.cancellation import CancelToken
+from tests.support.device_simulator import LOGCAT_INTERVAL
+
+@pytest.fixture
+def device(simulator):
+    return next(iter(simulator.devices.values()))
+
+@pytest.mark.parametrize('shell_v2', [True, False])
+def test_lines_reassembled_across_chunks(adb, device, shell_v2):
+    device.shell_v2 = shell_v2
+    for i in range(200):
+        device.log('Test', f"line {i} " + 'x' * (i % 13))
+    handle = adb.device(device.serial)
+    
+    # A 7 byte chunk size splits nearly every line over several reads
+    with adb.stream_command(handle.adb_command(['shell', 'logcat -d']), chunk_size=7) as stream:
+        lines = list(stream.lines())
+    assert lines == device.log_lines
+    assert stream.returncode == 0
+
+def test_chunks_are_byte_exact(adb, device):
+    handle = adb.device(device.serial)
+    path = '/sdcard/Download/large_file.bin'
+    
+    with handle.stream_command(['exec-out', f'cat {path}']) as stream:
+        chunks = list(stream.chunks())
+    assert len(chunks) > 1
+    assert b''.join(chunks) == device.fs.read(path)
+    assert stream.success
+
+def test_exit_code_and_stderr_kept(adb, device):
+    stream = adb.device(device.serial).stream_shell('echo out; echo err >&2; exit 3')
+    
+    assert list(stream) == ['out']
+    assert stream.returncode == 3
+    assert stream.stderr == 'err\n'
+
+def _log_stops_growing(device) -> bool:
+    size = len(device.log_lines)
+    time.sleep(LOGCAT_INTERVAL * 4)
+    return len(device.log_lines) == size
+
+@pytest.mark.parametrize('shell_v2', [True, False])
+def test_token_cancels_followed_logcat(adb, device, shell_v2):
+    device.shell_v2 = shell_v2
+    token = CancelToken()
+    stream = adb.device(device.serial).stream_command(['shell', 'logcat'], cancel=token)
+    threading.Timer(LOGCAT_INTERVAL * 5, token.cancel).start()
+    
+    start = time.monotonic()
+    lines = list(stream)
+    assert time.monotonic() - start < 5
+    assert lines[0].endswith(f"init: boot_id {device.boot_id}")
+    assert stream.cancelled and stream.returncode is not None
+    assert _log_stops_growing(device)
+
+def test_breaking_out_stops_logcat(adb, device):
+    stream = adb.device(device.serial).stream_shell('logcat')
+    
+    for i, line in enumerate(stream):
+        if i == 3:
+            break
+    assert 'heartbeat' in line
+    assert stream.cancelled and stream.returncode is not None
+    assert _log_stops_growing(device)
@@ -0,0 +1,54 @@
+"""
+Single-round-trip device probe script and its parsers
+"""
+
+from core.device_manager import DeviceManager
+from core.device_probe import build_probe_script, parse_network, split_probe_output
+
+def test_sections_split_on_token_markers():
+    script = build_probe_script(['df', 'capacity'], 'abcd1234')
+    assert script.count('echo @@ARS:abcd1234:') == 2
+    
+    output = ("@@ARS:abcd1234:df\n/dev/block/dm-48 110G 42G 68G 39% /data\n"
+              "@@ARS:ffff:fake\n@@ARS:abcd1234:capacity\n")
+    sections = split_probe_output(output, 'abcd1234')
+    assert sections['df'] == "/dev/block/dm-48 110G 42G 68G 39% /data\n@@ARS:ffff:fake"
+    assert sections['capacity'] == ''
+    assert split_probe_output("error: device offline\n", 'abcd1234') == {}
+
+def test_network_from_ip_or_ifconfig():
+    ip = ("1: lo    inet 127.0.0.1/8 scope host lo\\       valid_lft forever preferred_lft forever\n"
+          "30: wlan0    inet 192.168.1.23/24 brd 192.168.1.255 scope global wlan0\\       valid_lft forever\n"
+          "31: rmnet_data0@rmnet0    inet 10.64.2.7/30 scope global rmnet_data0")
+    network = parse_network({'ip': ip, 'telephony': "Carrier\nREADY\n"})
+    assert network == {'ip_wlan0': '192.168.1.23', 'ip_rmnet_data0': '10.64.2.7',
+                       'operator': 'Carrier', 'sim_state': 'READY'}
+    
+    ifconfig = ("lo        Link encap:Local Loopback\n          inet addr:127.0.0.1  Mask:255.0.0.0\n"
+                "wlan0     Link encap:UNSPEC\n          inet addr:192.168.1.23  Bcast:192.168.1.255\n")
+    assert parse_network({'ip': ifconfig}) == {'ip_wlan0': '192.168.1.23'}
+
+def test_detailed_info_in_one_round_trip(adb, simulator):
+    serial = next(iter(simulator.devices))
+    manager = DeviceManager(adb.device(serial))
+    calls = []
+    run_shell = manager.device.run_shell
+    
+    def counting_run_shell(command, *args, **kwargs):
+        calls.append(command)
+        return run_shell(command, *args, **kwargs)
+    manager.device.run_shell = counting_run_shell
+    
+    info = manager.get_detailed_device_info()
+    assert len(calls) == 1
+    assert info['basic']['ro.product.model'] == simulator.devices[serial].model
+    assert info['storage']['internal_use_percent'].endswith('%')
+    assert int(info['storage']['ram_total_mb']) > 0
+    assert info['battery'] == {'level': '85', 'status': 'Discharging'}
+    assert info['network']['ip_wlan0'].startswith('192.168.1.')
+    assert info['network']['operator'] == 'Simulated'
+    
+    # Warm cache: still one round trip, without the getprop dump
+    calls.clear()
+    manager.get_detailed_device_info()
+    assert len(calls) == 1 and ':props' not in calls[0]
@@ -0,0 +1,72 @@
+"""
+getprop parsing and the per-boot ro.* property cache
+"""
+
+from core.adb_manager import parse_getprop
+
+def test_parse_getprop_edge_cases():
+    dump = ("[ro.product.model]: [Pixel 8]\n"
+            "[persist.sys.empty]: []\n"
+            "[ro.build.description]: [a [bracketed] value]\n"
+            "[ro.multi.line]: [first\nsecond]\n"
+            "not a property line\n"
+            "[sys.boot_completed]: [1]\r\n")
+    
+    assert parse_getprop(dump) == {
+        'ro.product.model': 'Pixel 8',
+        'persist.sys.empty': '',
+        'ro.build.description': 'a [bracketed] value',
+        'ro.multi.line': 'first\nsecond',
+        'sys.boot_completed': '1',
+    }
+
+def test_parse_getprop_matches_device(simulator):
+    device = next(iter(simulator.devices.values()))
+    _, out, _ = device.shell('getprop')
+    
+    assert parse_getprop(out.decode()) == device.props
+
+def test_ro_props_cached_until_boot_id_changes(adb, simulator):
+    device = next(iter(simulator.devices.values()))
+    handle = adb.device(device.serial)
+    model = device.props['ro.product.model']
+    
+    assert handle.get_prop_snapshot() == device.props
+    
+    # Mutable properties are always re-read; ro.* come from the cache
+    device.props['ro.product.model'] = 'Changed by OTA'
+    device.props['persist.sys.locale'] = 'fr-FR'
+    snapshot = handle.get_prop_snapshot()
+    assert snapshot['ro.product.model'] == model
+    assert snapshot['persist.sys.locale'] == 'fr-FR'
+    
+    device.new_boot()
+    assert handle.get_prop_snapshot() == device.props
+
+def test_unreadable_device_keeps_ro_cache(adb, simulator):
+    device = next(iter(simulator.devices.values()))
+    handle = adb.device(device.serial)
+    handle.get_prop_snapshot()
+    cached = handle._ro_props
+    
+    simulator.set_state(device.serial, 'offline')
+    snapshot = handle.get_prop_snapshot()
+    assert snapshot == {k: v for k, v in device.props.items() if k.startswith('ro.')}
+    assert handle._ro_props == cached
+
+def test_boot_id_change_retried_once(adb, simulator):
+    device = next(iter(simulator.devices.values()))
+    handle = adb.device(device.serial)
+    handle.get_prop_snapshot()
+    calls = []
+    run_shell = handle.run_shell
+    
+    # A boot id that differs on every read must not recurse forever
+    def rebooting_run_shell(command, *args, **kwargs):
+        calls.append(command)
+        device.new_boot()
+        return run_shell(command, *args, **kwargs)
+    handle.run_shell = rebooting_run_shell
+    
+    assert handle.get_prop_snapshot()['ro.product.model'] == device.props['ro.product.model']
+    assert len(calls) == 2
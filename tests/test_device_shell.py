@@ -0,0 +1,29 @@
+"""
+The simulated device shell: exit status and subshells
+"""
+
+import pytest
+
+from tests.support.device_shell import DeviceShell
+
+@pytest.fixture
+def shell(simulator):
+    return DeviceShell(next(iter(simulator.devices.values())), root=False)
+
+@pytest.mark.parametrize('script, expected', [
+    ('echo hi; exit 3', (3, b'hi\n', b'')),
+    ('echo out; echo err >&2; exit 1', (1, b'out\n', b'err\n')),
+    ('(echo a; exit 4); echo after $?', (0, b'a\nafter 4\n', b'')),
+    ('( echo a; echo b >&2; exit 6 ) 2>&1', (6, b'a\nb\n', b'')),
+    ('sh -c "echo x; exit 5"; echo $?', (0, b'x\n5\n', b'')),
+    ('exit 2 | cat; echo piped', (0, b'piped\n', b'')),
+])
+def test_exit_ends_only_its_own_shell(shell, script, expected):
+    assert shell.run(script) == expected
+
+def test_exit_keeps_output_over_adb(adb, simulator):
+    handle = adb.device(next(iter(simulator.devices)))
+    
+    result = handle.run_shell('echo hi; exit 3')
+    assert result.returncode == 3
+    assert result.stdout.strip() == 'hi'
@@ -0,0 +1,60 @@
+"""
+Device info cache keyed by serial and build fingerprint
+"""
+
+from core.device_manager import DeviceManager
+from core.device_store import DeviceInfoStore, DeviceSnapshot
+
+def test_store_keeps_newest_build_only(tmp_path):
+    store = DeviceInfoStore(str(tmp_path / 'cache.sqlite3'))
+    store.save(DeviceSnapshot('SIM0000', 'build/1', 'boot-a', build={'basic': {'ro.product.model': 'One'}}))
+    store.save(DeviceSnapshot('SIM0000', 'build/2', 'boot-b', build={'basic': {'ro.product.model': 'Two'}}))
+    store.close()
+    
+    store = DeviceInfoStore(str(tmp_path / 'cache.sqlite3'))
+    assert store.load('SIM0000', 'build/1') is None
+    snapshot = store.load('SIM0000')
+    assert snapshot.fingerprint == 'build/2'
+    assert snapshot.sections()['basic'] == {'ro.product.model': 'Two'}
+    assert snapshot.sections()['battery'] == {}
+    
+    store.forget('SIM0000')
+    assert store.load('SIM0000') is None
+
+def test_build_info_served_from_cache_until_fingerprint_changes(adb, simulator):
+    serial = next(iter(simulator.devices))
+    device = simulator.devices[serial]
+    manager = DeviceManager(adb.device(serial))
+    assert manager.cached_device_info() is None
+    
+    info = manager.get_detailed_device_info()
+    model = info['basic']['ro.product.model']
+    assert info['battery']['level']
+    assert manager.cached_device_info()['basic'] == info['basic']
+    
+    # Same build: properties come from the cache, battery is read fresh
+    device.props['ro.product.model'] = 'Renamed'
+    device.battery['level'] = 7
+    device.write_file('/sys/class/power_supply/battery/capacity', b'7\n')
+    info = manager.get_detailed_device_info()
+    assert info['basic']['ro.product.model'] == model
+    assert info['battery']['level'] == '7'
+    
+    # An OTA: new fingerprint after a reboot
+    device.props['ro.build.fingerprint'] += '.1'
+    device.new_boot()
+    info = manager.get_detailed_device_info()
+    assert info['basic']['ro.product.model'] == 'Renamed'
+
+def test_reboot_drops_boot_scoped_data(adb, simulator):
+    serial = next(iter(simulator.devices))
+    manager = DeviceManager(adb.device(serial))
+    manager.get_detailed_device_info()
+    snapshot, _ = manager.current_snapshot()
+    snapshot.boot['root'] = [True, 'Rooted', 'Magisk']
+    manager.save_snapshot(snapshot)
+    
+    assert manager.current_snapshot()[0].boot
+    simulator.devices[serial].new_boot()
+    snapshot, cacheable = manager.current_snapshot()
+    assert cacheable and snapshot.build and not snapshot.boot
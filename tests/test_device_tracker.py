@@ -0,0 +1,58 @@
+"""
+Event-driven device tracking over host:track-devices-l
+"""
+
+import queue
+
+from core.device_tracker import CONNECTED, DISCONNECTED, STATE_CHANGED, DeviceTracker
+
+def test_plug_state_change_and_unplug_events(adb, simulator):
+    events = queue.Queue()
+    tracker = DeviceTracker(adb)
+    tracker.subscribe(events.put)
+    tracker.start()
+    try:
+        initial = [events.get(timeout=5) for _ in simulator.devices]
+        assert {e.kind for e in initial} == {CONNECTED}
+        assert {e.serial for e in initial} == set(simulator.devices)
+        
+        device = simulator.add_device()
+        event = events.get(timeout=5)
+        assert (event.kind, event.serial, event.status) == (CONNECTED, device.serial, 'device')
+        assert device.serial in {d['serial'] for d in event.devices}
+        
+        simulator.set_state(device.serial, 'unauthorized')
+        event = events.get(timeout=5)
+        assert (event.kind, event.status, event.previous_status) == (STATE_CHANGED, 'unauthorized', 'device')
+        
+        simulator.remove_device(device.serial)
+        event = events.get(timeout=5)
+        assert (event.kind, event.serial, event.previous_status) == (DISCONNECTED, device.serial, 'unauthorized')
+        assert {d['serial'] for d in tracker.devices} == set(simulator.devices)
+        assert events.empty()
+    finally:
+        tracker.stop()
+    assert not tracker.running
+
+def test_unsubscribed_callback_not_called(adb, simulator):
+    seen, events = [], queue.Queue()
+    tracker = DeviceTracker(adb)
+    tracker.unsubscribe(tracker.subscribe(seen.append))
+    tracker.subscribe(events.put)
+    tracker.start()
+    try:
+        for _ in simulator.devices:
+            events.get(timeout=5)
+    finally:
+        tracker.stop()
+    assert seen == []
+
+def test_stop_right_after_start(adb, simulator):
+    tracker = DeviceTracker(adb)
+    tracker.start()
+    thread = tracker._thread
+    tracker.stop()
+    
+    # The stream must not outlive stop(), however early stop() came
+    thread.join(timeout=5)
+    assert not thread.is_alive() and not tracker.running
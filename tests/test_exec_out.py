@@ -0,0 +1,44 @@
+"""
+Binary-safe exec-out captures: boot image dumps and screenshots
+"""
+
+import os
+
+from config.constants import BOOT_IMAGE_MAGIC, PNG_SIGNATURE
+from core.device_manager import DeviceManager
+from tests.support.device_shell import DeviceShell
+
+def test_boot_image_streamed_byte_exact(adb, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    manager = DeviceManager(adb.device(serial))
+    
+    assert manager.get_boot_image(str(tmp_path))
+    with open(tmp_path / 'ogboot.img', 'rb') as f:
+        data = f.read()
+    assert data.startswith(BOOT_IMAGE_MAGIC)
+    assert data == simulator.devices[serial].fs.read('/dev/block/bootdevice/by-name/boot')
+
+def test_su_error_text_is_not_a_boot_image(adb, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    simulator.devices[serial].root_method = None
+    manager = DeviceManager(adb.device(serial))
+    
+    # exec: reports no exit status and su's complaint arrives on the same stream
+    assert not manager.get_boot_image(str(tmp_path))
+    assert 'su' in manager.last_error
+    assert not os.path.exists(tmp_path / 'ogboot.img')
+
+def test_screenshot_must_be_a_png(adb, simulator, tmp_path, monkeypatch):
+    serial = next(iter(simulator.devices))
+    manager = DeviceManager(adb.device(serial))
+    
+    shots = tmp_path / 'shots'
+    path = manager.take_screenshot(str(shots))
+    with open(path, 'rb') as f:
+        assert f.read(len(PNG_SIGNATURE)) == PNG_SIGNATURE
+    os.remove(path)
+    
+    monkeypatch.setattr(DeviceShell, '_cmd_screencap',
+                        lambda self, args, stdin: (1, b'', b'screencap: Capturing failed.\n'))
+    assert manager.take_screenshot(str(shots)) is None
+    assert os.listdir(shots) == []
@@ -0,0 +1,42 @@
+"""
+Fleet export on a bounded pool, streamed per device
+"""
+
+import csv
+import io
+import json
+
+from config.settings import AppConfig
+from core.adb_manager import ADBManager
+from core.fleet_export import CSV_FIELDS, export_fleet
+from tests.support.device_simulator import DeviceSimulator, Link
+
+def test_slow_and_unauthorized_devices_do_not_block_the_rest(tmp_path):
+    with DeviceSimulator(device_count=4, package_count=10, file_count=2, large_file_size=1024,
+                         boot_size=1024) as simulator:
+        serials = list(simulator.devices)
+        simulator.set_state(serials[1], 'unauthorized')
+        simulator.devices[serials[2]].link = Link(latency=1.0)
+        adb = ADBManager(simulator.configure(AppConfig(BASE_DIR=str(tmp_path))))
+        try:
+            ndjson, csv_file, order = io.StringIO(), io.StringIO(), []
+            records = export_fleet(adb, ndjson, csv_file, max_workers=2, timeout=0.5,
+                                   on_record=lambda record: order.append(record['serial']))
+        finally:
+            adb.shutdown()
+    
+    by_serial = {record['serial']: record for record in records}
+    assert set(by_serial) == set(serials)
+    assert by_serial[serials[0]]['ok'] and by_serial[serials[3]]['ok']
+    assert by_serial[serials[1]]['error'] == "Device is unauthorized"
+    assert by_serial[serials[2]]['error'] == "Timed out after 0.5s"
+    # The slow device finishes last even though it was submitted third
+    assert order[-1] == serials[2]
+    assert by_serial[serials[0]]['info']['basic']['ro.product.manufacturer']
+    
+    lines = [json.loads(line) for line in ndjson.getvalue().splitlines()]
+    assert [line['serial'] for line in lines] == order
+    rows = list(csv.DictReader(io.StringIO(csv_file.getvalue())))
+    assert list(rows[0]) == CSV_FIELDS
+    row = next(row for row in rows if row['serial'] == serials[0])
+    assert row['ok'] == 'True' and row['network.ip'] == 'wlan0=192.168.1.100'
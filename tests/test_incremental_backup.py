@@ -0,0 +1,77 @@
+"""
+Manifest-based user-data backups: changed files only, links, resume
+"""
+
+import os
+
+from config.constants import BACKUP_FOLDERS
+from core.adb_client import ADBProtocolError, SyncConnection
+from core.backup_manager import BackupManager
+from core.backup_manifest import BackupManifest
+
+def test_repeat_backup_pulls_only_changes(adb, simulator, monkeypatch):
+    serial = next(iter(simulator.devices))
+    fs = simulator.devices[serial].fs
+    manager = BackupManager(adb.device(serial))
+    manager.config = adb.config
+    root = adb.config.PATHS['backup_root']
+    
+    pulled = []
+    pull_file = SyncConnection.pull_file
+    
+    def counting_pull_file(self, remote_path, local_path, mtime=None):
+        pulled.append(remote_path)
+        return pull_file(self, remote_path, local_path, mtime)
+    monkeypatch.setattr(SyncConnection, 'pull_file', counting_pull_file)
+    
+    first = manager.backup_user_data(os.path.join(root, 'newbackup_20240101_000000'), BACKUP_FOLDERS)
+    remote = sorted(path for path in fs.walk('/sdcard') if fs.isfile(path) and '/Android/' not in path)
+    assert sorted(pulled) == [path for path in remote if any(path.startswith(r + '/') for _, r in BACKUP_FOLDERS)]
+    
+    changed = next(path for path in pulled if path.endswith('.txt'))
+    fs.write(changed, b'edited', 1800000000)
+    fs.write('/sdcard/DCIM/Camera/new.jpg', b'\xff\xd8new', 1800000000)
+    pulled.clear()
+    
+    second = manager.backup_user_data(os.path.join(root, 'newbackup_20240102_000000'), BACKUP_FOLDERS)
+    assert sorted(pulled) == sorted([changed, '/sdcard/DCIM/Camera/new.jpg'])
+    assert second['DCIM'] == first['DCIM'] + 1
+    
+    # Unchanged files share storage with the previous backup
+    previous = BackupManifest.load(os.path.join(root, 'newbackup_20240101_000000', 'User_Data'))
+    current = BackupManifest.load(os.path.join(root, 'newbackup_20240102_000000', 'User_Data'))
+    kept = next(path for path in remote if path.endswith('.jpg'))
+    assert os.path.samefile(previous.local_path(kept), current.local_path(kept))
+    assert current.complete
+    with open(current.local_path(changed), 'rb') as f:
+        assert f.read() == b'edited'
+    assert manager.interrupted_backup() is None
+
+def test_interrupted_backup_resumes(adb, simulator, monkeypatch):
+    serial = next(iter(simulator.devices))
+    manager = BackupManager(adb.device(serial))
+    manager.config = adb.config
+    adb.config.RETRY_BASE_DELAY = 0.001
+    folder = os.path.join(adb.config.PATHS['backup_root'], 'newbackup_20240101_000000')
+    
+    pulled = []
+    pull_file = SyncConnection.pull_file
+    
+    def failing_pull_file(self, remote_path, local_path, mtime=None):
+        if remote_path.endswith('.pdf'):
+            raise ADBProtocolError("device disconnected")
+        return counting_pull_file(self, remote_path, local_path, mtime)
+    
+    def counting_pull_file(self, remote_path, local_path, mtime=None):
+        pulled.append(remote_path)
+        return pull_file(self, remote_path, local_path, mtime)
+    monkeypatch.setattr(SyncConnection, 'pull_file', failing_pull_file)
+    manager.backup_user_data(folder, BACKUP_FOLDERS)
+    assert manager.interrupted_backup() == folder
+    
+    done = len(pulled)
+    pulled.clear()
+    monkeypatch.setattr(SyncConnection, 'pull_file', counting_pull_file)
+    manager.backup_user_data(folder, BACKUP_FOLDERS)
+    assert pulled and all(path.endswith('.pdf') for path in pulled)
+    assert done and manager.interrupted_backup() is None
@@ -0,0 +1,100 @@
+"""
+Metrics registry and command/operation instrumentation
+"""
+
+import json
+import os
+
+import pytest
+
+from config.constants import BACKUP_FOLDERS
+from core.backup_manager import BackupManager
+from core.device_manager import DeviceManager
+from core.metrics import Counter, MetricsRegistry, _Metric, registry, summary_rows
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+def test_histogram_buckets_and_quantiles():
+    metrics = MetricsRegistry()
+    latency = metrics.histogram('latency_seconds', 'test', ('op',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.05, 0.5, 2.0):
+        latency.observe(value, op='a')
+    
+    [(key, cumulative, total, count)] = latency.samples()
+    assert key == ('a',)
+    assert cumulative == [2, 3, 4]
+    assert count == 4 and total == pytest.approx(2.6)
+    assert latency.quantile(0.5, cumulative) == pytest.approx(0.1)
+    assert latency.quantile(0.99, cumulative) == 1.0
+    
+    text = metrics.to_prometheus()
+    assert 'latency_seconds_bucket{op="a",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{op="a",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{op="a"} 4' in text
+
+def test_registry_rejects_conflicting_definitions():
+    metrics = MetricsRegistry()
+    assert metrics.counter('things_total', 'test', ('a',)) is metrics.counter('things_total', 'test', ('a',))
+    with pytest.raises(ValueError):
+        metrics.histogram('things_total', 'test', ('a',))
+
+def test_reset_clears_every_metric_kind():
+    metrics = MetricsRegistry()
+    metrics.counter('things_total', 'test').inc(3)
+    metrics.histogram('latency_seconds', 'test').observe(0.5)
+    metrics.reset()
+    assert all(metric.samples() == [] for metric in metrics.metrics())
+    
+    # A metric kind has to say how it resets
+    class Gauge(_Metric):
+        def samples(self):
+            return []
+    with pytest.raises(TypeError):
+        Gauge('gauge', 'test')
+    assert isinstance(Counter('c', 'test'), _Metric)
+
+def test_commands_and_operations_are_recorded(adb, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    handle = adb.device(serial)
+    
+    assert handle.run_command(['shell', 'echo hi']).success
+    assert DeviceManager(handle).get_boot_image(str(tmp_path))
+    assert not BackupManager(handle).backup_app('no.such.package', str(tmp_path))
+    
+    rows = {(row['kind'], row['name']): row for row in summary_rows() if row['serial'] == serial}
+    assert rows[('command', 'shell')]['count'] == 1
+    assert rows[('command', 'exec-out')]['bytes'] >= 64 * 1024
+    boot = rows[('operation', 'get_boot_image')]
+    assert boot['count'] == 1 and boot['failures'] == 0
+    assert boot['bytes'] == rows[('command', 'exec-out')]['bytes']
+    assert rows[('operation', 'backup_app')]['failures'] == 1
+    
+    path = registry.write(str(tmp_path / 'metrics.json'))
+    with open(path) as f:
+        snapshot = json.load(f)
+    samples = snapshot['metrics']['adb_commands_total']['samples']
+    assert {'command': 'shell', 'serial': serial, 'code': '0'} in [s['labels'] for s in samples]
+    
+    prom = registry.write(str(tmp_path / 'metrics.prom'))
+    with open(prom) as f:
+        assert f'operations_total{{operation="get_boot_image",serial="{serial}",outcome="ok"}} 1' in f.read()
+
+@pytest.mark.parametrize('min_tar_files', [10 ** 6, 1])
+def test_parallel_pull_bytes_credited_to_operation(adb, simulator, tmp_path, min_tar_files):
+    serial = next(iter(simulator.devices))
+    adb.config.PULL_TAR_MIN_FILES = min_tar_files
+    manager = BackupManager(adb.device(serial))
+    assert manager.backup_user_data(str(tmp_path / 'backup'), BACKUP_FOLDERS)
+    
+    on_disk = sum(os.path.getsize(os.path.join(folder, name))
+                  for folder, _, names in os.walk(str(tmp_path / 'backup')) for name in names
+                  if name != 'manifest.jsonl')
+    rows = {(row['kind'], row['name']): row for row in summary_rows() if row['serial'] == serial}
+    # Sync pulls count file bytes; a tar stream adds its headers and padding
+    transfer = rows[('command', 'sync-pull' if min_tar_files > 1 else 'exec-out')]['bytes']
+    assert transfer >= on_disk > 256 * 1024
+    assert rows[('operation', 'backup_user_data')]['bytes'] >= transfer
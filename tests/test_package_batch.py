@@ -0,0 +1,70 @@
+"""
+Package actions batched into one script and journaled for rollback
+"""
+
+from core.device_manager import DeviceManager
+
+def test_batch_runs_in_one_round_trip(adb, simulator):
+    serial = next(iter(simulator.devices))
+    device = simulator.devices[serial]
+    manager = DeviceManager(adb.device(serial))
+    inventory = manager.get_package_inventory()
+    
+    calls = []
+    run_shell = manager.device.run_shell
+    
+    def counting_run_shell(command, *args, **kwargs):
+        calls.append(command)
+        return run_shell(command, *args, **kwargs)
+    manager.device.run_shell = counting_run_shell
+    
+    targets = [name for name, p in device.packages.items() if not p['system']][:20]
+    batch = manager.apply_package_actions([('disable', name) for name in targets] + [('disable', 'com.missing')])
+    assert len(calls) == 1
+    assert [outcome.package for outcome in batch.succeeded] == targets
+    assert [outcome.package for outcome in batch.failed] == ['com.missing']
+    assert "Unknown package" in batch.failed[0].message
+    assert not any(device.packages[name]['enabled'] for name in targets)
+    assert set(inventory.filter(enabled=False).names) == set(targets)
+
+def test_rollback_last_batch(adb, simulator):
+    serial = next(iter(simulator.devices))
+    device = simulator.devices[serial]
+    manager = DeviceManager(adb.device(serial))
+    user_apps = [name for name, p in device.packages.items() if not p['system']]
+    
+    manager.apply_package_actions([('disable', user_apps[0]), ('uninstall', user_apps[1])])
+    assert not device.packages[user_apps[0]]['enabled'] and not device.packages[user_apps[1]]['installed']
+    assert user_apps[1] not in manager.get_package_inventory()
+    
+    # The journal outlives the session
+    manager.device.forget()
+    batch = manager.last_package_batch()
+    assert [(o.action, o.package) for o in batch.outcomes] == [('disable', user_apps[0]), ('uninstall', user_apps[1])]
+    
+    undo = manager.rollback_package_batch()
+    # Undone last step first
+    assert [(o.action, o.package) for o in undo.outcomes] == [('restore', user_apps[1]), ('enable', user_apps[0])]
+    assert not undo.failed
+    assert device.packages[user_apps[0]]['enabled'] and device.packages[user_apps[1]]['installed']
+    assert manager.last_package_batch() is None
+    assert manager.rollback_package_batch() is None
+
+def test_rollback_keeps_packages_already_in_target_state(adb, simulator):
+    serial = next(iter(simulator.devices))
+    device = simulator.devices[serial]
+    manager = DeviceManager(adb.device(serial))
+    disabled_before, enabled_before, removed_before = \
+        [name for name, p in device.packages.items() if not p['system']][:3]
+    device.packages[disabled_before]['enabled'] = False
+    device.packages[removed_before]['installed'] = False
+    
+    batch = manager.apply_package_actions([('disable', disabled_before), ('disable', enabled_before),
+                                           ('uninstall', removed_before)])
+    assert [(o.success, o.changed) for o in batch.outcomes] == [(True, False), (True, True), (False, False)]
+    
+    undo = manager.rollback_package_batch()
+    assert [(o.action, o.package) for o in undo.outcomes] == [('enable', enabled_before)]
+    assert not device.packages[disabled_before]['enabled']
+    assert device.packages[enabled_before]['enabled']
+    assert not device.packages[removed_before]['installed']
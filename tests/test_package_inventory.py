@@ -0,0 +1,72 @@
+"""
+Columnar package inventory from a single pm round trip
+"""
+
+from core.device_manager import DeviceManager
+from core.package_inventory import parse_inventory
+
+def test_parse_listing_with_paths_holding_equals():
+    inventory = parse_inventory({
+        'packages': (
+            "package:/data/app/~~Zx9q==/com.example.app-1/base.apk=com.example.app versionCode:42"
+            "  installer=com.android.vending uid:10123\n"
+            "package:/system/priv-app/Settings/Settings.apk=com.android.settings versionCode:34"
+            "  installer=null uid:1000\n"
+        ),
+        'system': "package:com.android.settings\n",
+        'disabled': "package:com.example.app\n",
+    })
+    app = inventory.get('com.example.app')
+    assert app.path == "/data/app/~~Zx9q==/com.example.app-1/base.apk"
+    assert (app.version_code, app.uid, app.installer) == (42, 10123, 'com.android.vending')
+    assert not app.system and not app.enabled
+    settings = inventory.get('com.android.settings')
+    assert settings.system and settings.enabled and settings.installer == ''
+
+def test_filter_sort_and_disable(adb, simulator):
+    serial = next(iter(simulator.devices))
+    device = simulator.devices[serial]
+    manager = DeviceManager(adb.device(serial))
+    
+    inventory = manager.get_package_inventory()
+    assert len(inventory) == len(device.packages)
+    user = inventory.filter(system=False)
+    assert set(user.names) == {name for name, p in device.packages.items() if not p['system']}
+    assert manager.get_installed_apps(system_only=True) == inventory.filter(system=True).names
+    
+    codes = list(inventory.sort('version_code', reverse=True).version_codes)
+    assert codes == sorted(codes, reverse=True)
+    
+    # Served from the handle; a disable updates the shared index in place
+    assert manager.get_package_inventory() is inventory
+    assert manager.disable_package('com.android.settings')
+    assert inventory.filter(enabled=False).names == ['com.android.settings']
+    assert manager.get_package_inventory(refresh=True).filter(enabled=False).names == ['com.android.settings']
+
+def test_changes_since_last_visit(adb, simulator):
+    serial = next(iter(simulator.devices))
+    device = simulator.devices[serial]
+    manager = DeviceManager(adb.device(serial))
+    manager.get_package_inventory()
+    assert manager.package_changes() is None
+    
+    user_apps = [name for name, p in device.packages.items() if not p['system']]
+    device.packages['com.example.new'] = dict(device.packages[user_apps[0]], uid=19999)
+    device.packages[user_apps[1]]['installed'] = False
+    device.packages[user_apps[2]]['version_code'] += 1
+    device.packages[user_apps[3]]['enabled'] = False
+    
+    # Reconnecting starts a new visit, compared with what the last one stored
+    manager.device.forget()
+    manager.get_package_inventory()
+    _, diff = manager.package_changes()
+    assert diff.installed == ['com.example.new']
+    assert diff.removed == [user_apps[1]]
+    assert [name for name, _, _ in diff.updated] == [user_apps[2]]
+    assert diff.disabled == [user_apps[3]] and diff.enabled == []
+    
+    # Later reloads in the same visit keep the same baseline
+    device.packages[user_apps[3]]['enabled'] = True
+    manager.get_package_inventory(refresh=True)
+    _, diff = manager.package_changes()
+    assert diff.disabled == [] and diff.installed == ['com.example.new']
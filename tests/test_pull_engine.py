@@ -0,0 +1,94 @@
+"""
+Parallel tree pulls: one listing, balanced units, per-file retry
+"""
+
+import os
+
+from config.constants import BACKUP_FOLDERS
+from core import pull_engine
+from core.adb_client import ADBProtocolError, SyncConnection
+from core.backup_manager import BackupManager
+from core.pull_engine import RemoteFile, list_remote_files, partition_files
+
+def test_units_balanced_by_bytes():
+    files = [RemoteFile(f"/f{i}", size, 0) for i, size in enumerate([900, 500, 400, 300, 300, 100, 100])]
+    units = partition_files(files, 3)
+    totals = sorted(sum(f.size for f in unit) for unit in units)
+    assert totals == [800, 900, 900]
+    assert sorted(f.path for unit in units for f in unit) == sorted(f.path for f in files)
+    assert len(partition_files(files[:2], 8)) == 2
+
+def test_tree_pulled_with_layout_and_mtimes(adb, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    fs = simulator.devices[serial].fs
+    handle = adb.device(serial)
+    
+    calls = []
+    run_shell = handle.run_shell
+    
+    def counting_run_shell(command, *args, **kwargs):
+        calls.append(command)
+        return run_shell(command, *args, **kwargs)
+    handle.run_shell = counting_run_shell
+    
+    updates = []
+    result = handle.pull_tree('/sdcard', str(tmp_path), workers=3, progress=updates.append)
+    remote = [path for path in fs.walk('/sdcard') if fs.isfile(path)]
+    assert result.success and result.files == len(remote) and len(calls) == 1
+    assert updates[-1].files_done == len(remote) and updates[-1].fraction == 1.0
+    for path in remote:
+        local = os.path.join(str(tmp_path), *path.lstrip('/').split('/'))
+        with open(local, 'rb') as f:
+            assert f.read() == fs.read(path)
+        assert int(os.path.getmtime(local)) == fs.stat(path)[2]
+    
+    missing = handle.pull_tree('/sdcard/Missing', str(tmp_path))
+    assert not missing.success and "does not exist" in missing.error
+
+def test_failed_files_retried_alone(adb, simulator, tmp_path, monkeypatch):
+    serial = next(iter(simulator.devices))
+    pull_file = SyncConnection.pull_file
+    attempts = {}
+    
+    def flaky_pull_file(self, remote_path, local_path, mtime=None):
+        attempts[remote_path] = attempts.get(remote_path, 0) + 1
+        if remote_path.endswith('large_file.bin') or remote_path.endswith('.pdf') and attempts[remote_path] == 1:
+            raise ADBProtocolError("transfer reset")
+        return pull_file(self, remote_path, local_path, mtime)
+    monkeypatch.setattr(SyncConnection, 'pull_file', flaky_pull_file)
+    adb.config.RETRY_BASE_DELAY = 0.001
+    
+    result = adb.device(serial).pull_tree('/sdcard/Download', str(tmp_path), workers=2)
+    assert result.failed == [('/sdcard/Download/large_file.bin', "transfer reset")]
+    assert attempts['/sdcard/Download/large_file.bin'] == 1 + adb.config.PULL_RETRIES
+    assert not os.path.exists(tmp_path / 'Download' / 'large_file.bin')
+    pdfs = [path for path in attempts if path.endswith('.pdf')]
+    assert pdfs and all(attempts[path] == 2 for path in pdfs)
+    assert result.files == len(attempts) - 1
+
+def test_symlinked_root_listed_or_reported(adb, simulator, tmp_path, monkeypatch):
+    serial = next(iter(simulator.devices))
+    fs = simulator.devices[serial].fs
+    handle = adb.device(serial)
+    assert fs.islink('/sdcard')
+    
+    listing = list_remote_files(handle, '/sdcard/DCIM', '/sdcard', '/sdcard/WhatsApp')
+    assert listing.missing == ['/sdcard/WhatsApp'] and listing.unlisted == []
+    assert {f.path for f in listing.under('/sdcard')} == {p for p in fs.walk('/sdcard') if fs.isfile(p)}
+    
+    # A find that does not follow the starting symlink lists nothing there: an error, not an empty tree
+    monkeypatch.setattr(pull_engine, 'LIST_COMMAND', pull_engine.LIST_COMMAND.replace('-H ', ''))
+    result = handle.pull_tree('/sdcard', str(tmp_path))
+    assert not result.success and "could not be listed" in result.error
+    
+    manager = BackupManager(handle)
+    manager.config = adb.config
+    folder = os.path.join(adb.config.PATHS['backup_root'], 'newbackup_20240101_000000')
+    manager.backup_user_data(folder, [('Everything', '/sdcard'), ('WhatsApp', '/sdcard/WhatsApp')])
+    assert manager.interrupted_backup() == folder
+    
+    # A folder that is simply absent is not an error
+    monkeypatch.undo()
+    complete = os.path.join(adb.config.PATHS['backup_root'], 'newbackup_20240102_000000')
+    manager.backup_user_data(complete, BACKUP_FOLDERS)
+    assert manager.interrupted_backup() is None
@@ -0,0 +1,91 @@
+"""
+Retries of transient device errors and the per-device circuit breaker
+"""
+
+import pytest
+
+from core.device_manager import DeviceManager
+from core.retry import CircuitBreaker, RetryPolicy, is_idempotent, is_read_only_shell
+
+@pytest.fixture
+def fast_retries(adb):
+    adb.retry_policy = RetryPolicy(attempts=3, base_delay=0.001, max_delay=0.002)
+    return adb
+
+@pytest.mark.parametrize('command, read_only', [
+    ("getprop ro.product.model", True),
+    ("cat /proc/sys/kernel/random/boot_id 2>/dev/null || echo; getprop | grep -v '^\\[ro\\.'", True),
+    ('su -c "dd if=/dev/block/by-name/boot bs=4096 count=32768 2>/dev/null"', True),
+    ("pm list packages -3", True),
+    ("pm uninstall com.example", False),
+    ("settings put global adb_enabled 1", False),
+    ("dd if=/sdcard/a of=/sdcard/b", False),
+    ("echo 1 > /sys/class/leds/x/brightness", False),
+    ("find /sdcard -name '*.tmp' -delete", False),
+    ("rm -rf /sdcard/Download", False),
+])
+def test_read_only_shell_classification(command, read_only):
+    assert is_read_only_shell(command) is read_only
+
+def test_idempotent_adb_arguments():
+    assert is_idempotent(['pull', '/sdcard/a', 'a'])
+    assert is_idempotent(['shell', '-T', 'ls /sdcard'])
+    assert not is_idempotent(['reboot', 'bootloader'])
+    assert not is_idempotent(['install', 'app.apk'])
+
+def test_transient_errors_are_retried(fast_retries, simulator):
+    serial = next(iter(simulator.devices))
+    simulator.inject_faults(serial, 2)
+    
+    result = fast_retries.device(serial).run_command(['shell', 'getprop ro.serialno'])
+    
+    assert result.success and result.stdout.strip() == serial
+    assert fast_retries.breaker_state(serial) == 'closed'
+
+def test_non_idempotent_commands_are_not_retried(fast_retries, simulator):
+    serial = next(iter(simulator.devices))
+    simulator.inject_faults(serial, 1, "protocol fault (couldn't read status)")
+    
+    result = fast_retries.device(serial).run_command(['shell', 'setprop debug.test 1'])
+    
+    assert not result.success and 'protocol fault' in result.stderr
+
+def test_breaker_opens_and_resets_on_reconnect(fast_retries, simulator):
+    serial = next(iter(simulator.devices))
+    changes = []
+    fast_retries.breaker_listeners.append(lambda s, state: changes.append((s, state)))
+    fast_retries.config.BREAKER_FAILURE_THRESHOLD = 3
+    simulator.inject_faults(serial, 10)
+    handle = fast_retries.device(serial)
+    
+    assert not handle.run_command(['shell', 'ls /sdcard']).success
+    assert fast_retries.breaker_state(serial) == CircuitBreaker.OPEN
+    result = handle.run_command(['shell', 'ls /sdcard'])
+    assert 'circuit open' in result.stderr
+    # Failing fast: the device saw only the first three attempts
+    assert len(simulator._faults[serial]) == 7
+    
+    fast_retries.apply_device_list([{'serial': serial, 'status': 'device'}])
+    assert changes == [(serial, 'open'), (serial, 'closed')]
+
+def test_half_open_breaker_allows_one_trial():
+    breaker = CircuitBreaker('SIM0000', failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.allow() and breaker.state == 'half-open'
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+
+def test_boot_image_stops_when_device_drops_off(fast_retries, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    simulator.inject_faults(serial, 4)
+    manager = DeviceManager(fast_retries.device(serial))
+    
+    assert not manager.get_boot_image(str(tmp_path))
+    assert 'device offline' in manager.last_error
+    # Retried the first partition path instead of moving on to the others
+    assert len(simulator._faults[serial]) == 1
+    
+    assert manager.get_boot_image(str(tmp_path))
+    assert manager.last_error is None
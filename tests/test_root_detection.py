@@ -0,0 +1,97 @@
+"""
+Root method detectors probed in one script, cached per boot
+"""
+
+import pytest
+
+from config.settings import AppConfig
+from core.adb_manager import ADBManager
+from core.device_manager import DeviceManager
+from core.root_detection import (ROOT_DETECTORS, ROOT_UNKNOWN, RootDetector, detect_root, probe_commands,
+                                 register_detector)
+from tests.support.device_simulator import DeviceSimulator
+
+@pytest.mark.parametrize('method, expected', [
+    ('magisk', 'Magisk 27.0:MAGISK:R'),
+    ('kernelsu', 'KernelSU 1.0.1'),
+    ('apatch', 'APatch 10763'),
+    ('supersu', 'SuperSU 2.82'),
+    (None, None),
+])
+def test_each_method_detected(tmp_path, method, expected):
+    with DeviceSimulator(device_count=1, package_count=10, file_count=2, large_file_size=1024,
+                         boot_size=1024, root_methods=(method,)) as simulator:
+        adb = ADBManager(simulator.configure(AppConfig(BASE_DIR=str(tmp_path))))
+        adb.get_devices()
+        try:
+            manager = DeviceManager(adb.device(next(iter(simulator.devices))))
+            rooted, _, label = manager.check_root_status()
+            assert rooted is (method is not None)
+            assert label == expected
+        finally:
+            adb.shutdown()
+
+def test_registered_detector_joins_the_probe():
+    detector = RootDetector('Custom', (("custom-su --info", r'^custom (\S+)'),))
+    register_detector(detector)
+    try:
+        commands = probe_commands()
+        assert commands.count("su -v") == 1 and "custom-su --info" in commands
+        sections = {f"root{i}": '' for i in range(len(commands))}
+        sections['root0'] = '/system/bin/su\n'
+        sections[f"root{commands.index('custom-su --info')}"] = 'custom 4.2\n'
+        assert detect_root(sections) == (True, "Rooted", "Custom 4.2")
+    finally:
+        ROOT_DETECTORS.remove(detector)
+
+@pytest.mark.parametrize('command, output, expected', [
+    ("ksud -V", 'ksud 1.0.1\n', 'KernelSU 1.0.1'),
+    ("ls -d /data/adb/ksu", '/data/adb/ksu\n', 'KernelSU'),
+    ("apd -V", 'apd 10763\n', 'APatch 10763'),
+    ("ls -d /data/adb/ap", '/data/adb/ap\n', 'APatch'),
+])
+def test_detected_without_su_in_path(command, output, expected):
+    commands = probe_commands()
+    sections = {f"root{i}": '' for i in range(len(commands))}
+    sections[f"root{commands.index(command)}"] = output
+    assert detect_root(sections) == (True, "Rooted", expected)
+
+def test_unanswered_probe_is_unknown_and_not_kept(adb, simulator):
+    serial = next(iter(simulator.devices))
+    manager = DeviceManager(adb.device(serial))
+    simulator.set_state(serial, 'unauthorized')
+    assert manager.check_root_status() == ROOT_UNKNOWN
+    assert manager.cached_root_status() is None
+    
+    # Nothing was stored, so the next answer is probed for real
+    simulator.set_state(serial, 'device')
+    assert manager.check_root_status() == (True, "Rooted", "Magisk 27.0:MAGISK:R")
+    assert manager.cached_root_status() is not None
+
+def test_status_cached_per_boot(adb, simulator):
+    serial = next(iter(simulator.devices))
+    manager = DeviceManager(adb.device(serial))
+    manager.get_detailed_device_info()
+    assert manager.cached_root_status() is None
+    
+    status = manager.check_root_status()
+    calls = []
+    run_shell = manager.device.run_shell
+    
+    def counting_run_shell(command, *args, **kwargs):
+        calls.append(command)
+        return run_shell(command, *args, **kwargs)
+    manager.device.run_shell = counting_run_shell
+    
+    # Same process: straight from the handle
+    assert manager.check_root_status() == status and calls == []
+    
+    # New session, same boot: one identity read against the device cache
+    manager.device.forget()
+    assert manager.check_root_status() == status and len(calls) == 1
+    
+    # After a reboot the method is probed again
+    manager.device.forget()
+    simulator.devices[serial].root_method = None
+    simulator.devices[serial].new_boot()
+    assert manager.check_root_status() == (False, "Not rooted", None)
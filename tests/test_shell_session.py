@@ -0,0 +1,93 @@
+"""
+Persistent shell sessions: sentinel framing, timeouts and cancellation
+"""
+
+import threading
+import time
+
+import pytest
+
+from core.cancellation import CancelToken
+from core.shell_session import ShellSessionCancelled, ShellSessionError, ShellSessionTimeout
+
+@pytest.fixture
+def serial(simulator):
+    return next(iter(simulator.devices))
+
+def test_commands_framed_back_to_back(adb, serial):
+    session = adb.get_shell_session(serial=serial)
+    
+    assert session.run('echo one; echo two') == (0, 'one\ntwo\n')
+    assert session.run("printf 'no newline'") == (0, 'no newline')
+    # Output that looks like a sentinel does not end the reply early
+    assert session.run('echo __ARS_0123abcd__ 7; echo after') == (0, '__ARS_0123abcd__ 7\nafter\n')
+    assert session.run('echo err >&2; false') == (1, 'err\n')
+    # exit only leaves the command's subshell, the session stays up
+    assert session.run('echo bye; exit 5') == (5, 'bye\n')
+    assert session.connected
+    assert session.run('echo still here') == (0, 'still here\n')
+
+def test_timeout_tears_down_the_shell(adb, serial):
+    session = adb.get_shell_session(serial=serial)
+    session.run('true')
+    
+    start = time.monotonic()
+    with pytest.raises(ShellSessionTimeout):
+        session.run('sleep 2', timeout=0.2)
+    assert time.monotonic() - start < 1.5
+    assert not session.connected
+    
+    # The next command reconnects on a fresh shell
+    assert session.run('echo again') == (0, 'again\n')
+
+def test_cancel_tears_down_the_shell(adb, serial):
+    session = adb.get_shell_session(serial=serial)
+    token = CancelToken()
+    threading.Timer(0.2, token.cancel).start()
+    
+    with pytest.raises(ShellSessionCancelled):
+        session.run('sleep 2', cancel=token)
+    assert not session.connected
+    assert session.run('echo again') == (0, 'again\n')
+
+def test_root_session_checks_su(adb, simulator, serial):
+    assert adb.get_shell_session(root=True, serial=serial).run('id -u') == (0, '0\n')
+    
+    other = [s for s in simulator.devices if s != serial][0]
+    simulator.devices[other].root_method = None
+    session = adb.get_shell_session(root=True, serial=other)
+    with pytest.raises(ShellSessionError, match='root shell not granted'):
+        session.run('id -u')
+    assert session.unavailable
+
+def test_close_mid_command_fails_the_command(adb, serial):
+    session = adb.get_shell_session(serial=serial)
+    session.run('true')
+    threading.Timer(0.2, session.close).start()
+    
+    start = time.monotonic()
+    with pytest.raises(ShellSessionError):
+        session.run('sleep 2')
+    assert time.monotonic() - start < 1.5
+    assert session.run('echo again') == (0, 'again\n')
+
+def test_worker_survives_unexpected_errors(adb, serial, monkeypatch):
+    session = adb.get_shell_session(serial=serial)
+    session.run('true')
+    monkeypatch.setattr(session, '_read_reply', lambda sentinel: 1 / 0)
+    
+    with pytest.raises(ShellSessionError, match='division by zero'):
+        session.run('true', timeout=5)
+    monkeypatch.undo()
+    assert session.run('echo ok') == (0, 'ok\n')
+
+def test_root_granted_after_close(adb, simulator, serial):
+    device = simulator.devices[serial]
+    device.root_method = None
+    session = adb.get_shell_session(root=True, serial=serial)
+    with pytest.raises(ShellSessionError, match='root shell not granted'):
+        session.run('id -u')
+    
+    device.root_method = 'magisk'
+    session.close()
+    assert session.run('id -u') == (0, '0\n')
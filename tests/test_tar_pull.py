@@ -0,0 +1,102 @@
+"""
+Tar-streamed pulls: transport choice, streaming extraction, archives
+"""
+
+import os
+import tarfile
+
+import pytest
+
+from core.adb_client import ADBProtocolError, MAX_SERVICE_LENGTH, SyncConnection
+from core.pull_engine import TAR_COMMAND_LIMIT, RemoteFile, choose_transport, tar_batches
+from tests.support.device_shell import DeviceShell
+
+def test_transport_follows_average_size(adb):
+    small = [RemoteFile(f"/sdcard/DCIM/.thumbnails/{i}.jpg", 20 * 1024, 0) for i in range(200)]
+    assert choose_transport(small, adb.config) == 'tar'
+    assert choose_transport(small[:10], adb.config) == 'sync'
+    assert choose_transport(small + [RemoteFile('/sdcard/DCIM/video.mp4', 2 ** 30, 0)], adb.config) == 'sync'
+    
+    commands = tar_batches(small, '/sdcard/DCIM', units=3)
+    assert len(commands) == 3 and all(c.startswith("tar -cf - -C /sdcard ") for c in commands)
+    assert sum(c.count('.thumbnails/') for c in commands) == len(small)
+    assert all(len(c) <= 2000 for c in tar_batches(small, '/sdcard/DCIM', limit=2000))
+
+def test_small_files_streamed_and_unpacked(adb, simulator, tmp_path, monkeypatch):
+    serial = next(iter(simulator.devices))
+    fs = simulator.devices[serial].fs
+    adb.config.PULL_TAR_MIN_FILES = 5
+    
+    pulled = []
+    pull_file = SyncConnection.pull_file
+    
+    def counting_pull_file(self, remote_path, local_path, mtime=None):
+        pulled.append(remote_path)
+        return pull_file(self, remote_path, local_path, mtime)
+    monkeypatch.setattr(SyncConnection, 'pull_file', counting_pull_file)
+    
+    updates = []
+    result = adb.device(serial).pull_tree('/sdcard/DCIM', str(tmp_path), workers=2, progress=updates.append)
+    remote = [path for path in fs.walk('/sdcard/DCIM') if fs.isfile(path)]
+    assert result.success and result.files == len(remote) and pulled == []
+    assert updates[-1].fraction == 1.0
+    for path in remote:
+        local = os.path.join(str(tmp_path), *path.split('/')[2:])
+        with open(local, 'rb') as f:
+            assert f.read() == fs.read(path)
+        assert int(os.path.getmtime(local)) == fs.stat(path)[2]
+
+def test_files_missing_from_stream_pulled_over_sync(adb, simulator, tmp_path, monkeypatch):
+    serial = next(iter(simulator.devices))
+    tar = DeviceShell._cmd_tar
+    
+    def lossy_tar(self, args, stdin):
+        return tar(self, [arg for arg in args if not arg.endswith('file_00003.jpg')], stdin)
+    monkeypatch.setattr(DeviceShell, '_cmd_tar', lossy_tar)
+    
+    pulled = []
+    pull_file = SyncConnection.pull_file
+    
+    def counting_pull_file(self, remote_path, local_path, mtime=None):
+        pulled.append(remote_path)
+        return pull_file(self, remote_path, local_path, mtime)
+    monkeypatch.setattr(SyncConnection, 'pull_file', counting_pull_file)
+    
+    result = adb.device(serial).pull_tree('/sdcard/DCIM', str(tmp_path), transport='tar')
+    assert result.success and pulled == ['/sdcard/DCIM/Camera/file_00003.jpg']
+    assert os.path.exists(os.path.join(str(tmp_path), 'DCIM', 'Camera', 'file_00003.jpg'))
+
+def test_long_selection_split_under_service_limit(adb, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    fs = simulator.devices[serial].fs
+    # ~70 KB of names: one command would not fit the 4-hex-digit request prefix
+    for i in range(500):
+        fs.write(f"/sdcard/WhatsApp/Media/{'x' * 120}_{i:04d}_\u00e9.jpg", b'media %d' % i, 1700000000)
+    files = [RemoteFile(path, 8, 1700000000) for path in fs.walk('/sdcard/WhatsApp') if fs.isfile(path)]
+    
+    commands = tar_batches(files, '/sdcard/WhatsApp')
+    assert len(commands) > 2
+    assert all(len(f"exec:{c}".encode('utf-8')) <= TAR_COMMAND_LIMIT + len('exec:') for c in commands)
+    
+    result = adb.device(serial).pull_tree('/sdcard/WhatsApp', str(tmp_path), transport='tar')
+    assert result.success and result.files == 500
+    
+    with pytest.raises(ADBProtocolError):
+        adb.client._send_request(None, 'exec:' + 'x' * MAX_SERVICE_LENGTH)
+
+def test_tree_streamed_into_compressed_archive(adb, simulator, tmp_path):
+    serial = next(iter(simulator.devices))
+    fs = simulator.devices[serial].fs
+    handle = adb.device(serial)
+    archive = str(tmp_path / 'Documents.tar.gz')
+    
+    result = handle.archive_tree('/sdcard/Documents', archive)
+    remote = sorted(path for path in fs.walk('/sdcard/Documents') if fs.isfile(path))
+    assert result.success and result.files == len(remote)
+    with tarfile.open(archive, 'r:gz') as tar:
+        assert sorted(tar.getnames()) == [path[len('/sdcard/'):] for path in remote]
+        member = tar.getmember(remote[0][len('/sdcard/'):])
+        assert tar.extractfile(member).read() == fs.read(remote[0]) and member.mtime == fs.stat(remote[0])[2]
+    
+    missing = handle.archive_tree('/sdcard/Missing', str(tmp_path / 'missing.tar'))
+    assert not missing.success and "does not exist" in missing.error
@@ -0,0 +1,59 @@
+"""
+Chrome trace recording of operations, steps and adb commands
+"""
+
+import json
+
+import pytest
+
+from config.constants import BACKUP_FOLDERS
+from core.backup_manager import BackupManager
+from core.tracing import Tracer, tracer
+
+@pytest.fixture
+def tracing():
+    tracer.start()
+    yield tracer
+    tracer.stop()
+    tracer.clear()
+
+def test_disabled_tracer_records_nothing():
+    off = Tracer()
+    with off.span('operation', 'operation', 'SIM0000') as span:
+        span.set(result='ignored')
+    off.complete('shell', 'adb', 0.0, 1.0)
+    assert off.events() == []
+
+def test_spans_nest_per_thread_with_device(adb, simulator, tmp_path, tracing):
+    serial = next(iter(simulator.devices))
+    manager = BackupManager(adb.device(serial))
+    
+    with tracer.span('backup_user_data', 'operation', serial):
+        results = manager.backup_user_data(str(tmp_path), BACKUP_FOLDERS[:2])
+    assert results
+    
+    events = tracer.events()
+    by_category = {}
+    for event in events:
+        by_category.setdefault(event['cat'], []).append(event)
+    [operation] = by_category['operation']
+    [step] = by_category['step']
+    assert step['name'] == 'backup_user_data'
+    # Folders are listed over the shell session, then pulled file by file by worker threads
+    assert {event['name'] for event in by_category['adb']} == {'shell-session', 'sync-pull'}
+    assert by_category['pull']
+    
+    # Every span sits inside its parent; all but the pull units and their pulls on the same thread
+    for child in by_category['step'] + by_category['folder'] + by_category['adb'] + by_category['pull']:
+        assert child['args']['serial'] == serial
+        on_worker = child['cat'] == 'pull' or child['name'] == 'sync-pull'
+        assert (child['tid'] == operation['tid']) != on_worker
+        assert operation['ts'] <= child['ts']
+        assert child['ts'] + child['dur'] <= operation['ts'] + operation['dur']
+    
+    path = tracer.write(str(tmp_path / 'trace.json'))
+    with open(path) as f:
+        trace = json.load(f)
+    phases = {event['ph'] for event in trace['traceEvents']}
+    assert phases == {'M', 'X'}
+    assert any(event['name'] == 'thread_name' for event in trace['traceEvents'])
@@ -0,0 +1,24 @@
+"""
+Native socket and adb subprocess transports give the same shell results
+"""
+
+import os
+
+# Stands in for the adb binary: runs `adb -s SERIAL shell COMMAND` on the host
+FAKE_ADB = '#!/bin/sh\nshift 3\nexec sh -c "$*"\n'
+
+def test_shell_text_same_over_both_transports(adb, simulator, tmp_path, monkeypatch):
+    serial = next(iter(simulator.devices))
+    command = "printf 'one\\r\\ntwo\\rthree\\n'; printf 'warn\\r\\n' >&2"
+    native = adb.run_command([adb.adb_path, '-s', serial, 'shell', command])
+    
+    fake = tmp_path / 'adb'
+    fake.write_text(FAKE_ADB)
+    os.chmod(fake, 0o755)
+    monkeypatch.setattr(adb, 'client', None)
+    monkeypatch.setattr(adb, 'adb_path', str(fake))
+    subprocess_result = adb.run_command([adb.adb_path, '-s', serial, 'shell', command])
+    
+    assert native.stdout == subprocess_result.stdout == 'one\ntwo\nthree\n'
+    assert native.stderr == subprocess_result.stderr == 'warn\n'
+    assert native.returncode == subprocess_result.returncode == 0
@@ -21,6 +21,16 @@ def format_file_size(size_bytes: int) -> str:
         size_bytes /= 1024.0
     return f"{size_bytes:.2f} PB"
 
+def link_or_copy(source: str, dest: str):
+    """Hard-link source to dest, copying instead where links are not supported"""
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(source, dest)
+    except OSError:
+        shutil.copy2(source, dest)
+
 def cleanup_old_backups(backup_dir: str, keep_count: int = 5) -> int:
     """Clean up old backups, keep only specified number"""
     if not os.path.exists(backup_dir):